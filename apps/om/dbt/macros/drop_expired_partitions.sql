@@ -0,0 +1,73 @@
+{#
+  Retention for the raw tables partitioned by day of _sdc_extracted_at
+  (flows/pg_partitions.py): drops every partition whose rows are all older
+  than retention_days. Keeps up to one day more than a row-wise delete, and
+  leaves nothing for vacuum.
+
+  A table that is not partitioned yet (weather_hourly between its creation
+  by Meltano and the next run's migration) is cleaned with a DELETE that
+  returns only the count.
+#}
+{% macro drop_expired_partitions(
+    schema_name,
+    table_name,
+    retention_days,
+    label='raw'
+) %}
+
+{% set relkind_sql %}
+  select c.relkind
+  from pg_class c
+  join pg_namespace n on n.oid = c.relnamespace
+  where n.nspname = '{{ schema_name }}' and c.relname = '{{ table_name }}'
+{% endset %}
+{% set relkind = run_query(relkind_sql) %}
+
+{% if relkind.rows | length == 0 %}
+  {{ log("No " ~ schema_name ~ "." ~ table_name ~ " table yet, nothing to clean up", info=True) }}
+
+{% elif relkind.rows[0][0] != 'p' %}
+  {% set sql %}
+    with deleted as (
+      delete from {{ schema_name }}.{{ table_name }}
+      where _sdc_extracted_at < localtimestamp - interval '{{ retention_days }} days'
+      returning 1
+    )
+    select count(*) from deleted
+  {% endset %}
+  {% set result = run_query(sql) %}
+  {{ log("Deleted " ~ label ~ " rows: " ~ result.rows[0][0], info=True) }}
+
+{% else %}
+  {% set expired_sql %}
+    select relname, greatest(reltuples, 0)::bigint
+    from (
+      select
+        c.relname,
+        c.reltuples,
+        substring(pg_get_expr(c.relpartbound, c.oid) from 'TO \(''([^'']+)''\)')::timestamp as upper_bound
+      from pg_inherits i
+      join pg_class c on c.oid = i.inhrelid
+      join pg_class p on p.oid = i.inhparent
+      join pg_namespace n on n.oid = p.relnamespace
+      where n.nspname = '{{ schema_name }}' and p.relname = '{{ table_name }}'
+    ) partitions
+    where upper_bound <= localtimestamp - interval '{{ retention_days }} days'
+    order by upper_bound
+  {% endset %}
+  {% set expired = run_query(expired_sql) %}
+
+  {% set rows = namespace(total=0) %}
+  {% for partition in expired.rows %}
+    {% do run_query("drop table " ~ schema_name ~ "." ~ partition[0]) %}
+    {% set rows.total = rows.total + partition[1] %}
+  {% endfor %}
+  {{ log(
+      "Dropped " ~ label ~ " partitions: " ~ (expired.rows | length)
+      ~ " (~" ~ rows.total ~ " rows)"
+      ~ ((": " ~ (expired.columns[0].values() | join(", "))) if expired.rows else ""),
+      info=True
+  ) }}
+{% endif %}
+
+{% endmacro %}
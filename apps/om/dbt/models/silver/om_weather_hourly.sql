@@ -5,17 +5,19 @@
 ) }}
 
 {#
-    Hourly weather data for energy forecasting.
+    Hourly weather data for energy forecasting (Folgaria).
     Outputs the 4 natural weather variables only, identical for
     both historical and forecast sources.
+    All locations are in om_weather_hourly_locations.
 #}
 
 with base as (
 
     select *
     from {{ ref('stg_om_weather') }}
+    where location_name = 'Folgaria'
     {% if is_incremental() %}
-    where datetime > (
+    and datetime > (
         select coalesce(max(datetime), '1900-01-01'::timestamp)
                - interval '7 days'
         from {{ this }}
@@ -0,0 +1,37 @@
+{{ config(
+    materialized = 'incremental',
+    unique_key   = ['location_name', 'datetime'],
+    incremental_strategy = 'merge'
+) }}
+
+{#
+    Hourly weather data for every tap-openmeteo location,
+    keyed by (location_name, datetime). Input of the multi-location
+    gold features (raw.om_weather_features_locations).
+#}
+
+with base as (
+
+    select *
+    from {{ ref('stg_om_weather') }}
+    {% if is_incremental() %}
+    where datetime > (
+        select coalesce(max(datetime), '1900-01-01'::timestamp)
+               - interval '7 days'
+        from {{ this }}
+    )
+    {% endif %}
+
+)
+
+select
+    location_name,
+    datetime,
+    shortwave_radiation,
+    direct_radiation,
+    diffuse_radiation,
+    global_tilted_irradiance,
+    cloud_cover,
+    temperature_2m,
+    precipitation
+from base
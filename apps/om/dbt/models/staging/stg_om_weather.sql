@@ -1,6 +1,6 @@
 {{ config(
     materialized = 'incremental',
-    unique_key   = ['datetime'],
+    unique_key   = ['datetime', 'location_name'],
     incremental_strategy = 'merge'
 ) }}
 
@@ -1,17 +1,33 @@
 """Retry wrapper for Open-Meteo API requests.
 
 Provides exponential backoff with jitter for transient HTTP errors
-(429 rate-limit, 5xx server errors, timeouts, connection resets).
-Used by pipeline_wind.py and pipeline_heat.py to avoid whole-task
-retry amplification in Prefect.
+(429 rate-limit, 5xx server errors, timeouts, connection resets), to avoid
+whole-task retry amplification in Prefect. ``post_with_retry`` is the
+blocking variant; ``async_post_with_retry`` is used by the concurrent
+fetch engine in om_fetch.py.
+
+Both variants go through pooled, keep-alive clients (``get_session`` and
+``async_client``) that advertise gzip and, when a decoder is installed,
+brotli. A multi-megabyte 600-point JSON response then travels compressed
+over a reused TLS connection. A per-host ``CircuitBreaker`` stops
+hammering an endpoint after consecutive failed requests, and per-host
+``RequestMetrics`` record attempts, retries, latency and bytes on the wire
+(see ``log_request_metrics``).
 """
 
+import asyncio
+import importlib.util
 import logging
 import random
+import threading
 import time
-from typing import Any, Dict, Optional, Set
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Set
+from urllib.parse import urlsplit
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
@@ -21,11 +37,374 @@ _DEFAULT_MAX_RETRIES = 2
 _DEFAULT_BASE_DELAY = 30.0  # seconds
 _DEFAULT_MAX_DELAY = 300.0  # seconds
 
+# Consecutive requests failing after all their retries that open a host's
+# circuit, and how long it stays open before one trial request is let
+# through (below the 180 s Prefect task retry delay, so a task retry gets
+# its trial).
+_DEFAULT_FAILURE_THRESHOLD = 5
+_DEFAULT_RESET_SECONDS = 120.0
+
+# Keep-alive connections per host; om_fetch runs up to
+# max_concurrent_requests POSTs at once
+_DEFAULT_POOL_SIZE = 8
+
+# httpx and urllib3 decode brotli only when one of these is installed
+ACCEPT_ENCODING: str = (
+    "gzip, deflate, br"
+    if any(importlib.util.find_spec(name) for name in ("brotli", "brotlicffi"))
+    else "gzip, deflate"
+)
+
 
 class DailyLimitExceeded(Exception):
     """Open-Meteo daily API limit exhausted — retrying is pointless until midnight UTC."""
 
 
+class CircuitOpenError(Exception):
+    """Requests to a host are suspended after repeated failures."""
+
+
+# ---------------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------------
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one host.
+
+    Closed: requests pass. After ``failure_threshold`` failed requests in a
+    row it opens and ``before_request`` raises ``CircuitOpenError`` for
+    ``reset_seconds``; then one trial request is let through (half-open).
+    Success closes the circuit; failure opens it again.
+
+    The retry loops check it once per request and record one outcome when
+    the request ends, so a request that was let through finishes its
+    retries, and a 429 (throttling, not a broken host) is recorded with
+    ``record_throttled``, which counts neither way.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = _DEFAULT_FAILURE_THRESHOLD,
+        reset_seconds: float = _DEFAULT_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def before_request(self, host: str = "") -> None:
+        """Raise ``CircuitOpenError`` unless a request may be sent now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_seconds - (self._clock() - self._opened_at)
+            if remaining <= 0 and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(
+                f"Circuit open for {host or 'host'} after {self._failures} "
+                f"consecutive failures; next trial in {max(remaining, 0):.0f}s"
+            )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+    def record_throttled(self) -> None:
+        """End a request that was only rate-limited; the next trial may go."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+@dataclass
+class RequestMetrics:
+    """Per-host request counters."""
+
+    host: str
+    requests: int = 0
+    attempts: int = 0
+    retries: int = 0
+    failures: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    bytes_decoded: int = 0
+    latency_seconds: float = 0.0
+    max_latency_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_attempt(
+        self,
+        latency: float,
+        retry: bool,
+        failed: bool,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        bytes_decoded: int = 0,
+    ) -> None:
+        with self._lock:
+            self.attempts += 1
+            self.retries += int(retry)
+            self.failures += int(failed)
+            self.bytes_sent += bytes_sent
+            self.bytes_received += bytes_received
+            self.bytes_decoded += bytes_decoded
+            self.latency_seconds += latency
+            self.max_latency_seconds = max(self.max_latency_seconds, latency)
+
+    def __str__(self) -> str:
+        mean_ms = 1000 * self.latency_seconds / self.attempts if self.attempts else 0.0
+        ratio = self.bytes_decoded / self.bytes_received if self.bytes_received else 0.0
+        return (
+            f"{self.host}: {self.requests} requests, {self.attempts} attempts "
+            f"({self.retries} retries, {self.failures} failed), latency mean "
+            f"{mean_ms:.0f} ms / max {1000 * self.max_latency_seconds:.0f} ms, "
+            f"{self.bytes_sent / 1e6:.2f} MB sent, {self.bytes_received / 1e6:.2f} MB "
+            f"received ({ratio:.1f}x compression)"
+        )
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_METRICS: Dict[str, RequestMetrics] = {}
+_SESSION: Optional[requests.Session] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def circuit_breaker(url: str) -> CircuitBreaker:
+    """The process-wide breaker for ``url``'s host."""
+    host = _host(url)
+    with _REGISTRY_LOCK:
+        return _BREAKERS.setdefault(host, CircuitBreaker())
+
+
+def _metrics(url: str) -> RequestMetrics:
+    host = _host(url)
+    with _REGISTRY_LOCK:
+        return _METRICS.setdefault(host, RequestMetrics(host=host))
+
+
+def request_metrics() -> list[RequestMetrics]:
+    """Snapshot of the counters of every host requested so far."""
+    with _REGISTRY_LOCK:
+        snapshot = []
+        for metrics in _METRICS.values():
+            with metrics._lock:
+                snapshot.append(RequestMetrics(
+                    host=metrics.host,
+                    requests=metrics.requests,
+                    attempts=metrics.attempts,
+                    retries=metrics.retries,
+                    failures=metrics.failures,
+                    bytes_sent=metrics.bytes_sent,
+                    bytes_received=metrics.bytes_received,
+                    bytes_decoded=metrics.bytes_decoded,
+                    latency_seconds=metrics.latency_seconds,
+                    max_latency_seconds=metrics.max_latency_seconds,
+                ))
+        return snapshot
+
+
+def log_request_metrics(level: int = logging.INFO) -> None:
+    """Log one line of ``request_metrics`` per host."""
+    for metrics in request_metrics():
+        logger.log(level, "HTTP %s", metrics)
+
+
+def reset_http_state() -> None:
+    """Forget breakers and metrics and close the shared session."""
+    global _SESSION
+    with _REGISTRY_LOCK:
+        _BREAKERS.clear()
+        _METRICS.clear()
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+
+
+# ---------------------------------------------------------------------------
+# Pooled clients
+# ---------------------------------------------------------------------------
+
+
+def get_session() -> requests.Session:
+    """Process-wide ``requests.Session`` with keep-alive and compression."""
+    global _SESSION
+    with _REGISTRY_LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=_DEFAULT_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            _SESSION = session
+        return _SESSION
+
+
+def async_client(
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    max_connections: int = _DEFAULT_POOL_SIZE,
+) -> httpx.AsyncClient:
+    """``httpx.AsyncClient`` with keep-alive and compression.
+
+    An async client is bound to its event loop, so each ``asyncio.run``
+    opens its own; connections are reused across the batches of one fetch.
+    """
+    return httpx.AsyncClient(
+        transport=transport,
+        headers={"Accept-Encoding": ACCEPT_ENCODING},
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+    )
+
+
+def _log_retry(status: Any, delay: float, attempt: int, max_retries: int, url: str) -> None:
+    if isinstance(status, int):
+        logger.warning(
+            "Open-Meteo returned %d, retrying in %.0fs (attempt %d/%d) url=%s",
+            status, delay, attempt + 1, max_retries, url,
+        )
+    else:
+        logger.warning(
+            "Open-Meteo request failed (%s), retrying in %.0fs (attempt %d/%d) url=%s",
+            status, delay, attempt + 1, max_retries, url,
+        )
+
+
+class _RetriedRequest:
+    """Breaker and metrics bookkeeping of one request across its attempts.
+
+    Shared by ``post_with_retry`` and ``async_post_with_retry``, which only
+    send the attempts and sleep. Used as a context manager: entering checks
+    the host's circuit; leaving without a recorded outcome (an exception
+    neither loop handles, a cancelled task) releases a half-open trial, so
+    the host is not left refusing every request.
+    """
+
+    def __init__(self, url: str, max_retries: int, base_delay: float, max_delay: float):
+        self.url = url
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = circuit_breaker(url)
+        self.metrics = _metrics(url)
+        self._ended = False
+
+    def __enter__(self) -> "_RetriedRequest":
+        self.breaker.before_request(_host(self.url))
+        self.metrics.record_request()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if not self._ended:
+            # No outcome: counts neither way, like a throttled request
+            self.breaker.record_throttled()
+
+    def _end(self, record: Callable[[], None]) -> None:
+        self._ended = True
+        record()
+
+    def transport_error(self, exc: Exception, attempt: int, latency: float) -> Optional[float]:
+        """Record an attempt that got no response.
+
+        Returns:
+            Delay before the next attempt, or None when retries are
+            exhausted (the caller re-raises ``exc``).
+        """
+        self.metrics.record_attempt(latency, retry=attempt > 0, failed=True)
+        if attempt >= self.max_retries:
+            self._end(self.breaker.record_failure)
+            return None
+        delay = _compute_delay(attempt, self.base_delay, self.max_delay)
+        _log_retry(type(exc).__name__, delay, attempt, self.max_retries, self.url)
+        return delay
+
+    def response(
+        self,
+        response: Any,
+        attempt: int,
+        latency: float,
+        bytes_sent: int,
+        bytes_received: int,
+    ) -> Optional[float]:
+        """Record an attempt's response (``requests`` or ``httpx``).
+
+        Returns:
+            Delay before the next attempt, or None when ``response`` is the
+            successful result.
+
+        Raises:
+            DailyLimitExceeded: On a daily-limit 429.
+            requests.HTTPError / httpx.HTTPStatusError: On a non-retriable
+                error status, or a retriable one after the last retry.
+        """
+        failed = response.status_code in RETRIABLE_STATUS_CODES
+        self.metrics.record_attempt(
+            latency,
+            retry=attempt > 0,
+            failed=failed,
+            bytes_sent=bytes_sent,
+            bytes_received=bytes_received,
+            bytes_decoded=len(response.content),
+        )
+
+        if not failed:
+            self._end(self.breaker.record_success)
+            response.raise_for_status()
+            return None
+
+        if response.status_code == 429 and "daily" in response.text.lower():
+            self._end(self.breaker.record_throttled)
+            raise DailyLimitExceeded(
+                f"Daily API request limit exceeded (url={self.url})"
+            )
+
+        # Retriable status — exhaust retries before raising
+        if attempt >= self.max_retries:
+            self._end(lambda: _record_exhausted(self.breaker, response.status_code))
+            response.raise_for_status()
+
+        delay = _compute_delay(
+            attempt, self.base_delay, self.max_delay, response.headers,
+        )
+        _log_retry(response.status_code, delay, attempt, self.max_retries, self.url)
+        return delay
+
+
 def post_with_retry(
     url: str,
     data: Dict[str, Any],
@@ -33,6 +412,7 @@ def post_with_retry(
     max_retries: int = _DEFAULT_MAX_RETRIES,
     base_delay: float = _DEFAULT_BASE_DELAY,
     max_delay: float = _DEFAULT_MAX_DELAY,
+    session: Optional[requests.Session] = None,
 ) -> requests.Response:
     """POST request with exponential backoff for transient API errors.
 
@@ -46,75 +426,116 @@ def post_with_retry(
         max_retries: Maximum number of retry attempts.
         base_delay: Initial backoff delay in seconds.
         max_delay: Cap on backoff delay in seconds.
+        session: Session to send on (default: the shared ``get_session()``).
 
     Returns:
         Successful ``requests.Response``.
 
     Raises:
+        CircuitOpenError: If the host's circuit is open.
         requests.HTTPError: After all retries are exhausted for HTTP errors.
         requests.exceptions.ReadTimeout: After all retries for timeouts.
         requests.exceptions.ConnectionError: After all retries for connection
             failures.
     """
-    last_exception: Optional[Exception] = None
-
-    for attempt in range(max_retries + 1):
-        try:
-            response = requests.post(url, data=data, timeout=timeout)
+    session = session or get_session()
+    with _RetriedRequest(url, max_retries, base_delay, max_delay) as request:
+        for attempt in range(max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = session.post(url, data=data, timeout=timeout)
+            except (
+                requests.exceptions.ReadTimeout,
+                requests.exceptions.ConnectionError,
+            ) as exc:
+                delay = request.transport_error(exc, attempt, time.perf_counter() - start)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
 
-            if response.status_code not in RETRIABLE_STATUS_CODES:
-                response.raise_for_status()
+            delay = request.response(
+                response,
+                attempt,
+                time.perf_counter() - start,
+                bytes_sent=len(response.request.body or b""),
+                bytes_received=response.raw.tell() if response.raw is not None else 0,
+            )
+            if delay is None:
                 return response
+            time.sleep(delay)
 
-            if response.status_code == 429 and "daily" in response.text.lower():
-                raise DailyLimitExceeded(
-                    f"Daily API request limit exceeded (url={url})"
-                )
+    raise RuntimeError("Unexpected retry loop exit")  # pragma: no cover
 
-            # Retriable status — exhaust retries before raising
-            if attempt >= max_retries:
-                response.raise_for_status()
 
-            delay = _compute_delay(
-                attempt, base_delay, max_delay, response.headers,
-            )
-            logger.warning(
-                "Open-Meteo returned %d, retrying in %.0fs "
-                "(attempt %d/%d) url=%s",
-                response.status_code,
-                delay,
-                attempt + 1,
-                max_retries,
-                url,
-            )
-            time.sleep(delay)
+async def async_post_with_retry(
+    client: httpx.AsyncClient,
+    url: str,
+    data: Dict[str, Any],
+    timeout: int = 120,
+    max_retries: int = _DEFAULT_MAX_RETRIES,
+    base_delay: float = _DEFAULT_BASE_DELAY,
+    max_delay: float = _DEFAULT_MAX_DELAY,
+) -> httpx.Response:
+    """Async ``post_with_retry`` on a shared ``httpx.AsyncClient``.
+
+    Same retry policy: 429, 5xx, read timeouts and connection errors are
+    retried with exponential backoff, honouring ``Retry-After``; a daily
+    limit 429 raises ``DailyLimitExceeded`` at once. Shares the host's
+    circuit breaker and metrics with ``post_with_retry``.
 
-        except (
-            requests.exceptions.ReadTimeout,
-            requests.exceptions.ConnectionError,
-        ) as exc:
-            last_exception = exc
-            if attempt >= max_retries:
-                raise
-
-            delay = _compute_delay(attempt, base_delay, max_delay)
-            logger.warning(
-                "Open-Meteo request failed (%s), retrying in %.0fs "
-                "(attempt %d/%d) url=%s",
-                type(exc).__name__,
-                delay,
-                attempt + 1,
-                max_retries,
-                url,
+    Args:
+        client: Open async client (see ``async_client``).
+        url: Target URL.
+        data: Form-encoded POST body.
+        timeout: Per-request read timeout in seconds.
+        max_retries: Maximum number of retry attempts.
+        base_delay: Initial backoff delay in seconds.
+        max_delay: Cap on backoff delay in seconds.
+
+    Returns:
+        Successful ``httpx.Response``.
+
+    Raises:
+        CircuitOpenError: If the host's circuit is open.
+        httpx.HTTPStatusError: After all retries are exhausted for HTTP errors.
+        httpx.TransportError: After all retries for timeouts and connection
+            failures.
+    """
+    with _RetriedRequest(url, max_retries, base_delay, max_delay) as request:
+        for attempt in range(max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, data=data, timeout=timeout)
+            except httpx.TransportError as exc:
+                delay = request.transport_error(exc, attempt, time.perf_counter() - start)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            delay = request.response(
+                response,
+                attempt,
+                time.perf_counter() - start,
+                bytes_sent=len(response.request.content),
+                bytes_received=response.num_bytes_downloaded,
             )
-            time.sleep(delay)
+            if delay is None:
+                return response
+            await asyncio.sleep(delay)
 
-    # Unreachable in practice; satisfies type checker
-    if last_exception:
-        raise last_exception
     raise RuntimeError("Unexpected retry loop exit")  # pragma: no cover
 
 
+def _record_exhausted(breaker: CircuitBreaker, status: int) -> None:
+    """Record a request whose retries ran out on a retriable status."""
+    if status == 429:
+        breaker.record_throttled()
+    else:
+        breaker.record_failure()
+
+
 def _compute_delay(
     attempt: int,
     base_delay: float,
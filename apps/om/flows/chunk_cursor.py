@@ -0,0 +1,185 @@
+"""Round-robin grid chunking with a cursor persisted in Postgres.
+
+A pipeline that fetches ``1/n_chunks`` of its grid per run keeps the next
+chunk index in a one-row-per-pipeline cursor table. ``claim_chunk`` leases
+the next chunk in a short transaction of its own, so no row lock or open
+transaction is held while the chunk is fetched. ``advance_chunk`` moves the
+cursor on and clears the lease in the transaction that loads the chunk's
+rows; a failed run calls ``release_chunk`` (or lets the lease expire) and
+the next run retries the same chunk. While a lease is live, overlapping
+runs get no chunk instead of fetching the same one twice.
+
+Chunks are strided (``grid[chunk::n_chunks]``) rather than contiguous, so
+every run samples the whole area at ``n_chunks`` times the grid spacing.
+
+Used by pipeline_obs.py.
+"""
+
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_points(
+    grid: Sequence[Tuple[float, float]],
+    n_chunks: int,
+    chunk: int,
+) -> List[Tuple[float, float]]:
+    """Points of round-robin chunk ``chunk`` out of ``n_chunks``.
+
+    Args:
+        grid: Full grid, in a stable order.
+        n_chunks: Number of chunks the grid is split into.
+        chunk: Chunk index, ``0 <= chunk < n_chunks``.
+
+    Returns:
+        Every ``n_chunks``-th point starting at ``chunk``.
+    """
+    if n_chunks < 1:
+        raise ValueError(f"n_chunks must be >= 1, got {n_chunks}")
+    if not 0 <= chunk < n_chunks:
+        raise ValueError(f"chunk {chunk} out of range for {n_chunks} chunks")
+    return list(grid[chunk::n_chunks])
+
+
+def ensure_cursor_table(conn: sa.Connection, schema: str, table: str) -> None:
+    """Create the cursor table if it doesn't exist."""
+    conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    conn.execute(sa.text(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.{table} (
+            pipeline     TEXT PRIMARY KEY,
+            next_chunk   INTEGER NOT NULL,
+            n_chunks     INTEGER NOT NULL,
+            grid_size    INTEGER NOT NULL,
+            updated_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+            leased_until TIMESTAMPTZ
+        )
+    """))
+    conn.execute(sa.text(
+        f"ALTER TABLE {schema}.{table} ADD COLUMN IF NOT EXISTS leased_until TIMESTAMPTZ"
+    ))
+
+
+def claim_chunk(
+    conn: sa.Connection,
+    schema: str,
+    table: str,
+    pipeline: str,
+    n_chunks: int,
+    grid_size: int,
+    lease_seconds: int,
+) -> Optional[int]:
+    """Lease the pipeline's next chunk for ``lease_seconds``.
+
+    Run it in its own transaction and commit before fetching: the row lock
+    only serialises concurrent claims, the lease keeps the chunk reserved
+    after the commit. The cursor restarts at chunk 0 when ``n_chunks`` or
+    ``grid_size`` differ from the stored values (the config or the
+    boundary changed).
+
+    Args:
+        conn: Connection inside an open transaction.
+        schema: Cursor table schema.
+        table: Cursor table name.
+        pipeline: Cursor row key.
+        n_chunks: Chunks the grid is split into.
+        grid_size: Points in the full grid.
+        lease_seconds: How long the chunk stays reserved for this run; set
+            it above the worst-case fetch time including retry sleeps.
+
+    Returns:
+        Chunk index in ``[0, n_chunks)``, or None while another run holds
+        a live lease.
+    """
+    conn.execute(
+        sa.text(f"""
+            INSERT INTO {schema}.{table} (pipeline, next_chunk, n_chunks, grid_size)
+            VALUES (:pipeline, 0, :n_chunks, :grid_size)
+            ON CONFLICT (pipeline) DO NOTHING
+        """),
+        {"pipeline": pipeline, "n_chunks": n_chunks, "grid_size": grid_size},
+    )
+    stored = conn.execute(
+        sa.text(f"""
+            SELECT next_chunk, n_chunks, grid_size,
+                   coalesce(leased_until > now(), false) AS leased
+            FROM {schema}.{table}
+            WHERE pipeline = :pipeline
+            FOR UPDATE
+        """),
+        {"pipeline": pipeline},
+    ).one()
+
+    if stored.leased:
+        return None
+    chunk = stored.next_chunk % n_chunks
+    if (stored.n_chunks, stored.grid_size) != (n_chunks, grid_size):
+        logger.info(
+            "Chunk cursor %s reset: %d chunks of %d points -> %d chunks of %d points",
+            pipeline, stored.n_chunks, stored.grid_size, n_chunks, grid_size,
+        )
+        chunk = 0
+    conn.execute(
+        sa.text(f"""
+            UPDATE {schema}.{table}
+            SET next_chunk   = :chunk,
+                n_chunks     = :n_chunks,
+                grid_size    = :grid_size,
+                leased_until = now() + :lease_seconds * interval '1 second'
+            WHERE pipeline = :pipeline
+        """),
+        {
+            "pipeline": pipeline,
+            "chunk": chunk,
+            "n_chunks": n_chunks,
+            "grid_size": grid_size,
+            "lease_seconds": lease_seconds,
+        },
+    )
+    return chunk
+
+
+def advance_chunk(
+    conn: sa.Connection,
+    schema: str,
+    table: str,
+    pipeline: str,
+    chunk: int,
+    n_chunks: int,
+    grid_size: int,
+) -> None:
+    """Point the cursor at the chunk after ``chunk`` and clear the lease.
+
+    Only moves a cursor still at ``chunk``: after a lease expired and another
+    run claimed (and advanced past) the same chunk, the late run leaves the
+    cursor alone.
+    """
+    conn.execute(
+        sa.text(f"""
+            UPDATE {schema}.{table}
+            SET next_chunk   = :next_chunk,
+                n_chunks     = :n_chunks,
+                grid_size    = :grid_size,
+                leased_until = NULL,
+                updated_at   = now()
+            WHERE pipeline = :pipeline AND next_chunk = :chunk
+        """),
+        {
+            "pipeline": pipeline,
+            "chunk": chunk,
+            "next_chunk": (chunk + 1) % n_chunks,
+            "n_chunks": n_chunks,
+            "grid_size": grid_size,
+        },
+    )
+
+
+def release_chunk(conn: sa.Connection, schema: str, table: str, pipeline: str) -> None:
+    """Drop the pipeline's lease without moving the cursor (failed fetch)."""
+    conn.execute(
+        sa.text(f"UPDATE {schema}.{table} SET leased_until = NULL WHERE pipeline = :pipeline"),
+        {"pipeline": pipeline},
+    )
@@ -0,0 +1,163 @@
+"""Cached solar-geometry and calendar lookup tables for features.py.
+
+Cyclic encodings, solar elevation and holiday flags depend only on the
+calendar (and latitude), not on the weather. They are computed once per
+process into small tables, and the feature builders fill them with a
+vectorized gather instead of per-row trig.
+
+Every table entry is computed with the same expression the builders used
+per row, so gathered values are bit-identical to direct computation.
+"""
+
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Hours covered by the epoch-cycle tables (about 20 years from the epoch).
+# Later or earlier timestamps, and non-whole hours, fall back to direct trig.
+_EPOCH_TABLE_HOURS: int = 20 * 8766
+
+# Latitude resolution of the solar tables (degrees); ~11 m, so existing
+# site coordinates (4 decimals) map to exact table keys.
+_LATITUDE_DECIMALS: int = 4
+
+
+# =============================================================================
+# Cyclic encodings
+# =============================================================================
+
+@lru_cache(maxsize=None)
+def _cyclic_table(period: int) -> tuple[np.ndarray, np.ndarray]:
+    """sin/cos of ``2*pi*k/period`` for k = 0..period-1."""
+    angle = 2 * np.pi * np.arange(period) / period
+    return np.sin(angle), np.cos(angle)
+
+
+def cyclic_terms(values: np.ndarray, period: int) -> tuple[np.ndarray, np.ndarray]:
+    """sin/cos encoding of integer ``values`` in [0, period), e.g. hour of day.
+
+    Args:
+        values: Integer array (hour 0-23, day of week 0-6, ...).
+        period: Cycle length.
+
+    Returns:
+        Tuple of (sin, cos) float64 arrays.
+    """
+    sin_table, cos_table = _cyclic_table(period)
+    return sin_table[values], cos_table[values]
+
+
+@lru_cache(maxsize=None)
+def _epoch_cycle_table(period: int) -> tuple[np.ndarray, np.ndarray]:
+    """sin/cos of ``2*pi*h/period`` for whole hours h since the epoch."""
+    angle = 2 * np.pi * np.arange(_EPOCH_TABLE_HOURS, dtype=float) / period
+    return np.sin(angle), np.cos(angle)
+
+
+def epoch_cycle_terms(
+    hours_since_epoch: np.ndarray,
+    period: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """sin/cos of ``2*pi*hours_since_epoch/period`` (annual/semi-annual Fourier).
+
+    Args:
+        hours_since_epoch: Float hours since the Fourier epoch.
+        period: Cycle length in hours.
+
+    Returns:
+        Tuple of (sin, cos) float64 arrays.
+    """
+    sin_table, cos_table = _epoch_cycle_table(period)
+    index = np.floor(hours_since_epoch)
+    in_table = (
+        (index == hours_since_epoch) & (index >= 0) & (index < _EPOCH_TABLE_HOURS)
+    )
+    safe_index = np.where(in_table, index, 0).astype(np.int64)
+    sin_values = sin_table[safe_index]
+    cos_values = cos_table[safe_index]
+
+    if not in_table.all():
+        outside = ~in_table
+        angle = 2 * np.pi * hours_since_epoch[outside] / period
+        sin_values[outside] = np.sin(angle)
+        cos_values[outside] = np.cos(angle)
+    return sin_values, cos_values
+
+
+# =============================================================================
+# Holiday calendar
+# =============================================================================
+
+@lru_cache(maxsize=None)
+def _holiday_table(holidays: tuple[str, ...]) -> tuple[np.datetime64, np.ndarray]:
+    """Per-day holiday flags from the first to the last holiday date."""
+    days = np.array(holidays, dtype="datetime64[D]")
+    first = days.min()
+    table = np.zeros(int((days.max() - first).astype(np.int64)) + 1, dtype=np.int64)
+    table[(days - first).astype(np.int64)] = 1
+    return first, table
+
+
+def holiday_flags(dt_series: pd.Series, holidays: tuple[str, ...]) -> np.ndarray:
+    """1 where the date of ``dt_series`` is in ``holidays``, else 0.
+
+    Args:
+        dt_series: Parsed (tz-naive) datetime of every row.
+        holidays: Holiday dates as 'YYYY-MM-DD' strings.
+
+    Returns:
+        int64 array of 0/1 flags.
+    """
+    first, table = _holiday_table(holidays)
+    offset = (dt_series.to_numpy().astype("datetime64[D]") - first).astype(np.int64)
+    in_table = (offset >= 0) & (offset < len(table))
+    return np.where(in_table, table[np.where(in_table, offset, 0)], 0)
+
+
+# =============================================================================
+# Solar geometry
+# =============================================================================
+
+@lru_cache(maxsize=None)
+def _solar_table(latitude: float) -> tuple[np.ndarray, np.ndarray]:
+    """Sine of solar elevation and clear-sky GHI per (day_of_year, hour).
+
+    Simplified declination / hour-angle model; rows are day_of_year 0-366
+    (row 0 unused), columns hour 0-23.
+    """
+    logger.debug("Building solar table for latitude %.4f", latitude)
+    day_of_year = np.arange(367)
+    hour = np.arange(24)
+    declination = 23.45 * np.sin(np.radians(360 / 365 * (day_of_year - 81)))
+    hour_angle = 15 * (hour - 12)
+    lat_rad = np.radians(latitude)
+    decl_rad = np.radians(declination)[:, None]
+    sin_elevation = (
+        np.sin(lat_rad) * np.sin(decl_rad)
+        + np.cos(lat_rad) * np.cos(decl_rad) * np.cos(np.radians(hour_angle))[None, :]
+    )
+    clearsky_ghi = np.maximum(0, 1000 * np.clip(sin_elevation, 0, None))
+    return sin_elevation, clearsky_ghi
+
+
+def solar_terms(
+    day_of_year: np.ndarray,
+    hour: np.ndarray,
+    latitude: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sine of solar elevation and clear-sky GHI (W/m2) for every row.
+
+    Args:
+        day_of_year: Day of year (1-366) of every row.
+        hour: Hour of day (0-23) of every row.
+        latitude: Site latitude in degrees.
+
+    Returns:
+        Tuple of (sin_elevation, clearsky_ghi) float64 arrays.
+    """
+    sin_elevation, clearsky_ghi = _solar_table(round(latitude, _LATITUDE_DECIMALS))
+    return sin_elevation[day_of_year, hour], clearsky_ghi[day_of_year, hour]
@@ -8,17 +8,21 @@ Features are designed for energy consumption forecasting and are
 identical for both historical and forecast data, ensuring
 train/test consistency.
 
-All datetime operations assume Italian local time (Europe/Rome),
-which matches the Open-Meteo API timezone parameter.
+All datetime operations assume the location's local time, which matches
+the Open-Meteo API timezone parameter. The holiday calendar, solar latitude
+and climate defaults of every location come from LOCATION_PROFILES.
 """
 
 import logging
+from dataclasses import dataclass, field
 from datetime import date, timedelta
-from typing import Optional
+from typing import Any, Callable, Optional
 
 import numpy as np
 import pandas as pd
 
+from ephemeris import cyclic_terms, epoch_cycle_terms, holiday_flags, solar_terms
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,6 +32,9 @@ logger = logging.getLogger(__name__)
 
 DATETIME_COL: str = "datetime"
 
+# Group key of the multi-location builder (weather_locations seed ids)
+LOCATION_COL: str = "location_id"
+
 REQUIRED_WEATHER_COLS: list[str] = [
     "temperature_2m",
     "shortwave_radiation",
@@ -45,8 +52,16 @@ METERS_WEATHER_COLS: list[str] = [
     "cloud_cover",
 ]
 
-# Folgaria coordinates for solar position calculations
+# Halflife (hours) of the thermal_inertia_12h EWM
+THERMAL_INERTIA_HALFLIFE: int = 12
+
+# Latitudes (degrees north) for solar position calculations
 FOLGARIA_LAT: float = 45.9167
+LAPPEENRANTA_LAT: float = 61.0583
+VALENCIA_LAT: float = 39.4699
+
+# Location of the single-location builders (the om pipeline's own site)
+DEFAULT_LOCATION: str = "it_folgaria"
 
 SELECTED_METERS_FEATURES: list[str] = [
     "hour_sin",
@@ -133,9 +148,49 @@ MONTHLY_CLIMATE_DEFAULTS: dict[str, dict[int, float]] = {
     },
 }
 
+# Monthly climate defaults for Lappeenranta (South Karelia, ~100m altitude)
+LAPPEENRANTA_CLIMATE_DEFAULTS: dict[str, dict[int, float]] = {
+    "temperature_2m": {
+        1: -8.5, 2: -9.0, 3: -4.5, 4: 2.5, 5: 9.5, 6: 14.5,
+        7: 17.5, 8: 15.5, 9: 10.0, 10: 4.5, 11: -0.5, 12: -5.0,
+    },
+    "shortwave_radiation": {
+        1: 40, 2: 100, 3: 220, 4: 350, 5: 480, 6: 520,
+        7: 500, 8: 400, 9: 260, 10: 120, 11: 50, 12: 25,
+    },
+    "cloud_cover": {
+        1: 85, 2: 80, 3: 70, 4: 65, 5: 55, 6: 55,
+        7: 55, 8: 60, 9: 70, 10: 80, 11: 88, 12: 90,
+    },
+    "precipitation": {
+        1: 0.1, 2: 0.0, 3: 0.0, 4: 0.0, 5: 0.1, 6: 0.1,
+        7: 0.1, 8: 0.1, 9: 0.1, 10: 0.1, 11: 0.1, 12: 0.1,
+    },
+}
+
+# Monthly climate defaults for Valencia (Mediterranean coast, sea level)
+VALENCIA_CLIMATE_DEFAULTS: dict[str, dict[int, float]] = {
+    "temperature_2m": {
+        1: 11.5, 2: 12.5, 3: 14.5, 4: 16.5, 5: 19.5, 6: 23.5,
+        7: 26.0, 8: 26.5, 9: 24.0, 10: 20.0, 11: 15.5, 12: 12.5,
+    },
+    "shortwave_radiation": {
+        1: 230, 2: 290, 3: 380, 4: 460, 5: 540, 6: 590,
+        7: 600, 8: 540, 9: 440, 10: 340, 11: 250, 12: 210,
+    },
+    "cloud_cover": {
+        1: 45, 2: 45, 3: 45, 4: 45, 5: 40, 6: 30,
+        7: 20, 8: 25, 9: 35, 10: 45, 11: 45, 12: 45,
+    },
+    "precipitation": {
+        1: 0.0, 2: 0.0, 3: 0.0, 4: 0.0, 5: 0.0, 6: 0.0,
+        7: 0.0, 8: 0.0, 9: 0.1, 10: 0.1, 11: 0.1, 12: 0.0,
+    },
+}
+
 
 # =============================================================================
-# Italian holidays
+# Holiday calendars
 # =============================================================================
 
 def _easter_date(year: int) -> date:
@@ -191,13 +246,182 @@ def _generate_italian_holidays(
     return sorted(holidays)
 
 
+def _weekday_on_or_after(year: int, month: int, day: int, weekday: int) -> date:
+    """First date on or after ``year-month-day`` falling on ``weekday`` (Monday=0)."""
+    start = date(year, month, day)
+    return start + timedelta(days=(weekday - start.weekday()) % 7)
+
+
+def _generate_finnish_holidays(
+    start_year: int = 2020,
+    end_year: int = 2035,
+) -> list[str]:
+    """Generate Finnish public holiday dates (plus Midsummer Eve) for a range of years.
+
+    Args:
+        start_year: First year to generate holidays for.
+        end_year: Last year (inclusive) to generate holidays for.
+
+    Returns:
+        Sorted list of date strings in 'YYYY-MM-DD' format.
+    """
+    fixed_dates = [
+        (1, 1),    # Uudenvuodenpäivä
+        (1, 6),    # Loppiainen
+        (5, 1),    # Vappu
+        (12, 6),   # Itsenäisyyspäivä
+        (12, 24),  # Jouluaatto
+        (12, 25),  # Joulupäivä
+        (12, 26),  # Tapaninpäivä
+    ]
+    holidays: list[str] = []
+    for year in range(start_year, end_year + 1):
+        for month, day in fixed_dates:
+            holidays.append(date(year, month, day).isoformat())
+        easter = _easter_date(year)
+        for days in (-2, 1, 39):  # Good Friday, Easter Monday, Ascension
+            holidays.append((easter + timedelta(days=days)).isoformat())
+        midsummer_eve = _weekday_on_or_after(year, 6, 19, 4)
+        holidays.append(midsummer_eve.isoformat())
+        holidays.append((midsummer_eve + timedelta(days=1)).isoformat())
+        holidays.append(_weekday_on_or_after(year, 10, 31, 5).isoformat())  # All Saints
+    return sorted(holidays)
+
+
+def _generate_valencian_holidays(
+    start_year: int = 2020,
+    end_year: int = 2035,
+) -> list[str]:
+    """Generate Spanish national plus Valencian regional holiday dates.
+
+    Args:
+        start_year: First year to generate holidays for.
+        end_year: Last year (inclusive) to generate holidays for.
+
+    Returns:
+        Sorted list of date strings in 'YYYY-MM-DD' format.
+    """
+    fixed_dates = [
+        (1, 1),    # Año Nuevo
+        (1, 6),    # Epifanía
+        (5, 1),    # Fiesta del Trabajo
+        (8, 15),   # Asunción
+        (10, 9),   # Día de la Comunitat Valenciana
+        (10, 12),  # Fiesta Nacional
+        (11, 1),   # Todos los Santos
+        (12, 6),   # Día de la Constitución
+        (12, 8),   # Inmaculada Concepción
+        (12, 25),  # Navidad
+    ]
+    holidays: list[str] = []
+    for year in range(start_year, end_year + 1):
+        for month, day in fixed_dates:
+            holidays.append(date(year, month, day).isoformat())
+        easter = _easter_date(year)
+        for days in (-2, 1):  # Viernes Santo, Lunes de Pascua
+            holidays.append((easter + timedelta(days=days)).isoformat())
+    return sorted(holidays)
+
+
 ITALIAN_HOLIDAYS: list[str] = _generate_italian_holidays()
+FINNISH_HOLIDAYS: list[str] = _generate_finnish_holidays()
+VALENCIAN_HOLIDAYS: list[str] = _generate_valencian_holidays()
+
+
+# =============================================================================
+# Location profiles
+# =============================================================================
+
+@dataclass(frozen=True)
+class LocationProfile:
+    """Calendar, solar and climate parameters of one weather location.
+
+    Attributes:
+        latitude: Degrees north, for the solar position features.
+        holidays: Public holiday dates ('YYYY-MM-DD'), for is_holiday. A
+            tuple, so it keys the cached calendar (ephemeris.holiday_flags).
+        climate: Monthly climate defaults (column -> {month: value}), the
+            last-resort fill of large weather gaps.
+    """
+
+    latitude: float
+    holidays: tuple[str, ...]
+    climate: dict[str, dict[int, float]] = field(hash=False)
+
+    def climate_arrays(self) -> dict[str, np.ndarray]:
+        """``climate`` as arrays indexed by month (index 0 unused)."""
+        return {
+            column: np.array([np.nan] + [monthly[m] for m in range(1, 13)], dtype=float)
+            for column, monthly in self.climate.items()
+        }
+
+
+# Profiles of the weather_locations seed points, by location_id.
+LOCATION_PROFILES: dict[str, LocationProfile] = {
+    "it_folgaria": LocationProfile(
+        FOLGARIA_LAT, tuple(ITALIAN_HOLIDAYS), MONTHLY_CLIMATE_DEFAULTS,
+    ),
+    "fi_lappeenranta": LocationProfile(
+        LAPPEENRANTA_LAT, tuple(FINNISH_HOLIDAYS), LAPPEENRANTA_CLIMATE_DEFAULTS,
+    ),
+    "es_valencia": LocationProfile(
+        VALENCIA_LAT, tuple(VALENCIAN_HOLIDAYS), VALENCIA_CLIMATE_DEFAULTS,
+    ),
+}
+
+
+def location_profile(location_id: str) -> LocationProfile:
+    """Profile of ``location_id``.
+
+    Raises:
+        ValueError: If the location has no profile in LOCATION_PROFILES.
+    """
+    try:
+        return LOCATION_PROFILES[location_id]
+    except KeyError:
+        raise ValueError(
+            f"Unknown location '{location_id}'; known: {sorted(LOCATION_PROFILES)}"
+        ) from None
 
 
 # =============================================================================
 # Imputation
 # =============================================================================
 
+# Same-hour fallbacks for large gaps, in preference order (1, 2, 3 days back).
+_FALLBACK_LAGS_HOURS: tuple[int, ...] = (24, 48, 72)
+
+
+def _find_gap_runs(
+    is_nan: np.ndarray,
+    offsets: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Find runs of consecutive True values in a boolean array.
+
+    Args:
+        is_nan: Boolean missing-value mask.
+        offsets: Row position within its group for stacked multi-location
+            series; runs are split at group boundaries. None means a single
+            series.
+
+    Returns:
+        Tuple of (start positions, run lengths), both int arrays in
+        ascending position order.
+    """
+    if offsets is not None:
+        group_start = offsets == 0
+        prev_nan = np.concatenate(([False], is_nan[:-1])) & ~group_start
+        next_nan = np.concatenate((is_nan[1:], [False])) & ~np.append(group_start[1:], True)
+        starts = np.flatnonzero(is_nan & ~prev_nan)
+        ends = np.flatnonzero(is_nan & ~next_nan)
+        return starts, ends - starts + 1
+
+    padded = np.concatenate(([False], is_nan, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    starts = edges[0::2]
+    return starts, edges[1::2] - starts
+
+
 def _find_gap_lengths(series: pd.Series) -> list[tuple[int, int, int]]:
     """Find all NaN gaps in a series.
 
@@ -207,109 +431,185 @@ def _find_gap_lengths(series: pd.Series) -> list[tuple[int, int, int]]:
     Returns:
         List of (start_idx, end_idx, length) tuples for each gap.
     """
-    is_nan = series.isna()
-    if not is_nan.any():
-        return []
+    starts, lengths = _find_gap_runs(series.isna().to_numpy())
+    return [
+        (int(start), int(start + length - 1), int(length))
+        for start, length in zip(starts, lengths)
+    ]
+
+
+def _fill_large_gaps(
+    values: np.ndarray,
+    defaults: Optional[np.ndarray],
+    starts: np.ndarray,
+    lengths: np.ndarray,
+    offsets: Optional[np.ndarray] = None,
+) -> None:
+    """Fill the given gaps in place from same-hour history or climate defaults.
+
+    Each position takes the first non-NaN value 24h/48h/72h back, falling back
+    to its climate default. Values filled earlier in the series are valid
+    sources for later positions, so positions are processed one 24-row block
+    at a time: every source of a block lies in an earlier block, and each
+    block is filled with a single vectorized gather per lag.
+
+    Args:
+        values: Float array to fill (modified in place).
+        defaults: Climate default of every row in ``values`` (NaN where there
+            is none), or None.
+        starts: Start positions of the gaps to fill.
+        lengths: Lengths of the gaps to fill.
+        offsets: Row position within its group for stacked multi-location
+            series; sources never reach into the previous group. None means a
+            single series.
+    """
+    gap_offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    positions = np.repeat(starts, lengths) + gap_offsets
+
+    block_size = min(_FALLBACK_LAGS_HOURS)
+    blocks = positions // block_size
+    for block in np.split(positions, np.flatnonzero(np.diff(blocks)) + 1):
+        filled = np.full(block.size, np.nan)
+        history = block if offsets is None else offsets[block]
+        for lag in _FALLBACK_LAGS_HOURS:
+            pending = np.isnan(filled) & (history >= lag)
+            candidate = values[np.where(pending, block - lag, 0)]
+            take = pending & ~np.isnan(candidate)
+            filled[take] = candidate[take]
+
+        if defaults is not None:
+            missing = np.isnan(filled)
+            filled[missing] = defaults[block[missing]]
+
+        values[block] = filled
+
+
+def _prefill_large_gaps(
+    values: np.ndarray,
+    months: np.ndarray,
+    column: str,
+    small_gap_threshold: int,
+    climate: dict[str, np.ndarray],
+) -> int:
+    """Fill gaps longer than the threshold in place (strategy steps 2 and 3).
+
+    Small gaps are left as NaN for interpolation.
+
+    Args:
+        values: Float values of ``column`` (modified in place).
+        months: Month (1-12) of every row in ``values``.
+        column: Column name, selects the climate defaults.
+        small_gap_threshold: Max consecutive NaN hours left for interpolation.
+        climate: Monthly climate defaults as arrays indexed by month
+            (``LocationProfile.climate_arrays``).
+
+    Returns:
+        Number of gaps found (small and large).
+    """
+    starts, lengths = _find_gap_runs(np.isnan(values))
+    large = lengths > small_gap_threshold
+    if large.any():
+        monthly = climate.get(column)
+        _fill_large_gaps(
+            values,
+            monthly[months] if monthly is not None else None,
+            starts[large],
+            lengths[large],
+        )
+    return len(starts)
 
-    gaps: list[tuple[int, int, int]] = []
-    in_gap = False
-    gap_start = 0
 
-    for idx, is_missing in enumerate(is_nan):
-        if is_missing and not in_gap:
-            in_gap = True
-            gap_start = idx
-        elif not is_missing and in_gap:
-            in_gap = False
-            gaps.append((gap_start, idx - 1, idx - gap_start))
+def _impute_values(
+    values: np.ndarray,
+    months: np.ndarray,
+    column: str,
+    small_gap_threshold: int,
+    climate: dict[str, np.ndarray],
+) -> np.ndarray:
+    """Impute one weather column held as a float array.
+
+    Array form of ``impute_weather_column``, shared with the builders.
 
-    if in_gap:
-        gaps.append((gap_start, len(series) - 1, len(series) - gap_start))
+    Args:
+        values: Float values of ``column`` (large gaps are filled in place).
+        months: Month (1-12) of every row in ``values``.
+        column: Column name, selects the climate defaults.
+        small_gap_threshold: Max consecutive NaN hours to interpolate.
+        climate: Monthly climate defaults as arrays indexed by month.
 
-    return gaps
+    Returns:
+        Imputed float array.
+    """
+    n_missing_before = int(np.isnan(values).sum())
+    n_gaps = _prefill_large_gaps(values, months, column, small_gap_threshold, climate)
+
+    logger.info(
+        "Imputing %s: %d missing values in %d gap(s)",
+        column, n_missing_before, n_gaps,
+    )
+
+    # Interpolate small gaps
+    if np.isnan(values).any():
+        values = (
+            pd.Series(values)
+            .interpolate(method="linear", limit=small_gap_threshold)
+            .to_numpy(dtype=float, copy=True)
+        )
+
+    # Final safety: forward/backward fill
+    if np.isnan(values).any():
+        remaining = int(np.isnan(values).sum())
+        values = pd.Series(values).ffill().bfill().to_numpy(dtype=float, copy=True)
+        logger.warning("Forward/backward filled %d remaining NaN in %s", remaining, column)
+
+    n_filled = n_missing_before - int(np.isnan(values).sum())
+    logger.info("Imputed %d values in %s", n_filled, column)
+    return values
 
 
 def impute_weather_column(
     df: pd.DataFrame,
     column: str,
     small_gap_threshold: int = 6,
+    location: str = DEFAULT_LOCATION,
 ) -> pd.DataFrame:
     """Impute missing values for a single weather column.
 
     Strategy (applied in order):
     1. Small gaps (<=threshold hours): linear interpolation
     2. Larger gaps: copy from same hour 24h/48h/72h back
-    3. Last resort: monthly climate default
+    3. Last resort: monthly climate default of ``location``
 
     Args:
         df: DataFrame with the column to impute.
         column: Column name to impute.
         small_gap_threshold: Max consecutive NaN hours to interpolate.
+        location: location_id whose climate defaults fill large gaps.
 
     Returns:
         DataFrame with imputed values.
+
+    Raises:
+        ValueError: If the location is unknown.
     """
+    climate = location_profile(location).climate_arrays()
     df = df.copy()
 
     if column not in df.columns or not df[column].isna().any():
         return df
 
-    n_missing_before = df[column].isna().sum()
-    dt_series = pd.to_datetime(df[DATETIME_COL])
-    gaps = _find_gap_lengths(df[column])
-
-    if not gaps:
-        return df
-
-    logger.info(
-        "Imputing %s: %d missing values in %d gap(s)",
-        column, n_missing_before, len(gaps),
+    months = pd.to_datetime(df[DATETIME_COL]).dt.month.to_numpy()
+    df[column] = _impute_values(
+        df[column].to_numpy(dtype=float, copy=True), months, column, small_gap_threshold,
+        climate,
     )
-
-    for gap_start, gap_end, gap_length in gaps:
-        if gap_length <= small_gap_threshold:
-            continue  # will be handled by interpolation below
-
-        for idx in range(gap_start, gap_end + 1):
-            if not pd.isna(df.iloc[idx][column]):
-                continue
-
-            filled = False
-            for days_back in [1, 2, 3]:
-                source_idx = idx - (24 * days_back)
-                if source_idx >= 0 and not pd.isna(df.iloc[source_idx][column]):
-                    df.iloc[idx, df.columns.get_loc(column)] = (
-                        df.iloc[source_idx][column]
-                    )
-                    filled = True
-                    break
-
-            if not filled and column in MONTHLY_CLIMATE_DEFAULTS:
-                month = dt_series.iloc[idx].month
-                df.iloc[idx, df.columns.get_loc(column)] = (
-                    MONTHLY_CLIMATE_DEFAULTS[column][month]
-                )
-
-    # Interpolate small gaps
-    if df[column].isna().any():
-        df[column] = df[column].interpolate(
-            method="linear", limit=small_gap_threshold,
-        )
-
-    # Final safety: forward/backward fill
-    if df[column].isna().any():
-        remaining = df[column].isna().sum()
-        df[column] = df[column].ffill().bfill()
-        logger.warning("Forward/backward filled %d remaining NaN in %s", remaining, column)
-
-    n_filled = n_missing_before - df[column].isna().sum()
-    logger.info("Imputed %d values in %s", n_filled, column)
     return df
 
 
 def impute_missing_weather(
     df: pd.DataFrame,
     small_gap_threshold: int = 6,
+    location: str = DEFAULT_LOCATION,
 ) -> pd.DataFrame:
     """Impute missing values for all required weather columns.
 
@@ -319,6 +619,7 @@ def impute_missing_weather(
     Args:
         df: DataFrame with weather columns.
         small_gap_threshold: Max consecutive NaN hours to interpolate.
+        location: location_id whose climate defaults fill large gaps.
 
     Returns:
         DataFrame with imputed weather values.
@@ -337,230 +638,678 @@ def impute_missing_weather(
     logger.info("Imputing %d columns with missing values", len(columns_with_nan))
 
     for col in columns_with_nan:
-        df = impute_weather_column(df, col, small_gap_threshold=small_gap_threshold)
+        df = impute_weather_column(
+            df, col, small_gap_threshold=small_gap_threshold, location=location,
+        )
 
     return df
 
 
 # =============================================================================
-# Temporal features
+# Rolling-window and EWM kernels
 # =============================================================================
 
-def add_temporal_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Add basic temporal features from datetime column.
+def _rolling_sum(
+    values: np.ndarray,
+    window: int,
+    offsets: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Trailing-window sum and count of non-NaN values.
 
-    All features use Italian local time directly (Europe/Rome).
+    Lags are accumulated in a fixed order, so every output depends only on the
+    values inside its own window. pandas' rolling aggregations keep a running
+    add/remove sum instead, which carries rounding from the start of the series:
+    a window recomputed from a shorter history would differ in the last bits.
 
     Args:
-        df: DataFrame with datetime column.
+        values: Float input array.
+        window: Window length in rows (shorter at the series start).
+        offsets: Row position within its group for stacked multi-location
+            series (see ``_group_layout``). Windows never reach into the
+            previous group, and each group's result is bit-identical to
+            computing it alone. None means a single series.
 
     Returns:
-        DataFrame with hour, day_of_week, is_weekend, is_holiday, is_daylight.
+        Tuple of (sums, counts) arrays.
     """
-    df = df.copy()
-    dt_series = pd.to_datetime(df[DATETIME_COL])
-
-    df["hour"] = dt_series.dt.hour
-    df["day_of_week"] = dt_series.dt.dayofweek
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    sums = filled.copy()
+    counts = valid.astype(np.int64)
+    for lag in range(1, min(window, len(values))):
+        if offsets is None:
+            sums[lag:] += filled[:-lag]
+            counts[lag:] += valid[:-lag]
+        else:
+            in_group = offsets[lag:] >= lag
+            sums[lag:] += np.where(in_group, filled[:-lag], 0.0)
+            counts[lag:] += in_group & valid[:-lag]
+    return sums, counts
+
+
+def _rolling_mean(
+    values: np.ndarray,
+    window: int,
+    offsets: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Trailing-window mean, ``rolling(window, min_periods=1).mean()`` semantics."""
+    sums, counts = _rolling_sum(values, window, offsets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _rolling_std(
+    values: np.ndarray,
+    window: int,
+    offsets: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Trailing-window sample std, ``rolling(window, min_periods=1).std()`` semantics."""
+    mean = _rolling_mean(values, window, offsets)
+    valid = ~np.isnan(values)
+    squares = np.zeros(len(values))
+    counts = np.zeros(len(values), dtype=np.int64)
+    for lag in range(min(window, len(values))):
+        end = len(values) - lag
+        include = valid[:end]
+        if offsets is not None:
+            include = include & (offsets[lag:] >= lag)
+        deviation = values[:end] - mean[lag:]
+        squares[lag:] += np.where(include, deviation * deviation, 0.0)
+        counts[lag:] += include
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+
+
+def _shift(
+    values: np.ndarray,
+    lag: int,
+    offsets: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """``Series.shift(lag)`` for a positive lag, optionally within groups."""
+    shifted = np.full(len(values), np.nan)
+    if lag < len(values):
+        shifted[lag:] = values[:-lag]
+    if offsets is not None:
+        shifted[offsets < lag] = np.nan
+    return shifted
+
+
+def _ewm_mean(
+    values: np.ndarray,
+    halflife: float,
+    state: Optional[dict] = None,
+) -> tuple[np.ndarray, dict]:
+    """Adjusted EWM mean, resumable from a saved accumulator state.
+
+    Replays the recurrence of ``Series.ewm(halflife=..., min_periods=1).mean()``
+    operation for operation, so output is bit-identical to pandas over the same
+    history, and a run resumed from ``state`` is bit-identical to one that
+    started at the beginning of the series.
 
-    df["is_weekend"] = df["day_of_week"].isin([5, 6]).astype(int)
+    Args:
+        values: Float input array.
+        halflife: EWM halflife in rows.
+        state: Accumulator returned by a previous call, or None to start fresh.
 
-    holiday_dates = pd.to_datetime(ITALIAN_HOLIDAYS)
-    df["is_holiday"] = dt_series.dt.normalize().isin(holiday_dates).astype(int)
+    Returns:
+        Tuple of (EWM values, accumulator state after the last row).
+    """
+    decay = 1 - np.exp(np.log(0.5) / halflife)
+    alpha = 1.0 / (1.0 + (1 / decay - 1))
+    old_wt_factor = 1.0 - alpha
+
+    if state is None:
+        weighted, old_wt, nobs = np.nan, 1.0, 0
+    else:
+        weighted, old_wt, nobs = state["weighted"], state["old_wt"], state["nobs"]
+        weighted = np.nan if weighted is None else weighted
+
+    out = np.empty(len(values))
+    for i, cur in enumerate(values.tolist()):
+        is_observation = cur == cur
+        nobs += is_observation
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != cur:
+                    weighted = old_wt * weighted + cur
+                    weighted /= old_wt + 1.0
+                old_wt += 1.0
+        elif is_observation:
+            weighted = cur
+        out[i] = weighted if nobs >= 1 else np.nan
+
+    return out, {
+        "weighted": weighted if weighted == weighted else None,
+        "old_wt": old_wt,
+        "nobs": nobs,
+    }
+
+
+def _ewm_state(values: np.ndarray, halflife: float, last_mean: float) -> dict:
+    """Accumulator ``_ewm_mean`` returns after ``values``, without replaying it.
+
+    The running mean is the EWM of the last row (``last_mean``, e.g. from
+    pandas); the old weight depends only on which rows were observed. It is
+    replayed row by row up to the last missing row, then iterated over the
+    fully observed rest only until it reaches its floating-point fixed point,
+    so a long history costs a few hundred scalar steps.
 
-    df["is_daylight"] = df["hour"].between(6, 20).astype(int)
+    Args:
+        values: Float input array the EWM ran over from a fresh start.
+        halflife: EWM halflife in rows.
+        last_mean: EWM value of the last row of ``values``.
 
-    return df
+    Returns:
+        State equal to the one ``_ewm_mean(values, halflife)`` returns.
+    """
+    observed = ~np.isnan(values)
+    nobs = int(observed.sum())
+    if nobs == 0:
+        return {"weighted": None, "old_wt": 1.0, "nobs": 0}
+
+    decay = 1 - np.exp(np.log(0.5) / halflife)
+    old_wt_factor = 1.0 - 1.0 / (1.0 + (1 / decay - 1))
+
+    after_first = observed[int(observed.argmax()) + 1:]
+    n_irregular = 0 if after_first.all() else len(after_first) - int(after_first[::-1].argmin())
+    old_wt = 1.0
+    for is_observation in after_first[:n_irregular].tolist():
+        old_wt *= old_wt_factor
+        if is_observation:
+            old_wt += 1.0
+    for _ in range(len(after_first) - n_irregular):
+        next_wt = old_wt * old_wt_factor + 1.0
+        if next_wt == old_wt:
+            break
+        old_wt = next_wt
+
+    return {"weighted": float(last_mean), "old_wt": old_wt, "nobs": nobs}
 
 
 # =============================================================================
-# Fourier features
+# Feature registry (dependency-aware lazy evaluation)
 # =============================================================================
 
-def add_fourier_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Add Fourier encoding for cyclical temporal patterns.
+@dataclass(frozen=True)
+class FeatureSpec:
+    """A registered feature or shared intermediate.
 
-    Creates: hour_sin, hour_cos, dow_sin, dow_cos,
-             annual_sin, annual_cos, semi_annual_sin, semi_annual_cos.
+    Attributes:
+        name: Feature name (output column for selected features).
+        inputs: Source columns or other registered names it is computed from.
+        compute: Called with the input arrays, in ``inputs`` order.
+        lookback_hours: Rows of history the feature reads before each row
+            on top of what its inputs need (e.g. 1 for a first difference).
+    """
 
-    Args:
-        df: DataFrame with datetime and temporal columns (hour, day_of_week).
+    name: str
+    inputs: tuple[str, ...]
+    compute: Callable[..., np.ndarray]
+    lookback_hours: int = 0
 
-    Returns:
-        DataFrame with added Fourier features.
+
+class FeatureRegistry:
+    """Features declared with their inputs, evaluated on demand.
+
+    Requesting a feature set evaluates only its dependency closure, and each
+    shared intermediate (e.g. the solar elevation behind both clearsky_index
+    and solar_elevation) is computed once per evaluation.
+
+    Args:
+        sources: Source column name -> lookback hours it needs before the
+            first row (e.g. the 72 h same-hour fallback of gap imputation).
     """
-    df = df.copy()
-    dt_series = pd.to_datetime(df[DATETIME_COL])
 
-    hours_since_epoch = (
-        (dt_series - pd.Timestamp("2020-01-01")).dt.total_seconds() / 3600
-    )
+    def __init__(self, sources: dict[str, int]) -> None:
+        self.sources = dict(sources)
+        self._specs: dict[str, FeatureSpec] = {}
+
+    def register(
+        self,
+        name: str,
+        inputs: tuple[str, ...],
+        lookback_hours: int = 0,
+    ) -> Callable[[Callable[..., np.ndarray]], Callable[..., np.ndarray]]:
+        """Decorator registering ``compute`` under ``name``."""
+        unknown = [i for i in inputs if i not in self.sources and i not in self._specs]
+        if unknown:
+            raise ValueError(f"Feature '{name}' depends on unknown inputs: {unknown}")
+
+        def decorator(compute: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+            self._specs[name] = FeatureSpec(name, tuple(inputs), compute, lookback_hours)
+            return compute
+
+        return decorator
+
+    def closure(self, names: list[str]) -> list[str]:
+        """Registered names needed for ``names``, in evaluation order.
+
+        Raises:
+            ValueError: If a name is neither registered nor a source column.
+        """
+        unknown = [n for n in names if n not in self._specs and n not in self.sources]
+        if unknown:
+            raise ValueError(f"Unknown features: {unknown}")
+
+        order: list[str] = []
+        seen: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in seen or name in self.sources:
+                return
+            seen.add(name)
+            for dep in self._specs[name].inputs:
+                visit(dep)
+            order.append(name)
+
+        for name in names:
+            visit(name)
+        return order
+
+    def source_columns(self, names: list[str]) -> list[str]:
+        """Source columns read by ``names``, in ``sources`` order."""
+        needed = {n for n in names if n in self.sources}
+        for name in self.closure(names):
+            needed.update(i for i in self._specs[name].inputs if i in self.sources)
+        return [col for col in self.sources if col in needed]
+
+    def lookback_hours(self, names: list[str]) -> int:
+        """Minimum source history (hours before the first output row) for ``names``.
+
+        The longest chain of lookbacks through the dependency graph, ending
+        in a source's own lookback.
+        """
+        need: dict[str, int] = dict(self.sources)
+        for name in self.closure(names):
+            spec = self._specs[name]
+            need[name] = spec.lookback_hours + max(
+                (need[i] for i in spec.inputs), default=0,
+            )
+        return max((need[n] for n in names), default=0)
+
+    def evaluate(
+        self,
+        sources: dict[str, Any],
+        names: list[str],
+    ) -> dict[str, np.ndarray]:
+        """Evaluate ``names`` from the given source arrays.
+
+        Args:
+            sources: Source column name -> array (or datetime Series).
+            names: Features to return.
+
+        Returns:
+            Dict of feature name to array, in ``names`` order.
+        """
+        values: dict[str, Any] = dict(sources)
+        for name in self.closure(names):
+            spec = self._specs[name]
+            values[name] = spec.compute(*(values[i] for i in spec.inputs))
+        return {name: values[name] for name in names}
+
+
+def _per_location(
+    locations: tuple[Optional[np.ndarray], tuple[LocationProfile, ...]],
+    compute: Callable[..., np.ndarray],
+    *arrays: Any,
+) -> np.ndarray:
+    """Evaluate ``compute(profile, *arrays)`` on the rows of every location."""
+    codes, profiles = locations
+    if codes is None:
+        return compute(profiles[0], *arrays)
+    parts = [
+        compute(profile, *(array[codes == code] for array in arrays))
+        for code, profile in enumerate(profiles)
+    ]
+    out = np.empty(len(codes), dtype=parts[0].dtype if parts else float)
+    for code, part in enumerate(parts):
+        out[codes == code] = part
+    return out
 
-    for name in ["annual", "semi_annual"]:
-        period = FOURIER_PERIODS[name]
-        angle = 2 * np.pi * hours_since_epoch / period
-        df[f"{name}_sin"] = np.sin(angle)
-        df[f"{name}_cos"] = np.cos(angle)
 
-    df["hour_sin"] = np.sin(2 * np.pi * df["hour"] / 24)
-    df["hour_cos"] = np.cos(2 * np.pi * df["hour"] / 24)
+def _fill_zero(values: np.ndarray) -> np.ndarray:
+    """``fillna(0)`` for a float array."""
+    return np.where(np.isnan(values), 0.0, values)
 
-    df["dow_sin"] = np.sin(2 * np.pi * df["day_of_week"] / 7)
-    df["dow_cos"] = np.cos(2 * np.pi * df["day_of_week"] / 7)
 
-    return df
+def _diff(values: np.ndarray) -> np.ndarray:
+    """``Series.diff()`` for a float array."""
+    return values - _shift(values, 1)
 
 
-# =============================================================================
-# Weather-derived features
-# =============================================================================
+# Source holding the row offsets of stacked multi-location series (see
+# ``_group_layout``); None for a single series.
+GROUP_OFFSETS: str = "group_offsets"
 
-def add_weather_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Add weather-derived features used by the model.
+# Source holding the location of every row as ``(codes, profiles)``: the
+# LocationProfile of row i is ``profiles[codes[i]]``, and codes is None for a
+# single-location series.
+LOCATIONS: str = "locations"
 
-    Creates: heating_degree_hour, temp_rolling_mean_24h, temp_rolling_std_24h,
-             radiation_rolling_mean_24h, cloud_cover_rolling_mean_24h,
-             heating_degree_rolling_mean_24h.
+# Weather columns read by any registered feature
+WEATHER_SOURCES: list[str] = list(dict.fromkeys(REQUIRED_WEATHER_COLS + METERS_WEATHER_COLS))
 
-    Args:
-        df: DataFrame with the 4 required weather columns.
+# Rows after which the thermal_inertia_12h EWM has converged: the weight of
+# older rows is below 0.5**8 < 0.4%. The incremental builder resumes the EWM
+# from its checkpoint instead; builders without one read this much history.
+THERMAL_INERTIA_LOOKBACK_HOURS: int = 8 * THERMAL_INERTIA_HALFLIFE
 
-    Returns:
-        DataFrame with added weather features.
-    """
-    df = df.copy()
+# Every gold feature (SELECTED_FEATURES and SELECTED_METERS_FEATURES) with
+# its inputs and lookback. Weather sources are gap-imputed before evaluation,
+# so they need the 72 h same-hour fallback of history.
+FEATURES = FeatureRegistry(
+    {
+        DATETIME_COL: 0,
+        GROUP_OFFSETS: 0,
+        LOCATIONS: 0,
+        **{col: max(_FALLBACK_LAGS_HOURS) for col in WEATHER_SOURCES},
+    },
+)
 
-    missing = [col for col in REQUIRED_WEATHER_COLS if col not in df.columns]
-    if missing:
-        raise ValueError(f"Missing required weather columns: {missing}")
 
-    df["heating_degree_hour"] = np.maximum(0, 18 - df["temperature_2m"])
+# --- Temporal ----------------------------------------------------------------
 
-    df["temp_rolling_mean_24h"] = (
-        df["temperature_2m"].rolling(window=24, min_periods=1).mean()
-    )
-    df["temp_rolling_std_24h"] = (
-        df["temperature_2m"].rolling(window=24, min_periods=1).std()
-    )
+@FEATURES.register("hour", (DATETIME_COL,))
+def _hour(dt_series: pd.Series) -> np.ndarray:
+    return dt_series.dt.hour.to_numpy()
 
-    df["radiation_rolling_mean_24h"] = (
-        df["shortwave_radiation"].rolling(window=24, min_periods=1).mean()
-    )
 
-    df["cloud_cover_rolling_mean_24h"] = (
-        df["cloud_cover"].rolling(window=24, min_periods=1).mean()
-    )
+@FEATURES.register("day_of_week", (DATETIME_COL,))
+def _day_of_week(dt_series: pd.Series) -> np.ndarray:
+    return dt_series.dt.dayofweek.to_numpy()
+
+
+@FEATURES.register("month", (DATETIME_COL,))
+def _month(dt_series: pd.Series) -> np.ndarray:
+    return dt_series.dt.month.to_numpy()
+
+
+@FEATURES.register("day_of_year", (DATETIME_COL,))
+def _day_of_year(dt_series: pd.Series) -> np.ndarray:
+    return dt_series.dt.dayofyear.to_numpy()
+
+
+@FEATURES.register("is_weekend", ("day_of_week",))
+def _is_weekend(day_of_week: np.ndarray) -> np.ndarray:
+    return (day_of_week >= 5).astype(np.int64)
 
-    df["heating_degree_rolling_mean_24h"] = (
-        df["heating_degree_hour"].rolling(window=24, min_periods=1).mean()
+
+@FEATURES.register("is_holiday", (DATETIME_COL, LOCATIONS))
+def _is_holiday(dt_series: pd.Series, locations: tuple) -> np.ndarray:
+    return _per_location(
+        locations, lambda profile, dt: holiday_flags(dt, profile.holidays), dt_series,
     )
 
-    return df
 
+@FEATURES.register("is_daylight", ("hour",))
+def _is_daylight(hour: np.ndarray) -> np.ndarray:
+    return ((hour >= 6) & (hour <= 20)).astype(np.int64)
 
-# =============================================================================
-# Thermal dynamics features
-# =============================================================================
 
-def add_thermal_dynamics(df: pd.DataFrame) -> pd.DataFrame:
-    """Add thermal dynamics features.
+@FEATURES.register("is_night", ("hour",))
+def _is_night(hour: np.ndarray) -> np.ndarray:
+    return ((hour >= 20) | (hour <= 6)).astype(np.int64)
 
-    Creates: temp_change_rate_3h, temp_gradient_24h,
-             thermal_inertia_12h, cumulative_hdd_48h.
 
-    Args:
-        df: DataFrame with temperature_2m and heating_degree_hour columns.
+# --- Fourier -----------------------------------------------------------------
 
-    Returns:
-        DataFrame with added thermal dynamics features.
-    """
-    df = df.copy()
+@FEATURES.register("hour_sin", ("hour",))
+def _hour_sin(hour: np.ndarray) -> np.ndarray:
+    return cyclic_terms(hour, 24)[0]
 
-    df["temp_change_rate_3h"] = (
-        (df["temperature_2m"] - df["temperature_2m"].shift(3)) / 3
-    )
 
-    df["temp_gradient_24h"] = (
-        df["temperature_2m"] - df["temperature_2m"].shift(24)
+@FEATURES.register("hour_cos", ("hour",))
+def _hour_cos(hour: np.ndarray) -> np.ndarray:
+    return cyclic_terms(hour, 24)[1]
+
+
+@FEATURES.register("dow_sin", ("day_of_week",))
+def _dow_sin(day_of_week: np.ndarray) -> np.ndarray:
+    return cyclic_terms(day_of_week, 7)[0]
+
+
+@FEATURES.register("dow_cos", ("day_of_week",))
+def _dow_cos(day_of_week: np.ndarray) -> np.ndarray:
+    return cyclic_terms(day_of_week, 7)[1]
+
+
+@FEATURES.register("hours_since_epoch", (DATETIME_COL,))
+def _hours_since_epoch(dt_series: pd.Series) -> np.ndarray:
+    return ((dt_series - pd.Timestamp("2020-01-01")).dt.total_seconds() / 3600).to_numpy()
+
+
+def _register_epoch_cycle(name: str) -> None:
+    """Register ``{name}_sin`` / ``{name}_cos`` over FOURIER_PERIODS[name]."""
+    for index, suffix in enumerate(("sin", "cos")):
+        FEATURES.register(f"{name}_{suffix}", ("hours_since_epoch",))(
+            lambda hours, index=index: epoch_cycle_terms(hours, FOURIER_PERIODS[name])[index]
+        )
+
+
+_register_epoch_cycle("annual")
+_register_epoch_cycle("semi_annual")
+
+
+# --- Weather-derived ---------------------------------------------------------
+
+@FEATURES.register("heating_degree", ("temperature_2m",))
+def _heating_degree(temperature: np.ndarray) -> np.ndarray:
+    return np.maximum(0, 18 - temperature)
+
+
+@FEATURES.register("heating_degree_hour", ("heating_degree",))
+def _heating_degree_hour(heating_degree: np.ndarray) -> np.ndarray:
+    return heating_degree
+
+
+@FEATURES.register("cooling_degree", ("temperature_2m",))
+def _cooling_degree(temperature: np.ndarray) -> np.ndarray:
+    return np.maximum(0, temperature - 24)
+
+
+def _register_rolling_mean(name: str, column: str, window: int) -> None:
+    """Register ``name`` as the trailing ``window``-row mean of ``column``."""
+    FEATURES.register(name, (column, GROUP_OFFSETS), lookback_hours=window - 1)(
+        lambda values, offsets: _rolling_mean(values, window, offsets)
     )
 
-    df["thermal_inertia_12h"] = (
-        df["temperature_2m"].ewm(halflife=12, min_periods=1).mean()
+
+_register_rolling_mean("temp_rolling_mean_24h", "temperature_2m", 24)
+_register_rolling_mean("radiation_rolling_mean_24h", "shortwave_radiation", 24)
+_register_rolling_mean("cloud_cover_rolling_mean_24h", "cloud_cover", 24)
+_register_rolling_mean("heating_degree_rolling_mean_24h", "heating_degree", 24)
+
+
+@FEATURES.register("temp_rolling_std_24h", ("temperature_2m", GROUP_OFFSETS), lookback_hours=23)
+def _temp_rolling_std_24h(temperature: np.ndarray, offsets: Optional[np.ndarray]) -> np.ndarray:
+    return _rolling_std(temperature, 24, offsets)
+
+
+# --- Thermal dynamics --------------------------------------------------------
+
+@FEATURES.register("temp_change_rate_3h", ("temperature_2m", GROUP_OFFSETS), lookback_hours=3)
+def _temp_change_rate_3h(temperature: np.ndarray, offsets: Optional[np.ndarray]) -> np.ndarray:
+    return (temperature - _shift(temperature, 3, offsets)) / 3
+
+
+@FEATURES.register("temp_gradient_24h", ("temperature_2m", GROUP_OFFSETS), lookback_hours=24)
+def _temp_gradient_24h(temperature: np.ndarray, offsets: Optional[np.ndarray]) -> np.ndarray:
+    return temperature - _shift(temperature, 24, offsets)
+
+
+@FEATURES.register(
+    "thermal_inertia_12h",
+    ("temperature_2m", GROUP_OFFSETS),
+    lookback_hours=THERMAL_INERTIA_LOOKBACK_HOURS,
+)
+def _thermal_inertia_12h(temperature: np.ndarray, offsets: Optional[np.ndarray]) -> np.ndarray:
+    series = pd.Series(temperature)
+    if offsets is not None:
+        # Rows are sorted by group, so the grouped result keeps row order
+        series = series.groupby(np.cumsum(offsets == 0), sort=False)
+    return series.ewm(halflife=THERMAL_INERTIA_HALFLIFE, min_periods=1).mean().to_numpy()
+
+
+@FEATURES.register("cumulative_hdd_48h", ("heating_degree", GROUP_OFFSETS), lookback_hours=47)
+def _cumulative_hdd_48h(heating_degree: np.ndarray, offsets: Optional[np.ndarray]) -> np.ndarray:
+    hdd_sum, hdd_count = _rolling_sum(heating_degree, 48, offsets)
+    return np.where(hdd_count > 0, hdd_sum, np.nan)
+
+
+# --- Interactions ------------------------------------------------------------
+
+@FEATURES.register("temp_x_hour_sin", ("temperature_2m", "hour_sin"))
+def _temp_x_hour_sin(temperature: np.ndarray, hour_sin: np.ndarray) -> np.ndarray:
+    return temperature * hour_sin
+
+
+@FEATURES.register("radiation_x_daytime", ("shortwave_radiation", "is_daylight"))
+def _radiation_x_daytime(radiation: np.ndarray, is_daylight: np.ndarray) -> np.ndarray:
+    return radiation * is_daylight
+
+
+@FEATURES.register("weekend_x_hour_cos", ("is_weekend", "hour_cos"))
+def _weekend_x_hour_cos(is_weekend: np.ndarray, hour_cos: np.ndarray) -> np.ndarray:
+    return is_weekend * hour_cos
+
+
+@FEATURES.register("heating_x_night", ("heating_degree", "is_night"))
+def _heating_x_night(heating_degree: np.ndarray, is_night: np.ndarray) -> np.ndarray:
+    return heating_degree * is_night
+
+
+# --- Solar / PV (meters feature set) -----------------------------------------
+
+@FEATURES.register("sin_solar_elevation", ("hour", "day_of_year", LOCATIONS))
+def _sin_solar_elevation(
+    hour: np.ndarray, day_of_year: np.ndarray, locations: tuple,
+) -> np.ndarray:
+    """Sine of the solar elevation at the location (simplified declination/hour angle)."""
+    return _per_location(
+        locations,
+        lambda profile, doy, h: solar_terms(doy, h, profile.latitude)[0],
+        day_of_year, hour,
     )
 
-    df["cumulative_hdd_48h"] = (
-        df["heating_degree_hour"].rolling(window=48, min_periods=1).sum()
+
+@FEATURES.register("clearsky_ghi", ("hour", "day_of_year", LOCATIONS))
+def _clearsky_ghi(
+    hour: np.ndarray, day_of_year: np.ndarray, locations: tuple,
+) -> np.ndarray:
+    """Simplified Ineichen-Perez clear-sky GHI at the location (W/m2)."""
+    return _per_location(
+        locations,
+        lambda profile, doy, h: solar_terms(doy, h, profile.latitude)[1],
+        day_of_year, hour,
     )
 
-    return df
 
+@FEATURES.register("clearsky_index", ("shortwave_radiation", "clearsky_ghi"))
+def _clearsky_index(radiation: np.ndarray, clearsky_ghi: np.ndarray) -> np.ndarray:
+    """Ratio of GHI to the clear-sky GHI, clipped to [0, 1.5]."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        clearsky_index = np.where(clearsky_ghi > 50, radiation / clearsky_ghi, 0)
+    return np.clip(clearsky_index, 0, 1.5)
 
-# =============================================================================
-# Interaction features
-# =============================================================================
 
-def add_interactions(df: pd.DataFrame) -> pd.DataFrame:
-    """Add interaction features used by the model.
+@FEATURES.register("solar_elevation", ("sin_solar_elevation",))
+def _solar_elevation(sin_elevation: np.ndarray) -> np.ndarray:
+    return np.degrees(np.arcsin(np.clip(sin_elevation, -1, 1)))
 
-    Creates: temp_x_hour_sin, radiation_x_daytime,
-             weekend_x_hour_cos, heating_x_night.
 
-    Args:
-        df: DataFrame with base features already computed.
+@FEATURES.register("effective_solar_pv", ("direct_radiation", "diffuse_radiation"))
+def _effective_solar_pv(direct: np.ndarray, diffuse: np.ndarray) -> np.ndarray:
+    return _fill_zero(direct) + 0.9 * _fill_zero(diffuse)
 
-    Returns:
-        DataFrame with added interaction features.
-    """
-    df = df.copy()
 
-    df["temp_x_hour_sin"] = df["temperature_2m"] * df["hour_sin"]
+@FEATURES.register("theoretical_prod", ("global_tilted_irradiance", "effective_solar_pv"))
+def _theoretical_prod(tilted: np.ndarray, effective: np.ndarray) -> np.ndarray:
+    return _fill_zero(tilted) * _fill_zero(effective)
 
-    df["radiation_x_daytime"] = df["shortwave_radiation"] * df["is_daylight"]
 
-    df["weekend_x_hour_cos"] = df["is_weekend"] * df["hour_cos"]
+@FEATURES.register("cloud_cover_diff", ("cloud_cover",), lookback_hours=1)
+def _cloud_cover_diff(cloud_cover: np.ndarray) -> np.ndarray:
+    return np.abs(_diff(cloud_cover))
 
-    is_night = ((df["hour"] >= 20) | (df["hour"] <= 6)).astype(int)
-    df["heating_x_night"] = df["heating_degree_hour"] * is_night
 
-    return df
+@FEATURES.register("pv_temp_factor", ("temperature_2m",))
+def _pv_temp_factor(temperature: np.ndarray) -> np.ndarray:
+    """PV efficiency correction (~0.4%/°C loss above 25°C)."""
+    return 1 - 0.004 * np.maximum(0, temperature - 25)
+
+
+@FEATURES.register("ghi_ramp", ("global_tilted_irradiance",), lookback_hours=1)
+def _ghi_ramp(tilted: np.ndarray) -> np.ndarray:
+    """Cloud transient signal."""
+    return _fill_zero(_diff(tilted))
 
 
 # =============================================================================
-# Edge-case NaN handling
+# Feature computation
 # =============================================================================
 
-def _fill_edge_nans(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
-    """Fill NaN values caused by rolling/shift warmup at series edges.
+# SELECTED_FEATURES that are 0/1 flags (int64 in the output, never downcast).
+_FLAG_FEATURES: frozenset[str] = frozenset({"is_weekend", "is_holiday", "is_daylight"})
+
+
+def _compute_feature_arrays(
+    dt_series: pd.Series,
+    weather: dict[str, np.ndarray],
+    locations: tuple[Optional[np.ndarray], tuple[LocationProfile, ...]],
+    offsets: Optional[np.ndarray] = None,
+    features: Optional[list[str]] = None,
+) -> dict[str, np.ndarray]:
+    """Evaluate SELECTED_FEATURES (or ``features``) from the FEATURES registry.
+
+    The single implementation of the gold features, shared by the full,
+    grouped, incremental and meters builders. Float features are float64 and
+    may still hold warmup NaN; the 0/1 flags are int64.
 
     Args:
-        df: DataFrame with potential edge-case NaN.
-        columns: Feature columns to check and fill.
+        dt_series: Parsed datetime of every row.
+        weather: Imputed weather arrays (the sources ``features`` read).
+        locations: ``(codes, profiles)`` location of every row (see
+            ``LOCATIONS``); selects the holiday calendar and solar latitude.
+        offsets: Row position within its group for stacked multi-location
+            series (see ``_group_layout``); rolling, shift and EWM features
+            then restart at every group. None means a single series.
+        features: Features to compute; defaults to SELECTED_FEATURES.
 
     Returns:
-        DataFrame with edge NaN filled via bfill/ffill.
+        Dict of feature name to array, in ``features`` order.
     """
-    df = df.copy()
+    sources = {DATETIME_COL: dt_series, GROUP_OFFSETS: offsets, LOCATIONS: locations, **weather}
+    return FEATURES.evaluate(sources, SELECTED_FEATURES if features is None else features)
 
-    for col in columns:
-        if col not in df.columns:
-            continue
-        if not df[col].isna().any():
-            continue
 
-        n_nan = df[col].isna().sum()
-        if n_nan <= 48:
-            df[col] = df[col].bfill().ffill()
-            if df[col].isna().any():
-                median_val = df[col].median()
-                fill_val = median_val if not pd.isna(median_val) else 0.0
-                df[col] = df[col].fillna(fill_val)
-            logger.debug("Filled %d edge-case NaN in '%s'", n_nan, col)
-        else:
-            logger.warning(
-                "Feature '%s' has %d NaN values (more than warmup period)", col, n_nan,
-            )
+# =============================================================================
+# Edge-case NaN handling
+# =============================================================================
 
-    return df
+def _fill_edge_values(values: np.ndarray, name: str) -> np.ndarray:
+    """Fill NaN caused by rolling/shift warmup at the series start.
+
+    Up to 48 NaN are back/forward filled (median, else 0.0, if the feature is
+    NaN throughout); more than that is logged and left as is.
+    """
+    n_nan = int(np.isnan(values).sum())
+    if n_nan == 0:
+        return values
+
+    if n_nan <= 48:
+        series = pd.Series(values).bfill().ffill()
+        if series.isna().any():
+            median_val = series.median()
+            fill_val = median_val if not pd.isna(median_val) else 0.0
+            series = series.fillna(fill_val)
+        logger.debug("Filled %d edge-case NaN in '%s'", n_nan, name)
+        return series.to_numpy(dtype=float)
+
+    logger.warning(
+        "Feature '%s' has %d NaN values (more than warmup period)", name, n_nan,
+    )
+    return values
 
 
 # =============================================================================
@@ -570,211 +1319,641 @@ def _fill_edge_nans(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
 def build_gold_features(
     df: pd.DataFrame,
     impute_missing: bool = True,
+    dtype: "np.dtype | type" = np.float64,
+    location: str = DEFAULT_LOCATION,
 ) -> pd.DataFrame:
     """Build the 29 gold ML features from silver weather data.
 
-    Pipeline order:
-    1. Impute missing weather values (optional)
-    2. Add temporal features (hour, day_of_week, is_weekend, is_holiday, is_daylight)
-    3. Add Fourier features (cyclical encodings)
-    4. Add weather-derived features (rolling stats, heating degree)
-    5. Add thermal dynamics (change rate, gradient, inertia, cumulative HDD)
-    6. Add interaction features (cross-feature products)
-    7. Fill edge-case NaN from rolling/shift warmup
-    8. Select final 29 features + datetime
+    Single pass over numpy columns: the datetime is parsed once, missing
+    weather is imputed (optional), every feature is computed into its own
+    array (``_compute_feature_arrays``), rolling/shift warmup NaN are
+    filled, and the output frame is assembled once at the end.
 
     Args:
         df: DataFrame with columns: datetime, temperature_2m,
             shortwave_radiation, cloud_cover, precipitation.
         impute_missing: Whether to impute missing weather values first.
+        dtype: Float dtype of the non-flag feature columns, e.g. ``np.float32``
+            to halve the output size. Features are computed in float64 and
+            cast once.
+        location: location_id of the series; selects its holiday calendar
+            and climate defaults (LOCATION_PROFILES).
 
     Returns:
-        DataFrame with datetime + 29 feature columns.
+        DataFrame with datetime + 29 feature columns, sorted by datetime.
 
     Raises:
-        ValueError: If required weather columns are missing.
+        ValueError: If required weather columns are missing or the location
+            is unknown.
     """
     logger.info("Building gold features (%d input rows)...", len(df))
+    profile = location_profile(location)
+    climate = profile.climate_arrays()
 
     required_cols = [DATETIME_COL] + REQUIRED_WEATHER_COLS
     missing = [col for col in required_cols if col not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
 
-    df = df.copy()
-    df = df.sort_values(DATETIME_COL).reset_index(drop=True)
-
-    if impute_missing:
-        df = impute_missing_weather(df)
-
-    df = add_temporal_features(df)
-    df = add_fourier_features(df)
-    df = add_weather_features(df)
-    df = add_thermal_dynamics(df)
-    df = add_interactions(df)
-
-    available = [col for col in SELECTED_FEATURES if col in df.columns]
-    missing_features = set(SELECTED_FEATURES) - set(available)
-    if missing_features:
-        logger.warning("Missing features from SELECTED_FEATURES: %s", missing_features)
-
-    df = _fill_edge_nans(df, available)
+    raw_dt = df[DATETIME_COL]
+    order = None
+    if not raw_dt.is_monotonic_increasing:
+        order = raw_dt.argsort(kind="stable").to_numpy()
+        raw_dt = raw_dt.iloc[order]
+    raw_dt = raw_dt.reset_index(drop=True)
+    dt_series = pd.to_datetime(raw_dt)
+
+    months = dt_series.dt.month.to_numpy()
+
+    weather: dict[str, np.ndarray] = {}
+    for col in REQUIRED_WEATHER_COLS:
+        values = df[col].to_numpy(dtype=float)
+        values = values[order] if order is not None else values.copy()
+        if impute_missing and np.isnan(values).any():
+            values = _impute_values(values, months, col, small_gap_threshold=6, climate=climate)
+        weather[col] = values
+
+    features = _compute_feature_arrays(dt_series, weather, (None, (profile,)))
+
+    output = {DATETIME_COL: raw_dt}
+    for name in SELECTED_FEATURES:
+        # pop so each float64 column is released as soon as it is cast
+        values = features.pop(name)
+        if name in _FLAG_FEATURES:
+            output[name] = values
+            continue
+        if np.isnan(values).any():
+            values = _fill_edge_values(values, name)
+        output[name] = values.astype(dtype, copy=False)
 
-    output_cols = [DATETIME_COL] + available
-    result = df[output_cols]
+    result = pd.DataFrame(output, copy=False)
 
-    logger.info("Built %d gold features (%d rows)", len(available), len(result))
+    logger.info("Built %d gold features (%d rows)", len(SELECTED_FEATURES), len(result))
     return result
 
 
 # =============================================================================
-# Meters feature builder (solar / PV focused)
+# Multi-location (grouped) entry point
 # =============================================================================
 
-def _compute_clearsky_index(df: pd.DataFrame) -> pd.Series:
-    """Compute clear-sky index from shortwave radiation and solar position.
-
-    Uses simplified Ineichen-Perez clear-sky GHI model based on
-    solar declination, hour angle, and Folgaria latitude.
+def _group_layout(codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Position of every row within its group, for rows sorted by group.
 
     Args:
-        df: DataFrame with datetime and shortwave_radiation columns.
+        codes: Group code of every row; equal codes must be contiguous.
 
     Returns:
-        Series with clearsky_index values clipped to [0, 1.5].
+        Tuple of (rows before this one in its group, rows after it).
     """
-    dt_series = pd.to_datetime(df[DATETIME_COL])
-    hour = dt_series.dt.hour
-    day_of_year = dt_series.dt.dayofyear
+    n = len(codes)
+    starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+    sizes = np.diff(np.append(starts, n))
+    offsets = np.arange(n) - np.repeat(starts, sizes)
+    return offsets, np.repeat(sizes, sizes) - offsets - 1
+
+
+def _last_valid(valid: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Index of the last valid row at or before each row in its group, else -1."""
+    positions = np.arange(len(valid))
+    last = np.maximum.accumulate(np.where(valid, positions, -1))
+    return np.where(last >= positions - offsets, last, -1)
+
+
+def _next_valid(valid: np.ndarray, remaining: np.ndarray) -> np.ndarray:
+    """Index of the next valid row at or after each row in its group, else -1."""
+    positions = np.arange(len(valid))
+    nxt = np.minimum.accumulate(np.where(valid, positions, len(valid))[::-1])[::-1]
+    return np.where(nxt <= positions + remaining, nxt, -1)
+
+
+def _ffill_bfill_grouped(
+    values: np.ndarray,
+    offsets: np.ndarray,
+    remaining: np.ndarray,
+) -> np.ndarray:
+    """``ffill().bfill()`` within every group."""
+    out = values.copy()
+    source = _last_valid(~np.isnan(out), offsets)
+    take = np.isnan(out) & (source >= 0)
+    out[take] = out[source[take]]
+    source = _next_valid(~np.isnan(out), remaining)
+    take = np.isnan(out) & (source >= 0)
+    out[take] = out[source[take]]
+    return out
+
+
+def _interpolate_grouped(
+    values: np.ndarray,
+    offsets: np.ndarray,
+    remaining: np.ndarray,
+    limit: int,
+) -> np.ndarray:
+    """``interpolate(method="linear", limit=limit)`` within every group.
+
+    Same semantics as pandas per group: NaN before a group's first value stay
+    NaN, interior runs are interpolated and trailing runs take the last value,
+    both for at most ``limit`` rows from the start of the run. Interior values
+    come from one ``np.interp`` call over all groups, with the same bracketing
+    points (and so the same bits) as a per-group call.
+    """
+    is_nan = np.isnan(values)
+    valid = ~is_nan
+    positions = np.arange(len(values))
+    prev = _last_valid(valid, offsets)
+    nxt = _next_valid(valid, remaining)
+
+    fill = is_nan & (prev >= 0) & (positions - prev <= limit)
+    interior = fill & (nxt >= 0)
+    trailing = fill & (nxt < 0)
+
+    out = values.copy()
+    if interior.any():
+        out[interior] = np.interp(
+            positions[interior], positions[valid], values[valid],
+        )
+    out[trailing] = values[prev[trailing]]
+    return out
 
-    # Solar declination (simplified)
-    declination = 23.45 * np.sin(np.radians(360 / 365 * (day_of_year - 81)))
 
-    # Hour angle
-    hour_angle = 15 * (hour - 12)
+def _impute_values_grouped(
+    values: np.ndarray,
+    defaults: np.ndarray,
+    column: str,
+    offsets: np.ndarray,
+    remaining: np.ndarray,
+    small_gap_threshold: int,
+) -> np.ndarray:
+    """Impute one weather column of stacked location series.
 
-    # Solar elevation
-    lat_rad = np.radians(FOLGARIA_LAT)
-    decl_rad = np.radians(declination)
-    hour_rad = np.radians(hour_angle)
+    Grouped form of ``_impute_values``: every location is imputed exactly as
+    ``impute_weather_column`` would impute it alone, with its own climate
+    defaults.
 
-    sin_elevation = (
-        np.sin(lat_rad) * np.sin(decl_rad)
-        + np.cos(lat_rad) * np.cos(decl_rad) * np.cos(hour_rad)
-    )
+    Args:
+        values: Float values of ``column`` (large gaps are filled in place).
+        defaults: Climate default of every row (NaN where the location has none).
+        column: Column name, for logging.
+        offsets: Rows before each row in its location (see ``_group_layout``).
+        remaining: Rows after each row in its location.
+        small_gap_threshold: Max consecutive NaN hours to interpolate.
 
-    # Clear-sky GHI approximation
-    clearsky_ghi = np.maximum(0, 1000 * np.clip(sin_elevation, 0, None))
+    Returns:
+        Imputed float array.
+    """
+    n_missing_before = int(np.isnan(values).sum())
+    starts, lengths = _find_gap_runs(np.isnan(values), offsets)
+    large = lengths > small_gap_threshold
+    if large.any():
+        _fill_large_gaps(values, defaults, starts[large], lengths[large], offsets)
+
+    if np.isnan(values).any():
+        values = _interpolate_grouped(values, offsets, remaining, small_gap_threshold)
+    if np.isnan(values).any():
+        remaining_nan = int(np.isnan(values).sum())
+        values = _ffill_bfill_grouped(values, offsets, remaining)
+        logger.warning(
+            "Forward/backward filled %d remaining NaN in %s", remaining_nan, column,
+        )
 
-    clearsky_index = np.where(
-        clearsky_ghi > 50,
-        df["shortwave_radiation"] / clearsky_ghi,
-        0,
+    logger.info(
+        "Imputed %d of %d missing values in %s (%d gap(s))",
+        n_missing_before - int(np.isnan(values).sum()), n_missing_before,
+        column, len(starts),
     )
-    return pd.Series(np.clip(clearsky_index, 0, 1.5), index=df.index)
+    return values
+
+
+def _fill_edge_values_grouped(
+    values: np.ndarray,
+    name: str,
+    codes: np.ndarray,
+    offsets: np.ndarray,
+    remaining: np.ndarray,
+    location_ids: np.ndarray,
+) -> np.ndarray:
+    """Fill warmup NaN per location (see ``_fill_edge_values``)."""
+    is_nan = np.isnan(values)
+    n_nan = np.bincount(codes, weights=is_nan, minlength=len(location_ids))
+    eligible = (n_nan > 0) & (n_nan <= 48)
+
+    for location_id, count in zip(location_ids[n_nan > 48], n_nan[n_nan > 48]):
+        logger.warning(
+            "Feature '%s' has %d NaN values for %s (more than warmup period)",
+            name, count, location_id,
+        )
+    if not eligible.any():
+        return values
 
+    filled = _ffill_bfill_grouped(values, offsets, remaining)
+    # A location that is NaN throughout falls back to its median, i.e. 0.0
+    filled[np.isnan(filled)] = 0.0
+    return np.where(eligible[codes], filled, values)
 
-def build_gold_features_meters(
+
+def build_gold_features_grouped(
     df: pd.DataFrame,
+    profiles: Optional[dict[str, LocationProfile]] = None,
     impute_missing: bool = True,
+    dtype: "np.dtype | type" = np.float64,
 ) -> pd.DataFrame:
-    """Build gold features for the meters/PV feature set.
+    """Build the 29 gold ML features for many locations in one pass.
 
-    Produces 15 features focused on solar production and energy metering:
-    temporal encodings, raw weather pass-throughs, and physics-derived
-    solar features (clearsky_index, effective_solar_pv, theoretical_prod).
+    ``df`` is a long frame keyed by (location_id, datetime). Each location
+    gets exactly the features ``build_gold_features`` would compute for it
+    alone (bit-identical at float64), using its own holiday calendar and
+    climate defaults. Rolling, shift and EWM features are computed for all
+    locations at once on the stacked series, restarting at every location,
+    instead of looping over locations.
 
     Args:
-        df: DataFrame from silver layer with columns: datetime,
-            shortwave_radiation, direct_radiation, diffuse_radiation,
-            global_tilted_irradiance, cloud_cover, temperature_2m.
+        df: DataFrame with columns: location_id, datetime, temperature_2m,
+            shortwave_radiation, cloud_cover, precipitation.
+        profiles: LocationProfile per location_id. Defaults to
+            LOCATION_PROFILES. A profile without climate defaults for a
+            column falls back to forward/backward fill.
         impute_missing: Whether to impute missing weather values first.
+        dtype: Float dtype of the non-flag feature columns.
 
     Returns:
-        DataFrame with datetime + 15 feature columns.
+        DataFrame with location_id + datetime + 29 feature columns, sorted
+        by location_id and datetime.
 
     Raises:
-        ValueError: If required columns are missing.
+        ValueError: If required columns are missing or a location has no
+            profile.
     """
-    logger.info("Building meters gold features (%d input rows)...", len(df))
+    logger.info("Building gold features, grouped (%d input rows)...", len(df))
 
-    required_cols = [DATETIME_COL] + METERS_WEATHER_COLS
+    required_cols = [LOCATION_COL, DATETIME_COL] + REQUIRED_WEATHER_COLS
     missing = [col for col in required_cols if col not in df.columns]
     if missing:
-        raise ValueError(f"Missing required columns for meters features: {missing}")
+        raise ValueError(f"Missing required columns: {missing}")
+    if profiles is None:
+        profiles = LOCATION_PROFILES
+
+    df = df[required_cols].sort_values([LOCATION_COL, DATETIME_COL], kind="stable")
+    df = df.reset_index(drop=True)
+
+    codes, location_ids = pd.factorize(df[LOCATION_COL], sort=True)
+    location_ids = np.asarray(location_ids)
+    offsets, remaining = _group_layout(codes)
+
+    raw_dt = df[DATETIME_COL]
+    dt_series = pd.to_datetime(raw_dt)
+    months = dt_series.dt.month.to_numpy()
+
+    unknown = [loc for loc in location_ids if loc not in profiles]
+    if unknown:
+        raise ValueError(f"No location profile for {unknown}; known: {sorted(profiles)}")
+    location_profiles = tuple(profiles[loc] for loc in location_ids)
+
+    weather: dict[str, np.ndarray] = {}
+    for col in REQUIRED_WEATHER_COLS:
+        values = df[col].to_numpy(dtype=float, copy=True)
+        if impute_missing and np.isnan(values).any():
+            table = np.full((len(location_ids), 13), np.nan)
+            for code, profile in enumerate(location_profiles):
+                monthly = profile.climate.get(col)
+                if monthly is not None:
+                    table[code, 1:] = [monthly[m] for m in range(1, 13)]
+            values = _impute_values_grouped(
+                values, table[codes, months], col, offsets, remaining,
+                small_gap_threshold=6,
+            )
+        weather[col] = values
 
-    df = df.copy()
+    features = _compute_feature_arrays(
+        dt_series, weather, (codes, location_profiles), offsets,
+    )
+
+    output = {LOCATION_COL: df[LOCATION_COL], DATETIME_COL: raw_dt}
+    for name in SELECTED_FEATURES:
+        values = features.pop(name)
+        if name in _FLAG_FEATURES:
+            output[name] = values
+            continue
+        if np.isnan(values).any():
+            values = _fill_edge_values_grouped(
+                values, name, codes, offsets, remaining, location_ids,
+            )
+        output[name] = values.astype(dtype, copy=False)
+
+    result = pd.DataFrame(output, copy=False)
+
+    logger.info(
+        "Built %d gold features (%d rows, %d locations)",
+        len(SELECTED_FEATURES), len(result), len(location_ids),
+    )
+    return result
+
+
+# =============================================================================
+# Incremental (checkpointed) entry point
+# =============================================================================
+
+FEATURE_STATE_VERSION: int = 2
+
+# Features the incremental builder evaluates through the registry over the
+# checkpoint tail and the new rows; thermal_inertia_12h resumes from its EWM
+# accumulator instead.
+_INCREMENTAL_FEATURES: list[str] = [
+    name for name in SELECTED_FEATURES if name != "thermal_inertia_12h"
+]
+
+# Rows of pre-interpolation weather kept in a checkpoint: the registry lookback
+# of _INCREMENTAL_FEATURES (72h same-hour imputation + 47h cumulative_hdd_48h).
+_STATE_TAIL_HOURS: int = FEATURES.lookback_hours(_INCREMENTAL_FEATURES)
+
+
+def _json_floats(values: np.ndarray) -> list[Optional[float]]:
+    """Convert a float array to a JSON-safe list (NaN -> None)."""
+    return [None if v != v else v for v in values.tolist()]
+
+
+def _state_tail_frame(state: dict) -> pd.DataFrame:
+    """Rebuild the pre-interpolation weather rows stored in a checkpoint."""
+    tail = state["tail"]
+    frame = pd.DataFrame({DATETIME_COL: pd.to_datetime(tail[DATETIME_COL])})
+    for col in REQUIRED_WEATHER_COLS:
+        frame[col] = np.array(
+            [np.nan if v is None else v for v in tail[col]], dtype=float,
+        )
+    return frame
+
+
+def _leading_run(mask: np.ndarray) -> int:
+    """Number of consecutive True values at the start of ``mask``."""
+    return len(mask) if mask.all() else int(mask.argmin())
+
+
+def _resume_open_gap(
+    values: np.ndarray,
+    months: np.ndarray,
+    column: str,
+    small_gap_threshold: int,
+    climate: dict[str, np.ndarray],
+    n_tail: int,
+    open_gap: int,
+) -> None:
+    """Continue a gap that was open, and already filled, at the checkpoint.
+
+    The last ``open_gap`` checkpoint rows were missing in the raw input and
+    filled as part of a large gap. Together with the missing rows right after
+    the checkpoint they are one gap of the full history: if it is still large,
+    its new rows are filled from the same-hour history (the filled tail rows
+    are what a full recompute would have); otherwise the tail rows are reset
+    to missing and the whole gap is left for interpolation.
+
+    Args:
+        values: Checkpoint tail followed by the new rows (modified in place).
+        months: Month (1-12) of every row in ``values``.
+        column: Column name, selects the climate defaults.
+        small_gap_threshold: Max consecutive NaN hours left for interpolation.
+        climate: Monthly climate defaults as arrays indexed by month.
+        n_tail: Number of checkpoint tail rows at the start of ``values``.
+        open_gap: Filled gap rows at the end of the tail.
+    """
+    n_new = _leading_run(np.isnan(values[n_tail:]))
+    if open_gap + n_new <= small_gap_threshold:
+        values[max(0, n_tail - open_gap):n_tail] = np.nan
+    elif n_new:
+        monthly = climate.get(column)
+        _fill_large_gaps(
+            values,
+            monthly[months] if monthly is not None else None,
+            np.array([n_tail]),
+            np.array([n_new]),
+        )
+
+
+def build_gold_features_incremental(
+    df: pd.DataFrame,
+    state: Optional[dict] = None,
+    checkpoint_at: Optional[pd.Timestamp] = None,
+    impute_missing: bool = True,
+    location: str = DEFAULT_LOCATION,
+) -> tuple[pd.DataFrame, Optional[dict]]:
+    """Build the 29 gold features, resuming from a feature-state checkpoint.
+
+    Without ``state`` this is ``build_gold_features`` over the whole history.
+    With ``state`` only silver rows after its checkpoint are needed: the
+    checkpoint carries the last ``_STATE_TAIL_HOURS`` of pre-interpolation
+    weather (imputation lookback and rolling windows), the length of any gap
+    still open at the checkpoint and the thermal_inertia_12h EWM accumulator,
+    so the rows after it come out bit-identical to a full recompute over the
+    same history.
+
+    Args:
+        df: DataFrame with columns: datetime, temperature_2m,
+            shortwave_radiation, cloud_cover, precipitation. With ``state``,
+            rows at or before its checkpoint are ignored.
+        state: Checkpoint returned by a previous call, or None.
+        checkpoint_at: Last datetime to fold into the returned checkpoint;
+            later rows are expected to be revised and recomputed next run.
+            If None, or no row after the input checkpoint is at or before it,
+            ``state`` is returned unchanged.
+        impute_missing: Whether to impute missing weather values first.
+        location: location_id of the series (see ``build_gold_features``).
+
+    Returns:
+        Tuple of (datetime + 29 feature columns for every row after the input
+        checkpoint, new checkpoint state).
+
+    Raises:
+        ValueError: If required columns are missing, the location is unknown
+            or ``state`` was written by an incompatible version.
+    """
+    profile = location_profile(location)
+    climate = profile.climate_arrays()
+    required_cols = [DATETIME_COL] + REQUIRED_WEATHER_COLS
+    missing = [col for col in required_cols if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    if state is not None and state.get("version") != FEATURE_STATE_VERSION:
+        raise ValueError(
+            f"Feature state version {state.get('version')} != {FEATURE_STATE_VERSION}"
+        )
+
+    df = df[required_cols].copy()
+    df[DATETIME_COL] = pd.to_datetime(df[DATETIME_COL])
     df = df.sort_values(DATETIME_COL).reset_index(drop=True)
 
-    if impute_missing:
-        for col in METERS_WEATHER_COLS:
-            if col in df.columns and df[col].isna().any():
-                df = impute_weather_column(df, col)
+    n_tail = 0
+    ewm_state = None
+    open_gaps: dict[str, int] = {}
+    if state is not None:
+        df = df[df[DATETIME_COL] > pd.Timestamp(state["checkpoint_at"])]
+        tail = _state_tail_frame(state)
+        n_tail = len(tail)
+        df = pd.concat([tail, df], ignore_index=True)
+        ewm_state = state["ewm"]["thermal_inertia_12h"]
+        open_gaps = state["open_gaps"]
 
-    # --- Temporal features ---
-    dt_series = pd.to_datetime(df[DATETIME_COL])
-    df["hour"] = dt_series.dt.hour
-    df["day_of_week"] = dt_series.dt.dayofweek
-    df["month"] = dt_series.dt.month
-    df["is_weekend"] = df["day_of_week"].isin([5, 6]).astype(int)
-    df["is_daylight"] = df["hour"].between(6, 20).astype(int)
-
-    # Fourier hour encoding
-    df["hour_sin"] = np.sin(2 * np.pi * df["hour"] / 24)
-    df["hour_cos"] = np.cos(2 * np.pi * df["hour"] / 24)
-
-    # --- Temperature-derived ---
-    df["heating_degree"] = np.maximum(0, 18 - df["temperature_2m"])
-    df["cooling_degree"] = np.maximum(0, df["temperature_2m"] - 24)
-
-    # --- Solar-derived ---
-    df["clearsky_index"] = _compute_clearsky_index(df)
-
-    df["effective_solar_pv"] = (
-        df["direct_radiation"].fillna(0)
-        + 0.9 * df["diffuse_radiation"].fillna(0)
+    logger.info(
+        "Building gold features incrementally (%d checkpoint + %d new rows)...",
+        n_tail, len(df) - n_tail,
     )
 
-    df["theoretical_prod"] = (
-        df["global_tilted_irradiance"].fillna(0)
-        * df["effective_solar_pv"].fillna(0)
+    dt_series = df[DATETIME_COL]
+    months = dt_series.dt.month.to_numpy()
+    prefilled: dict[str, np.ndarray] = {}
+    weather: dict[str, np.ndarray] = {}
+    raw_nan: dict[str, np.ndarray] = {}
+    for col in REQUIRED_WEATHER_COLS:
+        values = df[col].to_numpy(dtype=float, copy=True)
+        open_gap = open_gaps.get(col, 0)
+        raw_nan[col] = np.isnan(values)
+        raw_nan[col][max(0, n_tail - open_gap):n_tail] = True
+        if impute_missing and open_gap:
+            _resume_open_gap(
+                values, months, col, small_gap_threshold=6, climate=climate,
+                n_tail=n_tail, open_gap=open_gap,
+            )
+        if impute_missing and np.isnan(values).any():
+            # Fill large gaps first and keep these pre-interpolation values for
+            # the checkpoint. Every required column has climate defaults, so
+            # only small gaps are left and _impute_values finishes them exactly
+            # as it would on the raw input.
+            _prefill_large_gaps(values, months, col, small_gap_threshold=6, climate=climate)
+            prefilled[col] = values.copy()
+            values = _impute_values(values, months, col, small_gap_threshold=6, climate=climate)
+        else:
+            prefilled[col] = values
+        weather[col] = values
+
+    features = _compute_feature_arrays(
+        dt_series, weather, (None, (profile,)), features=_INCREMENTAL_FEATURES,
     )
 
-    # --- Solar elevation (degrees) ---
-    dt_series = pd.to_datetime(df[DATETIME_COL])
-    hour = dt_series.dt.hour
-    day_of_year = dt_series.dt.dayofyear
-    declination = 23.45 * np.sin(np.radians(360 / 365 * (day_of_year - 81)))
-    hour_angle = 15 * (hour - 12)
-    lat_rad = np.radians(FOLGARIA_LAT)
-    sin_elevation = (
-        np.sin(lat_rad) * np.sin(np.radians(declination))
-        + np.cos(lat_rad) * np.cos(np.radians(declination))
-        * np.cos(np.radians(hour_angle))
+    # thermal_inertia_12h of the new rows, and its accumulator at the new
+    # checkpoint. Without a checkpoint pandas' EWM over the whole series is
+    # the result and only the accumulator is derived; with one, the EWM
+    # continues from the stored accumulator over the new rows only.
+    split = (
+        int((dt_series.iloc[n_tail:] <= pd.Timestamp(checkpoint_at)).sum())
+        if checkpoint_at is not None else 0
     )
-    df["solar_elevation"] = np.degrees(np.arcsin(np.clip(sin_elevation, -1, 1)))
+    temperature = weather["temperature_2m"][n_tail:]
+    if ewm_state is None:
+        inertia = _thermal_inertia_12h(temperature, None)
+        split_state = _ewm_state(
+            temperature[:split], THERMAL_INERTIA_HALFLIFE,
+            inertia[split - 1] if split else np.nan,
+        )
+    else:
+        head, split_state = _ewm_mean(temperature[:split], THERMAL_INERTIA_HALFLIFE, ewm_state)
+        rest, _ = _ewm_mean(temperature[split:], THERMAL_INERTIA_HALFLIFE, split_state)
+        inertia = np.concatenate([head, rest])
+
+    output = {DATETIME_COL: dt_series.iloc[n_tail:].reset_index(drop=True)}
+    for name in SELECTED_FEATURES:
+        if name == "thermal_inertia_12h":
+            values = inertia
+        else:
+            values = features[name]
+        if name not in _FLAG_FEATURES and np.isnan(values).any():
+            values = _fill_edge_values(values, name)
+        output[name] = values if name == "thermal_inertia_12h" else values[n_tail:]
+    result = pd.DataFrame(output, copy=False)
+
+    new_state = state
+    if split > 0:
+        end = n_tail + split
+        begin = max(0, end - _STATE_TAIL_HOURS)
+        new_state = {
+            "version": FEATURE_STATE_VERSION,
+            "checkpoint_at": dt_series.iloc[end - 1].isoformat(),
+            "tail": {
+                DATETIME_COL: [ts.isoformat() for ts in dt_series.iloc[begin:end]],
+                **{
+                    col: _json_floats(prefilled[col][begin:end])
+                    for col in REQUIRED_WEATHER_COLS
+                },
+            },
+            # Raw-missing rows at the checkpoint already filled as a large gap
+            "open_gaps": {
+                col: (
+                    _leading_run(raw_nan[col][:end][::-1])
+                    if not np.isnan(prefilled[col][end - 1]) else 0
+                )
+                for col in REQUIRED_WEATHER_COLS
+            },
+            "ewm": {"thermal_inertia_12h": split_state},
+        }
 
-    # --- Cloud variability ---
-    df["cloud_cover_diff"] = df["cloud_cover"].diff().abs()
+    logger.info("Built %d gold features (%d rows)", len(SELECTED_FEATURES), len(result))
+    return result, new_state
 
-    # --- PV efficiency correction (~0.4%/°C loss above 25°C) ---
-    df["pv_temp_factor"] = 1 - 0.004 * np.maximum(0, df["temperature_2m"] - 25)
 
-    # --- GHI ramp (cloud transient signal) ---
-    df["ghi_ramp"] = df["global_tilted_irradiance"].diff().fillna(0)
+# =============================================================================
+# Meters feature builder (solar / PV focused)
+# =============================================================================
 
-    # --- Select output columns ---
-    available = [col for col in SELECTED_METERS_FEATURES if col in df.columns]
-    missing_features = set(SELECTED_METERS_FEATURES) - set(available)
-    if missing_features:
-        logger.warning(
-            "Missing features from SELECTED_METERS_FEATURES: %s", missing_features,
-        )
+def build_gold_features_meters(
+    df: pd.DataFrame,
+    impute_missing: bool = True,
+    features: Optional[list[str]] = None,
+    location: str = DEFAULT_LOCATION,
+) -> pd.DataFrame:
+    """Build gold features for the meters/PV feature set.
+
+    Produces 19 features focused on solar production and energy metering:
+    temporal encodings, raw weather pass-throughs, and physics-derived
+    solar features (clearsky_index, effective_solar_pv, theoretical_prod).
+    Only the dependency closure of ``features`` is computed (see
+    ``FEATURES``), and only the weather columns it reads are required.
+
+    Args:
+        df: DataFrame from silver layer with columns: datetime,
+            shortwave_radiation, direct_radiation, diffuse_radiation,
+            global_tilted_irradiance, cloud_cover, temperature_2m.
+        impute_missing: Whether to impute missing weather values first.
+        features: Features to build. Defaults to SELECTED_METERS_FEATURES.
+        location: location_id of the series; selects the solar latitude and
+            climate defaults (LOCATION_PROFILES).
+
+    Returns:
+        DataFrame with datetime + one column per feature.
+
+    Raises:
+        ValueError: If required columns are missing, a feature is unknown or
+            the location is unknown.
+    """
+    logger.info("Building meters gold features (%d input rows)...", len(df))
+    profile = location_profile(location)
+    climate = profile.climate_arrays()
 
-    df = _fill_edge_nans(df, available)
+    if features is None:
+        features = SELECTED_METERS_FEATURES
 
-    output_cols = [DATETIME_COL] + available
-    result = df[output_cols]
+    weather_cols = [
+        col for col in FEATURES.source_columns(features) if col in WEATHER_SOURCES
+    ]
+    required_cols = [DATETIME_COL] + weather_cols
+    missing = [col for col in required_cols if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns for meters features: {missing}")
 
-    logger.info("Built %d meters gold features (%d rows)", len(available), len(result))
+    df = df[required_cols].sort_values(DATETIME_COL).reset_index(drop=True)
+    dt_series = pd.to_datetime(df[DATETIME_COL])
+    months = dt_series.dt.month.to_numpy()
+
+    sources: dict[str, np.ndarray] = {}
+    for col in weather_cols:
+        values = df[col].to_numpy(dtype=float, copy=True)
+        if impute_missing and np.isnan(values).any():
+            values = _impute_values(values, months, col, small_gap_threshold=6, climate=climate)
+        sources[col] = values
+
+    output = {DATETIME_COL: df[DATETIME_COL]}
+    for name, values in _compute_feature_arrays(
+        dt_series, sources, (None, (profile,)), features=features,
+    ).items():
+        if values.dtype.kind == "f" and np.isnan(values).any():
+            values = _fill_edge_values(values, name)
+        output[name] = values
+
+    result = pd.DataFrame(output, copy=False)
+
+    logger.info("Built %d meters gold features (%d rows)", len(features), len(result))
     return result
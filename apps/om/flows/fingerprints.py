@@ -0,0 +1,197 @@
+"""Change detection between successive Open-Meteo extractions.
+
+Forecast pipelines re-download the same model run whenever they run more
+often than the model updates (wind every 4 h vs. ICON-D2 every 3 h plus
+Open-Meteo's own refresh cadence). ``skip_unchanged`` fingerprints every
+(point, hour) of an extraction, drops the rows whose fingerprint matches
+the previous extraction, and replaces the stored fingerprints of the points
+it fetched, all inside the caller's transaction. Only new hours and values
+from a new model run reach the raw table.
+
+Fingerprints are per point-hour rather than per point: the forecast window
+slides with every run, so whole-array hashes would never match. They are
+replaced per point rather than table-wide: a run that fetches a subset of
+the grid (quota subsampling, ``om_plan.subsample_specs``) keeps the other
+points' fingerprints for the next full run.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+from pg_bulk import copy_dataframe
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DedupStats:
+    """Rows and points kept or skipped by one ``skip_unchanged`` call."""
+
+    rows_total: int = 0
+    rows_skipped: int = 0
+    points_total: int = 0
+    points_unchanged: int = 0
+
+    @property
+    def rows_written(self) -> int:
+        return self.rows_total - self.rows_skipped
+
+    def __str__(self) -> str:
+        return (
+            f"{self.rows_skipped} of {self.rows_total} rows unchanged since the "
+            f"previous extraction ({self.points_unchanged} of {self.points_total} "
+            f"points fully unchanged)"
+        )
+
+
+def row_fingerprints(df: pd.DataFrame, value_cols: Sequence[str]) -> np.ndarray:
+    """64-bit hash of ``value_cols`` for every row (NaN-stable), as int64."""
+    return pd.util.hash_pandas_object(
+        df[list(value_cols)], index=False,
+    ).to_numpy().view(np.int64)
+
+
+def compare_fingerprints(
+    df: pd.DataFrame,
+    previous: pd.DataFrame,
+    key_cols: Sequence[str],
+    value_cols: Sequence[str],
+) -> tuple[np.ndarray, pd.DataFrame, DedupStats]:
+    """Match ``df`` against the previous extraction's fingerprints.
+
+    Args:
+        df: Fresh extraction.
+        previous: Previous fingerprints (key columns + ``fingerprint``).
+        key_cols: Row identity: ``datetime`` plus the point columns.
+        value_cols: Columns whose change means the row must be written.
+
+    Returns:
+        Tuple of (unchanged-row mask over ``df``, this extraction's
+        fingerprints, DedupStats).
+    """
+    key_cols = list(key_cols)
+    point_cols = [col for col in key_cols if col != "datetime"]
+    current = df[key_cols].reset_index(drop=True)
+    current["fingerprint"] = row_fingerprints(df, value_cols)
+
+    merged = current.merge(
+        previous, on=key_cols, how="left", suffixes=("", "_previous"),
+    )
+    unchanged = (merged["fingerprint"] == merged["fingerprint_previous"]).to_numpy()
+
+    point_ids = merged.groupby(point_cols, sort=False).ngroup().to_numpy()
+    stats = DedupStats(
+        rows_total=len(df),
+        rows_skipped=int(unchanged.sum()),
+        points_total=int(point_ids.max()) + 1 if len(point_ids) else 0,
+    )
+    stats.points_unchanged = stats.points_total - len(np.unique(point_ids[~unchanged]))
+    return unchanged, current, stats
+
+
+def _previous_fingerprints_sql(target: str, stage: str, key_cols: Sequence[str]) -> str:
+    """Fingerprints of ``target`` for the points in ``stage`` within ``:start``-``:end``."""
+    point_cols = [col for col in key_cols if col != "datetime"]
+    columns = ", ".join(f"t.{col}" for col in key_cols)
+    match = " AND ".join(f"t.{col} = s.{col}" for col in point_cols)
+    return (
+        f"SELECT {columns}, t.fingerprint FROM {target} t JOIN {stage} s ON {match}"
+        f" WHERE t.datetime BETWEEN :start AND :end"
+    )
+
+
+def _delete_points_sql(target: str, stage: str, point_cols: Sequence[str]) -> str:
+    """Delete every fingerprint of ``target`` whose point is listed in ``stage``."""
+    match = " AND ".join(f"t.{col} = s.{col}" for col in point_cols)
+    return f"DELETE FROM {target} t USING {stage} s WHERE {match}"
+
+
+def _stage_points(
+    conn: sa.Connection,
+    df: pd.DataFrame,
+    schema: str,
+    table: str,
+    point_cols: Sequence[str],
+) -> str:
+    """Copy the distinct points of ``df`` into a temporary table; return its name."""
+    # Dropped at commit
+    stage = f"_fp_points_{table}"
+    conn.execute(sa.text(
+        f"CREATE TEMPORARY TABLE IF NOT EXISTS {stage} ON COMMIT DROP"
+        f" AS SELECT {', '.join(point_cols)} FROM {schema}.{table} WITH NO DATA"
+    ))
+    conn.execute(sa.text(f"TRUNCATE {stage}"))
+    copy_dataframe(
+        conn, df[list(point_cols)].drop_duplicates(), "pg_temp", stage, create=False,
+    )
+    return f"pg_temp.{stage}"
+
+
+def skip_unchanged(
+    conn: sa.Connection,
+    df: pd.DataFrame,
+    schema: str,
+    table: str,
+    key_cols: Sequence[str],
+    value_cols: Sequence[str],
+) -> tuple[pd.DataFrame, DedupStats]:
+    """Drop rows identical to the previous extraction and record this one.
+
+    Runs inside the caller's transaction, so the stored fingerprints only
+    advance together with the raw write. The fingerprint table (key columns
+    and ``fingerprint`` BIGINT, created on first use) holds the latest
+    extraction of every point. Only the fetched points' fingerprints within
+    the extraction's datetime range are read back; the fetched points'
+    previous fingerprints are then deleted and this extraction's inserted,
+    other points are kept.
+
+    Args:
+        conn: Open connection inside a transaction.
+        df: Fresh extraction.
+        schema: Fingerprint table schema.
+        table: Fingerprint table name.
+        key_cols: Row identity: ``datetime`` plus the point columns.
+        value_cols: Columns whose change means the row must be written.
+
+    Returns:
+        Tuple of (rows to write, DedupStats).
+    """
+    key_cols = list(key_cols)
+    point_cols = [col for col in key_cols if col != "datetime"]
+    target = f"{schema}.{table}"
+    exists = sa.inspect(conn).has_table(table, schema=schema)
+    if exists:
+        # Only the fetched points over the extraction's hours are compared
+        stage = _stage_points(conn, df, schema, table, point_cols)
+        previous = pd.read_sql(
+            sa.text(_previous_fingerprints_sql(target, stage, key_cols)),
+            conn,
+            params={
+                "start": df["datetime"].min().to_pydatetime(),
+                "end": df["datetime"].max().to_pydatetime(),
+            },
+        )
+        previous["datetime"] = pd.to_datetime(previous["datetime"])
+    else:
+        previous = pd.DataFrame({
+            **{col: df[col].iloc[:0] for col in key_cols},
+            "fingerprint": np.array([], dtype=np.int64),
+        })
+
+    unchanged, current, stats = compare_fingerprints(df, previous, key_cols, value_cols)
+
+    current = current.drop_duplicates(key_cols, keep="last")
+    if exists:
+        # Replace the fetched points' fingerprints, keep the other points'
+        conn.execute(sa.text(_delete_points_sql(target, stage, point_cols)))
+        copy_dataframe(conn, current, schema, table, create=False)
+    else:
+        copy_dataframe(conn, current, schema, table)
+
+    logger.info("Fingerprint dedup: %s", stats)
+    return df.loc[~unchanged].reset_index(drop=True), stats
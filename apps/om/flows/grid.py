@@ -0,0 +1,210 @@
+"""Trentino point grids for the Open-Meteo wind, heat and obs pipelines.
+
+``generate_grid`` builds the regular lat/lon lattice over a bounding box.
+``build_grid`` clips it to a boundary polygon read from a local GeoJSON
+(``grid.boundary`` in the pipeline config), keeping points within
+``buffer_km`` of the boundary so border cells keep coverage. Points in
+Lombardy, Veneto and Alto Adige are dropped before any API call, which
+cuts calls, raw rows and dbt spatial work in proportion.
+
+Point-in-polygon and edge distances are computed with numpy on a local
+equirectangular projection; no GIS dependency is needed. Results are
+cached per process.
+"""
+
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_FLOWS_DIR = Path(__file__).parent
+
+# Equirectangular projection to km around the grid's mean latitude
+_KM_PER_DEG_LAT: float = 110.574
+_KM_PER_DEG_LON_EQUATOR: float = 111.320
+
+
+def generate_grid(
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    spacing: float,
+) -> List[Tuple[float, float]]:
+    """Generate a regular lat/lon grid over a bounding box.
+
+    Args:
+        lat_min: Southern boundary latitude.
+        lat_max: Northern boundary latitude.
+        lon_min: Western boundary longitude.
+        lon_max: Eastern boundary longitude.
+        spacing: Grid spacing in degrees.
+
+    Returns:
+        List of (lat, lon) tuples covering the bounding box.
+    """
+    lats = np.arange(lat_min, lat_max + spacing / 2, spacing)
+    lons = np.arange(lon_min, lon_max + spacing / 2, spacing)
+
+    grid = [
+        (round(float(lat), 4), round(float(lon), 4))
+        for lat in lats
+        for lon in lons
+    ]
+    return grid
+
+
+def load_boundary(path: Path) -> List[np.ndarray]:
+    """Read the polygon rings of a GeoJSON file.
+
+    Accepts a FeatureCollection, Feature or bare Polygon/MultiPolygon
+    geometry. Holes are returned as rings too; the even-odd rule in
+    ``points_in_polygon`` treats them as excluded.
+
+    Args:
+        path: GeoJSON file (WGS84 lon/lat).
+
+    Returns:
+        List of (n, 2) arrays of (lon, lat) vertices.
+    """
+    with open(path) as fh:
+        data = json.load(fh)
+
+    if data["type"] == "FeatureCollection":
+        geometries = [feature["geometry"] for feature in data["features"]]
+    elif data["type"] == "Feature":
+        geometries = [data["geometry"]]
+    else:
+        geometries = [data]
+
+    rings: List[np.ndarray] = []
+    for geometry in geometries:
+        if geometry["type"] == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry["type"] == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            raise ValueError(f"Unsupported boundary geometry: {geometry['type']}")
+        for polygon in polygons:
+            rings.extend(np.asarray(ring, dtype=float)[:, :2] for ring in polygon)
+    return rings
+
+
+def points_in_polygon(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    rings: List[np.ndarray],
+    buffer_km: float = 0.0,
+) -> np.ndarray:
+    """Mask of points inside the polygon or within ``buffer_km`` of its edges.
+
+    Args:
+        lats: Point latitudes.
+        lons: Point longitudes.
+        rings: Polygon rings from ``load_boundary``.
+        buffer_km: Outward buffer in km.
+
+    Returns:
+        Boolean array, True for points to keep.
+    """
+    km_per_deg_lon = _KM_PER_DEG_LON_EQUATOR * np.cos(np.radians(np.mean(lats)))
+    px = np.asarray(lons, dtype=float) * km_per_deg_lon
+    py = np.asarray(lats, dtype=float) * _KM_PER_DEG_LAT
+
+    inside = np.zeros(len(px), dtype=bool)
+    min_dist = np.full(len(px), np.inf)
+    for ring in rings:
+        x0 = ring[:-1, 0] * km_per_deg_lon
+        y0 = ring[:-1, 1] * _KM_PER_DEG_LAT
+        x1 = ring[1:, 0] * km_per_deg_lon
+        y1 = ring[1:, 1] * _KM_PER_DEG_LAT
+
+        # Even-odd ray casting: count edges crossed by a ray towards +x
+        straddles = (y0[None, :] > py[:, None]) != (y1[None, :] > py[:, None])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x0 + (py[:, None] - y0) * (x1 - x0) / (y1 - y0)
+        crossings = straddles & (px[:, None] < x_cross)
+        inside ^= (crossings.sum(axis=1) % 2).astype(bool)
+
+        if buffer_km > 0:
+            dx, dy = x1 - x0, y1 - y0
+            length_sq = np.where(dx * dx + dy * dy > 0, dx * dx + dy * dy, 1.0)
+            t = np.clip(
+                ((px[:, None] - x0) * dx + (py[:, None] - y0) * dy) / length_sq, 0.0, 1.0,
+            )
+            dist = np.hypot(px[:, None] - (x0 + t * dx), py[:, None] - (y0 + t * dy))
+            min_dist = np.minimum(min_dist, dist.min(axis=1))
+
+    return inside | (min_dist <= buffer_km)
+
+
+@lru_cache(maxsize=None)
+def _masked_grid(
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    spacing: float,
+    boundary_path: Optional[str],
+    buffer_km: float,
+) -> tuple[Tuple[float, float], ...]:
+    grid = generate_grid(lat_min, lat_max, lon_min, lon_max, spacing)
+    if boundary_path is None:
+        return tuple(grid)
+
+    points = np.asarray(grid)
+    keep = points_in_polygon(
+        points[:, 0], points[:, 1], load_boundary(Path(boundary_path)), buffer_km,
+    )
+    masked = tuple(point for point, kept in zip(grid, keep) if kept)
+    saved = len(grid) - len(masked)
+    logger.info(
+        "Grid %.2f deg: kept %d of %d bbox points inside %s (+%.1f km); "
+        "%d points (%.0f%%) saved",
+        spacing, len(masked), len(grid), Path(boundary_path).name, buffer_km,
+        saved, 100 * saved / len(grid) if grid else 0.0,
+    )
+    return masked
+
+
+def build_grid(grid_cfg: Dict[str, Any]) -> List[Tuple[float, float]]:
+    """Grid points of a pipeline's ``grid`` config, clipped to its boundary.
+
+    Args:
+        grid_cfg: ``grid`` section with the bbox, ``spacing_deg`` and an
+            optional ``boundary`` ({path, buffer_km}); ``path`` is relative
+            to the flows directory. Without ``boundary`` the full bbox is
+            returned.
+
+    Returns:
+        List of (lat, lon) tuples.
+    """
+    boundary = grid_cfg.get("boundary")
+    boundary_path = str(_FLOWS_DIR / boundary["path"]) if boundary else None
+    return list(_masked_grid(
+        grid_cfg["lat_min"],
+        grid_cfg["lat_max"],
+        grid_cfg["lon_min"],
+        grid_cfg["lon_max"],
+        grid_cfg["spacing_deg"],
+        boundary_path,
+        float(boundary.get("buffer_km", 0.0)) if boundary else 0.0,
+    ))
+
+
+def bbox_point_count(grid_cfg: Dict[str, Any]) -> int:
+    """Points of the unclipped bbox lattice, for reporting the points saved."""
+    return len(_masked_grid(
+        grid_cfg["lat_min"],
+        grid_cfg["lat_max"],
+        grid_cfg["lon_min"],
+        grid_cfg["lon_max"],
+        grid_cfg["spacing_deg"],
+        None,
+        0.0,
+    ))
@@ -0,0 +1,97 @@
+"""Columnar decoding of Open-Meteo multi-location responses.
+
+A 600-point response used to become 600 small DataFrames and one
+``pd.concat``. ``decode_locations`` instead preallocates one numpy array
+per output column (sum of all locations' steps long), fills each
+location's slice in place and builds a single DataFrame at the end. The
+time axis is parsed once when every location shares it (the normal case
+for one request).
+
+``loads`` parses response bodies with orjson when it is installed (it
+ships with Prefect) and falls back to the standard library.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is a Prefect dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def loads(body: bytes) -> Any:
+    """Parse a JSON response body (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _values(raw: List[Any]) -> np.ndarray:
+    """float64 array of a JSON number list; null becomes NaN."""
+    return np.array(raw, dtype=np.float64)
+
+
+def decode_locations(
+    locations: List[Dict[str, Any]],
+    section: str,
+    variables: Sequence[str],
+    time_col: str = "datetime",
+    location_fields: Sequence[str] = (),
+) -> pd.DataFrame:
+    """One DataFrame for every location of a response, built column-wise.
+
+    Args:
+        locations: Per-location response objects (``latitude``,
+            ``longitude`` and a ``section`` with ``time`` and variables).
+        section: Time-series block, e.g. ``hourly``, ``daily``, ``minutely_15``.
+        variables: Variables to read from the block, in output order.
+        time_col: Name of the parsed ``time`` column.
+        location_fields: Per-location scalars repeated on every row
+            (e.g. ``elevation``); missing ones become NaN.
+
+    Returns:
+        DataFrame with columns ``time_col``, lat, lon, ``variables``,
+        ``location_fields``, locations in response order.
+    """
+    blocks = [location[section] for location in locations]
+    lengths = np.array([len(block["time"]) for block in blocks], dtype=np.int64)
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    total = int(bounds[-1])
+
+    first_time = blocks[0]["time"] if blocks else []
+    if all(block["time"] == first_time for block in blocks):
+        times = np.tile(pd.to_datetime(first_time).to_numpy(), len(blocks))
+    else:
+        times = pd.to_datetime(
+            [ts for block in blocks for ts in block["time"]]
+        ).to_numpy()
+
+    columns: Dict[str, np.ndarray] = {
+        time_col: times,
+        "lat": np.repeat(
+            np.array([location["latitude"] for location in locations], dtype=np.float64),
+            lengths,
+        ),
+        "lon": np.repeat(
+            np.array([location["longitude"] for location in locations], dtype=np.float64),
+            lengths,
+        ),
+    }
+    for variable in variables:
+        values = np.empty(total, dtype=np.float64)
+        for i, block in enumerate(blocks):
+            values[bounds[i]:bounds[i + 1]] = _values(block[variable])
+        columns[variable] = values
+    for field in location_fields:
+        columns[field] = np.repeat(
+            _values([location.get(field) for location in locations]), lengths,
+        )
+
+    return pd.DataFrame(columns)
@@ -0,0 +1,263 @@
+"""Concurrent Open-Meteo fetch engine with a token-bucket rate limiter.
+
+Open-Meteo meters usage in location-weighted calls against per-minute,
+per-hour and per-day limits. Instead of sleeping a fixed interval between
+POST batches, ``fetch_batches`` sends each batch as soon as the shared
+``TokenBucket`` holds enough budget for it (up to ``max_concurrency`` in
+flight) and decodes every response in a worker thread while the other
+requests are still in flight.
+
+Used by pipeline_wind.py, pipeline_heat.py and pipeline_obs.py.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import httpx
+
+from api_retry import DailyLimitExceeded, async_client, async_post_with_retry
+from om_decode import loads
+
+logger = logging.getLogger(__name__)
+
+Decoder = Callable[[List[Dict[str, Any]]], Any]
+
+_DAY_SECONDS: int = 86_400
+
+# Concurrent POSTs per fetch when the config does not set max_concurrent_requests
+DEFAULT_MAX_CONCURRENCY: int = 4
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """At most ``calls`` weighted API calls per ``period_seconds``."""
+
+    calls: float
+    period_seconds: float
+
+
+# Open-Meteo free (non-commercial) tier
+OPEN_METEO_FREE_LIMITS: tuple[RateLimit, ...] = (
+    RateLimit(calls=600, period_seconds=60),
+    RateLimit(calls=5_000, period_seconds=3_600),
+    RateLimit(calls=10_000, period_seconds=_DAY_SECONDS),
+)
+
+
+def call_weight(n_locations: int, n_variables: int = 1, n_days: float = 1.0) -> float:
+    """Weighted API calls of one request, as Open-Meteo counts them.
+
+    Every location is one call; more than 10 variables or more than 14 days
+    per location count fractionally more (15 variables = 1.5 calls,
+    4 weeks = 2 calls).
+
+    Args:
+        n_locations: Points in the request.
+        n_variables: Weather variables requested.
+        n_days: Days of data per location (past + forecast).
+
+    Returns:
+        Weighted call count.
+    """
+    return n_locations * max(1.0, n_variables / 10) * max(1.0, n_days / 14)
+
+
+class TokenBucket:
+    """Multi-window token bucket for location-weighted API calls.
+
+    One bucket per ``RateLimit``, refilled continuously at calls/period and
+    capped at its capacity. Thread-safe and not tied to an event loop, so
+    flows in separate threads or ``asyncio.run`` calls of one process draw
+    from one bucket.
+
+    The buckets live in process memory: every worker process starts with
+    full buckets of its own, so this only smooths bursts within a process.
+    The budget shared by all flows and processes is the Postgres quota
+    ledger (``quota.QuotaLedger``), reserved before each fetch.
+    """
+
+    def __init__(
+        self,
+        limits: Sequence[RateLimit] = OPEN_METEO_FREE_LIMITS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limits = tuple(limits)
+        self._tokens = [limit.calls for limit in self.limits]
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        for i, limit in enumerate(self.limits):
+            self._tokens[i] = min(
+                limit.calls,
+                self._tokens[i] + elapsed * limit.calls / limit.period_seconds,
+            )
+
+    def remaining(self) -> tuple[float, ...]:
+        """Tokens currently available in each window."""
+        with self._lock:
+            self._refill()
+            return tuple(self._tokens)
+
+    def reserve(self, cost: float) -> float:
+        """Take ``cost`` tokens if every window holds them.
+
+        Returns:
+            0.0 when the tokens were taken, else the seconds until they
+            will be available.
+
+        Raises:
+            ValueError: If ``cost`` exceeds a window's capacity.
+            DailyLimitExceeded: If the daily window cannot cover ``cost``;
+                waiting for it is pointless within a run.
+        """
+        with self._lock:
+            self._refill()
+            wait = 0.0
+            for tokens, limit in zip(self._tokens, self.limits):
+                if cost > limit.calls:
+                    raise ValueError(
+                        f"Request weight {cost:.0f} exceeds the limit of "
+                        f"{limit.calls:.0f} calls per {limit.period_seconds:.0f}s"
+                    )
+                if tokens >= cost:
+                    continue
+                if limit.period_seconds >= _DAY_SECONDS:
+                    raise DailyLimitExceeded(
+                        f"Daily API budget exhausted: {tokens:.0f} calls left, "
+                        f"request needs {cost:.0f}"
+                    )
+                wait = max(wait, (cost - tokens) * limit.period_seconds / limit.calls)
+
+            if wait == 0.0:
+                self._tokens = [tokens - cost for tokens in self._tokens]
+            return wait
+
+    async def acquire(self, cost: float) -> float:
+        """Wait until ``cost`` tokens are available and take them.
+
+        Returns:
+            Seconds spent waiting.
+        """
+        waited = 0.0
+        while (wait := self.reserve(cost)) > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited
+
+
+@lru_cache(maxsize=None)
+def shared_bucket(limits: tuple[RateLimit, ...] = OPEN_METEO_FREE_LIMITS) -> TokenBucket:
+    """Process-wide bucket for ``limits``, shared by every OM pipeline."""
+    return TokenBucket(limits)
+
+
+@dataclass
+class FetchStats:
+    """Counts and timings of one ``fetch_batches`` call."""
+
+    batches: int = 0
+    weighted_calls: float = 0.0
+    wait_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.batches} batches, {self.weighted_calls:.0f} weighted calls "
+            f"in {self.elapsed_seconds:.1f}s ({self.wait_seconds:.1f}s rate-limited)"
+        )
+
+
+def _decode_body(body: bytes, decode: Decoder) -> Any:
+    """Parse a response body and hand its per-location objects to ``decode``."""
+    data = loads(body)
+    # Single location returns a dict; multiple returns a list
+    if isinstance(data, dict):
+        data = [data]
+    return decode(data)
+
+
+async def _fetch_all(
+    url: str,
+    payloads: Sequence[Dict[str, Any]],
+    weights: Sequence[float],
+    decoders: Sequence[Decoder],
+    max_concurrency: int,
+    timeout: int,
+    bucket: TokenBucket,
+    stats: FetchStats,
+    transport: Optional[httpx.AsyncBaseTransport],
+) -> List[Any]:
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_one(
+        client: httpx.AsyncClient, payload: Dict[str, Any], weight: float, decode: Decoder,
+    ):
+        async with semaphore:
+            stats.wait_seconds += await bucket.acquire(weight)
+            response = await async_post_with_retry(client, url, data=payload, timeout=timeout)
+        return await asyncio.to_thread(_decode_body, response.content, decode)
+
+    async with async_client(transport, max_connections=max_concurrency) as client:
+        return await asyncio.gather(*(
+            fetch_one(client, payload, weight, decode)
+            for payload, weight, decode in zip(payloads, weights, decoders)
+        ))
+
+
+def fetch_batches(
+    url: str,
+    payloads: Sequence[Dict[str, Any]],
+    weights: Sequence[float],
+    decode: Union[Decoder, Sequence[Decoder]],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: int = 120,
+    bucket: Optional[TokenBucket] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> List[Any]:
+    """POST every payload concurrently within the rate-limit budget.
+
+    Args:
+        url: Open-Meteo endpoint.
+        payloads: Form-encoded POST bodies, one per batch of points.
+        weights: Weighted call count of each payload (see ``call_weight``).
+        decode: Turns the per-location objects of one response into a
+            frame; or one such decoder per payload.
+        max_concurrency: Requests in flight at once.
+        timeout: Per-request read timeout in seconds.
+        bucket: Rate limiter; defaults to the process-wide free-tier bucket.
+        transport: Optional httpx transport (tests, local stand-ins).
+
+    Returns:
+        Decoded results in payload order.
+
+    Raises:
+        DailyLimitExceeded: If the daily budget cannot cover a batch.
+        httpx.HTTPStatusError: If a batch still fails after retries.
+    """
+    decoders = [decode] * len(payloads) if callable(decode) else list(decode)
+    if not len(payloads) == len(weights) == len(decoders):
+        raise ValueError("payloads, weights and decoders must have the same length")
+
+    stats = FetchStats(batches=len(payloads), weighted_calls=float(sum(weights)))
+    start = time.perf_counter()
+    frames = asyncio.run(_fetch_all(
+        url, payloads, weights, decoders,
+        max_concurrency=max(1, max_concurrency),
+        timeout=timeout,
+        bucket=bucket or shared_bucket(),
+        stats=stats,
+        transport=transport,
+    ))
+    stats.elapsed_seconds = time.perf_counter() - start
+    logger.info("Open-Meteo fetch: %s", stats)
+    return frames
@@ -0,0 +1,357 @@
+"""Request planner that coalesces Open-Meteo forecast requests across pipelines.
+
+Each pipeline describes what it needs as a ``RequestSpec`` (time-series
+section, variables, model, window parameters, points). ``plan_requests``
+groups points by the set of specs that need them, merges compatible specs
+for each group into one ``/v1/forecast`` request and batches it by
+``max_points_per_call``. A point shared by two specs is fetched once. The
+wind and heat grids are identical, and every 4th obs point on a 0.09° grid
+sits on the 0.04° grid. ``split_response`` turns one response back into a
+frame per spec.
+
+Two specs are merged only if:
+
+* their API parameters agree on every shared key;
+* the merged request does not weigh more than the separate ones;
+* a spec in the ``hourly`` or ``minutely_15`` section pins its own window
+  (``forecast_hours``/``past_hours`` or ``forecast_minutely_15``/
+  ``past_minutely_15``) whenever another spec sets ``forecast_days`` or
+  ``past_days``. Open-Meteo applies those to every section.
+
+Specs with different models share one request with ``models=a,b``. The
+response then suffixes every variable with its model name
+(``wind_speed_10m_icon_d2``), and ``split_response`` reads each spec's own
+model.
+"""
+
+import dataclasses
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import httpx
+import pandas as pd
+
+from om_decode import decode_locations
+from om_fetch import DEFAULT_MAX_CONCURRENCY, TokenBucket, call_weight, fetch_batches
+from quota import QuotaLedger
+
+logger = logging.getLogger(__name__)
+
+# Name of the model Open-Meteo uses when ``models`` is omitted
+DEFAULT_MODEL: str = "best_match"
+
+# Parameters that pin a section's own time window
+_SECTION_WINDOW: Dict[str, Tuple[str, str]] = {
+    "hourly": ("forecast_hours", "past_hours"),
+    "minutely_15": ("forecast_minutely_15", "past_minutely_15"),
+}
+# Window parameters Open-Meteo applies to every section
+_DAY_WINDOW: Tuple[str, ...] = ("forecast_days", "past_days")
+
+Point = Tuple[float, float]
+
+
+@dataclass(frozen=True)
+class RequestSpec:
+    """What one pipeline needs from ``/v1/forecast``.
+
+    Attributes:
+        name: Key of the spec's frame in ``split_response`` output.
+        section: Time-series block, e.g. ``hourly``, ``daily``, ``minutely_15``.
+        variables: Variables of ``section``, in output column order.
+        points: (lat, lon) points to fetch.
+        model: Open-Meteo model; None for best_match.
+        params: Other API parameters (time window, units, timezone).
+        n_days: Days of data per location, for the call weight.
+        time_col: Name of the parsed ``time`` column.
+        location_fields: Per-location scalars to keep (e.g. ``elevation``).
+    """
+
+    name: str
+    section: str
+    variables: Tuple[str, ...]
+    points: Tuple[Point, ...]
+    model: Optional[str] = None
+    params: Mapping[str, str] = field(default_factory=dict)
+    n_days: float = 1.0
+    time_col: str = "datetime"
+    location_fields: Tuple[str, ...] = ()
+
+    @property
+    def model_name(self) -> str:
+        return self.model or DEFAULT_MODEL
+
+
+@dataclass
+class PlannedRequest:
+    """One POST covering ``points`` for every spec in ``specs``."""
+
+    specs: Tuple[RequestSpec, ...]
+    points: List[Point]
+    payload: Dict[str, str]
+    weight: float
+
+    @property
+    def models(self) -> List[str]:
+        return list(dict.fromkeys(spec.model_name for spec in self.specs))
+
+
+def _point_key(point: Point) -> Point:
+    # Grids built with different spacings hit shared points through
+    # different float arithmetic; 1e-4° is ~10 m.
+    return (round(point[0], 4), round(point[1], 4))
+
+
+def _merged_params(specs: Sequence[RequestSpec]) -> Optional[Dict[str, str]]:
+    """Union of the specs' parameters, or None if they are incompatible."""
+    merged: Dict[str, str] = {}
+    for spec in specs:
+        for key, value in spec.params.items():
+            value = str(value)
+            if merged.setdefault(key, value) != value:
+                return None
+    for spec in specs:
+        window = _SECTION_WINDOW.get(spec.section)
+        if window is None:
+            continue
+        borrows_days = any(
+            key in merged and key not in spec.params for key in _DAY_WINDOW
+        )
+        if borrows_days and not all(key in spec.params for key in window):
+            return None
+    return merged
+
+
+def _weight(specs: Sequence[RequestSpec], n_points: int) -> float:
+    models = {spec.model_name for spec in specs}
+    sections: Dict[str, set] = {}
+    for spec in specs:
+        sections.setdefault(spec.section, set()).update(spec.variables)
+    n_variables = sum(len(variables) for variables in sections.values()) * len(models)
+    return call_weight(n_points, n_variables, max(spec.n_days for spec in specs))
+
+
+def _payload(specs: Sequence[RequestSpec], points: Sequence[Point]) -> Dict[str, str]:
+    payload = {
+        "latitude": ",".join(str(point[0]) for point in points),
+        "longitude": ",".join(str(point[1]) for point in points),
+    }
+    sections: Dict[str, List[str]] = {}
+    for spec in specs:
+        sections.setdefault(spec.section, []).extend(spec.variables)
+    for section, variables in sections.items():
+        payload[section] = ",".join(dict.fromkeys(variables))
+    payload.update(_merged_params(specs) or {})
+    models = list(dict.fromkeys(spec.model_name for spec in specs))
+    if models != [DEFAULT_MODEL]:
+        payload["models"] = ",".join(models)
+    return payload
+
+
+def _cluster(specs: Sequence[RequestSpec]) -> List[List[RequestSpec]]:
+    """Greedily group specs into compatible, weight-saving requests."""
+    clusters: List[List[RequestSpec]] = []
+    for spec in specs:
+        for cluster in clusters:
+            candidate = cluster + [spec]
+            if _merged_params(candidate) is None:
+                continue
+            if _weight(candidate, 1) > _weight(cluster, 1) + _weight([spec], 1):
+                continue
+            cluster.append(spec)
+            break
+        else:
+            clusters.append([spec])
+    return clusters
+
+
+def plan_requests(
+    specs: Sequence[RequestSpec],
+    max_points_per_call: int,
+) -> List[PlannedRequest]:
+    """Merge specs into the fewest compatible requests.
+
+    Args:
+        specs: What each pipeline needs; names must be unique.
+        max_points_per_call: Locations per POST (payload size limit).
+
+    Returns:
+        Requests in a stable order (first-seen point groups, then batches).
+    """
+    names = [spec.name for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate request spec names: {names}")
+
+    # Points keyed by the set of specs that need them
+    needed_by: Dict[Point, List[int]] = {}
+    first_seen: Dict[Point, Point] = {}
+    for index, spec in enumerate(specs):
+        for point in spec.points:
+            key = _point_key(point)
+            first_seen.setdefault(key, point)
+            owners = needed_by.setdefault(key, [])
+            if not owners or owners[-1] != index:
+                owners.append(index)
+    groups: Dict[Tuple[int, ...], List[Point]] = {}
+    for key, owners in needed_by.items():
+        groups.setdefault(tuple(owners), []).append(first_seen[key])
+
+    requests: List[PlannedRequest] = []
+    for owners, points in groups.items():
+        for cluster in _cluster([specs[index] for index in owners]):
+            for start in range(0, len(points), max_points_per_call):
+                batch = points[start:start + max_points_per_call]
+                requests.append(PlannedRequest(
+                    specs=tuple(cluster),
+                    points=batch,
+                    payload=_payload(cluster, batch),
+                    weight=_weight(cluster, len(batch)),
+                ))
+
+    separate = sum(
+        _weight([spec], len(spec.points)) for spec in specs
+    )
+    planned = sum(request.weight for request in requests)
+    logger.info(
+        "Planned %d requests for %s: %.0f weighted calls (%.0f if fetched separately)",
+        len(requests), ", ".join(names), planned, separate,
+    )
+    return requests
+
+
+def subsample_specs(
+    specs: Sequence[RequestSpec],
+    fraction: float,
+) -> List[RequestSpec]:
+    """Keep an evenly spread ``fraction`` of every spec's points.
+
+    Used when the daily quota cannot cover a whole run: the request weight
+    is linear in points, so the subset's weight is at most ``fraction`` of
+    the original. Every spec keeps at least one point, so a small spec
+    still yields a (thinned) frame rather than none.
+    """
+    subsampled = []
+    for spec in specs:
+        n_points = len(spec.points)
+        keep = min(n_points, max(1, math.floor(n_points * fraction)))
+        points = tuple(spec.points[i * n_points // keep] for i in range(keep))
+        subsampled.append(dataclasses.replace(spec, points=points))
+    return subsampled
+
+
+def split_response(
+    request: PlannedRequest,
+    locations: List[Dict[str, Any]],
+) -> Dict[str, pd.DataFrame]:
+    """Decode one response into a frame per spec of ``request``.
+
+    Returns:
+        ``{spec.name: DataFrame}`` with columns ``time_col``, lat, lon,
+        the spec's variables and location fields.
+    """
+    multi_model = len(request.models) > 1
+    frames = {}
+    for spec in request.specs:
+        keys = [
+            f"{variable}_{spec.model_name}" if multi_model else variable
+            for variable in spec.variables
+        ]
+        df = decode_locations(
+            locations, spec.section, keys,
+            time_col=spec.time_col, location_fields=spec.location_fields,
+        )
+        frames[spec.name] = df.rename(columns=dict(zip(keys, spec.variables)))
+    return frames
+
+
+def fetch_specs(
+    url: str,
+    specs: Sequence[RequestSpec],
+    max_points_per_call: int,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: int = 120,
+    bucket: Optional[TokenBucket] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    ledger: Optional[QuotaLedger] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Plan, fetch and split: one frame per spec.
+
+    Args:
+        url: Open-Meteo ``/v1/forecast`` endpoint.
+        specs: What each pipeline needs.
+        max_points_per_call: Locations per POST.
+        max_concurrency: Requests in flight at once.
+        timeout: Per-request read timeout in seconds.
+        bucket: Rate limiter; defaults to the process-wide bucket.
+        transport: Optional httpx transport (tests, local stand-ins).
+        ledger: Daily quota ledger; the planned weight is reserved before
+            the first request and the points are subsampled when only
+            part of it is granted. If the fetch fails, the reservation is
+            settled to the requests that got a response.
+
+    Returns:
+        ``{spec.name: DataFrame}``, rows grouped by request. Each frame's
+        ``attrs["quota_fraction"]`` is the granted share of the planned
+        weight: below 1.0 when its points were subsampled.
+
+    Raises:
+        DailyLimitExceeded: If the ledger cannot grant enough of the run.
+    """
+    requests = plan_requests(specs, max_points_per_call)
+    reservation = None
+    quota_fraction = 1.0
+    if ledger is not None:
+        planned = sum(request.weight for request in requests)
+        reservation = ledger.reserve(
+            planned,
+            requests=len(requests),
+            points=sum(len(request.points) for request in requests),
+        )
+        if reservation.granted < planned:
+            quota_fraction = reservation.granted / planned
+            specs = subsample_specs(specs, quota_fraction)
+            requests = plan_requests(specs, max_points_per_call)
+            logger.warning(
+                "Quota short: fetching %d of the planned points (%.0f of %.0f calls)",
+                sum(len(request.points) for request in requests),
+                sum(request.weight for request in requests),
+                planned,
+            )
+
+    # Weights of the requests that got a response, to settle the
+    # reservation if the fetch fails part-way
+    answered: List[float] = []
+
+    def decoder(request: PlannedRequest):
+        def decode(locations: List[Dict[str, Any]]) -> Dict[str, pd.DataFrame]:
+            answered.append(request.weight)
+            return split_response(request, locations)
+        return decode
+
+    try:
+        results = fetch_batches(
+            url,
+            [request.payload for request in requests],
+            [request.weight for request in requests],
+            [decoder(request) for request in requests],
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+            bucket=bucket,
+            transport=transport,
+        )
+    except Exception:
+        if reservation is not None:
+            ledger.settle(reservation, sum(answered))
+        raise
+
+    frames: Dict[str, List[pd.DataFrame]] = {spec.name: [] for spec in specs}
+    for result in results:
+        for name, df in result.items():
+            frames[name].append(df)
+    merged = {}
+    for name, parts in frames.items():
+        merged[name] = pd.concat(parts, ignore_index=True)
+        merged[name].attrs["quota_fraction"] = quota_fraction
+    return merged
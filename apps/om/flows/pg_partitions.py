@@ -0,0 +1,206 @@
+"""Daily range partitions for the append-only raw OM tables.
+
+The raw tables (wind, heat, obs, and the Meltano-loaded ``weather_hourly``)
+only ever grow by extraction, and retention used to ``DELETE`` the old rows
+every run. Partitioned by day of ``_sdc_extracted_at`` instead, retention
+drops whole expired partitions (``drop_expired_partitions`` macro), which
+leaves no dead tuples behind for vacuum.
+
+``ensure_partitioned_table`` is called before every load. It:
+
+* creates the table as ``PARTITION BY RANGE (_sdc_extracted_at)`` if it is
+  missing and its columns are given;
+* migrates an existing plain table in place. The table is renamed to
+  ``<table>_legacy`` and attached as one partition that spans its rows up
+  to the end of today, so no rows are copied. Retention drops it like any
+  other partition once all of its rows have expired;
+* creates the daily partitions ``<table>_pYYYYMMDD`` from yesterday to
+  ``premake_days`` ahead, skipping days an existing partition covers.
+
+There is no DEFAULT partition, so a row extracted beyond the premade days
+is rejected instead of landing in a partition that later blocks creating
+its day. Every run premakes again, and the flows run at least daily.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+# Column the raw tables are partitioned by
+PARTITION_KEY: str = "_sdc_extracted_at"
+# Daily partitions created ahead of today, so a run that is late by a day
+# or two still finds its partition
+DEFAULT_PREMAKE_DAYS: int = 2
+
+Bounds = Tuple[datetime, datetime]
+
+
+def partition_name(table: str, day: date) -> str:
+    """Name of ``table``'s partition for ``day``."""
+    return f"{table}_p{day:%Y%m%d}"
+
+
+def days_to_premake(today: date, premake_days: int = DEFAULT_PREMAKE_DAYS) -> List[date]:
+    """Days that need a partition: yesterday through ``premake_days`` ahead.
+
+    Yesterday is included because loaders stamp rows with the worker's
+    clock, which may be behind the database's date.
+    """
+    return [today + timedelta(days=offset) for offset in range(-1, premake_days + 1)]
+
+
+def missing_days(days: Sequence[date], bounds: Sequence[Bounds]) -> List[date]:
+    """Days of ``days`` that no existing partition range overlaps."""
+    missing = []
+    for day in days:
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+        if not any(lower < end and start < upper for lower, upper in bounds):
+            missing.append(day)
+    return missing
+
+
+def _relkind(conn: sa.Connection, schema: str, table: str) -> Optional[str]:
+    """``p`` for a partitioned table, ``r`` for a plain one, None if missing."""
+    return conn.execute(
+        sa.text("""
+            SELECT c.relkind
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :schema AND c.relname = :table
+        """),
+        {"schema": schema, "table": table},
+    ).scalar()
+
+
+def partition_bounds(conn: sa.Connection, schema: str, table: str) -> List[Bounds]:
+    """[lower, upper) range of every partition of ``schema.table``."""
+    rows = conn.execute(
+        sa.text(r"""
+            SELECT
+                substring(pg_get_expr(c.relpartbound, c.oid) FROM 'FROM \(''([^'']+)''\)'),
+                substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \(''([^'']+)''\)')
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            JOIN pg_namespace n ON n.oid = p.relnamespace
+            WHERE n.nspname = :schema AND p.relname = :table
+        """),
+        {"schema": schema, "table": table},
+    ).all()
+    return [
+        (datetime.fromisoformat(lower), datetime.fromisoformat(upper))
+        for lower, upper in rows
+        if lower is not None and upper is not None
+    ]
+
+
+def _partition_legacy_table(
+    conn: sa.Connection,
+    schema: str,
+    table: str,
+    key: str,
+    today: date,
+) -> None:
+    """Turn plain ``schema.table`` into a partitioned table, in place."""
+    legacy = f"{table}_legacy"
+    conn.execute(sa.text(f"LOCK TABLE {schema}.{table} IN ACCESS EXCLUSIVE MODE"))
+    dropped = conn.execute(
+        sa.text(f"DELETE FROM {schema}.{table} WHERE {key} IS NULL")
+    ).rowcount
+    if dropped:
+        logger.warning(
+            "Dropped %d rows of %s.%s without %s (no partition can hold them)",
+            dropped, schema, table, key,
+        )
+    first, last = conn.execute(
+        sa.text(f"SELECT min({key})::date, max({key})::date FROM {schema}.{table}")
+    ).one()
+
+    conn.execute(sa.text(f"ALTER TABLE {schema}.{table} RENAME TO {legacy}"))
+    conn.execute(sa.text(f"""
+        CREATE TABLE {schema}.{table} (LIKE {schema}.{legacy} INCLUDING DEFAULTS)
+        PARTITION BY RANGE ({key})
+    """))
+    if first is None:
+        conn.execute(sa.text(f"DROP TABLE {schema}.{legacy}"))
+        logger.info("Partitioned empty table %s.%s by day of %s", schema, table, key)
+        return
+
+    upper = max(today, last) + timedelta(days=1)
+    conn.execute(sa.text(f"""
+        ALTER TABLE {schema}.{table} ATTACH PARTITION {schema}.{legacy}
+        FOR VALUES FROM ('{first}') TO ('{upper}')
+    """))
+    logger.info(
+        "Partitioned %s.%s by day of %s; existing rows kept in %s [%s, %s)",
+        schema, table, key, legacy, first, upper,
+    )
+
+
+def ensure_partitioned_table(
+    engine: sa.Engine,
+    schema: str,
+    table: str,
+    columns: Optional[str] = None,
+    key: str = PARTITION_KEY,
+    premake_days: int = DEFAULT_PREMAKE_DAYS,
+    today: Optional[date] = None,
+) -> bool:
+    """Create or migrate ``schema.table`` and premake its daily partitions.
+
+    Args:
+        engine: SQLAlchemy engine.
+        schema: Table schema.
+        table: Table name.
+        columns: Column definitions (the body of ``CREATE TABLE (...)``)
+            used when the table is missing. Without them a missing table is
+            left to whoever creates it (e.g. the Meltano loader), and is
+            migrated on a later call.
+        key: Timestamp column to partition by.
+        premake_days: Daily partitions to create ahead of today.
+        today: Date to premake from; defaults to the current date.
+
+    Returns:
+        True if the table is partitioned, False if it does not exist yet.
+    """
+    today = today or date.today()
+    qualified = f"{schema}.{table}"
+    with engine.begin() as conn:
+        # Flows sharing a table (wind writes coalesced heat rows) must not
+        # race on creating the same partition.
+        conn.execute(
+            sa.text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+            {"key": f"partitions:{qualified}"},
+        )
+        conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+        relkind = _relkind(conn, schema, table)
+        if relkind is None:
+            if columns is None:
+                return False
+            conn.execute(sa.text(
+                f"CREATE TABLE {qualified} ({columns}) PARTITION BY RANGE ({key})"
+            ))
+        elif relkind == "r":
+            _partition_legacy_table(conn, schema, table, key, today)
+
+        days = missing_days(
+            days_to_premake(today, premake_days),
+            partition_bounds(conn, schema, table),
+        )
+        for day in days:
+            conn.execute(sa.text(f"""
+                CREATE TABLE {schema}.{partition_name(table, day)}
+                PARTITION OF {qualified}
+                FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')
+            """))
+        if days:
+            logger.info(
+                "Created %d daily partitions of %s (%s .. %s)",
+                len(days), qualified, days[0], days[-1],
+            )
+    return True
@@ -7,9 +7,12 @@ loads into Postgres raw schema, then runs dbt staging -> silver -> gold.
 Schedule: daily at 06:00 (new forecast available ~05:00 UTC).
 """
 
+import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from pathlib import Path
 from typing import Any, Dict
 
@@ -34,7 +37,19 @@ _flows_dir = str(Path(__file__).parent)
 if _flows_dir not in sys.path:
     sys.path.insert(0, _flows_dir)
 
-from features import build_gold_features
+from features import (
+    FEATURE_STATE_VERSION,
+    FEATURES,
+    SELECTED_FEATURES,
+    SELECTED_METERS_FEATURES,
+    build_gold_features_grouped,
+    build_gold_features_incremental,
+    build_gold_features_meters,
+    location_profile,
+)
+from pg_bulk import MergeStats, merge_dataframe, prepare_merge_target
+from pg_engines import get_engine, log_pool_stats
+from pg_partitions import ensure_partitioned_table
 
 logger = logging.getLogger(__name__)
 
@@ -68,8 +83,8 @@ def _load_config() -> Dict[str, Any]:
 # ---------------------------------------------------------------------------
 
 def _get_pg_engine(cfg: PipelineConfig) -> sa.Engine:
-    """Build SQLAlchemy engine from PipelineConfig."""
-    return sa.create_engine(
+    """Shared pooled SQLAlchemy engine for PipelineConfig."""
+    return get_engine(
         f"postgresql://{cfg.postgres_user}:{cfg.postgres_password}"
         f"@{cfg.postgres_host}:{cfg.postgres_port}/{cfg.postgres_db}"
     )
@@ -80,82 +95,190 @@ def _get_pg_engine(cfg: PipelineConfig) -> sa.Engine:
 # past they are replaced by ERA5 actuals. Re-processing the last 2 days ensures
 # gold features always reflect the most accurate silver values.
 _RECOMPUTE_WINDOW_HOURS: int = 48
-# Extra lookback added on top of the recompute window so that rolling-window
-# features (max window = 24 h) are computed with sufficient history.
-_ROLLING_BUFFER_HOURS: int = 24
-
-
-def _load_to_postgres(
+# Extra lookback added on top of the recompute window, so that rolling windows,
+# diffs and gap imputation see enough history (declared per feature in the
+# FEATURES registry). The main features resume from the checkpoint in
+# gold_state, which carries its own history.
+_METERS_LOOKBACK_HOURS: int = FEATURES.lookback_hours(SELECTED_METERS_FEATURES)
+# The multi-location features have no checkpoint; their lookback includes the
+# convergence span of the thermal_inertia_12h EWM.
+_LOCATIONS_LOOKBACK_HOURS: int = FEATURES.lookback_hours(SELECTED_FEATURES)
+
+# Conflict key of the location-keyed gold table; datetime first, the column
+# merge_dataframe's replace window applies to
+_LOCATION_KEY_COLS: tuple[str, ...] = ("datetime", "location_id")
+
+
+def _write_gold_rows(
+    conn: sa.Connection,
     df: pd.DataFrame,
-    cfg: PipelineConfig,
-    table_name: str,
     schema: str,
-    if_exists: str = "append",
-) -> int:
-    """Write weather DataFrame into Postgres.
-
-    Args:
-        df: DataFrame to write.
-        cfg: Pipeline configuration.
-        table_name: Target table name.
-        schema: Target schema name.
-        if_exists: How to behave if the table exists ('append' or 'replace').
+    table: str,
+    recompute_from: "pd.Timestamp | None" = None,
+    recompute_to: "pd.Timestamp | None" = None,
+) -> MergeStats:
+    """Merge gold rows into a raw gold table on an open connection.
+
+    The recompute window and the rows beyond it are written together by one
+    COPY + ``INSERT ... ON CONFLICT (datetime)``. Rows of the window
+    (``recompute_from`` to ``recompute_to``, the old max datetime) that are
+    not in ``df`` are deleted, so it ends up holding exactly the recomputed
+    rows.
     """
     df = df.copy()
     df["_sdc_extracted_at"] = pd.Timestamp.now()
+    window = (recompute_from, recompute_to) if recompute_from is not None else None
+    return merge_dataframe(conn, df, schema, table, key_cols=("datetime",), replace_window=window)
+
+
+def _recompute_rows(
+    gold_df: pd.DataFrame,
+    max_processed: "pd.Timestamp | None",
+    recomputed_from: "pd.Timestamp | None" = None,
+) -> "tuple[pd.DataFrame, pd.Timestamp | None]":
+    """Gold rows to write to one table, and the start of its replaced window.
+
+    Everything on a first run (``max_processed`` None). Otherwise the last
+    _RECOMPUTE_WINDOW_HOURS before ``max_processed`` are replaced, so hours
+    first stored from Open-Meteo forecasts are rewritten once ERA5 actuals
+    arrive, and later rows are appended. ``recomputed_from`` widens the
+    window to the first recomputed row (everything after a feature
+    checkpoint).
+    """
+    if max_processed is None:
+        return gold_df, None
+    recompute_from = max_processed - pd.Timedelta(hours=_RECOMPUTE_WINDOW_HOURS)
+    if recomputed_from is not None:
+        recompute_from = min(recompute_from, recomputed_from)
+    return gold_df[gold_df["datetime"] >= recompute_from], recompute_from
 
-    engine = _get_pg_engine(cfg)
 
+def _ensure_state_table(engine: sa.Engine, schema: str, table: str) -> None:
+    """Create the feature-state checkpoint table if it doesn't exist.
+
+    Args:
+        engine: SQLAlchemy engine.
+        schema: Target schema name.
+        table: Target table name.
+    """
     with engine.begin() as conn:
         conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
-        df.to_sql(
-            table_name, conn, schema=schema, if_exists=if_exists, index=False,
-        )
-
-    return len(df)
+        conn.execute(sa.text(f"""
+            CREATE TABLE IF NOT EXISTS {schema}.{table} (
+                feature_set        TEXT PRIMARY KEY,
+                checkpoint_at      TIMESTAMP NOT NULL,
+                state              JSONB NOT NULL,
+                _sdc_extracted_at  TIMESTAMP DEFAULT now()
+            )
+        """))
 
 
-def _upsert_gold_rows(
-    df: pd.DataFrame,
+def _load_feature_state(
     engine: sa.Engine,
     schema: str,
     table: str,
-    recompute_from: pd.Timestamp,
-    recompute_to: pd.Timestamp,
-) -> int:
-    """Delete stale gold rows in the recompute window, then re-insert fresh ones.
-
-    Args:
-        df: Recomputed gold rows for [recompute_from, recompute_to].
-        engine: SQLAlchemy engine.
-        schema: Target schema.
-        table: Target table name.
-        recompute_from: Start of the recompute window (inclusive).
-        recompute_to: End of the recompute window (inclusive, = old max_processed).
+    feature_set: str,
+) -> "dict | None":
+    """Return the saved feature-state checkpoint, or None if absent or stale.
 
-    Returns:
-        Number of rows inserted.
+    A checkpoint written by another FEATURE_STATE_VERSION is treated as absent,
+    so the next run re-seeds it from a full silver read.
     """
-    df = df.copy()
-    df["_sdc_extracted_at"] = pd.Timestamp.now()
-
-    with engine.begin() as conn:
-        conn.execute(
-            sa.text(
-                f"DELETE FROM {schema}.{table}"
-                f" WHERE datetime >= :start AND datetime <= :end"
-            ),
-            {"start": recompute_from, "end": recompute_to},
+    with engine.connect() as conn:
+        row = conn.execute(
+            sa.text(f"SELECT state FROM {schema}.{table} WHERE feature_set = :fs"),
+            {"fs": feature_set},
+        ).first()
+    if row is None:
+        return None
+    state = row[0] if isinstance(row[0], dict) else json.loads(row[0])
+    if state.get("version") != FEATURE_STATE_VERSION:
+        logger.warning(
+            "Discarding %s feature state (version %s != %s)",
+            feature_set, state.get("version"), FEATURE_STATE_VERSION,
         )
-        df.to_sql(table, conn, schema=schema, if_exists="append", index=False)
+        return None
+    return state
 
-    return len(df)
+
+def _save_feature_state(
+    conn: sa.Connection,
+    schema: str,
+    table: str,
+    feature_set: str,
+    state: dict,
+) -> None:
+    """Upsert the feature-state checkpoint for ``feature_set`` inside the caller's transaction."""
+    conn.execute(
+        sa.text(f"""
+            INSERT INTO {schema}.{table} (feature_set, checkpoint_at, state, _sdc_extracted_at)
+            VALUES (:fs, :checkpoint_at, CAST(:state AS JSONB), now())
+            ON CONFLICT (feature_set) DO UPDATE
+            SET checkpoint_at = EXCLUDED.checkpoint_at,
+                state = EXCLUDED.state,
+                _sdc_extracted_at = EXCLUDED._sdc_extracted_at
+        """),
+        {
+            "fs": feature_set,
+            "checkpoint_at": pd.Timestamp(state["checkpoint_at"]),
+            "state": json.dumps(state),
+        },
+    )
 
 
 # ---------------------------------------------------------------------------
 # Prefect tasks
 # ---------------------------------------------------------------------------
 
+@task(name="Prepare raw partitions", retries=2, retry_delay_seconds=30)
+def prepare_raw_partitions(cfg: PipelineConfig) -> PipelineTaskResult:
+    """Partition the Meltano raw table by day and premake the coming days.
+
+    The table only exists after the first import; until then there is
+    nothing to prepare and target-postgres creates it as a plain table.
+    """
+    raw_cfg = _load_config()["raw"]
+    partitioned = ensure_partitioned_table(
+        _get_pg_engine(cfg), raw_cfg["schema"], raw_cfg["table"],
+    )
+    return PipelineTaskResult(
+        status="success",
+        command="prepare_raw_partitions",
+        details={"partitioned": partitioned},
+    )
+
+
+@task(name="Prepare gold tables", retries=2, retry_delay_seconds=30)
+def prepare_gold_tables(cfg: PipelineConfig) -> PipelineTaskResult:
+    """Dedupe the raw gold tables and add the unique keys the merges need.
+
+    Tables written by ``to_sql`` appends before the merge writer existed may
+    hold duplicate keys, on which the first merge would fail. Once a table
+    has its unique index this is a no-op; tables not created yet are left
+    to the first merge.
+    """
+    run_logger = get_run_logger()
+    om_cfg = _load_config()
+    targets = [
+        (om_cfg["gold_raw"], ("datetime",)),
+        (om_cfg["gold_raw_meters"], ("datetime",)),
+        (om_cfg["gold_raw_locations"], _LOCATION_KEY_COLS),
+    ]
+    deleted = {}
+    with _get_pg_engine(cfg).begin() as conn:
+        for table_cfg, key_cols in targets:
+            deleted[table_cfg["table"]] = prepare_merge_target(
+                conn, table_cfg["schema"], table_cfg["table"], key_cols,
+            )
+    if any(deleted.values()):
+        run_logger.warning("Deleted duplicate-key gold rows: %s", deleted)
+    return PipelineTaskResult(
+        status="success",
+        command="prepare_gold_tables",
+        details={"duplicates_deleted": deleted},
+    )
+
+
 @task(name="Import raw data", retries=1, retry_delay_seconds=180)
 def import_raw_data(cfg: PipelineConfig) -> PipelineTaskResult:
     """Extract weather data via tap-openmeteo and load into Postgres raw."""
@@ -164,7 +287,7 @@ def import_raw_data(cfg: PipelineConfig) -> PipelineTaskResult:
 
 @task(name="Cleanup old data", retries=3, retry_delay_seconds=60)
 def cleanup_old_data(cfg: PipelineConfig) -> PipelineTaskResult:
-    """Delete old raw records beyond retention period."""
+    """Drop raw partitions beyond the retention period."""
     return dbt_run_operation("cleanup_om_weather", {}, cfg)
 
 
@@ -185,41 +308,122 @@ def _get_max_processed_datetime(
         return None
 
 
-@task(name="Compute Gold Features")
-def compute_gold_features_task(cfg: PipelineConfig) -> PipelineTaskResult:
-    """Read new silver weather rows, compute 29 ML features, upsert to raw gold table.
+def _get_max_processed_by_location(
+    engine: sa.Engine,
+    schema: str,
+    table: str,
+) -> Dict[str, pd.Timestamp]:
+    """Return the max datetime per location_id in a location-keyed raw gold table."""
+    try:
+        result = pd.read_sql(
+            f"SELECT location_id, MAX(datetime) AS max_dt FROM {schema}.{table}"
+            f" GROUP BY location_id",
+            engine,
+        )
+    except Exception:
+        return {}
+    return dict(zip(result["location_id"], result["max_dt"]))
 
-    On every incremental run the last _RECOMPUTE_WINDOW_HOURS (48 h) of gold rows
-    are deleted and recomputed from the latest silver values, so that hours that were
-    initially stored as Open-Meteo forecast data are updated once ERA5 actuals arrive.
-    Rows beyond max_processed are appended as new.
+
+def _merge_location_rows(
+    df: pd.DataFrame,
+    engine: sa.Engine,
+    schema: str,
+    table: str,
+    max_processed: Dict[str, pd.Timestamp],
+) -> MergeStats:
+    """Merge recomputed location gold rows atomically (COPY + ON CONFLICT).
+
+    Every location with gold rows is rewritten from the earliest recompute
+    start (``_RECOMPUTE_WINDOW_HOURS`` before its max datetime) onwards; the
+    silver read covers that start plus the feature lookback for all of them.
+    Locations without gold rows get their full history.
+
+    Args:
+        df: Recomputed gold rows (location_id, datetime, features).
+        engine: SQLAlchemy engine.
+        schema: Target schema.
+        table: Target table name.
+        max_processed: Per location_id, the max datetime already stored.
+
+    Returns:
+        MergeStats with row counts and timings.
+    """
+    window = None
+    if max_processed:
+        window = (
+            min(max_processed.values()) - pd.Timedelta(hours=_RECOMPUTE_WINDOW_HOURS),
+            max(max_processed.values()),
+        )
+        known = df["location_id"].isin(list(max_processed))
+        df = df[~known | (df["datetime"] >= window[0])]
+    df = df.copy()
+    df["_sdc_extracted_at"] = pd.Timestamp.now()
+
+    with engine.begin() as conn:
+        return merge_dataframe(
+            conn, df, schema, table, key_cols=_LOCATION_KEY_COLS, replace_window=window,
+        )
+
+
+@task(name="Compute Gold Features Shared")
+def compute_gold_features_shared_task(cfg: PipelineConfig) -> PipelineTaskResult:
+    """Compute the 29 ML features and the meters/PV features from one silver read.
+
+    On every incremental run the last _RECOMPUTE_WINDOW_HOURS (48 h) of both
+    raw gold tables are recomputed from the latest silver values and rows
+    beyond them appended (see ``_recompute_rows``).
+
+    The main features resume from the checkpoint in ``gold_state`` (taken
+    _RECOMPUTE_WINDOW_HOURS before the newest silver row), so only silver
+    rows after it are needed and rolling/EWM features match a full
+    recompute exactly; the meters features need the recompute window plus
+    their registry lookback. Silver is read once over the union of the two
+    windows (all of it when either table has no gold rows or checkpoint
+    yet), both builders run in parallel threads on that frame, and both
+    tables plus the new checkpoint are written in a single transaction.
     """
     run_logger = get_run_logger()
     om_cfg = _load_config()
 
     silver = om_cfg["silver"]
     gold_raw = om_cfg["gold_raw"]
+    gold_raw_meters = om_cfg["gold_raw_meters"]
+    gold_state = om_cfg["gold_state"]
     engine = _get_pg_engine(cfg)
+    _ensure_state_table(engine, gold_state["schema"], gold_state["table"])
 
     max_processed = _get_max_processed_datetime(
         engine, gold_raw["schema"], gold_raw["table"]
     )
+    state = None
+    if max_processed is not None:
+        state = _load_feature_state(
+            engine, gold_state["schema"], gold_state["table"], gold_raw["table"],
+        )
+    max_processed_meters = _get_max_processed_datetime(
+        engine, gold_raw_meters["schema"], gold_raw_meters["table"]
+    )
 
-    if max_processed is None:
+    # Main features: rows after the checkpoint; meters: from its lookback cutoff
+    checkpoint = pd.Timestamp(state["checkpoint_at"]) if state is not None else None
+    meters_cutoff = None
+    if max_processed_meters is not None:
+        meters_cutoff = max_processed_meters - pd.Timedelta(
+            hours=_RECOMPUTE_WINDOW_HOURS + _METERS_LOOKBACK_HOURS
+        )
+
+    if checkpoint is None or meters_cutoff is None:
         run_logger.info(
-            "First run — reading all silver data from %s.%s",
-            silver["schema"], silver["table"],
+            "Reading all silver data from %s.%s (main checkpoint=%s, meters max_processed=%s)",
+            silver["schema"], silver["table"], checkpoint, max_processed_meters,
         )
         silver_df = pd.read_sql_table(silver["table"], engine, schema=silver["schema"])
     else:
-        # Lookback = recompute window + rolling-window buffer
-        cutoff = max_processed - pd.Timedelta(
-            hours=_RECOMPUTE_WINDOW_HOURS + _ROLLING_BUFFER_HOURS
-        )
+        cutoff = min(checkpoint, meters_cutoff)
         run_logger.info(
-            "Incremental run — reading silver from %s "
-            "(max_processed=%s, recompute_window=%dh)",
-            cutoff, max_processed, _RECOMPUTE_WINDOW_HOURS,
+            "Incremental run — reading silver from %s (checkpoint=%s, meters cutoff=%s)",
+            cutoff, checkpoint, meters_cutoff,
         )
         silver_df = pd.read_sql(
             f"SELECT * FROM {silver['schema']}.{silver['table']} "
@@ -229,95 +433,111 @@ def compute_gold_features_task(cfg: PipelineConfig) -> PipelineTaskResult:
         )
 
     if silver_df.empty:
-        run_logger.warning("Silver table is empty, skipping gold features")
-        return PipelineTaskResult(status="skipped", command="compute_gold_features")
+        run_logger.warning("No silver rows to process, skipping gold features")
+        return PipelineTaskResult(status="skipped", command="compute_gold_features_shared")
 
-    run_logger.info("Computing gold features for %d silver rows", len(silver_df))
-    gold_df = build_gold_features(silver_df, impute_missing=True)
+    silver_dt = pd.to_datetime(silver_df["datetime"])
+    main_df = silver_df if checkpoint is None else silver_df[silver_dt > checkpoint]
+    meters_df = silver_df if meters_cutoff is None else silver_df[silver_dt >= meters_cutoff]
+    checkpoint_at = silver_dt.max() - pd.Timedelta(hours=_RECOMPUTE_WINDOW_HOURS)
 
-    if max_processed is None:
-        rows = _load_to_postgres(
-            gold_df, cfg, gold_raw["table"], gold_raw["schema"], if_exists="append",
-        )
-        run_logger.info(
-            "Appended %d gold feature rows into %s.%s (first run)",
-            rows, gold_raw["schema"], gold_raw["table"],
-        )
-    else:
-        recompute_from = max_processed - pd.Timedelta(hours=_RECOMPUTE_WINDOW_HOURS)
-
-        # Rows in the recompute window: delete stale values, re-insert with fresh silver
-        recompute_df = gold_df[
-            (gold_df["datetime"] >= recompute_from)
-            & (gold_df["datetime"] <= max_processed)
-        ]
-        # Rows beyond max_processed: plain append
-        new_df = gold_df[gold_df["datetime"] > max_processed]
-
-        updated = 0
-        if not recompute_df.empty:
-            updated = _upsert_gold_rows(
-                recompute_df, engine,
-                gold_raw["schema"], gold_raw["table"],
-                recompute_from, max_processed,
+    run_logger.info(
+        "Computing gold features for %d silver rows (main %d, meters %d)",
+        len(silver_df), len(main_df), len(meters_df),
+    )
+    gold_df, new_state, meters_gold_df = None, None, None
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        main_future = None
+        if not main_df.empty:
+            main_future = pool.submit(
+                build_gold_features_incremental,
+                main_df, state=state, checkpoint_at=checkpoint_at, impute_missing=True,
             )
-            run_logger.info(
-                "Re-inserted %d gold rows for recompute window [%s, %s]",
-                updated, recompute_from, max_processed,
+        meters_future = None
+        if not meters_df.empty:
+            meters_future = pool.submit(
+                build_gold_features_meters, meters_df, impute_missing=True,
             )
+        if main_future is not None:
+            gold_df, new_state = main_future.result()
+        if meters_future is not None:
+            meters_gold_df = meters_future.result()
+
+    writes = []
+    if gold_df is not None:
+        # With a checkpoint, everything after it was recomputed
+        gold_df, recompute_from = _recompute_rows(
+            gold_df, max_processed,
+            gold_df["datetime"].min() if state is not None else None,
+        )
+        writes.append((gold_raw, gold_df, recompute_from, max_processed))
+    if meters_gold_df is not None:
+        meters_gold_df, recompute_from = _recompute_rows(meters_gold_df, max_processed_meters)
+        writes.append((gold_raw_meters, meters_gold_df, recompute_from, max_processed_meters))
 
-        appended = 0
-        if not new_df.empty:
-            appended = _load_to_postgres(
-                new_df, cfg, gold_raw["table"], gold_raw["schema"], if_exists="append",
+    rows = 0
+    with engine.begin() as conn:
+        for target, df, recompute_from, recompute_to in writes:
+            stats = _write_gold_rows(
+                conn, df, target["schema"], target["table"], recompute_from, recompute_to,
             )
-            run_logger.info(
-                "Appended %d new gold feature rows into %s.%s",
-                appended, gold_raw["schema"], gold_raw["table"],
+            run_logger.info("Merged gold rows (recompute from %s): %s", recompute_from, stats)
+            rows += stats.rows_merged + stats.rows_deleted
+        if new_state is not None and new_state is not state:
+            _save_feature_state(
+                conn, gold_state["schema"], gold_state["table"], gold_raw["table"], new_state,
             )
+            run_logger.info("Saved feature checkpoint at %s", new_state["checkpoint_at"])
 
-        if updated == 0 and appended == 0:
-            run_logger.info("No rows to update or append — gold features are up to date")
-            return PipelineTaskResult(status="skipped", command="compute_gold_features")
+    if rows == 0:
+        run_logger.info("No rows to update or append — gold features are up to date")
+        return PipelineTaskResult(status="skipped", command="compute_gold_features_shared")
 
-    return PipelineTaskResult(status="success", command="compute_gold_features")
+    return PipelineTaskResult(status="success", command="compute_gold_features_shared")
 
 
-@task(name="Compute Gold Features Meters")
-def compute_gold_features_meters_task(cfg: PipelineConfig) -> PipelineTaskResult:
-    """Read new silver weather rows, compute 15 meters/PV features, upsert to raw gold table.
+@task(name="Compute Gold Features Locations")
+def compute_gold_features_locations_task(cfg: PipelineConfig) -> PipelineTaskResult:
+    """Compute the 29 ML features for every configured location, keyed by location_id.
 
-    Same recompute-window strategy as compute_gold_features_task: the last
-    _RECOMPUTE_WINDOW_HOURS (48 h) of rows are deleted and re-inserted from the
-    latest silver so that forecast values are replaced by ERA5 actuals over time.
+    Reads the location-keyed silver table once and builds all locations in a
+    single grouped pass. The rows from _RECOMPUTE_WINDOW_HOURS before the
+    oldest location's max datetime are merged in on (datetime, location_id)
+    in one transaction; locations without gold rows yet get their full history.
     """
-    from features import build_gold_features_meters
-
     run_logger = get_run_logger()
     om_cfg = _load_config()
 
-    silver = om_cfg["silver"]
-    gold_raw_meters = om_cfg["gold_raw_meters"]
+    silver = om_cfg["silver_locations"]
+    gold_raw = om_cfg["gold_raw_locations"]
+    locations = om_cfg["locations"]
     engine = _get_pg_engine(cfg)
 
-    max_processed = _get_max_processed_datetime(
-        engine, gold_raw_meters["schema"], gold_raw_meters["table"]
-    )
+    location_ids = {loc["location_name"]: loc["location_id"] for loc in locations}
+    # Raises for a configured location without a profile in features.py
+    profiles = {}
+    for loc in locations:
+        profile = location_profile(loc["location_id"])
+        if loc.get("climate"):
+            profile = replace(profile, climate=loc["climate"])
+        profiles[loc["location_id"]] = profile
 
-    if max_processed is None:
+    max_processed = _get_max_processed_by_location(
+        engine, gold_raw["schema"], gold_raw["table"]
+    )
+    if set(location_ids.values()) - set(max_processed):
         run_logger.info(
-            "First run — reading all silver data from %s.%s",
+            "Locations without gold rows — reading all silver data from %s.%s",
             silver["schema"], silver["table"],
         )
         silver_df = pd.read_sql_table(silver["table"], engine, schema=silver["schema"])
     else:
-        cutoff = max_processed - pd.Timedelta(
-            hours=_RECOMPUTE_WINDOW_HOURS + _ROLLING_BUFFER_HOURS
+        cutoff = min(max_processed.values()) - pd.Timedelta(
+            hours=_RECOMPUTE_WINDOW_HOURS + _LOCATIONS_LOOKBACK_HOURS
         )
         run_logger.info(
-            "Incremental run — reading silver from %s "
-            "(max_processed=%s, recompute_window=%dh)",
-            cutoff, max_processed, _RECOMPUTE_WINDOW_HOURS,
+            "Incremental run — reading silver from %s for %d locations",
+            cutoff, len(location_ids),
         )
         silver_df = pd.read_sql(
             f"SELECT * FROM {silver['schema']}.{silver['table']} "
@@ -326,63 +546,33 @@ def compute_gold_features_meters_task(cfg: PipelineConfig) -> PipelineTaskResult
             params={"cutoff": cutoff},
         )
 
-    if silver_df.empty:
-        run_logger.warning("Silver table is empty, skipping meters gold features")
-        return PipelineTaskResult(status="skipped", command="compute_gold_features_meters")
-
-    run_logger.info("Computing meters gold features for %d silver rows", len(silver_df))
-    gold_df = build_gold_features_meters(silver_df, impute_missing=True)
+    silver_df["location_id"] = silver_df["location_name"].map(location_ids)
+    unknown = silver_df.loc[silver_df["location_id"].isna(), "location_name"].unique()
+    if len(unknown):
+        run_logger.warning("Skipping silver rows of unconfigured locations: %s", list(unknown))
+        silver_df = silver_df[silver_df["location_id"].notna()]
 
-    if max_processed is None:
-        rows = _load_to_postgres(
-            gold_df, cfg, gold_raw_meters["table"], gold_raw_meters["schema"],
-            if_exists="append",
-        )
-        run_logger.info(
-            "Appended %d meters gold feature rows into %s.%s (first run)",
-            rows, gold_raw_meters["schema"], gold_raw_meters["table"],
-        )
-    else:
-        recompute_from = max_processed - pd.Timedelta(hours=_RECOMPUTE_WINDOW_HOURS)
-
-        recompute_df = gold_df[
-            (gold_df["datetime"] >= recompute_from)
-            & (gold_df["datetime"] <= max_processed)
-        ]
-        new_df = gold_df[gold_df["datetime"] > max_processed]
-
-        updated = 0
-        if not recompute_df.empty:
-            updated = _upsert_gold_rows(
-                recompute_df, engine,
-                gold_raw_meters["schema"], gold_raw_meters["table"],
-                recompute_from, max_processed,
-            )
-            run_logger.info(
-                "Re-inserted %d meters gold rows for recompute window [%s, %s]",
-                updated, recompute_from, max_processed,
-            )
+    if silver_df.empty:
+        run_logger.warning("No silver rows to process, skipping location gold features")
+        return PipelineTaskResult(status="skipped", command="compute_gold_features_locations")
 
-        appended = 0
-        if not new_df.empty:
-            appended = _load_to_postgres(
-                new_df, cfg, gold_raw_meters["table"], gold_raw_meters["schema"],
-                if_exists="append",
-            )
-            run_logger.info(
-                "Appended %d new meters gold feature rows into %s.%s",
-                appended, gold_raw_meters["schema"], gold_raw_meters["table"],
-            )
+    run_logger.info(
+        "Computing gold features for %d silver rows (%d locations)",
+        len(silver_df), silver_df["location_id"].nunique(),
+    )
+    gold_df = build_gold_features_grouped(silver_df, profiles=profiles, impute_missing=True)
 
-        if updated == 0 and appended == 0:
-            run_logger.info(
-                "No rows to update or append — meters gold features are up to date"
-            )
-            return PipelineTaskResult(
-                status="skipped", command="compute_gold_features_meters"
-            )
+    stats = _merge_location_rows(
+        gold_df, engine, gold_raw["schema"], gold_raw["table"], max_processed,
+    )
+    run_logger.info(
+        "Merged location gold features into %s.%s: %s",
+        gold_raw["schema"], gold_raw["table"], stats,
+    )
+    if stats.rows_merged == 0 and stats.rows_deleted == 0:
+        return PipelineTaskResult(status="skipped", command="compute_gold_features_locations")
 
-    return PipelineTaskResult(status="success", command="compute_gold_features_meters")
+    return PipelineTaskResult(status="success", command="compute_gold_features_locations")
 
 
 @task(name="Transform Staging Layer")
@@ -421,6 +611,7 @@ def om_flow(config: Dict[str, Any] | None = None) -> dict:
     result: dict = {"status": "success"}
 
     # --- Extract + Load (via Meltano tap-openmeteo) ---
+    result["partitions"] = prepare_raw_partitions(cfg)
     result["import"] = import_raw_data(cfg)
 
     # --- Cleanup old raw records ---
@@ -431,13 +622,15 @@ def om_flow(config: Dict[str, Any] | None = None) -> dict:
     result["silver"] = transform_silver_task(cfg)
 
     # --- Gold features (Python compute + dbt model) ---
-    result["gold_compute"] = compute_gold_features_task(cfg)
-    result["gold_meters_compute"] = compute_gold_features_meters_task(cfg)
+    result["gold_tables"] = prepare_gold_tables(cfg)
+    result["gold_compute"] = compute_gold_features_shared_task(cfg)
+    result["gold_locations_compute"] = compute_gold_features_locations_task(cfg)
     result["gold_transform"] = transform_gold_task(cfg)
 
     # --- Tests (covers all layers) ---
     result["tests"] = run_dbt_tests_task(cfg)
 
+    log_pool_stats()
     return result
 
 
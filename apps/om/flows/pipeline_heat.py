@@ -1,7 +1,7 @@
 """Open-Meteo heat pipeline: API extraction + dbt transforms for Trentino.
 
 Fetches daily max temperature for a 4.4 km grid covering the entire
-Trentino region (~1064 grid points). Uses ICON-D2 model via Open-Meteo API.
+Trentino region (~609 grid points). Uses ICON-D2 model via Open-Meteo API.
 Includes elevation from API response for altitude-band classification.
 
 Schedule: 2x/day (06:00, 18:00).
@@ -9,13 +9,12 @@ Schedule: 2x/day (06:00, 18:00).
 
 import logging
 import os
-import time
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-import requests
 import sqlalchemy as sa
 import yaml
 from prefect import flow, task
@@ -29,7 +28,14 @@ from celine.utils.pipelines.pipeline import (
     dbt_run_operation,
 )
 
-from api_retry import post_with_retry
+from api_retry import log_request_metrics
+from grid import bbox_point_count, build_grid
+from om_fetch import DEFAULT_MAX_CONCURRENCY
+from om_plan import RequestSpec, fetch_specs
+from pg_bulk import copy_dataframe
+from pg_engines import get_engine
+from pg_partitions import ensure_partitioned_table
+from quota import QuotaLedger
 
 logger = logging.getLogger(__name__)
 
@@ -55,47 +61,13 @@ def _load_heat_config() -> Dict[str, Any]:
         return yaml.safe_load(fh)
 
 
-# ---------------------------------------------------------------------------
-# Grid generation
-# ---------------------------------------------------------------------------
-
-def _generate_grid(
-    lat_min: float,
-    lat_max: float,
-    lon_min: float,
-    lon_max: float,
-    spacing: float,
-) -> List[Tuple[float, float]]:
-    """Generate a regular lat/lon grid for the Trentino region.
-
-    Args:
-        lat_min: Southern boundary latitude.
-        lat_max: Northern boundary latitude.
-        lon_min: Western boundary longitude.
-        lon_max: Eastern boundary longitude.
-        spacing: Grid spacing in degrees.
-
-    Returns:
-        List of (lat, lon) tuples covering the bounding box.
-    """
-    lats = np.arange(lat_min, lat_max + spacing / 2, spacing)
-    lons = np.arange(lon_min, lon_max + spacing / 2, spacing)
-
-    grid = [
-        (round(float(lat), 4), round(float(lon), 4))
-        for lat in lats
-        for lon in lons
-    ]
-    return grid
-
-
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
 def _get_pg_engine(cfg: PipelineConfig) -> sa.Engine:
-    """Build SQLAlchemy engine from PipelineConfig."""
-    return sa.create_engine(
+    """Shared pooled SQLAlchemy engine for PipelineConfig."""
+    return get_engine(
         f"postgresql://{cfg.postgres_user}:{cfg.postgres_password}"
         f"@{cfg.postgres_host}:{cfg.postgres_port}/{cfg.postgres_db}"
     )
@@ -104,24 +76,28 @@ def _get_pg_engine(cfg: PipelineConfig) -> sa.Engine:
 def _ensure_raw_table(engine: sa.Engine, schema: str, table: str) -> None:
     """Create the raw heat table if it doesn't exist.
 
+    Partitioned by extraction day like the other raw tables (pg_partitions.py).
+
     Args:
         engine: SQLAlchemy engine.
         schema: Target schema name.
         table: Target table name.
     """
+    ensure_partitioned_table(engine, schema, table, columns="""
+        date               DATE NOT NULL,
+        lat                DOUBLE PRECISION NOT NULL,
+        lon                DOUBLE PRECISION NOT NULL,
+        temperature_2m_max DOUBLE PRECISION,
+        elevation          DOUBLE PRECISION,
+        model              TEXT,
+        quota_fraction     DOUBLE PRECISION,
+        _sdc_extracted_at  TIMESTAMP DEFAULT now()
+    """)
+    # Tables created before extractions recorded their quota share
     with engine.begin() as conn:
-        conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
-        conn.execute(sa.text(f"""
-            CREATE TABLE IF NOT EXISTS {schema}.{table} (
-                date               DATE NOT NULL,
-                lat                DOUBLE PRECISION NOT NULL,
-                lon                DOUBLE PRECISION NOT NULL,
-                temperature_2m_max DOUBLE PRECISION,
-                elevation          DOUBLE PRECISION,
-                model              TEXT,
-                _sdc_extracted_at  TIMESTAMP DEFAULT now()
-            )
-        """))
+        conn.execute(sa.text(
+            f"ALTER TABLE {schema}.{table} ADD COLUMN IF NOT EXISTS quota_fraction DOUBLE PRECISION"
+        ))
 
 
 def _load_to_postgres(
@@ -145,101 +121,128 @@ def _load_to_postgres(
     df["_sdc_extracted_at"] = pd.Timestamp.now()
 
     with engine.begin() as conn:
-        df.to_sql(
-            table_name, conn, schema=schema, if_exists="append", index=False,
-        )
-
-    return len(df)
+        return copy_dataframe(conn, df, schema, table_name)
 
 
 # ---------------------------------------------------------------------------
 # Open-Meteo API
 # ---------------------------------------------------------------------------
 
+def heat_request_spec(
+    grid: List[Tuple[float, float]],
+    heat_cfg: Dict[str, Any],
+) -> RequestSpec:
+    """What the heat pipeline needs from Open-Meteo (see om_plan.py).
+
+    The wind pipeline plans this spec together with its own on the runs
+    listed in its ``coalesce.heat`` config, so both share one request.
+    """
+    api_cfg = heat_cfg["api"]
+    return RequestSpec(
+        name="heat",
+        section="daily",
+        variables=tuple(api_cfg["variables"]),
+        points=tuple(grid),
+        model=api_cfg.get("model"),
+        params={
+            "forecast_days": str(api_cfg["forecast_days"]),
+            "past_days": str(api_cfg["past_days"]),
+            "timezone": api_cfg["timezone"],
+        },
+        n_days=api_cfg["forecast_days"] + api_cfg["past_days"],
+        time_col="date",
+        location_fields=("elevation",),
+    )
+
+
+def finish_heat_frame(df: pd.DataFrame, today: date) -> pd.DataFrame:
+    """Tag decoded heat rows with their forecast model, plain dates and quota share.
+
+    ICON-D2 covers ~48h, so dates within 2 days of ``today`` use high-res
+    data, dates beyond that use longer-range models (GFS/ECMWF) via
+    best_match. ``quota_fraction`` (from ``fetch_specs``) is below 1.0 when
+    the grid was subsampled to the daily quota.
+    """
+    df["quota_fraction"] = df.attrs.get("quota_fraction", 1.0)
+    days_ahead = (df["date"] - pd.Timestamp(today)).dt.days
+    df["model"] = np.where(days_ahead <= 1, "icon_d2", "best_match_extended")
+    df["date"] = df["date"].dt.date
+    return df
+
+
 def _fetch_heat_data(
     grid: List[Tuple[float, float]],
     heat_cfg: Dict[str, Any],
+    ledger: Optional[QuotaLedger] = None,
 ) -> pd.DataFrame:
     """Fetch daily max temperature from Open-Meteo API for all grid points.
 
     Uses POST with form-encoded body to avoid GET URL length limits and
     per-location rate limiting. Batches into chunks of max_points_per_call
-    to stay under the POST payload size limit (~1000 points).
+    to stay under the POST payload size limit (~1000 points); batches run
+    concurrently within the shared Open-Meteo rate-limit budget.
 
     Args:
         grid: List of (lat, lon) tuples.
         heat_cfg: Heat pipeline configuration dict.
+        ledger: Optional daily quota ledger (pre-flight budget check).
 
     Returns:
         DataFrame with columns: date, lat, lon,
         temperature_2m_max, elevation, model.
 
     Raises:
-        requests.HTTPError: If the Open-Meteo API returns an error.
+        httpx.HTTPStatusError: If the Open-Meteo API returns an error.
+        DailyLimitExceeded: If the daily quota cannot cover the run.
     """
     api_cfg = heat_cfg["api"]
-    max_per_call = api_cfg["max_points_per_call"]
-    all_frames: List[pd.DataFrame] = []
-
-    for batch_idx, batch_start in enumerate(range(0, len(grid), max_per_call)):
-        if batch_idx > 0:
-            time.sleep(70)  # Open-Meteo per-minute limit; 70 s gives margin
-
-        batch = grid[batch_start:batch_start + max_per_call]
-        lats = ",".join(str(point[0]) for point in batch)
-        lons = ",".join(str(point[1]) for point in batch)
-
-        post_data = {
-                "latitude": lats,
-                "longitude": lons,
-                "daily": ",".join(api_cfg["variables"]),
-                "forecast_days": str(api_cfg["forecast_days"]),
-                "past_days": str(api_cfg["past_days"]),
-                "timezone": api_cfg["timezone"],
-            }
-        model_name = api_cfg.get("model")
-        if model_name:
-            post_data["models"] = model_name
-
-        response = post_with_retry(
-            api_cfg["base_url"],
-            data=post_data,
-            timeout=120,
-        )
-
-        data = response.json()
-
-        # Single location returns a dict; multiple returns a list
-        if isinstance(data, dict):
-            data = [data]
-
-        # Tag rows with forecast model based on proximity to extraction time.
-        # ICON-D2 covers ~48h, so dates within 2 days of today use high-res data,
-        # dates beyond that use longer-range models (GFS/ECMWF) via best_match.
-        today = pd.Timestamp.now(tz="Europe/Rome").normalize().date()
-
-        for location_data in data:
-            location_lat = location_data["latitude"]
-            location_lon = location_data["longitude"]
-            location_elevation = location_data.get("elevation", None)
-            daily = location_data["daily"]
-
-            dates = [pd.Timestamp(ts).date() for ts in daily["time"]]
-            forecast_models = [
-                "icon_d2" if (d - today).days <= 1 else "best_match_extended"
-                for d in dates
-            ]
-            location_df = pd.DataFrame({
-                "date": dates,
-                "lat": location_lat,
-                "lon": location_lon,
-                "temperature_2m_max": daily["temperature_2m_max"],
-                "elevation": location_elevation,
-                "model": forecast_models,
-            })
-            all_frames.append(location_df)
-
-    return pd.concat(all_frames, ignore_index=True)
+    today = pd.Timestamp.now(tz="Europe/Rome").normalize().date()
+    frames = fetch_specs(
+        api_cfg["base_url"],
+        [heat_request_spec(grid, heat_cfg)],
+        max_points_per_call=api_cfg["max_points_per_call"],
+        max_concurrency=api_cfg.get("max_concurrent_requests", DEFAULT_MAX_CONCURRENCY),
+        timeout=120,
+        ledger=ledger,
+    )
+    return finish_heat_frame(frames["heat"], today)
+
+
+def store_heat_extraction(
+    engine: sa.Engine,
+    heat_cfg: Dict[str, Any],
+    heat_df: pd.DataFrame,
+) -> int:
+    """Create the raw heat table if needed and load one extraction into it.
+
+    Returns:
+        Number of rows written.
+    """
+    raw_cfg = heat_cfg["raw"]
+    _ensure_raw_table(engine, raw_cfg["schema"], raw_cfg["table"])
+    return _load_to_postgres(heat_df, engine, raw_cfg["table"], raw_cfg["schema"])
+
+
+def _latest_extraction(
+    engine: sa.Engine,
+    schema: str,
+    table: str,
+) -> Optional[Tuple[pd.Timestamp, float]]:
+    """Most recent ``_sdc_extracted_at`` in the raw table and its quota share.
+
+    Rows written before ``quota_fraction`` was recorded count as complete.
+
+    Returns:
+        Tuple of (extraction time, quota fraction), or None if empty.
+    """
+    with engine.connect() as conn:
+        latest = conn.execute(sa.text(
+            f"SELECT _sdc_extracted_at, min(coalesce(quota_fraction, 1.0)) "
+            f"FROM {schema}.{table} "
+            f"WHERE _sdc_extracted_at = (SELECT max(_sdc_extracted_at) FROM {schema}.{table}) "
+            f"GROUP BY _sdc_extracted_at"
+        )).first()
+    return (pd.Timestamp(latest[0]), float(latest[1])) if latest is not None else None
 
 
 # ---------------------------------------------------------------------------
@@ -255,24 +258,45 @@ def extract_heat_data(cfg: PipelineConfig) -> PipelineTaskResult:
     grid_cfg = heat_cfg["grid"]
     raw_cfg = heat_cfg["raw"]
 
-    grid = _generate_grid(
-        lat_min=grid_cfg["lat_min"],
-        lat_max=grid_cfg["lat_max"],
-        lon_min=grid_cfg["lon_min"],
-        lon_max=grid_cfg["lon_max"],
-        spacing=grid_cfg["spacing_deg"],
-    )
+    grid = build_grid(grid_cfg)
+    bbox_points = bbox_point_count(grid_cfg)
     run_logger.info(
-        "Generated grid: %d points (%.1f km spacing)",
+        "Grid: %d points (%.1f km spacing), %d of %d bbox points outside the boundary",
         len(grid),
         grid_cfg["spacing_deg"] * 111,
+        bbox_points - len(grid),
+        bbox_points,
     )
 
     engine = _get_pg_engine(cfg)
     _ensure_raw_table(engine, raw_cfg["schema"], raw_cfg["table"])
 
+    # The wind pipeline fetches heat variables in its own requests on some
+    # runs (coalesce.heat in config_wind.yaml); reuse that extraction unless
+    # the quota thinned its grid.
+    max_age_hours = heat_cfg.get("reuse", {}).get("max_age_hours")
+    if max_age_hours:
+        extraction = _latest_extraction(engine, raw_cfg["schema"], raw_cfg["table"])
+        latest, quota_fraction = extraction or (None, None)
+        if latest is not None and quota_fraction < 1.0:
+            run_logger.info(
+                "Latest extraction from %s covers %.0f%% of the planned quota; refetching",
+                latest, quota_fraction * 100,
+            )
+        elif latest is not None and pd.Timestamp.now() - latest < pd.Timedelta(hours=max_age_hours):
+            run_logger.info(
+                "Reusing extraction from %s (< %sh old); skipping the API call",
+                latest, max_age_hours,
+            )
+            return PipelineTaskResult(
+                status="success",
+                command="extract_heat_data",
+                details={"rows_loaded": 0, "reused_extraction": latest.isoformat()},
+            )
+
     run_logger.info("Fetching heat data from Open-Meteo API (ICON-D2)...")
-    heat_df = _fetch_heat_data(grid, heat_cfg)
+    ledger = QuotaLedger.from_config(engine, "om-heat-flow", heat_cfg.get("quota"))
+    heat_df = _fetch_heat_data(grid, heat_cfg, ledger=ledger)
     run_logger.info("Received %d rows from API", len(heat_df))
 
     rows = _load_to_postgres(
@@ -282,12 +306,16 @@ def extract_heat_data(cfg: PipelineConfig) -> PipelineTaskResult:
         "Loaded %d rows into %s.%s", rows, raw_cfg["schema"], raw_cfg["table"],
     )
 
-    return PipelineTaskResult(status="success", command="extract_heat_data")
+    return PipelineTaskResult(
+        status="success",
+        command="extract_heat_data",
+        details={"rows_loaded": rows},
+    )
 
 
 @task(name="Cleanup heat data", retries=2, retry_delay_seconds=30)
 def cleanup_heat_data(cfg: PipelineConfig) -> PipelineTaskResult:
-    """Delete old raw heat records beyond retention period."""
+    """Drop raw heat partitions beyond the retention period."""
     return dbt_run_operation("cleanup_om_heat", {}, cfg)
 
 
@@ -324,7 +352,7 @@ def om_heat_flow(config: Dict[str, Any] | None = None) -> dict:
     """Heat pipeline for Trentino: Open-Meteo API -> dbt transforms.
 
     Fetches daily max temperature for a 4.4 km grid covering Trentino
-    (~1064 points), then transforms through staging -> silver -> gold
+    (~609 points), then transforms through staging -> silver -> gold
     layers with altitude-band P90 heat stress classification.
     """
     cfg = PipelineConfig.model_validate(config or {})
@@ -345,6 +373,8 @@ def om_heat_flow(config: Dict[str, Any] | None = None) -> dict:
     # --- Tests ---
     result["tests"] = test_heat_task(cfg)
 
+    log_request_metrics()
+
     return result
 
 
@@ -1,20 +1,19 @@
 """Open-Meteo observations pipeline: 15-min API extraction + dbt transforms for Trentino.
 
-Fetches 15-minute resolution weather data for a ~5 km grid covering
-Trentino (~850 points). Each run processes one chunk of the grid in
-round-robin to stay within the free-tier 600 calls/min rate limit.
-Full spatial coverage every ``grid.chunks × 15 min``.
+Fetches 15-minute resolution weather data for a ~10 km grid covering
+Trentino (~124 points). Each run processes one chunk of the grid in
+round-robin (cursor leased in Postgres, see chunk_cursor.py) so API
+load stays flat through the day. Full spatial coverage every
+``grid.chunks × 15 min``; silver ``om_obs_15min`` merges the chunks.
 
 Schedule: every 15 minutes (offset to avoid wind/heat collisions).
 """
 
 import logging
 import os
-import time
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-import numpy as np
 import pandas as pd
 import sqlalchemy as sa
 import yaml
@@ -29,7 +28,21 @@ from celine.utils.pipelines.pipeline import (
     dbt_run_operation,
 )
 
-from api_retry import post_with_retry
+from api_retry import log_request_metrics
+from chunk_cursor import (
+    advance_chunk,
+    chunk_points,
+    claim_chunk,
+    ensure_cursor_table,
+    release_chunk,
+)
+from grid import bbox_point_count, build_grid
+from om_fetch import DEFAULT_MAX_CONCURRENCY
+from om_plan import RequestSpec, fetch_specs
+from pg_bulk import copy_dataframe
+from pg_engines import get_engine
+from pg_partitions import ensure_partitioned_table
+from quota import QuotaLedger
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +56,9 @@ dbt_dir = str(app_dir / "dbt")
 os.environ.setdefault("DBT_PROJECT_DIR", dbt_dir)
 os.environ.setdefault("DBT_PROFILES_DIR", dbt_dir)
 
+# Chunk lease: above the worst-case fetch (timeouts plus retry sleeps)
+_DEFAULT_LEASE_SECONDS = 1200
+
 
 # ---------------------------------------------------------------------------
 # Config loader
@@ -55,47 +71,13 @@ def _load_obs_config() -> Dict[str, Any]:
         return yaml.safe_load(fh)
 
 
-# ---------------------------------------------------------------------------
-# Grid generation
-# ---------------------------------------------------------------------------
-
-def _generate_grid(
-    lat_min: float,
-    lat_max: float,
-    lon_min: float,
-    lon_max: float,
-    spacing: float,
-) -> List[Tuple[float, float]]:
-    """Generate a regular lat/lon grid for the Trentino region.
-
-    Args:
-        lat_min: Southern boundary latitude.
-        lat_max: Northern boundary latitude.
-        lon_min: Western boundary longitude.
-        lon_max: Eastern boundary longitude.
-        spacing: Grid spacing in degrees.
-
-    Returns:
-        List of (lat, lon) tuples covering the bounding box.
-    """
-    lats = np.arange(lat_min, lat_max + spacing / 2, spacing)
-    lons = np.arange(lon_min, lon_max + spacing / 2, spacing)
-
-    grid = [
-        (round(float(lat), 4), round(float(lon), 4))
-        for lat in lats
-        for lon in lons
-    ]
-    return grid
-
-
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
 def _get_pg_engine(cfg: PipelineConfig) -> sa.Engine:
-    """Build SQLAlchemy engine from PipelineConfig."""
-    return sa.create_engine(
+    """Shared pooled SQLAlchemy engine for PipelineConfig."""
+    return get_engine(
         f"postgresql://{cfg.postgres_user}:{cfg.postgres_password}"
         f"@{cfg.postgres_host}:{cfg.postgres_port}/{cfg.postgres_db}"
     )
@@ -104,33 +86,32 @@ def _get_pg_engine(cfg: PipelineConfig) -> sa.Engine:
 def _ensure_raw_table(engine: sa.Engine, schema: str, table: str) -> None:
     """Create the raw observations table if it doesn't exist.
 
+    One partition per extraction day; with the 15-minute schedule, retention
+    drops ~96 loads at once instead of deleting them row by row.
+
     Args:
         engine: SQLAlchemy engine.
         schema: Target schema name.
         table: Target table name.
     """
-    with engine.begin() as conn:
-        conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
-        conn.execute(sa.text(f"""
-            CREATE TABLE IF NOT EXISTS {schema}.{table} (
-                datetime               TIMESTAMP NOT NULL,
-                lat                    DOUBLE PRECISION NOT NULL,
-                lon                    DOUBLE PRECISION NOT NULL,
-                temperature_2m         DOUBLE PRECISION,
-                apparent_temperature   DOUBLE PRECISION,
-                wind_speed_10m         DOUBLE PRECISION,
-                wind_gusts_10m         DOUBLE PRECISION,
-                wind_direction_10m     DOUBLE PRECISION,
-                precipitation          DOUBLE PRECISION,
-                model                  TEXT,
-                _sdc_extracted_at      TIMESTAMP DEFAULT now()
-            )
-        """))
+    ensure_partitioned_table(engine, schema, table, columns="""
+        datetime               TIMESTAMP NOT NULL,
+        lat                    DOUBLE PRECISION NOT NULL,
+        lon                    DOUBLE PRECISION NOT NULL,
+        temperature_2m         DOUBLE PRECISION,
+        apparent_temperature   DOUBLE PRECISION,
+        wind_speed_10m         DOUBLE PRECISION,
+        wind_gusts_10m         DOUBLE PRECISION,
+        wind_direction_10m     DOUBLE PRECISION,
+        precipitation          DOUBLE PRECISION,
+        model                  TEXT,
+        _sdc_extracted_at      TIMESTAMP DEFAULT now()
+    """)
 
 
 def _load_to_postgres(
     df: pd.DataFrame,
-    engine: sa.Engine,
+    conn: sa.Connection,
     table_name: str,
     schema: str,
 ) -> int:
@@ -138,7 +119,7 @@ def _load_to_postgres(
 
     Args:
         df: DataFrame to write.
-        engine: SQLAlchemy engine.
+        conn: Connection inside the run's transaction.
         table_name: Target table name.
         schema: Target schema name.
 
@@ -148,84 +129,57 @@ def _load_to_postgres(
     df = df.copy()
     df["_sdc_extracted_at"] = pd.Timestamp.now()
 
-    with engine.begin() as conn:
-        df.to_sql(
-            table_name, conn, schema=schema, if_exists="append", index=False,
-        )
-
-    return len(df)
+    return copy_dataframe(conn, df, schema, table_name)
 
 
 # ---------------------------------------------------------------------------
 # Open-Meteo API
 # ---------------------------------------------------------------------------
 
-def _fetch_obs_data(
+def obs_request_spec(
     grid: List[Tuple[float, float]],
     obs_cfg: Dict[str, Any],
-) -> pd.DataFrame:
-    """Fetch 15-minute weather data from Open-Meteo API for the given grid points.
-
-    Uses POST with form-encoded body. Batches into chunks of max_points_per_call
-    with a configurable delay between batches.
-    """
+) -> RequestSpec:
+    """What the obs pipeline needs from Open-Meteo (see om_plan.py)."""
     api_cfg = obs_cfg["api"]
-    max_per_call = api_cfg["max_points_per_call"]
-    batch_delay = api_cfg.get("batch_delay_seconds", 30)
-    all_frames: List[pd.DataFrame] = []
-
-    for batch_idx, batch_start in enumerate(range(0, len(grid), max_per_call)):
-        if batch_idx > 0:
-            time.sleep(batch_delay)
-
-        batch = grid[batch_start:batch_start + max_per_call]
-        lats = ",".join(str(point[0]) for point in batch)
-        lons = ",".join(str(point[1]) for point in batch)
-
-        post_data = {
-            "latitude": lats,
-            "longitude": lons,
-            "minutely_15": ",".join(api_cfg["variables"]),
+    return RequestSpec(
+        name="obs",
+        section="minutely_15",
+        variables=tuple(api_cfg["variables"]),
+        points=tuple(grid),
+        model=api_cfg.get("model"),
+        params={
             "wind_speed_unit": api_cfg["wind_speed_unit"],
             "past_minutely_15": str(api_cfg["past_minutely_15"]),
             "forecast_minutely_15": str(api_cfg["forecast_minutely_15"]),
             "timezone": api_cfg["timezone"],
-        }
-        model_name = api_cfg.get("model")
-        if model_name:
-            post_data["models"] = model_name
-
-        response = post_with_retry(
-            api_cfg["base_url"],
-            data=post_data,
-            timeout=120,
-        )
-
-        data = response.json()
-
-        if isinstance(data, dict):
-            data = [data]
+        },
+    )
 
-        for location_data in data:
-            location_lat = location_data["latitude"]
-            location_lon = location_data["longitude"]
-            minutely = location_data["minutely_15"]
 
-            location_df = pd.DataFrame({
-                "datetime": pd.to_datetime(minutely["time"]),
-                "lat": location_lat,
-                "lon": location_lon,
-                "temperature_2m": minutely["temperature_2m"],
-                "apparent_temperature": minutely["apparent_temperature"],
-                "wind_speed_10m": minutely["wind_speed_10m"],
-                "wind_gusts_10m": minutely["wind_gusts_10m"],
-                "wind_direction_10m": minutely["wind_direction_10m"],
-                "precipitation": minutely["precipitation"],
-                "model": model_name or "best_match",
-            })
-            all_frames.append(location_df)
+def _fetch_obs_data(
+    grid: List[Tuple[float, float]],
+    obs_cfg: Dict[str, Any],
+    ledger: Optional[QuotaLedger] = None,
+) -> pd.DataFrame:
+    """Fetch 15-minute weather data from Open-Meteo API for the given grid points.
 
-    return pd.concat(all_frames, ignore_index=True)
+    Uses POST with form-encoded body. Batches into chunks of max_points_per_call,
+    run concurrently within the shared Open-Meteo rate-limit budget. With a
+    ``ledger``, the daily quota is checked (and the points thinned) first.
+    """
+    api_cfg = obs_cfg["api"]
+    frames = fetch_specs(
+        api_cfg["base_url"],
+        [obs_request_spec(grid, obs_cfg)],
+        max_points_per_call=api_cfg["max_points_per_call"],
+        max_concurrency=api_cfg.get("max_concurrent_requests", DEFAULT_MAX_CONCURRENCY),
+        timeout=120,
+        ledger=ledger,
+    )
+    df = frames["obs"]
+    df["model"] = api_cfg.get("model") or "best_match"
+    return df
 
 
 # ---------------------------------------------------------------------------
@@ -240,41 +194,85 @@ def extract_obs_data(cfg: PipelineConfig) -> PipelineTaskResult:
 
     grid_cfg = obs_cfg["grid"]
     raw_cfg = obs_cfg["raw"]
+    cursor_cfg = obs_cfg["cursor"]
+    n_chunks = grid_cfg.get("chunks", 1)
 
-    grid = _generate_grid(
-        lat_min=grid_cfg["lat_min"],
-        lat_max=grid_cfg["lat_max"],
-        lon_min=grid_cfg["lon_min"],
-        lon_max=grid_cfg["lon_max"],
-        spacing=grid_cfg["spacing_deg"],
-    )
-
+    grid = build_grid(grid_cfg)
+    bbox_points = bbox_point_count(grid_cfg)
     run_logger.info(
-        "Grid: %d points (%.1f km spacing)",
+        "Grid: %d points (%.1f km spacing), %d of %d bbox points outside the boundary",
         len(grid),
         grid_cfg["spacing_deg"] * 111,
+        bbox_points - len(grid),
+        bbox_points,
     )
 
+    if obs_cfg["api"]["past_minutely_15"] <= n_chunks:
+        # Each point is revisited every n_chunks runs; without a few steps of
+        # slack a late or skipped run leaves 15-min steps no run ever fetches.
+        run_logger.warning(
+            "past_minutely_15=%d does not exceed the %d-run chunk cycle; "
+            "observations will have gaps",
+            obs_cfg["api"]["past_minutely_15"], n_chunks,
+        )
+
     engine = _get_pg_engine(cfg)
     _ensure_raw_table(engine, raw_cfg["schema"], raw_cfg["table"])
+    ledger = QuotaLedger.from_config(engine, "om-obs-flow", obs_cfg.get("quota"))
+    cursor = (cursor_cfg["schema"], cursor_cfg["table"], cursor_cfg["name"])
 
-    run_logger.info("Fetching obs data from Open-Meteo API (minutely_15)...")
-    obs_df = _fetch_obs_data(grid, obs_cfg)
-    run_logger.info("Received %d rows from API", len(obs_df))
+    # Lease the chunk and commit, so no lock or transaction stays open across
+    # the fetch and its retry sleeps; load and advance in a second, short
+    # transaction. A failed run releases the lease and the next run retries
+    # the same chunk.
+    with engine.begin() as conn:
+        ensure_cursor_table(conn, cursor_cfg["schema"], cursor_cfg["table"])
+        chunk = claim_chunk(
+            conn, *cursor, n_chunks, len(grid),
+            lease_seconds=cursor_cfg.get("lease_seconds", _DEFAULT_LEASE_SECONDS),
+        )
+    if chunk is None:
+        run_logger.warning("Chunk cursor %s is leased by another run; skipping", cursor[2])
+        return PipelineTaskResult(status="skipped", command="extract_obs_data")
+    points = chunk_points(grid, n_chunks, chunk)
+
+    try:
+        run_logger.info(
+            "Fetching obs data from Open-Meteo API (minutely_15), "
+            "chunk %d/%d: %d points...",
+            chunk + 1, n_chunks, len(points),
+        )
+        obs_df = _fetch_obs_data(points, obs_cfg, ledger=ledger)
+        run_logger.info("Received %d rows from API", len(obs_df))
 
-    rows = _load_to_postgres(
-        obs_df, engine, raw_cfg["table"], raw_cfg["schema"],
-    )
+        with engine.begin() as conn:
+            rows = _load_to_postgres(
+                obs_df, conn, raw_cfg["table"], raw_cfg["schema"],
+            )
+            advance_chunk(conn, *cursor, chunk, n_chunks, len(grid))
+    except Exception:
+        with engine.begin() as conn:
+            release_chunk(conn, *cursor)
+        raise
     run_logger.info(
         "Loaded %d rows into %s.%s", rows, raw_cfg["schema"], raw_cfg["table"],
     )
 
-    return PipelineTaskResult(status="success", command="extract_obs_data")
+    return PipelineTaskResult(
+        status="success",
+        command="extract_obs_data",
+        details={
+            "chunk": chunk,
+            "chunks": n_chunks,
+            "points": len(points),
+            "rows_loaded": rows,
+        },
+    )
 
 
 @task(name="Cleanup obs data", retries=2, retry_delay_seconds=30)
 def cleanup_obs_data(cfg: PipelineConfig) -> PipelineTaskResult:
-    """Delete old raw observation records beyond retention period."""
+    """Drop raw observation partitions beyond the retention period."""
     return dbt_run_operation("cleanup_om_obs", {}, cfg)
 
 
@@ -304,8 +302,9 @@ def test_obs_task(cfg: PipelineConfig) -> PipelineTaskResult:
 def om_obs_flow(config: Dict[str, Any] | None = None) -> dict:
     """Observations pipeline for Trentino: Open-Meteo API -> dbt transforms.
 
-    Each run fetches the full 10 km grid (~234 points),
-    then transforms through staging -> silver layers.
+    Each run fetches one round-robin chunk of the 10 km grid
+    (~124 points / ``grid.chunks``), then transforms through
+    staging -> silver layers; silver merges it into ``om_obs_15min``.
     """
     cfg = PipelineConfig.model_validate(config or {})
 
@@ -324,6 +323,8 @@ def om_obs_flow(config: Dict[str, Any] | None = None) -> dict:
     # --- Tests ---
     result["tests"] = test_obs_task(cfg)
 
+    log_request_metrics()
+
     return result
 
 
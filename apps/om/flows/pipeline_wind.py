@@ -1,25 +1,26 @@
 """Open-Meteo wind pipeline: API extraction + dbt transforms for Trentino.
 
 Fetches hourly wind speed, gusts, and direction for a 4.4 km grid
-covering the entire Trentino region (~798 grid points).
-Uses ICON-D2 model (2.2 km native) via Open-Meteo API.
+covering the Autonomous Province of Trento (~609 grid points).
+Uses ICON-D2 model (2.2 km native) via Open-Meteo API. On the runs listed
+in ``coalesce.heat.at_hours`` the same requests also carry the heat
+pipeline's daily variables (om_plan.py), which are loaded into the raw
+heat table for the next heat run to reuse.
 
 Schedule: every 4 hours (6x/day).
 """
 
 import logging
 import os
-import time
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-import numpy as np
 import pandas as pd
-import requests
 import sqlalchemy as sa
 import yaml
 from prefect import flow, task
 from prefect.logging import get_run_logger
+from prefect.runtime import flow_run
 
 from celine.utils.pipelines.pipeline import (
     DEV_MODE,
@@ -29,7 +30,16 @@ from celine.utils.pipelines.pipeline import (
     dbt_run_operation,
 )
 
-from api_retry import post_with_retry
+from fingerprints import DedupStats, skip_unchanged
+from api_retry import log_request_metrics
+from grid import bbox_point_count, build_grid
+from om_fetch import DEFAULT_MAX_CONCURRENCY
+from om_plan import RequestSpec, fetch_specs
+from pg_bulk import copy_dataframe
+from pg_engines import get_engine
+from pg_partitions import ensure_partitioned_table
+from pipeline_heat import finish_heat_frame, heat_request_spec, store_heat_extraction
+from quota import QuotaLedger
 
 logger = logging.getLogger(__name__)
 
@@ -55,47 +65,13 @@ def _load_wind_config() -> Dict[str, Any]:
         return yaml.safe_load(fh)
 
 
-# ---------------------------------------------------------------------------
-# Grid generation
-# ---------------------------------------------------------------------------
-
-def _generate_grid(
-    lat_min: float,
-    lat_max: float,
-    lon_min: float,
-    lon_max: float,
-    spacing: float,
-) -> List[Tuple[float, float]]:
-    """Generate a regular lat/lon grid for the Trentino region.
-
-    Args:
-        lat_min: Southern boundary latitude.
-        lat_max: Northern boundary latitude.
-        lon_min: Western boundary longitude.
-        lon_max: Eastern boundary longitude.
-        spacing: Grid spacing in degrees.
-
-    Returns:
-        List of (lat, lon) tuples covering the bounding box.
-    """
-    lats = np.arange(lat_min, lat_max + spacing / 2, spacing)
-    lons = np.arange(lon_min, lon_max + spacing / 2, spacing)
-
-    grid = [
-        (round(float(lat), 4), round(float(lon), 4))
-        for lat in lats
-        for lon in lons
-    ]
-    return grid
-
-
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
 def _get_pg_engine(cfg: PipelineConfig) -> sa.Engine:
-    """Build SQLAlchemy engine from PipelineConfig."""
-    return sa.create_engine(
+    """Shared pooled SQLAlchemy engine for PipelineConfig."""
+    return get_engine(
         f"postgresql://{cfg.postgres_user}:{cfg.postgres_password}"
         f"@{cfg.postgres_host}:{cfg.postgres_port}/{cfg.postgres_db}"
     )
@@ -107,25 +83,32 @@ def _ensure_raw_table(engine: sa.Engine, schema: str, table: str) -> None:
     Ensures the table schema matches what the extraction writes
     and what the dbt staging model expects.
 
+    The table is partitioned by day of ``_sdc_extracted_at`` (an existing
+    plain table is migrated), and the coming days' partitions are created;
+    see pg_partitions.py.
+
     Args:
         engine: SQLAlchemy engine.
         schema: Target schema name.
         table: Target table name.
     """
-    with engine.begin() as conn:
-        conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
-        conn.execute(sa.text(f"""
-            CREATE TABLE IF NOT EXISTS {schema}.{table} (
-                datetime           TIMESTAMP NOT NULL,
-                lat                DOUBLE PRECISION NOT NULL,
-                lon                DOUBLE PRECISION NOT NULL,
-                wind_speed_10m     DOUBLE PRECISION,
-                wind_gusts_10m     DOUBLE PRECISION,
-                wind_direction_10m DOUBLE PRECISION,
-                model              TEXT,
-                _sdc_extracted_at  TIMESTAMP DEFAULT now()
-            )
-        """))
+    ensure_partitioned_table(engine, schema, table, columns="""
+        datetime           TIMESTAMP NOT NULL,
+        lat                DOUBLE PRECISION NOT NULL,
+        lon                DOUBLE PRECISION NOT NULL,
+        wind_speed_10m     DOUBLE PRECISION,
+        wind_gusts_10m     DOUBLE PRECISION,
+        wind_direction_10m DOUBLE PRECISION,
+        model              TEXT,
+        _sdc_extracted_at  TIMESTAMP DEFAULT now()
+    """)
+
+
+# Row identity and forecast values compared by the fingerprint dedup
+_WIND_KEY_COLS: Tuple[str, ...] = ("datetime", "lat", "lon")
+_WIND_VALUE_COLS: Tuple[str, ...] = (
+    "wind_speed_10m", "wind_gusts_10m", "wind_direction_10m", "model",
+)
 
 
 def _load_to_postgres(
@@ -133,103 +116,133 @@ def _load_to_postgres(
     engine: sa.Engine,
     table_name: str,
     schema: str,
-) -> int:
+    dedup_cfg: Optional[Dict[str, Any]] = None,
+) -> Tuple[int, Optional[DedupStats]]:
     """Write wind DataFrame into Postgres raw table.
 
+    With ``dedup_cfg`` enabled, rows unchanged since the previous extraction
+    are skipped and the fingerprints are updated in the same transaction.
+
     Args:
         df: DataFrame to write.
         engine: SQLAlchemy engine.
         table_name: Target table name.
         schema: Target schema name.
+        dedup_cfg: Optional ``dedup`` config section ({enabled, schema, table}).
 
     Returns:
-        Number of rows written.
+        Tuple of (rows written, DedupStats or None when dedup is off).
     """
     df = df.copy()
     df["_sdc_extracted_at"] = pd.Timestamp.now()
 
     with engine.begin() as conn:
-        df.to_sql(
-            table_name, conn, schema=schema, if_exists="append", index=False,
-        )
-
-    return len(df)
+        stats = None
+        if dedup_cfg and dedup_cfg.get("enabled", False):
+            df, stats = skip_unchanged(
+                conn, df, dedup_cfg["schema"], dedup_cfg["table"],
+                key_cols=_WIND_KEY_COLS, value_cols=_WIND_VALUE_COLS,
+            )
+        return copy_dataframe(conn, df, schema, table_name), stats
 
 
 # ---------------------------------------------------------------------------
 # Open-Meteo API
 # ---------------------------------------------------------------------------
 
-def _fetch_wind_data(
+def wind_request_spec(
     grid: List[Tuple[float, float]],
     wind_cfg: Dict[str, Any],
-) -> pd.DataFrame:
-    """Fetch wind data from Open-Meteo API for all grid points.
+) -> RequestSpec:
+    """What the wind pipeline needs from Open-Meteo (see om_plan.py)."""
+    api_cfg = wind_cfg["api"]
+    params = {
+        "wind_speed_unit": api_cfg["wind_speed_unit"],
+        "forecast_hours": str(api_cfg["forecast_hours"]),
+        "timezone": api_cfg["timezone"],
+    }
+    if "past_hours" in api_cfg:
+        params["past_hours"] = str(api_cfg["past_hours"])
+    return RequestSpec(
+        name="wind",
+        section="hourly",
+        variables=tuple(api_cfg["variables"]),
+        points=tuple(grid),
+        model=api_cfg["model"],
+        params=params,
+        n_days=api_cfg["forecast_hours"] / 24,
+    )
+
+
+def _fetch_forecasts(
+    specs: List[RequestSpec],
+    wind_cfg: Dict[str, Any],
+    ledger: Optional[QuotaLedger] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Fetch wind data (and any coalesced specs) from Open-Meteo API.
 
     Uses POST with form-encoded body to avoid GET URL length limits and
-    per-location rate limiting. Batches into chunks of max_points_per_call
-    to stay under the POST payload size limit (~1000 points).
+    per-location rate limiting. Points shared by several specs are fetched
+    once, in one request carrying every spec's variables; batches of
+    max_points_per_call stay under the POST payload size limit (~1000
+    points) and run concurrently within the shared Open-Meteo rate-limit
+    budget.
 
     Args:
-        grid: List of (lat, lon) tuples.
+        specs: Request specs, the wind spec first.
         wind_cfg: Wind pipeline configuration dict.
+        ledger: Optional daily quota ledger (pre-flight budget check).
 
     Returns:
-        DataFrame with columns: datetime, lat, lon,
-        wind_speed_10m, wind_gusts_10m, wind_direction_10m, model.
+        One DataFrame per spec name. The ``wind`` frame has columns:
+        datetime, lat, lon, wind_speed_10m, wind_gusts_10m,
+        wind_direction_10m, model.
 
     Raises:
-        requests.HTTPError: If the Open-Meteo API returns an error.
+        httpx.HTTPStatusError: If the Open-Meteo API returns an error.
+        DailyLimitExceeded: If the daily quota cannot cover the run.
     """
     api_cfg = wind_cfg["api"]
-    max_per_call = api_cfg["max_points_per_call"]
-    all_frames: List[pd.DataFrame] = []
-
-    for batch_idx, batch_start in enumerate(range(0, len(grid), max_per_call)):
-        if batch_idx > 0:
-            time.sleep(70)  # Open-Meteo per-minute limit; 70 s gives margin
-
-        batch = grid[batch_start:batch_start + max_per_call]
-        lats = ",".join(str(point[0]) for point in batch)
-        lons = ",".join(str(point[1]) for point in batch)
-
-        response = post_with_retry(
-            api_cfg["base_url"],
-            data={
-                "latitude": lats,
-                "longitude": lons,
-                "hourly": ",".join(api_cfg["variables"]),
-                "wind_speed_unit": api_cfg["wind_speed_unit"],
-                "models": api_cfg["model"],
-                "forecast_hours": str(api_cfg["forecast_hours"]),
-                "timezone": api_cfg["timezone"],
-            },
-            timeout=120,
-        )
-
-        data = response.json()
+    frames = fetch_specs(
+        api_cfg["base_url"],
+        specs,
+        max_points_per_call=api_cfg["max_points_per_call"],
+        max_concurrency=api_cfg.get("max_concurrent_requests", DEFAULT_MAX_CONCURRENCY),
+        timeout=120,
+        ledger=ledger,
+    )
+    frames["wind"]["model"] = api_cfg["model"]
+    return frames
 
-        # Single location returns a dict; multiple returns a list
-        if isinstance(data, dict):
-            data = [data]
 
-        for location_data in data:
-            location_lat = location_data["latitude"]
-            location_lon = location_data["longitude"]
-            hourly = location_data["hourly"]
+def _coalesced_heat_config(
+    wind_cfg: Dict[str, Any],
+    scheduled: pd.Timestamp,
+) -> Optional[Dict[str, Any]]:
+    """Heat config to fetch alongside wind on this run, if any.
 
-            location_df = pd.DataFrame({
-                "datetime": pd.to_datetime(hourly["time"]),
-                "lat": location_lat,
-                "lon": location_lon,
-                "wind_speed_10m": hourly["wind_speed_10m"],
-                "wind_gusts_10m": hourly["wind_gusts_10m"],
-                "wind_direction_10m": hourly["wind_direction_10m"],
-                "model": api_cfg["model"],
-            })
-            all_frames.append(location_df)
+    ``coalesce.heat.at_hours`` lists the wind runs (by scheduled hour in
+    ``coalesce.heat.timezone``, the cron's timezone) that also fetch the
+    heat pipeline's variables; a run counts when it was scheduled within
+    ``tolerance_minutes`` after one of those hours. The next heat run then
+    reuses that extraction (``reuse.max_age_hours`` in config_heat.yaml)
+    unless the quota thinned it.
 
-    return pd.concat(all_frames, ignore_index=True)
+    Args:
+        wind_cfg: Wind pipeline configuration dict.
+        scheduled: The flow run's scheduled start (tz-aware), not the
+            container clock, so a late start or a local-time container
+            does not move the run out of its slot.
+    """
+    coalesce_cfg = wind_cfg.get("coalesce", {}).get("heat")
+    if not coalesce_cfg:
+        return None
+    local = scheduled.tz_convert(coalesce_cfg.get("timezone", "UTC"))
+    tolerance = pd.Timedelta(minutes=coalesce_cfg.get("tolerance_minutes", 30))
+    if local.hour not in coalesce_cfg["at_hours"] or local - local.floor("h") > tolerance:
+        return None
+    with open(script_dir / coalesce_cfg["config"]) as fh:
+        return yaml.safe_load(fh)
 
 
 # ---------------------------------------------------------------------------
@@ -245,39 +258,69 @@ def extract_wind_data(cfg: PipelineConfig) -> PipelineTaskResult:
     grid_cfg = wind_cfg["grid"]
     raw_cfg = wind_cfg["raw"]
 
-    grid = _generate_grid(
-        lat_min=grid_cfg["lat_min"],
-        lat_max=grid_cfg["lat_max"],
-        lon_min=grid_cfg["lon_min"],
-        lon_max=grid_cfg["lon_max"],
-        spacing=grid_cfg["spacing_deg"],
-    )
+    grid = build_grid(grid_cfg)
+    bbox_points = bbox_point_count(grid_cfg)
     run_logger.info(
-        "Generated grid: %d points (%.1f km spacing)",
+        "Grid: %d points (%.1f km spacing), %d of %d bbox points outside the boundary",
         len(grid),
         grid_cfg["spacing_deg"] * 111,
+        bbox_points - len(grid),
+        bbox_points,
     )
 
     engine = _get_pg_engine(cfg)
     _ensure_raw_table(engine, raw_cfg["schema"], raw_cfg["table"])
 
-    run_logger.info("Fetching wind data from Open-Meteo API (ICON-D2)...")
-    wind_df = _fetch_wind_data(grid, wind_cfg)
+    specs = [wind_request_spec(grid, wind_cfg)]
+    # Outside a deployment run Prefect reports the current time
+    heat_cfg = _coalesced_heat_config(wind_cfg, pd.Timestamp(flow_run.scheduled_start_time))
+    if heat_cfg is not None:
+        specs.append(heat_request_spec(build_grid(heat_cfg["grid"]), heat_cfg))
+        today = pd.Timestamp.now(tz="Europe/Rome").normalize().date()
+
+    run_logger.info(
+        "Fetching %s data from Open-Meteo API (ICON-D2)...",
+        " + ".join(spec.name for spec in specs),
+    )
+    ledger = QuotaLedger.from_config(engine, "om-wind-flow", wind_cfg.get("quota"))
+    frames = _fetch_forecasts(specs, wind_cfg, ledger=ledger)
+    wind_df = frames["wind"]
     run_logger.info("Received %d rows from API", len(wind_df))
 
-    rows = _load_to_postgres(
+    rows, dedup = _load_to_postgres(
         wind_df, engine, raw_cfg["table"], raw_cfg["schema"],
+        dedup_cfg=wind_cfg.get("dedup"),
     )
     run_logger.info(
         "Loaded %d rows into %s.%s", rows, raw_cfg["schema"], raw_cfg["table"],
     )
+    if dedup is not None:
+        run_logger.info("Skipped %s", dedup)
 
-    return PipelineTaskResult(status="success", command="extract_wind_data")
+    heat_rows = 0
+    if heat_cfg is not None:
+        heat_rows = store_heat_extraction(
+            engine, heat_cfg, finish_heat_frame(frames["heat"], today),
+        )
+        run_logger.info(
+            "Loaded %d coalesced heat rows into %s.%s",
+            heat_rows, heat_cfg["raw"]["schema"], heat_cfg["raw"]["table"],
+        )
+
+    return PipelineTaskResult(
+        status="success",
+        command="extract_wind_data",
+        details={
+            "rows_loaded": rows,
+            "rows_skipped": dedup.rows_skipped if dedup is not None else 0,
+            "heat_rows_loaded": heat_rows,
+        },
+    )
 
 
 @task(name="Cleanup wind data", retries=2, retry_delay_seconds=30)
 def cleanup_wind_data(cfg: PipelineConfig) -> PipelineTaskResult:
-    """Delete old raw wind records beyond retention period."""
+    """Drop raw wind partitions beyond the retention period."""
     return dbt_run_operation("cleanup_om_wind", {}, cfg)
 
 
@@ -314,7 +357,7 @@ def om_wind_flow(config: Dict[str, Any] | None = None) -> dict:
     """Wind pipeline for Trentino: Open-Meteo API -> dbt transforms.
 
     Fetches hourly wind speed, gusts, and direction for a 4.4 km grid
-    covering Trentino (~798 points), then transforms through
+    covering Trentino (~609 points), then transforms through
     staging -> silver -> gold layers with gust alert classification.
     """
     cfg = PipelineConfig.model_validate(config or {})
@@ -335,6 +378,8 @@ def om_wind_flow(config: Dict[str, Any] | None = None) -> dict:
     # --- Tests ---
     result["tests"] = test_wind_task(cfg)
 
+    log_request_metrics()
+
     return result
 
 
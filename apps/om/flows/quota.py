@@ -0,0 +1,261 @@
+"""Cross-flow Open-Meteo quota ledger with pre-flight budgeting.
+
+Every OM fetch reserves its location-weighted calls in a Postgres ledger
+table *before* the first request. The daily limit is shared by the wind,
+heat and obs flows (and every worker process), so the ledger is the one
+place that knows what is left today.
+
+``QuotaLedger.reserve`` runs under a transaction-scoped advisory lock, so
+two flows starting together cannot both spend the last calls. It grants:
+
+* the full weight when the remaining budget covers it;
+* a smaller weight when it does not, but at least ``min_fraction`` of the
+  run fits. The caller then fetches a strided subset of its points
+  (``om_plan.subsample_specs``);
+* nothing otherwise: ``DailyLimitExceeded`` is raised before any API call.
+
+A fetch that fails part-way ``settle``s its reservation down to the calls
+whose responses arrived, so a failed run does not keep the budget it never
+spent.
+
+``reserve_calls`` is the part of the daily limit a flow must leave for the
+others. The ``<table>_daily`` view sums consumption per UTC day and flow.
+Open-Meteo resets its counters at midnight UTC.
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import sqlalchemy as sa
+
+from api_retry import DailyLimitExceeded
+from om_fetch import OPEN_METEO_FREE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+# Longest window of the free tier: 10,000 calls per day
+DEFAULT_DAILY_LIMIT: float = max(
+    OPEN_METEO_FREE_LIMITS, key=lambda limit: limit.period_seconds,
+).calls
+
+
+def grant(
+    planned: float,
+    used: float,
+    daily_limit: float,
+    reserve_calls: float = 0.0,
+    min_fraction: float = 1.0,
+) -> float:
+    """Weighted calls a run may spend today.
+
+    Args:
+        planned: Weighted calls the run needs.
+        used: Weighted calls already spent today by every flow.
+        daily_limit: Daily weighted-call limit.
+        reserve_calls: Calls this flow must leave unspent for the others.
+        min_fraction: Smallest share of ``planned`` worth fetching.
+
+    Returns:
+        ``planned`` if it fits, else the (smaller) weight that fits.
+
+    Raises:
+        DailyLimitExceeded: If less than ``min_fraction`` of the run fits.
+    """
+    available = max(0.0, daily_limit - reserve_calls - used)
+    if planned <= available:
+        return planned
+    if available > 0 and available / planned >= min_fraction:
+        return available
+    raise DailyLimitExceeded(
+        f"Pre-flight: {available:.0f} of {daily_limit:.0f} daily calls available "
+        f"({used:.0f} used, {reserve_calls:.0f} reserved for other flows), "
+        f"run needs {planned:.0f} (min {math.ceil(planned * min_fraction)})"
+    )
+
+
+@dataclass(frozen=True)
+class Reservation:
+    """One ledger row: what a fetch planned and what it was granted."""
+
+    id: int
+    planned: float
+    granted: float
+
+
+class QuotaLedger:
+    """Daily API budget shared by the OM flows, persisted in Postgres."""
+
+    def __init__(
+        self,
+        engine: sa.Engine,
+        flow: str,
+        schema: str = "raw",
+        table: str = "om_api_quota_ledger",
+        daily_limit: float = DEFAULT_DAILY_LIMIT,
+        reserve_calls: float = 0.0,
+        min_fraction: float = 1.0,
+    ):
+        self.engine = engine
+        self.flow = flow
+        self.schema = schema
+        self.table = table
+        self.daily_limit = daily_limit
+        self.reserve_calls = reserve_calls
+        self.min_fraction = min_fraction
+        self._ensured = False
+
+    @classmethod
+    def from_config(
+        cls,
+        engine: sa.Engine,
+        flow: str,
+        quota_cfg: Optional[Dict[str, Any]],
+    ) -> Optional["QuotaLedger"]:
+        """Ledger from a pipeline's ``quota`` config section, None if absent."""
+        if not quota_cfg:
+            return None
+        return cls(
+            engine,
+            flow,
+            schema=quota_cfg.get("schema", "raw"),
+            table=quota_cfg.get("table", "om_api_quota_ledger"),
+            daily_limit=quota_cfg.get("daily_limit", DEFAULT_DAILY_LIMIT),
+            reserve_calls=quota_cfg.get("reserve_calls", 0.0),
+            min_fraction=quota_cfg.get("min_fraction", 1.0),
+        )
+
+    @property
+    def _qualified(self) -> str:
+        return f"{self.schema}.{self.table}"
+
+    def ensure(self) -> None:
+        """Create the ledger table and its daily summary view if needed."""
+        if self._ensured:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {self.schema}"))
+            conn.execute(sa.text(f"""
+                CREATE TABLE IF NOT EXISTS {self._qualified} (
+                    id              BIGSERIAL PRIMARY KEY,
+                    flow            TEXT NOT NULL,
+                    reserved_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    planned_calls   DOUBLE PRECISION NOT NULL,
+                    weighted_calls  DOUBLE PRECISION NOT NULL,
+                    requests        INTEGER NOT NULL,
+                    points          INTEGER NOT NULL
+                )
+            """))
+            conn.execute(sa.text(f"""
+                CREATE INDEX IF NOT EXISTS {self.table}_reserved_at_idx
+                ON {self._qualified} (reserved_at)
+            """))
+            conn.execute(sa.text(f"""
+                CREATE OR REPLACE VIEW {self._qualified}_daily AS
+                SELECT
+                    (reserved_at AT TIME ZONE 'UTC')::date          AS day_utc,
+                    flow,
+                    count(*)                                        AS fetches,
+                    sum(requests)                                   AS requests,
+                    sum(points)                                     AS points,
+                    sum(weighted_calls)                             AS weighted_calls,
+                    sum(planned_calls - weighted_calls)             AS calls_shed
+                FROM {self._qualified}
+                GROUP BY 1, 2
+            """))
+        self._ensured = True
+
+    def _used_today(self, conn: sa.Connection) -> float:
+        return conn.execute(sa.text(f"""
+            SELECT coalesce(sum(weighted_calls), 0)
+            FROM {self._qualified}
+            WHERE reserved_at >= date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+        """)).scalar()
+
+    def used_today(self) -> float:
+        """Weighted calls every flow has reserved since midnight UTC."""
+        self.ensure()
+        with self.engine.connect() as conn:
+            return float(self._used_today(conn))
+
+    def reserve(self, planned: float, requests: int, points: int) -> Reservation:
+        """Reserve today's calls for one fetch before making it.
+
+        Args:
+            planned: Weighted calls the fetch needs.
+            requests: POSTs the fetch will make (recorded for the summary).
+            points: Locations the fetch covers.
+
+        Returns:
+            The reservation; a ``granted`` below ``planned`` means the
+            caller must shrink the fetch to fit.
+
+        Raises:
+            DailyLimitExceeded: If the remaining budget cannot cover
+                ``min_fraction`` of the fetch; nothing is reserved.
+        """
+        self.ensure()
+        with self.engine.begin() as conn:
+            conn.execute(
+                sa.text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+                {"key": self._qualified},
+            )
+            used = float(self._used_today(conn))
+            granted = grant(
+                planned, used, self.daily_limit,
+                reserve_calls=self.reserve_calls,
+                min_fraction=self.min_fraction,
+            )
+            share = granted / planned if planned else 1.0
+            reservation_id = conn.execute(
+                sa.text(f"""
+                    INSERT INTO {self._qualified}
+                        (flow, planned_calls, weighted_calls, requests, points)
+                    VALUES (:flow, :planned, :granted, :requests, :points)
+                    RETURNING id
+                """),
+                {
+                    "flow": self.flow,
+                    "planned": planned,
+                    "granted": granted,
+                    "requests": requests,
+                    "points": math.floor(points * share),
+                },
+            ).scalar_one()
+
+        remaining = self.daily_limit - used - granted
+        if granted < planned:
+            logger.warning(
+                "Quota: %s granted %.0f of %.0f calls; %.0f left today",
+                self.flow, granted, planned, remaining,
+            )
+        else:
+            logger.info(
+                "Quota: %s reserved %.0f calls; %.0f of %.0f left today",
+                self.flow, granted, remaining, self.daily_limit,
+            )
+        return Reservation(reservation_id, planned, granted)
+
+    def settle(self, reservation: Reservation, spent: float) -> None:
+        """Lower a reservation to the calls a failed fetch actually spent.
+
+        Args:
+            reservation: What ``reserve`` returned for the fetch.
+            spent: Weighted calls of the requests that got a response;
+                the rest of the grant goes back to today's budget.
+        """
+        spent = min(spent, reservation.granted)
+        with self.engine.begin() as conn:
+            conn.execute(
+                sa.text(f"""
+                    UPDATE {self._qualified}
+                    SET weighted_calls = :spent
+                    WHERE id = :id
+                """),
+                {"id": reservation.id, "spent": spent},
+            )
+        logger.info(
+            "Quota: %s released %.0f of %.0f reserved calls after a failed fetch",
+            self.flow, reservation.granted - spent, reservation.granted,
+        )
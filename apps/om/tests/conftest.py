@@ -0,0 +1,32 @@
+"""Shared pytest fixtures for om tests."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Flow modules import each other as top-level modules (``from features import ...``),
+# the way celine-utils loads them; mirror that here.
+_FLOWS_DIR = str(Path(__file__).resolve().parents[1] / "flows")
+if _FLOWS_DIR not in sys.path:
+    sys.path.insert(0, _FLOWS_DIR)
+
+import api_retry  # noqa: E402
+from tests.synthetic import make_silver_hourly  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _fresh_http_state():
+    """Per-host circuit breakers and metrics are process-wide; isolate tests."""
+    api_retry.reset_http_state()
+    yield
+    api_retry.reset_http_state()
+
+
+@pytest.fixture
+def silver_hourly() -> pd.DataFrame:
+    """Synthetic silver weather: 60 days of hourly rows, no gaps."""
+    return make_silver_hourly(60 * 24)
@@ -0,0 +1,79 @@
+"""Synthetic silver weather and the reference imputer, shared by the tests and tools/.
+
+Plain helpers without pytest, so tools/bench_features.py can import them.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+import features as ft
+
+
+def make_silver_hourly(hours: int, seed: int = 0, start: str = "2024-01-01") -> pd.DataFrame:
+    """Synthetic ``om_weather_hourly`` rows with a daily cycle and noise."""
+    rng = np.random.RandomState(seed)
+    dt = pd.date_range(start, periods=hours, freq="h")
+    hour = dt.hour.to_numpy()
+    daylight = np.clip(np.sin(np.pi * (hour - 6) / 14), 0, None)
+    return pd.DataFrame(
+        {
+            "datetime": dt,
+            "temperature_2m": 5 + 8 * daylight + rng.normal(0, 1.5, hours),
+            "shortwave_radiation": 600 * daylight * rng.uniform(0.3, 1.0, hours),
+            "direct_radiation": 400 * daylight * rng.uniform(0.2, 1.0, hours),
+            "diffuse_radiation": 150 * daylight * rng.uniform(0.5, 1.0, hours),
+            "global_tilted_irradiance": 700 * daylight * rng.uniform(0.3, 1.0, hours),
+            "cloud_cover": rng.uniform(0, 100, hours).round(),
+            "precipitation": np.where(rng.uniform(size=hours) < 0.1, rng.gamma(1.0, 1.0, hours), 0.0),
+        }
+    )
+
+
+def punch_gaps(
+    df: pd.DataFrame,
+    columns: list[str],
+    n_gaps: int,
+    max_length: int,
+    seed: int = 1,
+) -> pd.DataFrame:
+    """Set ``n_gaps`` random NaN runs (1..max_length hours) per column."""
+    rng = np.random.RandomState(seed)
+    df = df.copy()
+    for col in columns:
+        pos = df.columns.get_loc(col)
+        for start, length in zip(
+            rng.randint(0, len(df), n_gaps), rng.randint(1, max_length + 1, n_gaps)
+        ):
+            df.iloc[start:start + length, pos] = np.nan
+    return df
+
+
+def reference_impute_weather_column(
+    df: pd.DataFrame, column: str, threshold: int = 6,
+) -> pd.DataFrame:
+    """The original cell-by-cell imputer, kept as the oracle for the vectorized one."""
+    df = df.copy()
+    if column not in df.columns or not df[column].isna().any():
+        return df
+    dt_series = pd.to_datetime(df[ft.DATETIME_COL])
+    pos = df.columns.get_loc(column)
+    for gap_start, gap_end, gap_length in ft._find_gap_lengths(df[column]):
+        if gap_length <= threshold:
+            continue
+        for idx in range(gap_start, gap_end + 1):
+            filled = False
+            for days_back in [1, 2, 3]:
+                source_idx = idx - 24 * days_back
+                if source_idx >= 0 and not pd.isna(df.iloc[source_idx, pos]):
+                    df.iloc[idx, pos] = df.iloc[source_idx, pos]
+                    filled = True
+                    break
+            if not filled and column in ft.MONTHLY_CLIMATE_DEFAULTS:
+                df.iloc[idx, pos] = ft.MONTHLY_CLIMATE_DEFAULTS[column][dt_series.iloc[idx].month]
+    if df[column].isna().any():
+        df[column] = df[column].interpolate(method="linear", limit=threshold)
+    if df[column].isna().any():
+        df[column] = df[column].ffill().bfill()
+    return df
@@ -0,0 +1,186 @@
+"""Tests for pooled clients, circuit breaker and metrics in flows/api_retry.py."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+
+import httpx
+import pytest
+import requests
+
+import api_retry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_after_threshold_and_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = api_retry.CircuitBreaker(failure_threshold=2, reset_seconds=60, clock=clock)
+
+    breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(api_retry.CircuitOpenError):
+        breaker.before_request()
+
+    clock.now = 60.0
+    breaker.before_request()  # the trial
+    with pytest.raises(api_retry.CircuitOpenError):
+        breaker.before_request()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 120.0
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def _post(transport: httpx.MockTransport, **kwargs) -> httpx.Response:
+    async def run():
+        async with api_retry.async_client(transport) as client:
+            return await api_retry.async_post_with_retry(
+                client, "https://api.example.test/v1/forecast", data={"latitude": "46.0"},
+                base_delay=0, **kwargs,
+            )
+    return asyncio.run(run())
+
+
+def test_async_post_negotiates_compression_and_records_wire_bytes():
+    body = json.dumps([{"hourly": {"v": [1.0] * 5000}}]).encode()
+    seen: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, content=gzip.compress(body), headers={"Content-Encoding": "gzip"})
+
+    response = _post(httpx.MockTransport(handler))
+
+    assert response.content == body
+    assert "gzip" in seen[0].headers["Accept-Encoding"]
+    (metrics,) = api_retry.request_metrics()
+    assert (metrics.host, metrics.requests, metrics.attempts) == ("api.example.test", 1, 1)
+    assert metrics.bytes_decoded == len(body)
+    assert metrics.bytes_received < len(body) / 10
+    assert metrics.bytes_sent == len(b"latitude=46.0")
+
+
+def test_async_post_counts_retries_and_opens_circuit(monkeypatch):
+    monkeypatch.setattr(api_retry, "_compute_delay", lambda *args, **kwargs: 0.0)
+    calls = {"n": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls["n"] += 1
+        return httpx.Response(503)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _post(httpx.MockTransport(handler), max_retries=2)
+    (metrics,) = api_retry.request_metrics()
+    assert (metrics.attempts, metrics.retries, metrics.failures) == (3, 2, 3)
+    # One failed request, however many attempts it took
+    assert api_retry.circuit_breaker("https://api.example.test").state == "closed"
+
+    # Four more failed requests reach the default threshold of 5; the next
+    # request is refused without a call
+    for _ in range(4):
+        with pytest.raises(httpx.HTTPStatusError):
+            _post(httpx.MockTransport(handler), max_retries=2)
+    assert calls["n"] == 15
+    with pytest.raises(api_retry.CircuitOpenError):
+        _post(httpx.MockTransport(handler))
+    assert calls["n"] == 15
+
+
+def test_throttled_concurrent_requests_finish_their_retries(monkeypatch):
+    monkeypatch.setattr(api_retry, "_compute_delay", lambda *args, **kwargs: 0.0)
+    attempts: dict[str, int] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        key = request.content.decode()
+        attempts[key] = attempts.get(key, 0) + 1
+        if attempts[key] <= 2:
+            return httpx.Response(429, headers={"Retry-After": "1"})
+        return httpx.Response(200, content=b"[]")
+
+    async def run():
+        async with api_retry.async_client(httpx.MockTransport(handler)) as client:
+            return await asyncio.gather(*(
+                api_retry.async_post_with_retry(
+                    client, "https://api.example.test/v1/forecast",
+                    data={"latitude": str(46.0 + i)}, max_retries=2,
+                )
+                for i in range(4)
+            ))
+
+    responses = asyncio.run(run())
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert api_retry.circuit_breaker("https://api.example.test").state == "closed"
+
+
+def test_request_let_through_finishes_retries_after_the_circuit_opens(monkeypatch):
+    monkeypatch.setattr(api_retry, "_compute_delay", lambda *args, **kwargs: 0.0)
+    breaker = api_retry.circuit_breaker("https://api.example.test")
+    calls = {"n": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls["n"] += 1
+        if calls["n"] == 1:
+            # Other requests fail meanwhile and open the circuit
+            for _ in range(breaker.failure_threshold):
+                breaker.record_failure()
+            return httpx.Response(503)
+        return httpx.Response(200, content=b"[]")
+
+    assert _post(httpx.MockTransport(handler), max_retries=2).status_code == 200
+    assert calls["n"] == 2
+
+
+def test_unexpected_error_releases_the_half_open_trial(monkeypatch):
+    breaker = api_retry.circuit_breaker("https://api.example.test")
+    monkeypatch.setattr(breaker, "reset_seconds", 0.0)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == "half-open"
+
+    def broken(request: httpx.Request) -> httpx.Response:
+        raise ValueError("not a transport error")
+
+    with pytest.raises(ValueError):
+        _post(httpx.MockTransport(broken))
+
+    # The trial ended without an outcome, so the next request is the trial
+    ok = _post(httpx.MockTransport(lambda request: httpx.Response(200, content=b"[]")))
+    assert ok.status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_post_with_retry_reuses_the_shared_session(monkeypatch):
+    sessions = []
+
+    def fake_post(self, url, data, timeout):
+        sessions.append(self)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"[]"
+        response.request = requests.Request("POST", url, data=data).prepare()
+        return response
+
+    monkeypatch.setattr(requests.Session, "post", fake_post)
+
+    for _ in range(2):
+        api_retry.post_with_retry("https://api.example.test/v1/forecast", {"latitude": "46.0"})
+
+    assert sessions[0] is sessions[1] is api_retry.get_session()
+    assert "gzip" in api_retry.get_session().headers["Accept-Encoding"]
+    (metrics,) = api_retry.request_metrics()
+    assert (metrics.requests, metrics.attempts, metrics.retries) == (2, 2, 0)
@@ -0,0 +1,48 @@
+"""Tests for the cached lookup tables in flows/ephemeris.py."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+import ephemeris as ep
+import features as ft
+
+
+def test_lookup_tables_match_direct_computation():
+    # Spans both ends of the epoch-cycle table and includes non-whole hours
+    dt = pd.Series(
+        list(pd.date_range("2019-12-30", periods=96, freq="h"))
+        + list(pd.date_range("2024-03-31 00:30", periods=48, freq="90min"))
+        + list(pd.date_range("2039-12-30", periods=96, freq="h"))
+    )
+    hours = ((dt - pd.Timestamp("2020-01-01")).dt.total_seconds() / 3600).to_numpy()
+    hour = dt.dt.hour.to_numpy()
+    day_of_year = dt.dt.dayofyear.to_numpy()
+
+    sin_values, cos_values = ep.epoch_cycle_terms(hours, 8766)
+    np.testing.assert_array_equal(sin_values, np.sin(2 * np.pi * hours / 8766))
+    np.testing.assert_array_equal(cos_values, np.cos(2 * np.pi * hours / 8766))
+
+    sin_values, cos_values = ep.cyclic_terms(hour, 24)
+    np.testing.assert_array_equal(sin_values, np.sin(2 * np.pi * hour / 24))
+    np.testing.assert_array_equal(cos_values, np.cos(2 * np.pi * hour / 24))
+
+    declination = np.radians(23.45 * np.sin(np.radians(360 / 365 * (day_of_year - 81))))
+    lat_rad = np.radians(ft.FOLGARIA_LAT)
+    expected = (
+        np.sin(lat_rad) * np.sin(declination)
+        + np.cos(lat_rad) * np.cos(declination) * np.cos(np.radians(15 * (hour - 12)))
+    )
+    sin_elevation, clearsky_ghi = ep.solar_terms(day_of_year, hour, ft.FOLGARIA_LAT)
+    np.testing.assert_array_equal(sin_elevation, expected)
+    np.testing.assert_array_equal(clearsky_ghi, np.maximum(0, 1000 * np.clip(expected, 0, None)))
+
+
+def test_holiday_flags_match_isin():
+    dt = pd.Series(pd.date_range("2019-12-20", "2036-01-10", freq="5h"))
+    expected = dt.dt.normalize().isin(pd.to_datetime(ft.ITALIAN_HOLIDAYS)).astype(int)
+
+    got = ep.holiday_flags(dt, tuple(ft.ITALIAN_HOLIDAYS))
+
+    np.testing.assert_array_equal(got, expected.to_numpy())
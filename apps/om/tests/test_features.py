@@ -0,0 +1,368 @@
+"""Tests for the gold feature builders in flows/features.py."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import features as ft
+from tests.synthetic import make_silver_hourly, punch_gaps, reference_impute_weather_column
+
+
+def test_find_gap_lengths_matches_runs():
+    s = pd.Series([np.nan, 1.0, np.nan, np.nan, 2.0, np.nan])
+    assert ft._find_gap_lengths(s) == [(0, 0, 1), (2, 3, 2), (5, 5, 1)]
+    assert ft._find_gap_lengths(pd.Series([1.0, 2.0])) == []
+
+
+@pytest.mark.parametrize("column", ["temperature_2m", "cloud_cover", "direct_radiation"])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_impute_weather_column_matches_reference(column, seed):
+    # Long gaps chain fallbacks through values filled earlier in the same pass;
+    # direct_radiation has no climate default, so some positions stay NaN until ffill.
+    df = punch_gaps(make_silver_hourly(120 * 24), [column], n_gaps=40, max_length=100, seed=seed)
+    got = ft.impute_weather_column(df, column)
+    expected = reference_impute_weather_column(df, column)
+    np.testing.assert_array_equal(got[column].to_numpy(), expected[column].to_numpy())
+
+
+def test_impute_uses_climate_default_when_history_missing():
+    df = make_silver_hourly(24 * 5, start="2024-07-01")
+    df.loc[:30, "temperature_2m"] = np.nan
+    out = ft.impute_weather_column(df, "temperature_2m")
+    assert out.loc[0, "temperature_2m"] == ft.MONTHLY_CLIMATE_DEFAULTS["temperature_2m"][7]
+    assert not out["temperature_2m"].isna().any()
+
+
+# --- rolling / EWM kernels ---------------------------------------------------
+
+
+def test_ewm_mean_is_bit_identical_to_pandas():
+    x = make_silver_hourly(2000)["temperature_2m"].to_numpy(copy=True)
+    x[[0, 5, 6, 7, 500]] = np.nan
+    expected = pd.Series(x).ewm(halflife=12, min_periods=1).mean().to_numpy()
+    got, _ = ft._ewm_mean(x, 12)
+    np.testing.assert_array_equal(got, expected)
+
+
+def test_ewm_mean_resumes_bit_identically():
+    x = make_silver_hourly(500)["temperature_2m"].to_numpy(copy=True)
+    full, _ = ft._ewm_mean(x, 12)
+    head, state = ft._ewm_mean(x[:321], 12)
+    rest, _ = ft._ewm_mean(x[321:], 12, state)
+    np.testing.assert_array_equal(np.concatenate([head, rest]), full)
+
+
+@pytest.mark.parametrize("missing", [[], [0, 1], [5, 6, 7, 1500], list(range(3000))])
+def test_ewm_state_equals_the_replayed_accumulator(missing):
+    x = make_silver_hourly(3000)["temperature_2m"].to_numpy(copy=True)
+    x[missing] = np.nan
+    out, expected = ft._ewm_mean(x, 12)
+
+    assert ft._ewm_state(x, 12, out[-1]) == expected
+
+
+def test_rolling_kernels_match_pandas_and_are_window_local():
+    x = make_silver_hourly(1000)["temperature_2m"].to_numpy(copy=True)
+    x[[3, 400, 401]] = np.nan
+    s = pd.Series(x)
+    np.testing.assert_allclose(
+        ft._rolling_mean(x, 24), s.rolling(24, min_periods=1).mean(), rtol=1e-12
+    )
+    np.testing.assert_allclose(
+        ft._rolling_std(x, 24), s.rolling(24, min_periods=1).std(), rtol=1e-9, atol=1e-12
+    )
+    # a window recomputed from a short history is bit-identical
+    np.testing.assert_array_equal(ft._rolling_std(x, 24)[-50:], ft._rolling_std(x[-73:], 24)[-50:])
+    np.testing.assert_array_equal(ft._rolling_sum(x, 48)[0][-50:], ft._rolling_sum(x[-97:], 48)[0][-50:])
+
+
+# --- incremental build with checkpointed state -------------------------------
+
+
+def _resume(silver: pd.DataFrame, cuts: list[int]) -> tuple[pd.DataFrame, dict]:
+    """Run the incremental builder as successive daily runs ending at ``cuts``.
+
+    Each run sees silver up to its cut and checkpoints 48 h before it, like the
+    flow does; the state goes through JSON as it does through Postgres.
+    """
+    state = None
+    for cut in cuts:
+        visible = silver.iloc[:cut]
+        checkpoint_at = visible["datetime"].iloc[-1] - pd.Timedelta(hours=48)
+        gold, state = ft.build_gold_features_incremental(visible, state, checkpoint_at)
+        state = json.loads(json.dumps(state))
+    return gold, state
+
+
+def test_incremental_build_matches_full_recompute_bit_for_bit():
+    silver = punch_gaps(
+        make_silver_hourly(40 * 24),
+        ft.REQUIRED_WEATHER_COLS,
+        n_gaps=12,
+        max_length=30,
+        seed=5,
+    )
+    cuts = [20 * 24 + 7, 21 * 24, 23 * 24 + 13, 30 * 24, 40 * 24]
+    gold, state = _resume(silver, cuts)
+
+    full = ft.build_gold_features(silver)
+    expected = full[full["datetime"] > pd.Timestamp(gold["datetime"].iloc[0]) - pd.Timedelta(hours=1)]
+    expected = expected.reset_index(drop=True)
+    assert list(gold.columns) == list(full.columns)
+    assert len(gold) > 48
+    for col in gold.columns:
+        np.testing.assert_array_equal(gold[col].to_numpy(), expected[col].to_numpy(), err_msg=col)
+    assert len(state["tail"]["datetime"]) == ft._STATE_TAIL_HOURS
+
+
+@pytest.mark.parametrize(
+    "before, after, revised",
+    [
+        (10, 3, False),  # large gap, only a small remainder after the checkpoint
+        (4, 4, False),  # large only together
+        (3, 60, False),  # still open at the end of the first run's input
+        (4, 10, True),  # rows after the checkpoint revised: a small gap after all
+    ],
+)
+def test_incremental_resume_across_a_gap_open_at_the_checkpoint(before, after, revised):
+    silver = make_silver_hourly(30 * 24)
+    checkpoint = 20 * 24 - 49
+    cols = [silver.columns.get_loc(col) for col in ft.REQUIRED_WEATHER_COLS]
+    gappy = silver.copy()
+    gappy.iloc[checkpoint - before + 1:checkpoint + after + 1, cols] = np.nan
+    final = gappy.copy()
+    if revised:
+        final.iloc[checkpoint + 1:, cols] = silver.iloc[checkpoint + 1:, cols]
+
+    _, state = ft.build_gold_features_incremental(
+        gappy.iloc[:20 * 24], checkpoint_at=silver["datetime"].iloc[checkpoint],
+    )
+    state = json.loads(json.dumps(state))
+    gold, _ = ft.build_gold_features_incremental(final, state)
+
+    full = ft.build_gold_features(final).iloc[checkpoint + 1:].reset_index(drop=True)
+    assert state["open_gaps"]["temperature_2m"] == before
+    for col in gold.columns:
+        if revised and col == "thermal_inertia_12h":
+            # Rows up to the checkpoint are final: the EWM accumulator keeps
+            # the first run's imputation of them
+            continue
+        np.testing.assert_array_equal(gold[col].to_numpy(), full[col].to_numpy(), err_msg=col)
+
+
+def test_incremental_first_run_equals_build_gold_features(silver_hourly):
+    gold, state = ft.build_gold_features_incremental(
+        silver_hourly, checkpoint_at=silver_hourly["datetime"].iloc[-49],
+    )
+    pd.testing.assert_frame_equal(gold, ft.build_gold_features(silver_hourly))
+    assert pd.Timestamp(state["checkpoint_at"]) == silver_hourly["datetime"].iloc[-49]
+
+
+def test_incremental_rejects_foreign_state_version(silver_hourly):
+    with pytest.raises(ValueError, match="version"):
+        ft.build_gold_features_incremental(silver_hourly, state={"version": 0})
+
+
+def _reference_build(df: pd.DataFrame) -> pd.DataFrame:
+    """The original stage-by-stage pandas builder, kept as the oracle for the single pass."""
+    df = ft.impute_missing_weather(df.sort_values(ft.DATETIME_COL).reset_index(drop=True))
+    dt_series = pd.to_datetime(df[ft.DATETIME_COL])
+    hour, dow = dt_series.dt.hour, dt_series.dt.dayofweek
+    temperature = df["temperature_2m"]
+    out = df[[ft.DATETIME_COL]].copy()
+    out["hour_sin"], out["hour_cos"] = np.sin(2 * np.pi * hour / 24), np.cos(2 * np.pi * hour / 24)
+    out["dow_sin"], out["dow_cos"] = np.sin(2 * np.pi * dow / 7), np.cos(2 * np.pi * dow / 7)
+    hours = (dt_series - pd.Timestamp("2020-01-01")).dt.total_seconds() / 3600
+    for name, period in ft.FOURIER_PERIODS.items():
+        out[f"{name}_sin"] = np.sin(2 * np.pi * hours / period)
+        out[f"{name}_cos"] = np.cos(2 * np.pi * hours / period)
+    out["is_weekend"] = dow.isin([5, 6]).astype(int)
+    out["is_holiday"] = dt_series.dt.normalize().isin(pd.to_datetime(ft.ITALIAN_HOLIDAYS)).astype(int)
+    out["is_daylight"] = hour.between(6, 20).astype(int)
+    hdh = np.maximum(0, 18 - temperature)
+    out["temperature_2m"] = temperature
+    out["heating_degree_hour"] = hdh
+    out["temp_rolling_mean_24h"] = temperature.rolling(24, min_periods=1).mean()
+    out["temp_rolling_std_24h"] = temperature.rolling(24, min_periods=1).std()
+    out["temp_change_rate_3h"] = (temperature - temperature.shift(3)) / 3
+    out["thermal_inertia_12h"] = temperature.ewm(halflife=12, min_periods=1).mean()
+    out["temp_gradient_24h"] = temperature - temperature.shift(24)
+    out["heating_degree_rolling_mean_24h"] = hdh.rolling(24, min_periods=1).mean()
+    out["cumulative_hdd_48h"] = hdh.rolling(48, min_periods=1).sum()
+    out["temp_x_hour_sin"] = temperature * out["hour_sin"]
+    out["heating_x_night"] = hdh * ((hour >= 20) | (hour <= 6)).astype(int)
+    out["shortwave_radiation"] = df["shortwave_radiation"]
+    out["radiation_rolling_mean_24h"] = df["shortwave_radiation"].rolling(24, min_periods=1).mean()
+    out["radiation_x_daytime"] = df["shortwave_radiation"] * out["is_daylight"]
+    out["cloud_cover"] = df["cloud_cover"]
+    out["cloud_cover_rolling_mean_24h"] = df["cloud_cover"].rolling(24, min_periods=1).mean()
+    out["precipitation"] = df["precipitation"]
+    out["weekend_x_hour_cos"] = out["is_weekend"] * out["hour_cos"]
+    return out[[ft.DATETIME_COL] + ft.SELECTED_FEATURES].bfill()
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_build_matches_staged_reference(seed):
+    silver = punch_gaps(
+        make_silver_hourly(45 * 24, seed=seed),
+        ft.REQUIRED_WEATHER_COLS,
+        n_gaps=10,
+        max_length=40,
+        seed=seed,
+    ).sample(frac=1, random_state=seed)
+
+    gold = ft.build_gold_features(silver)
+    expected = _reference_build(silver)
+
+    assert list(gold.columns) == list(expected.columns)
+    pd.testing.assert_series_equal(gold["datetime"], expected["datetime"])
+    for col in ft.SELECTED_FEATURES:
+        # pandas' running rolling sums differ from the window-local kernels in the last bits
+        np.testing.assert_allclose(gold[col], expected[col], rtol=1e-9, atol=1e-9, err_msg=col)
+
+
+def test_build_float32_output(silver_hourly):
+    gold = ft.build_gold_features(silver_hourly, dtype=np.float32)
+    full = ft.build_gold_features(silver_hourly)
+
+    assert gold["temperature_2m"].dtype == np.float32
+    assert gold["is_holiday"].dtype == full["is_holiday"].dtype
+    np.testing.assert_array_equal(
+        gold["thermal_inertia_12h"].to_numpy(),
+        full["thermal_inertia_12h"].to_numpy().astype(np.float32),
+    )
+
+
+def _location_frames() -> dict[str, pd.DataFrame]:
+    """Silver series for three locations with different spans and gap patterns."""
+    frames = {}
+    for location_id, seed, start, days in [
+        ("it_folgaria", 0, "2024-01-01", 40),
+        ("es_valencia", 1, "2024-01-10", 30),
+        ("fi_lappeenranta", 2, "2023-12-20", 35),
+    ]:
+        frame = punch_gaps(
+            make_silver_hourly(days * 24, seed=seed, start=start),
+            ft.REQUIRED_WEATHER_COLS,
+            n_gaps=10,
+            max_length=60,
+            seed=seed + 3,
+        )
+        frame.iloc[:30, frame.columns.get_loc("temperature_2m")] = np.nan
+        frame.iloc[-5:, frame.columns.get_loc("shortwave_radiation")] = np.nan
+        frames[location_id] = frame
+    return frames
+
+
+def test_grouped_build_matches_per_location_build():
+    frames = _location_frames()
+    stacked = pd.concat(
+        [frame.assign(location_id=loc) for loc, frame in frames.items()]
+    ).sample(frac=1, random_state=0)
+
+    gold = ft.build_gold_features_grouped(stacked)
+
+    assert gold["location_id"].is_monotonic_increasing
+    for location_id, frame in frames.items():
+        expected = ft.build_gold_features(frame, location=location_id)
+
+        got = gold[gold["location_id"] == location_id].drop(columns="location_id")
+        pd.testing.assert_frame_equal(got.reset_index(drop=True), expected, check_exact=True)
+
+
+def test_grouped_build_uses_location_climate():
+    frame = make_silver_hourly(10 * 24, start="2024-07-01")
+    frame.iloc[:20, frame.columns.get_loc("temperature_2m")] = np.nan
+    climate = {"temperature_2m": {m: 30.0 for m in range(1, 13)}}
+
+    profile = replace(ft.LOCATION_PROFILES["es_valencia"], climate=climate)
+
+    gold = ft.build_gold_features_grouped(
+        frame.assign(location_id="es_valencia"), profiles={"es_valencia": profile},
+    )
+
+    assert (gold["temperature_2m"].iloc[:20] == 30.0).all()
+
+
+def test_location_profiles_select_holidays_and_latitude(silver_hourly):
+    frame = make_silver_hourly(3 * 24, start="2024-12-05")
+    holiday = pd.to_datetime(frame["datetime"]).dt.date == pd.Timestamp("2024-12-06").date()
+
+    finnish = ft.build_gold_features(frame, location="fi_lappeenranta")
+    italian = ft.build_gold_features(frame, location="it_folgaria")
+
+    # Itsenäisyyspäivä is a Finnish holiday only
+    assert (finnish["is_holiday"] == holiday.astype(int)).all()
+    assert (italian["is_holiday"] == 0).all()
+    meters = {
+        loc: ft.build_gold_features_meters(silver_hourly, location=loc)["solar_elevation"]
+        for loc in ("it_folgaria", "fi_lappeenranta")
+    }
+    assert meters["fi_lappeenranta"].max() < meters["it_folgaria"].max()
+
+
+def test_unknown_location_raises(silver_hourly):
+    with pytest.raises(ValueError, match="Unknown location 'xx_nowhere'"):
+        ft.build_gold_features(silver_hourly, location="xx_nowhere")
+    with pytest.raises(ValueError, match="No location profile"):
+        ft.build_gold_features_grouped(silver_hourly.assign(location_id="xx_nowhere"))
+
+
+def test_registry_evaluates_closure_once():
+    calls = []
+    registry = ft.FeatureRegistry({"x": 2})
+
+    @registry.register("shared", ("x",))
+    def _shared(x):
+        calls.append("shared")
+        return x * 2
+
+    @registry.register("a", ("shared",), lookback_hours=1)
+    def _a(shared):
+        return shared + 1
+
+    @registry.register("b", ("shared",))
+    def _b(shared):
+        return shared - 1
+
+    @registry.register("unused", ("x",), lookback_hours=24)
+    def _unused(x):
+        calls.append("unused")
+        return x
+
+    out = registry.evaluate({"x": np.arange(3.0)}, ["b", "a"])
+
+    assert list(out) == ["b", "a"]
+    np.testing.assert_array_equal(out["a"], [1.0, 3.0, 5.0])
+    assert calls == ["shared"]
+    assert registry.lookback_hours(["a", "b"]) == 3
+    assert registry.source_columns(["b"]) == ["x"]
+    with pytest.raises(ValueError, match="Unknown features"):
+        registry.closure(["missing"])
+
+
+def test_meters_subset_needs_only_its_columns(silver_hourly):
+    full = ft.build_gold_features_meters(silver_hourly)
+    subset = ft.build_gold_features_meters(
+        silver_hourly[["datetime", "cloud_cover"]], features=["cloud_cover_diff", "month"],
+    )
+
+    assert list(full.columns) == ["datetime"] + ft.SELECTED_METERS_FEATURES
+    pd.testing.assert_frame_equal(subset, full[["datetime", "cloud_cover_diff", "month"]])
+    # 72 h imputation fallback + 1 h first difference
+    assert ft.FEATURES.lookback_hours(ft.SELECTED_METERS_FEATURES) == 73
+
+
+def test_registry_lookbacks_of_the_main_features():
+    # 72 h imputation fallback + 47 h cumulative_hdd_48h window
+    assert ft._STATE_TAIL_HOURS == 119
+    # ... and the 96 h convergence span of the thermal_inertia_12h EWM
+    assert ft.FEATURES.lookback_hours(ft.SELECTED_FEATURES) == 168
+    assert ft.FEATURES.source_columns(ft.SELECTED_FEATURES) == (
+        ["datetime", "group_offsets", "locations"] + ft.REQUIRED_WEATHER_COLS
+    )
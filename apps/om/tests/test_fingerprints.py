@@ -0,0 +1,92 @@
+"""Tests for the extraction change detection in flows/fingerprints.py."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+import fingerprints
+
+KEY_COLS = ["datetime", "lat", "lon"]
+VALUE_COLS = ["wind_speed_10m", "model"]
+
+
+def _extraction(start: str, hours: int, speeds: dict) -> pd.DataFrame:
+    """Two points; ``speeds[(lat, datetime)]`` overrides the default speed."""
+    rows = []
+    for lat in (46.0, 46.1):
+        for dt in pd.date_range(start, periods=hours, freq="h"):
+            rows.append({
+                "datetime": dt, "lat": lat, "lon": 11.0,
+                "wind_speed_10m": speeds.get((lat, dt), 3.0 + dt.hour / 10),
+                "model": "icon_d2",
+            })
+    return pd.DataFrame(rows)
+
+
+def _no_fingerprints(df: pd.DataFrame) -> pd.DataFrame:
+    return df[KEY_COLS].iloc[:0].assign(fingerprint=np.array([], dtype=np.int64))
+
+
+def test_sliding_window_skips_only_unchanged_overlap():
+    first = _extraction("2024-06-01 00:00", 6, {})
+    _, previous, _ = fingerprints.compare_fingerprints(
+        first, _no_fingerprints(first), KEY_COLS, VALUE_COLS,
+    )
+
+    # Four hours later: hours 4-5 overlap; one value changed at point 46.1
+    changed_at = pd.Timestamp("2024-06-01 05:00")
+    second = _extraction("2024-06-01 04:00", 6, {(46.1, changed_at): np.nan})
+
+    unchanged, current, stats = fingerprints.compare_fingerprints(
+        second, previous, KEY_COLS, VALUE_COLS,
+    )
+
+    skipped = second.loc[unchanged, ["lat", "datetime"]]
+    assert sorted(map(tuple, skipped.to_numpy().tolist())) == [
+        (46.0, pd.Timestamp("2024-06-01 04:00")),
+        (46.0, pd.Timestamp("2024-06-01 05:00")),
+        (46.1, pd.Timestamp("2024-06-01 04:00")),
+    ]
+    assert (stats.rows_total, stats.rows_skipped, stats.rows_written) == (12, 3, 9)
+    assert (stats.points_total, stats.points_unchanged) == (2, 0)
+    assert list(current.columns) == KEY_COLS + ["fingerprint"]
+
+
+def test_identical_rerun_skips_every_row():
+    first = _extraction("2024-06-01 00:00", 4, {})
+    _, previous, _ = fingerprints.compare_fingerprints(
+        first, _no_fingerprints(first), KEY_COLS, VALUE_COLS,
+    )
+
+    unchanged, _, stats = fingerprints.compare_fingerprints(
+        first.sample(frac=1, random_state=0), previous, KEY_COLS, VALUE_COLS,
+    )
+
+    assert unchanged.all()
+    assert (stats.rows_skipped, stats.points_unchanged) == (8, 2)
+
+
+def test_nan_values_fingerprint_stably():
+    df = pd.DataFrame({"a": [np.nan, 1.0], "b": ["x", None]})
+
+    np.testing.assert_array_equal(
+        fingerprints.row_fingerprints(df, ["a", "b"]),
+        fingerprints.row_fingerprints(df.copy(), ["a", "b"]),
+    )
+
+
+def test_only_fetched_points_are_replaced():
+    sql = fingerprints._delete_points_sql("raw.fp", "pg_temp.stage", ["lat", "lon"])
+
+    assert sql == "DELETE FROM raw.fp t USING pg_temp.stage s WHERE t.lat = s.lat AND t.lon = s.lon"
+
+
+def test_previous_fingerprints_are_read_for_fetched_points_and_hours_only():
+    sql = fingerprints._previous_fingerprints_sql("raw.fp", "pg_temp.stage", KEY_COLS)
+
+    assert sql == (
+        "SELECT t.datetime, t.lat, t.lon, t.fingerprint FROM raw.fp t"
+        " JOIN pg_temp.stage s ON t.lat = s.lat AND t.lon = s.lon"
+        " WHERE t.datetime BETWEEN :start AND :end"
+    )
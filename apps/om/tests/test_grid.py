@@ -0,0 +1,68 @@
+"""Tests for the boundary-clipped point grids in flows/grid.py."""
+
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import yaml
+
+import grid
+
+
+def _square_with_hole(path):
+    outer = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+    hole = [[0.4, 0.4], [0.6, 0.4], [0.6, 0.6], [0.4, 0.6], [0.4, 0.4]]
+    path.write_text(json.dumps({
+        "type": "Feature",
+        "properties": {},
+        "geometry": {"type": "Polygon", "coordinates": [outer, hole]},
+    }))
+    return path
+
+
+def test_points_in_polygon_honours_holes_and_buffer(tmp_path):
+    rings = grid.load_boundary(_square_with_hole(tmp_path / "square.geojson"))
+    lats = np.array([0.2, 0.5, 1.05, 1.3])
+    lons = np.array([0.2, 0.5, 0.5, 0.5])
+
+    assert grid.points_in_polygon(lats, lons, rings).tolist() == [True, False, False, False]
+    # The hole centre is ~11 km from its edges; lat 1.05 is ~5.5 km out, 1.3 is ~33 km out
+    assert grid.points_in_polygon(lats, lons, rings, buffer_km=12).tolist() == [
+        True, True, True, False,
+    ]
+
+
+def test_build_grid_without_boundary_is_the_full_bbox():
+    grid_cfg = {
+        "lat_min": 45.44, "lat_max": 46.52, "lon_min": 10.40, "lon_max": 11.90,
+        "spacing_deg": 0.04,
+    }
+
+    points = grid.build_grid(grid_cfg)
+
+    assert len(points) == grid.bbox_point_count(grid_cfg) == 28 * 38
+    assert points[0] == (45.44, 10.4)
+    assert points[-1] == (46.52, 11.88)
+
+
+def test_build_grid_clips_the_wind_grid_to_the_province():
+    with open(grid._FLOWS_DIR / "config_wind.yaml") as fh:
+        grid_cfg = yaml.safe_load(fh)["grid"]
+
+    points = grid.build_grid(grid_cfg)
+    bbox_points = grid.bbox_point_count(grid_cfg)
+
+    assert 0 < len(points) < 0.7 * bbox_points
+    assert set(points) <= set(grid.build_grid({k: v for k, v in grid_cfg.items() if k != "boundary"}))
+    rings = grid.load_boundary(grid._FLOWS_DIR / grid_cfg["boundary"]["path"])
+    towns = {"Trento": (46.07, 11.12), "Canazei": (46.48, 11.77), "Bolzano": (46.50, 11.35),
+             "Verona": (45.44, 10.99)}
+    inside = grid.points_in_polygon(
+        np.array([lat for lat, _ in towns.values()]),
+        np.array([lon for _, lon in towns.values()]),
+        rings,
+    )
+    assert dict(zip(towns, inside.tolist())) == {
+        "Trento": True, "Canazei": True, "Bolzano": False, "Verona": False,
+    }
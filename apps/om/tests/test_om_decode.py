@@ -0,0 +1,66 @@
+"""Tests for the columnar response decoder in flows/om_decode.py."""
+
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pandas as pd
+
+import om_decode
+
+
+def _location(lat: float, lon: float, times: list[str], values: list, elevation=None) -> dict:
+    location = {"latitude": lat, "longitude": lon, "hourly": {"time": times, "v": values}}
+    if elevation is not None:
+        location["elevation"] = elevation
+    return location
+
+
+def _per_location(locations: list[dict]) -> pd.DataFrame:
+    return pd.concat(
+        [
+            pd.DataFrame({
+                "datetime": pd.to_datetime(loc["hourly"]["time"]),
+                "lat": loc["latitude"],
+                "lon": loc["longitude"],
+                "v": np.array(loc["hourly"]["v"], dtype=float),
+            })
+            for loc in locations
+        ],
+        ignore_index=True,
+    )
+
+
+def test_decode_matches_per_location_frames_with_nulls():
+    times = ["2024-06-01T00:00", "2024-06-01T01:00", "2024-06-01T02:00"]
+    locations = [
+        _location(46.0, 11.0, times, [1.5, None, 2.5]),
+        _location(46.04, 11.04, times, [None, None, None]),
+        _location(46.08, 11.08, times, [0.0, 1.0, 2.0]),
+    ]
+
+    decoded = om_decode.decode_locations(locations, "hourly", ["v"])
+
+    pd.testing.assert_frame_equal(decoded, _per_location(locations))
+
+
+def test_decode_handles_differing_time_axes_and_location_fields():
+    locations = [
+        _location(46.0, 11.0, ["2024-06-01T00:00", "2024-06-01T01:00"], [1.0, 2.0], 250.0),
+        _location(46.1, 11.1, ["2024-06-01T05:00"], [3.0]),
+    ]
+
+    decoded = om_decode.decode_locations(
+        locations, "hourly", ["v"], location_fields=["elevation"],
+    )
+
+    pd.testing.assert_frame_equal(
+        decoded.drop(columns="elevation"), _per_location(locations),
+    )
+    np.testing.assert_array_equal(decoded["elevation"], [250.0, 250.0, np.nan])
+
+
+def test_loads_parses_bytes():
+    body = json.dumps([{"latitude": 1.5}]).encode()
+    assert om_decode.loads(body) == [{"latitude": 1.5}]
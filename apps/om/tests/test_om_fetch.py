@@ -0,0 +1,142 @@
+"""Tests for the rate limiter and concurrent fetch engine in flows/om_fetch.py."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import httpx
+import pandas as pd
+import pytest
+
+import om_fetch
+from api_retry import DailyLimitExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_call_weight_counts_locations_variables_and_days():
+    assert om_fetch.call_weight(600, n_variables=3, n_days=2) == 600
+    assert om_fetch.call_weight(10, n_variables=15) == 15
+    assert om_fetch.call_weight(10, n_days=28) == 20
+
+
+def test_token_bucket_waits_for_the_tightest_window():
+    clock = FakeClock()
+    bucket = om_fetch.TokenBucket(
+        [om_fetch.RateLimit(600, 60), om_fetch.RateLimit(1000, 3600)], clock=clock,
+    )
+
+    assert bucket.reserve(600) == 0.0
+    assert bucket.reserve(300) == pytest.approx(30.0)  # minute window refills 10/s
+
+    clock.now = 30.0
+    assert bucket.reserve(300) == 0.0
+    # Hour window: 1000 - 900 + 30 s * 1000/3600 left, needs 300
+    assert bucket.reserve(300) == pytest.approx((300 - 100 - 30 * 1000 / 3600) * 3.6)
+
+
+def test_token_bucket_rejects_oversized_requests_and_exhausted_days():
+    clock = FakeClock()
+    bucket = om_fetch.TokenBucket(
+        [om_fetch.RateLimit(600, 60), om_fetch.RateLimit(800, 86_400)], clock=clock,
+    )
+
+    with pytest.raises(ValueError):
+        bucket.reserve(700)
+    assert bucket.reserve(600) == 0.0
+    clock.now = 60.0
+    with pytest.raises(DailyLimitExceeded):
+        bucket.reserve(600)
+
+
+def _forecast_handler(seen: list[dict]):
+    def handler(request: httpx.Request) -> httpx.Response:
+        form = {k: v[0] for k, v in parse_qs(request.content.decode()).items()}
+        seen.append(form)
+        lats = form["latitude"].split(",")
+        lons = form["longitude"].split(",")
+        body = [
+            {"latitude": float(lat), "longitude": float(lon), "hourly": {"v": [float(lat)]}}
+            for lat, lon in zip(lats, lons)
+        ]
+        return httpx.Response(200, content=json.dumps(body[0] if len(body) == 1 else body))
+    return handler
+
+
+def _decode(locations):
+    return pd.DataFrame({
+        "lat": [loc["latitude"] for loc in locations],
+        "v": [loc["hourly"]["v"][0] for loc in locations],
+    })
+
+
+def test_fetch_batches_returns_frames_in_payload_order():
+    seen: list[dict] = []
+    payloads = [
+        {"latitude": "1.0,2.0", "longitude": "10.0,11.0"},
+        {"latitude": "3.0", "longitude": "12.0"},
+        {"latitude": "4.0,5.0", "longitude": "13.0,14.0"},
+    ]
+
+    frames = om_fetch.fetch_batches(
+        "https://example.test/v1/forecast",
+        payloads,
+        weights=[2, 1, 2],
+        decode=_decode,
+        max_concurrency=3,
+        bucket=om_fetch.TokenBucket([om_fetch.RateLimit(10, 60)]),
+        transport=httpx.MockTransport(_forecast_handler(seen)),
+    )
+
+    assert len(seen) == 3
+    assert [frame["lat"].tolist() for frame in frames] == [[1.0, 2.0], [3.0], [4.0, 5.0]]
+
+
+def test_fetch_batches_retries_retriable_status(monkeypatch):
+    calls = {"n": 0}
+    inner = _forecast_handler([])
+
+    def flaky(request: httpx.Request) -> httpx.Response:
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return inner(request)
+
+    monkeypatch.setattr("api_retry._compute_delay", lambda *args, **kwargs: 0.0)
+    frames = om_fetch.fetch_batches(
+        "https://example.test/v1/forecast",
+        [{"latitude": "1.0", "longitude": "10.0"}],
+        weights=[1],
+        decode=_decode,
+        bucket=om_fetch.TokenBucket([om_fetch.RateLimit(10, 60)]),
+        transport=httpx.MockTransport(flaky),
+    )
+
+    assert calls["n"] == 2
+    assert frames[0]["lat"].tolist() == [1.0]
+
+
+def test_acquire_sleeps_until_tokens_refill(monkeypatch):
+    clock = FakeClock()
+    bucket = om_fetch.TokenBucket([om_fetch.RateLimit(10, 10)], clock=clock)
+    sleeps: list[float] = []
+
+    async def fake_sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(om_fetch.asyncio, "sleep", fake_sleep)
+    bucket.reserve(10)
+
+    waited = asyncio.run(bucket.acquire(4))
+
+    assert waited == pytest.approx(4.0)
+    assert sleeps == [pytest.approx(4.0)]
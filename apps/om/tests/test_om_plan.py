@@ -0,0 +1,221 @@
+"""Tests for the cross-pipeline request planner in flows/om_plan.py."""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+import om_fetch
+import om_plan
+import quota
+from grid import generate_grid
+
+GRID = [(46.0, 11.0), (46.04, 11.0), (46.08, 11.0)]
+
+
+def _wind(points=GRID, **params) -> om_plan.RequestSpec:
+    return om_plan.RequestSpec(
+        name="wind",
+        section="hourly",
+        variables=("wind_speed_10m", "wind_gusts_10m"),
+        points=tuple(points),
+        model="icon_d2",
+        params={"forecast_hours": "2", "past_hours": "0", **params},
+        n_days=2 / 24,
+    )
+
+
+def _heat(points=GRID) -> om_plan.RequestSpec:
+    return om_plan.RequestSpec(
+        name="heat",
+        section="daily",
+        variables=("temperature_2m_max",),
+        points=tuple(points),
+        params={"forecast_days": "1", "past_days": "1"},
+        n_days=2,
+        time_col="date",
+        location_fields=("elevation",),
+    )
+
+
+def test_same_grid_specs_share_one_request_per_batch():
+    requests = om_plan.plan_requests([_wind(), _heat()], max_points_per_call=2)
+
+    assert [len(request.points) for request in requests] == [2, 1]
+    assert all(len(request.specs) == 2 for request in requests)
+    payload = requests[0].payload
+    assert payload["hourly"] == "wind_speed_10m,wind_gusts_10m"
+    assert payload["daily"] == "temperature_2m_max"
+    assert payload["models"] == "icon_d2,best_match"
+    assert (payload["past_days"], payload["past_hours"]) == ("1", "0")
+    assert sum(request.weight for request in requests) == 3  # not 3 + 3
+
+
+def test_hourly_spec_without_pinned_window_is_not_merged_with_day_window():
+    unpinned = dataclasses.replace(_wind(), params={"forecast_hours": "2"})
+
+    requests = om_plan.plan_requests([unpinned, _heat()], max_points_per_call=10)
+
+    assert [[spec.name for spec in request.specs] for request in requests] == [
+        ["wind"], ["heat"],
+    ]
+    assert "models" not in requests[1].payload
+
+
+def test_conflicting_params_are_not_merged():
+    heat = _heat()
+    heat = dataclasses.replace(heat, params={**heat.params, "timezone": "Europe/Rome"})
+
+    requests = om_plan.plan_requests(
+        [_wind(timezone="UTC"), heat], max_points_per_call=10,
+    )
+
+    assert len(requests) == 2
+
+
+def test_obs_grid_reuses_points_shared_with_the_coarse_grid():
+    coarse = generate_grid(45.44, 46.52, 10.40, 11.90, 0.04)
+    obs = generate_grid(45.44, 46.52, 10.40, 11.90, 0.09)
+    obs_spec = om_plan.RequestSpec(
+        name="obs",
+        section="minutely_15",
+        variables=("temperature_2m",),
+        points=tuple(obs),
+        params={"forecast_minutely_15": "4", "past_minutely_15": "4"},
+    )
+
+    requests = om_plan.plan_requests(
+        [_wind(coarse), obs_spec], max_points_per_call=10_000,
+    )
+
+    by_specs = {
+        tuple(spec.name for spec in request.specs): len(request.points)
+        for request in requests
+    }
+    # Every 4th obs row and column sits on the 0.04° lattice (0.36° apart):
+    # 4 latitudes x 5 longitudes
+    assert by_specs[("wind", "obs")] == 4 * 5
+    assert by_specs[("wind",)] == len(coarse) - 20
+    assert by_specs[("obs",)] == len(obs) - 20
+
+
+def _multi_model_handler(seen: list[dict]):
+    def handler(request: httpx.Request) -> httpx.Response:
+        form = {k: v[0] for k, v in parse_qs(request.content.decode()).items()}
+        seen.append(form)
+        models = form["models"].split(",")
+        body = []
+        for i, (lat, lon) in enumerate(zip(form["latitude"].split(","), form["longitude"].split(","))):
+            hourly = {"time": ["2024-06-01T00:00", "2024-06-01T01:00"]}
+            daily = {"time": ["2024-06-01"]}
+            for model in models:
+                for variable in form["hourly"].split(","):
+                    hourly[f"{variable}_{model}"] = [float(i), float(i) + 0.5]
+                for variable in form["daily"].split(","):
+                    daily[f"{variable}_{model}"] = [20.0 + i if model == "best_match" else -1.0]
+            body.append({
+                "latitude": float(lat), "longitude": float(lon), "elevation": 300.0,
+                "hourly": hourly, "daily": daily,
+            })
+        return httpx.Response(200, content=json.dumps(body))
+    return handler
+
+
+def test_fetch_specs_splits_each_spec_with_its_own_model():
+    seen: list[dict] = []
+
+    frames = om_plan.fetch_specs(
+        "https://example.test/v1/forecast",
+        [_wind(), _heat()],
+        max_points_per_call=2,
+        bucket=om_fetch.TokenBucket([om_fetch.RateLimit(100, 60)]),
+        transport=httpx.MockTransport(_multi_model_handler(seen)),
+    )
+
+    assert list(frames["wind"].columns) == ["datetime", "lat", "lon", "wind_speed_10m", "wind_gusts_10m"]
+    assert len(frames["wind"]) == 6
+    assert list(frames["heat"].columns) == ["date", "lat", "lon", "temperature_2m_max", "elevation"]
+    # best_match values for heat, not icon_d2's
+    assert frames["heat"]["temperature_2m_max"].tolist() == [20.0, 21.0, 20.0]
+
+
+def test_subsample_specs_spreads_points_evenly():
+    coarse = generate_grid(45.44, 46.52, 10.40, 11.90, 0.04)
+
+    (spec,) = om_plan.subsample_specs([_wind(coarse)], 0.25)
+
+    assert len(spec.points) == len(coarse) // 4
+    assert spec.points[0] == coarse[0]
+    # Spread over the whole grid, not its first quarter
+    assert coarse.index(spec.points[-1]) >= len(coarse) * 3 // 4
+
+
+def test_subsample_specs_keeps_a_point_of_small_specs():
+    wind, heat = om_plan.subsample_specs([_wind(), _heat(GRID[:1])], 0.5)
+
+    assert wind.points == (GRID[0],)
+    assert heat.points == (GRID[0],)
+
+
+class _HalfLedger:
+    def __init__(self):
+        self.reserved = []
+        self.settled = []
+
+    def reserve(self, planned, requests, points):
+        self.reserved.append((planned, requests, points))
+        return quota.Reservation(len(self.reserved), planned, planned / 2)
+
+    def settle(self, reservation, spent):
+        self.settled.append((reservation.id, spent))
+
+
+def test_fetch_specs_thins_points_to_the_granted_quota():
+    seen: list[dict] = []
+    ledger = _HalfLedger()
+    points = [(46.0 + 0.04 * i, 11.0) for i in range(4)]
+
+    frames = om_plan.fetch_specs(
+        "https://example.test/v1/forecast",
+        [_wind(points), _heat(points)],
+        max_points_per_call=10,
+        bucket=om_fetch.TokenBucket([om_fetch.RateLimit(100, 60)]),
+        transport=httpx.MockTransport(_multi_model_handler(seen)),
+        ledger=ledger,
+    )
+
+    assert ledger.reserved == [(4.0, 1, 4)]
+    assert seen[0]["latitude"] == "46.0,46.08"
+    assert frames["heat"]["lat"].tolist() == [46.0, 46.08]
+    assert frames["heat"].attrs["quota_fraction"] == 0.5
+
+
+def test_fetch_specs_settles_the_reservation_when_a_batch_fails():
+    seen: list[dict] = []
+    ledger = _HalfLedger()
+    ok = _multi_model_handler(seen)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if seen:
+            return httpx.Response(400, content=b"bad request")
+        return ok(request)
+
+    points = [(46.0 + 0.04 * i, 11.0) for i in range(8)]
+    with pytest.raises(httpx.HTTPStatusError):
+        om_plan.fetch_specs(
+            "https://example.test/v1/forecast",
+            [_wind(points), _heat(points)],
+            max_points_per_call=2,
+            max_concurrency=1,
+            bucket=om_fetch.TokenBucket([om_fetch.RateLimit(100, 60)]),
+            transport=httpx.MockTransport(handler),
+            ledger=ledger,
+        )
+
+    # Half the points granted, in 2 requests; only the first was answered
+    (planned, _, _), = ledger.reserved
+    assert ledger.settled == [(1, planned / 4)]
@@ -0,0 +1,157 @@
+"""Tests for the offline Open-Meteo stand-in in tools/om_standin.py."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import pytest
+
+import api_retry
+import om_fetch
+import om_plan
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tools"))
+
+import om_standin  # noqa: E402
+
+NOW = datetime(2024, 6, 1, 10, 20)
+GRID = ((46.0, 11.0), (46.04, 11.0), (46.08, 11.04))
+UNLIMITED = om_fetch.TokenBucket([om_fetch.RateLimit(10_000, 60)])
+
+
+def _wind() -> om_plan.RequestSpec:
+    return om_plan.RequestSpec(
+        name="wind",
+        section="hourly",
+        variables=("wind_speed_10m", "wind_direction_10m"),
+        points=GRID,
+        model="icon_d2",
+        params={"forecast_hours": "6", "past_hours": "0", "timezone": "Europe/Rome"},
+        n_days=6 / 24,
+    )
+
+
+def _heat() -> om_plan.RequestSpec:
+    return om_plan.RequestSpec(
+        name="heat",
+        section="daily",
+        variables=("temperature_2m_max",),
+        points=GRID,
+        params={"forecast_days": "3", "past_days": "1", "timezone": "Europe/Rome"},
+        n_days=4,
+        time_col="date",
+        location_fields=("elevation",),
+    )
+
+
+def test_time_windows_follow_the_request_parameters():
+    body = om_standin.build_response(
+        {
+            "latitude": "46.0,46.04", "longitude": "11.0,11.0",
+            "hourly": "wind_speed_10m", "forecast_hours": "3", "past_hours": "1",
+            "minutely_15": "temperature_2m", "past_minutely_15": "2", "forecast_minutely_15": "2",
+            "daily": "temperature_2m_max", "past_days": "1", "forecast_days": "2",
+        },
+        om_standin.StandinConfig(now=NOW),
+    )
+
+    first = body[0]
+    assert first["hourly"]["time"] == [
+        "2024-06-01T09:00", "2024-06-01T10:00", "2024-06-01T11:00", "2024-06-01T12:00",
+    ]
+    assert first["minutely_15"]["time"] == [
+        "2024-06-01T09:45", "2024-06-01T10:00", "2024-06-01T10:15", "2024-06-01T10:30",
+    ]
+    assert first["daily"]["time"] == ["2024-05-31", "2024-06-01", "2024-06-02"]
+    assert len(first["hourly"]["wind_speed_10m"]) == 4
+    # Deterministic per point, different across points
+    again = om_standin.build_response(
+        {"latitude": "46.0", "longitude": "11.0", "hourly": "wind_speed_10m",
+         "forecast_hours": "3", "past_hours": "1"},
+        om_standin.StandinConfig(now=NOW),
+    )
+    assert again["hourly"]["wind_speed_10m"] == first["hourly"]["wind_speed_10m"]
+    assert body[1]["hourly"]["wind_speed_10m"] != first["hourly"]["wind_speed_10m"]
+
+
+def test_replay_reuses_recorded_locations_at_requested_points():
+    recorded = [
+        {"latitude": 45.0, "longitude": 10.0, "elevation": 500.0,
+         "hourly": {"time": ["2024-06-01T00:00"], "wind_speed_10m": [float(i)]}}
+        for i in range(2)
+    ]
+    config = om_standin.StandinConfig(replay=recorded)
+
+    body = om_standin.build_response(
+        {"latitude": "46.0,46.04,46.08", "longitude": "11.0,11.0,11.0", "hourly": "wind_speed_10m"},
+        config,
+    )
+
+    assert [loc["hourly"]["wind_speed_10m"] for loc in body] == [[0.0], [1.0], [0.0]]
+    assert [loc["latitude"] for loc in body] == [46.0, 46.04, 46.08]
+    with pytest.raises(om_standin.RequestError):
+        om_standin.build_response(
+            {"latitude": "46.0", "longitude": "11.0", "hourly": "wind_gusts_10m"}, config,
+        )
+
+
+def test_coalesced_fetch_round_trips_through_the_standin():
+    with om_standin.running_standin(om_standin.StandinConfig(now=NOW)) as server:
+        frames = om_plan.fetch_specs(
+            server.url, [_wind(), _heat()], max_points_per_call=2, bucket=UNLIMITED,
+        )
+
+    # Multi-model request: variables come back suffixed and are split per spec
+    assert server.counters.requests == 2
+    assert server.counters.points == len(GRID)
+    assert len(frames["wind"]) == len(GRID) * 6
+    assert list(frames["wind"].columns) == [
+        "datetime", "lat", "lon", "wind_speed_10m", "wind_direction_10m",
+    ]
+    assert len(frames["heat"]) == len(GRID) * 4
+    assert frames["heat"]["elevation"].notna().all()
+
+
+def test_injected_rate_limits_and_server_errors_are_retried():
+    config = om_standin.StandinConfig(rate_limit_every=3, error_rate=0.25, retry_after=0, seed=3)
+
+    async def post_all(url: str) -> list[int]:
+        async with api_retry.async_client() as client:
+            responses = [
+                await api_retry.async_post_with_retry(
+                    client, url, data={"latitude": "46.0", "longitude": "11.0", "daily": "temperature_2m_max"},
+                    max_retries=10, base_delay=0.0,
+                )
+                for _ in range(4)
+            ]
+        return [response.status_code for response in responses]
+
+    with om_standin.running_standin(config) as server:
+        assert asyncio.run(post_all(server.url)) == [200] * 4
+
+    counters = server.counters
+    assert counters.rate_limited > 0 and counters.server_errors > 0
+    assert counters.requests == 4 + counters.rate_limited + counters.server_errors
+
+
+def test_daily_limit_is_not_retried():
+    config = om_standin.StandinConfig(daily_limit_after=1)
+
+    with om_standin.running_standin(config) as server:
+        form = {"latitude": "46.0", "longitude": "11.0", "daily": "temperature_2m_max"}
+        assert httpx.post(server.url, data=form).status_code == 200
+        with pytest.raises(api_retry.DailyLimitExceeded):
+            api_retry.post_with_retry(server.url, data=form, base_delay=0.0)
+
+
+def test_bad_requests_get_the_api_error_body():
+    with om_standin.running_standin() as server:
+        response = httpx.get(server.url, params={"latitude": "46.0,46.1", "longitude": "11.0"})
+
+    assert response.status_code == 400
+    assert json.loads(response.content)["error"] is True
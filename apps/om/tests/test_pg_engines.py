@@ -0,0 +1,64 @@
+"""Tests for the pooled engine registry in flows/pg_engines.py."""
+
+from __future__ import annotations
+
+import pytest
+import sqlalchemy as sa
+
+import pg_engines
+
+
+@pytest.fixture(autouse=True)
+def _empty_registry():
+    pg_engines.dispose_engines()
+    yield
+    pg_engines.dispose_engines()
+
+
+def test_get_engine_shares_one_engine_per_url_and_settings(tmp_path):
+    url = f"sqlite:///{tmp_path / 'a.db'}"
+
+    engine = pg_engines.get_engine(url)
+
+    assert pg_engines.get_engine(url) is engine
+    assert pg_engines.get_engine(sa.make_url(url)) is engine
+    assert pg_engines.get_engine(url, pool_size=2) is not engine
+    assert pg_engines.get_engine(f"sqlite:///{tmp_path / 'b.db'}") is not engine
+
+
+def test_pool_stats_count_acquires_and_new_connections(tmp_path):
+    engine = pg_engines.get_engine(f"sqlite:///{tmp_path / 'a.db'}")
+
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(sa.text("SELECT 1"))
+    with engine.connect():
+        [stats] = pg_engines.pool_stats()
+
+    assert stats.acquires == 4
+    assert stats.connects == 1  # the pool reused the first connection
+    assert stats.checked_out == 1
+    assert stats.max_wait_seconds >= 0.0
+
+    engine.dispose()
+    with engine.connect():
+        pass
+    [stats] = pg_engines.pool_stats()
+    assert (stats.acquires, stats.connects, stats.checked_out) == (5, 2, 0)
+
+
+def test_dbapi_connection_commits_or_rolls_back(tmp_path):
+    url = f"sqlite:///{tmp_path / 'a.db'}"
+    with pg_engines.dbapi_connection(url) as conn:
+        conn.cursor().execute("CREATE TABLE t (x INTEGER)")
+        conn.cursor().execute("INSERT INTO t VALUES (1)")
+
+    with pytest.raises(RuntimeError):
+        with pg_engines.dbapi_connection(url) as conn:
+            conn.cursor().execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError("boom")
+
+    with pg_engines.get_engine(url).connect() as conn:
+        assert conn.execute(sa.text("SELECT x FROM t")).scalars().all() == [1]
+    [stats] = pg_engines.pool_stats()
+    assert stats.checked_out == 0
@@ -0,0 +1,38 @@
+"""Tests for the daily partition bookkeeping in flows/pg_partitions.py."""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pg_partitions
+
+TODAY = date(2024, 6, 10)
+
+
+def test_partition_names_sort_by_day():
+    assert pg_partitions.partition_name("om_weather_wind", TODAY) == "om_weather_wind_p20240610"
+
+
+def test_premake_covers_yesterday_through_the_days_ahead():
+    days = pg_partitions.days_to_premake(TODAY, premake_days=2)
+
+    assert days == [date(2024, 6, 9), TODAY, date(2024, 6, 11), date(2024, 6, 12)]
+
+
+def test_days_inside_the_legacy_partition_are_not_premade():
+    # Migrated table: old rows attached as one partition up to end of today
+    legacy = (datetime(2024, 5, 1), datetime(2024, 6, 11))
+    tomorrow = (datetime(2024, 6, 11), datetime(2024, 6, 12))
+
+    missing = pg_partitions.missing_days(
+        pg_partitions.days_to_premake(TODAY, premake_days=2), [legacy, tomorrow],
+    )
+
+    assert missing == [date(2024, 6, 12)]
+
+
+def test_partial_overlap_counts_as_covered():
+    # A range ending mid-day would collide with a whole-day partition
+    bounds = [(datetime(2024, 6, 9), datetime(2024, 6, 10, 6))]
+
+    assert pg_partitions.missing_days([TODAY], bounds) == []
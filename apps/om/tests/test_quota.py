@@ -0,0 +1,34 @@
+"""Tests for the pre-flight quota budgeting in flows/quota.py."""
+
+from __future__ import annotations
+
+import pytest
+
+import quota
+from api_retry import DailyLimitExceeded
+
+
+def test_grant_full_run_when_budget_covers_it():
+    assert quota.grant(600, used=3000, daily_limit=10_000, reserve_calls=1500) == 600
+
+
+def test_grant_shrinks_run_down_to_min_fraction():
+    granted = quota.grant(
+        600, used=8100, daily_limit=10_000, reserve_calls=1500, min_fraction=0.5,
+    )
+
+    assert granted == 400
+
+
+def test_grant_refuses_run_below_min_fraction():
+    with pytest.raises(DailyLimitExceeded, match="run needs 600"):
+        quota.grant(600, used=8300, daily_limit=10_000, reserve_calls=1500, min_fraction=0.5)
+
+
+def test_grant_refuses_when_nothing_is_left():
+    with pytest.raises(DailyLimitExceeded):
+        quota.grant(16, used=10_000, daily_limit=10_000, min_fraction=0.0)
+
+
+def test_default_daily_limit_is_the_free_tier_day_window():
+    assert quota.DEFAULT_DAILY_LIMIT == 10_000
@@ -0,0 +1,28 @@
+"""The Postgres helper modules copied into every app must stay identical.
+
+Each app image ships only its own directory (see the root Dockerfile), so
+these modules are copied into every app that uses them; a fix made to one
+copy has to be made to all of them.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+APPS_DIR = Path(__file__).resolve().parents[2]
+
+
+@pytest.mark.parametrize("module", ["pg_bulk.py", "pg_engines.py"])
+def test_copies_are_identical(module):
+    reference = APPS_DIR / "om" / "flows" / module
+    copies = sorted(APPS_DIR.glob(f"*/flows/{module}")) + sorted(APPS_DIR.glob(f"*/lib/{module}"))
+
+    assert len(copies) > 1
+    differing = [
+        str(path.relative_to(APPS_DIR))
+        for path in copies
+        if path.read_bytes() != reference.read_bytes()
+    ]
+    assert differing == [], f"{module} differs from om/flows/{module}; copy it over"
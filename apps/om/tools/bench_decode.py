@@ -0,0 +1,133 @@
+"""
+Benchmark Open-Meteo response decoding in flows/om_decode.py.
+
+Times the two halves of decoding one multi-location response:
+  parse     json.loads vs orjson.loads of the raw body
+  assembly  one DataFrame per location + pd.concat vs decode_locations
+
+Usage:
+    # Synthetic wind-shaped response, 600 points x 48 hours:
+    python tools/bench_decode.py
+
+    # A recorded response (e.g. saved with `curl -d ... > wind_600.json`):
+    python tools/bench_decode.py --response wind_600.json --section hourly
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(APP_DIR / "flows"))
+
+import om_decode  # noqa: E402
+
+logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+
+_WIND_VARIABLES = ["wind_speed_10m", "wind_gusts_10m", "wind_direction_10m"]
+
+
+def make_response(points: int, hours: int, seed: int = 0) -> bytes:
+    """Wind-shaped /v1/forecast body for ``points`` locations."""
+    rng = np.random.RandomState(seed)
+    times = [
+        ts.strftime("%Y-%m-%dT%H:%M")
+        for ts in pd.date_range("2024-06-01", periods=hours, freq="h")
+    ]
+    body = []
+    for i in range(points):
+        hourly: Dict[str, Any] = {"time": times}
+        for variable in _WIND_VARIABLES:
+            hourly[variable] = rng.gamma(2.0, 3.0, hours).round(1).tolist()
+        body.append({
+            "latitude": round(45.44 + 0.04 * (i // 38), 4),
+            "longitude": round(10.40 + 0.04 * (i % 38), 4),
+            "elevation": float(rng.randint(200, 3000)),
+            "hourly": hourly,
+        })
+    return json.dumps(body).encode()
+
+
+def decode_per_location(
+    locations: List[Dict[str, Any]], section: str, variables: List[str],
+) -> pd.DataFrame:
+    """The previous decoder: one DataFrame per location, then concat."""
+    frames = []
+    for location_data in locations:
+        block = location_data[section]
+        frame = {
+            "datetime": pd.to_datetime(block["time"]),
+            "lat": location_data["latitude"],
+            "lon": location_data["longitude"],
+        }
+        for variable in variables:
+            frame[variable] = block[variable]
+        frames.append(pd.DataFrame(frame))
+    return pd.concat(frames, ignore_index=True)
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Open-Meteo response decoding")
+    parser.add_argument("--response", type=Path, help="Recorded response body (JSON)")
+    parser.add_argument("--section", default="hourly", help="Time-series block to decode")
+    parser.add_argument("--points", type=int, default=600, help="Synthetic locations")
+    parser.add_argument("--hours", type=int, default=48, help="Synthetic steps per location")
+    parser.add_argument("--repeat", type=int, default=5, help="Best-of repetitions")
+    args = parser.parse_args()
+
+    body = args.response.read_bytes() if args.response else make_response(args.points, args.hours)
+    locations = json.loads(body)
+    if isinstance(locations, dict):
+        locations = [locations]
+    variables = [
+        key for key in locations[0][args.section] if key != "time"
+    ]
+    print(
+        f"response: {len(body) / 1e6:.1f} MB, {len(locations)} locations x "
+        f"{len(locations[0][args.section]['time'])} steps, {len(variables)} variables"
+    )
+
+    parse_json = best_of(lambda: json.loads(body), args.repeat)
+    print(f"parse     json.loads     {1000 * parse_json:8.1f} ms")
+    if om_decode.orjson is not None:
+        parse_orjson = best_of(lambda: om_decode.orjson.loads(body), args.repeat)
+        print(
+            f"parse     orjson.loads   {1000 * parse_orjson:8.1f} ms  "
+            f"({parse_json / parse_orjson:.1f}x)"
+        )
+    else:
+        print("parse     orjson.loads   (orjson not installed)")
+
+    legacy = best_of(
+        lambda: decode_per_location(locations, args.section, variables), args.repeat,
+    )
+    columnar = best_of(
+        lambda: om_decode.decode_locations(locations, args.section, variables), args.repeat,
+    )
+    print(f"assembly  per-location   {1000 * legacy:8.1f} ms")
+    print(f"assembly  columnar       {1000 * columnar:8.1f} ms  ({legacy / columnar:.1f}x)")
+
+    pd.testing.assert_frame_equal(
+        decode_per_location(locations, args.section, variables),
+        om_decode.decode_locations(locations, args.section, variables),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+End-to-end benchmark of the OM extract path against the offline stand-in.
+
+Runs each pipeline's own fetch function (planning, rate limiting, retrying
+HTTP client, decoding) with its shipped config, pointed at
+tools/om_standin.py instead of api.open-meteo.com:
+
+  wind       pipeline_wind._fetch_forecasts, wind spec only
+  wind+heat  pipeline_wind._fetch_forecasts with the coalesced heat spec
+  heat       pipeline_heat._fetch_heat_data
+  obs        pipeline_obs._fetch_obs_data, one grid chunk
+
+With ``--dsn`` each frame is also loaded through the pipeline's
+``_load_to_postgres`` into scratch tables, dropped afterwards. Needs the
+flows' runtime dependencies (prefect, celine-utils), as the flows do.
+
+The free-tier token bucket is replaced by an unlimited one unless
+``--free-tier-limits`` is given; ``--latency-ms`` adds a per-response delay
+to approximate the network round trip.
+
+Usage:
+    python tools/bench_extract.py
+
+    # Slower "network", more concurrency, a recorded body, and the load step:
+    python tools/bench_extract.py --latency-ms 300 --concurrency 1 4 8 \\
+        --replay wind_600.json --scenarios wind --dsn postgresql://... --schema scratch
+
+    # Against a stand-in (or anything else) already running:
+    python tools/bench_extract.py --url http://127.0.0.1:8765/v1/forecast
+"""
+
+import argparse
+import copy
+import logging
+import sys
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+import sqlalchemy as sa
+
+APP_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(APP_DIR / "flows"))
+sys.path.insert(0, str(APP_DIR / "tools"))
+
+import api_retry  # noqa: E402
+import om_fetch  # noqa: E402
+import om_standin  # noqa: E402
+import pipeline_heat  # noqa: E402
+import pipeline_obs  # noqa: E402
+import pipeline_wind  # noqa: E402
+from chunk_cursor import chunk_points  # noqa: E402
+from grid import build_grid  # noqa: E402
+
+logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+
+SCENARIOS = ("wind", "wind+heat", "heat", "obs")
+
+
+def _pointed_at(cfg: Dict[str, Any], url: str, concurrency: int) -> Dict[str, Any]:
+    cfg = copy.deepcopy(cfg)
+    cfg["api"]["base_url"] = url
+    cfg["api"]["max_concurrent_requests"] = concurrency
+    return cfg
+
+
+def _fetchers(url: str, concurrency: int) -> Dict[str, Callable[[], Dict[str, pd.DataFrame]]]:
+    """One zero-argument fetch per scenario, returning frames by pipeline."""
+    wind_cfg = _pointed_at(pipeline_wind._load_wind_config(), url, concurrency)
+    heat_cfg = _pointed_at(pipeline_heat._load_heat_config(), url, concurrency)
+    obs_cfg = _pointed_at(pipeline_obs._load_obs_config(), url, concurrency)
+    wind_grid = build_grid(wind_cfg["grid"])
+    heat_grid = build_grid(heat_cfg["grid"])
+    obs_points = chunk_points(build_grid(obs_cfg["grid"]), obs_cfg["grid"].get("chunks", 1), 0)
+
+    def wind():
+        specs = [pipeline_wind.wind_request_spec(wind_grid, wind_cfg)]
+        return pipeline_wind._fetch_forecasts(specs, wind_cfg)
+
+    def wind_heat():
+        specs = [
+            pipeline_wind.wind_request_spec(wind_grid, wind_cfg),
+            pipeline_heat.heat_request_spec(heat_grid, heat_cfg),
+        ]
+        frames = pipeline_wind._fetch_forecasts(specs, wind_cfg)
+        today = pd.Timestamp.now(tz="Europe/Rome").normalize().date()
+        frames["heat"] = pipeline_heat.finish_heat_frame(frames["heat"], today)
+        return frames
+
+    return {
+        "wind": wind,
+        "wind+heat": wind_heat,
+        "heat": lambda: {"heat": pipeline_heat._fetch_heat_data(heat_grid, heat_cfg)},
+        "obs": lambda: {"obs": pipeline_obs._fetch_obs_data(obs_points, obs_cfg)},
+    }
+
+
+def _load(engine: sa.Engine, schema: str, frames: Dict[str, pd.DataFrame]) -> int:
+    """Load frames through the pipelines' loaders into ``schema``."""
+    rows = 0
+    for name, df in frames.items():
+        table = f"bench_raw_om_{name}"
+        if name == "wind":
+            pipeline_wind._ensure_raw_table(engine, schema, table)
+            rows += pipeline_wind._load_to_postgres(df, engine, table, schema)[0]
+        elif name == "heat":
+            pipeline_heat._ensure_raw_table(engine, schema, table)
+            rows += pipeline_heat._load_to_postgres(df, engine, table, schema)
+        else:
+            pipeline_obs._ensure_raw_table(engine, schema, table)
+            with engine.begin() as conn:
+                rows += pipeline_obs._load_to_postgres(df, conn, table, schema)
+    return rows
+
+
+def _drop(engine: sa.Engine, schema: str) -> None:
+    with engine.begin() as conn:
+        for name in ("wind", "heat", "obs"):
+            conn.execute(sa.text(f"DROP TABLE IF EXISTS {schema}.bench_raw_om_{name}"))
+
+
+def run_scenario(
+    fetch: Callable[[], Dict[str, pd.DataFrame]],
+    repeat: int,
+    engine: Optional[sa.Engine],
+    schema: str,
+) -> Dict[str, Any]:
+    """Best-of-``repeat`` timings and traffic of one scenario."""
+    best: Dict[str, Any] = {}
+    for _ in range(repeat):
+        api_retry.reset_http_state()
+        start = time.perf_counter()
+        frames = fetch()
+        fetched = time.perf_counter() - start
+        loaded = _load(engine, schema, frames) if engine is not None else 0
+        total = time.perf_counter() - start
+        if best and total >= best["total"]:
+            continue
+        (metrics,) = api_retry.request_metrics()
+        best = {
+            "fetch": fetched,
+            "total": total,
+            "requests": metrics.requests,
+            "retries": metrics.retries,
+            "mb_received": metrics.bytes_received / 1e6,
+            "rows": sum(len(df) for df in frames.values()),
+            "loaded": loaded,
+        }
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OM extraction against the offline stand-in")
+    parser.add_argument("--url", help="Endpoint of a running stand-in; starts one in-process if omitted")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4], help="max_concurrent_requests values")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the best is reported")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Stand-in per-response latency")
+    parser.add_argument("--replay", type=Path, help="Recorded response body for the stand-in")
+    parser.add_argument("--free-tier-limits", action="store_true", help="Keep the free-tier rate limiter")
+    parser.add_argument("--dsn", help="SQLAlchemy Postgres URL; also time the load step")
+    parser.add_argument("--schema", default="public", help="Schema of the scratch tables")
+    args = parser.parse_args()
+
+    if not args.free_tier_limits:
+        unlimited = om_fetch.TokenBucket([om_fetch.RateLimit(1e9, 60)])
+        om_fetch.shared_bucket = lambda *_: unlimited
+
+    engine = sa.create_engine(args.dsn) if args.dsn else None
+    standin = (
+        nullcontext() if args.url
+        else om_standin.running_standin(om_standin.StandinConfig(
+            replay=om_standin.load_replay(args.replay) if args.replay else None,
+            latency_seconds=args.latency_ms / 1000,
+        ))
+    )
+    try:
+        with standin as server:
+            url = args.url or server.url
+            for concurrency in args.concurrency:
+                fetchers = _fetchers(url, concurrency)
+                for name in args.scenarios:
+                    r = run_scenario(fetchers[name], args.repeat, engine, args.schema)
+                    load = f"  load={r['total'] - r['fetch']:6.2f} s" if engine is not None else ""
+                    print(
+                        f"{name:<10} concurrency={concurrency:<3} fetch={r['fetch']:6.2f} s{load}  "
+                        f"requests={r['requests']:<3} retries={r['retries']:<3} "
+                        f"received={r['mb_received']:6.2f} MB  rows={r['rows']}"
+                    )
+    finally:
+        if engine is not None:
+            _drop(engine, args.schema)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Build flows/geo/trentino_province.geojson from the official ISTAT boundaries.
+
+Reads the province layer (``ProvCM*_g_WGS84.shp``) of the generalised ISTAT
+administrative boundaries, keeps one province by its ``COD_PROV`` code
+(22 = Provincia autonoma di Trento), simplifies it with Douglas-Peucker and
+writes a GeoJSON FeatureCollection in WGS84 lon/lat, with the source,
+licence and simplification recorded in the feature properties.
+
+The layer is in WGS84 / UTM zone 32N (EPSG:32632); the shapefile is parsed
+and unprojected here without GIS dependencies, so the tool runs in the app
+image.
+
+Usage:
+    python tools/build_province_boundary.py
+
+    # From an already downloaded archive, another province or tolerance:
+    python tools/build_province_boundary.py --zip Limiti01012024_g.zip --code 21 \\
+        --tolerance-m 100 --output /tmp/bolzano.geojson
+"""
+
+import argparse
+import io
+import json
+import math
+import struct
+import sys
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import requests
+
+APP_DIR = Path(__file__).parent.parent
+
+ISTAT_URL = (
+    "https://www.istat.it/storage/cartografia/confini_amministrativi/"
+    "generalizzati/2024/Limiti01012024_g.zip"
+)
+ISTAT_ATTRIBUTION = (
+    "ISTAT - Confini delle unità amministrative a fini statistici "
+    "al 1 gennaio 2024, versione generalizzata"
+)
+ISTAT_LICENCE = "CC BY 4.0 (https://creativecommons.org/licenses/by/4.0/)"
+
+# WGS84 ellipsoid and UTM zone 32N
+_A = 6378137.0
+_F = 1 / 298.257223563
+_K0 = 0.9996
+_LON0 = math.radians(9.0)
+_FALSE_EASTING = 500000.0
+
+Ring = List[Tuple[float, float]]
+
+
+def read_dbf(data: bytes) -> List[Dict[str, str]]:
+    """Records of a dBase III table as dicts of stripped strings."""
+    n_records, header_len, record_len = struct.unpack("<IHH", data[4:12])
+    fields = []
+    pos = 32
+    while data[pos] != 0x0D:
+        name = data[pos:pos + 11].split(b"\0")[0].decode("ascii")
+        fields.append((name, data[pos + 16]))
+        pos += 32
+
+    records = []
+    for i in range(n_records):
+        record = data[header_len + i * record_len:header_len + (i + 1) * record_len]
+        if record[:1] == b"*":  # deleted
+            continue
+        values, offset = {}, 1
+        for name, length in fields:
+            values[name] = record[offset:offset + length].decode("latin-1").strip()
+            offset += length
+        records.append(values)
+    return records
+
+
+def read_shp_polygons(data: bytes) -> Iterator[List[Ring]]:
+    """Rings of every polygon record of a .shp file, in record order."""
+    pos = 100
+    while pos < len(data):
+        _, content_words = struct.unpack(">ii", data[pos:pos + 8])
+        content = data[pos + 8:pos + 8 + 2 * content_words]
+        pos += 8 + 2 * content_words
+
+        shape_type = struct.unpack("<i", content[:4])[0]
+        if shape_type == 0:  # null shape
+            yield []
+            continue
+        if shape_type != 5:
+            raise ValueError(f"Expected polygon shapes (type 5), got type {shape_type}")
+        n_parts, n_points = struct.unpack("<ii", content[36:44])
+        parts = list(struct.unpack(f"<{n_parts}i", content[44:44 + 4 * n_parts]))
+        flat = struct.unpack(f"<{2 * n_points}d", content[44 + 4 * n_parts:])
+        points = list(zip(flat[0::2], flat[1::2]))
+        yield [points[a:b] for a, b in zip(parts, parts[1:] + [n_points])]
+
+
+def utm32n_to_lonlat(easting: float, northing: float) -> Tuple[float, float]:
+    """Inverse transverse Mercator (Snyder) from UTM zone 32N to WGS84 degrees."""
+    e2 = _F * (2 - _F)
+    ep2 = e2 / (1 - e2)
+    e1 = (1 - math.sqrt(1 - e2)) / (1 + math.sqrt(1 - e2))
+
+    m = northing / _K0
+    mu = m / (_A * (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256))
+    phi1 = (
+        mu
+        + (3 * e1 / 2 - 27 * e1 ** 3 / 32) * math.sin(2 * mu)
+        + (21 * e1 ** 2 / 16 - 55 * e1 ** 4 / 32) * math.sin(4 * mu)
+        + (151 * e1 ** 3 / 96) * math.sin(6 * mu)
+        + (1097 * e1 ** 4 / 512) * math.sin(8 * mu)
+    )
+    sin1, cos1, tan1 = math.sin(phi1), math.cos(phi1), math.tan(phi1)
+    c1 = ep2 * cos1 ** 2
+    t1 = tan1 ** 2
+    n1 = _A / math.sqrt(1 - e2 * sin1 ** 2)
+    r1 = _A * (1 - e2) / (1 - e2 * sin1 ** 2) ** 1.5
+    d = (easting - _FALSE_EASTING) / (n1 * _K0)
+
+    lat = phi1 - (n1 * tan1 / r1) * (
+        d ** 2 / 2
+        - (5 + 3 * t1 + 10 * c1 - 4 * c1 ** 2 - 9 * ep2) * d ** 4 / 24
+        + (61 + 90 * t1 + 298 * c1 + 45 * t1 ** 2 - 252 * ep2 - 3 * c1 ** 2) * d ** 6 / 720
+    )
+    lon = _LON0 + (
+        d
+        - (1 + 2 * t1 + c1) * d ** 3 / 6
+        + (5 - 2 * c1 + 28 * t1 - 3 * c1 ** 2 + 8 * ep2 + 24 * t1 ** 2) * d ** 5 / 120
+    ) / cos1
+    return math.degrees(lon), math.degrees(lat)
+
+
+def simplify(ring: Ring, tolerance: float) -> Ring:
+    """Douglas-Peucker simplification of a closed ring (endpoints kept)."""
+    keep = [False] * len(ring)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = ring[first], ring[last]
+        length = math.hypot(x2 - x1, y2 - y1)
+        worst, worst_dist = None, tolerance
+        for i in range(first + 1, last):
+            x, y = ring[i]
+            if length == 0:
+                dist = math.hypot(x - x1, y - y1)
+            else:
+                dist = abs((x2 - x1) * (y1 - y) - (x1 - x) * (y2 - y1)) / length
+            if dist > worst_dist:
+                worst, worst_dist = i, dist
+        if worst is not None:
+            keep[worst] = True
+            stack.extend([(first, worst), (worst, last)])
+    return [point for point, kept in zip(ring, keep) if kept]
+
+
+def _signed_area(ring: Ring) -> float:
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:])) / 2
+
+
+def to_multipolygon(rings: List[Ring]) -> List[List[Ring]]:
+    """Group shapefile rings (outer clockwise, holes counter-clockwise) into polygons."""
+    polygons: List[List[Ring]] = []
+    for ring in rings:
+        if _signed_area(ring) < 0 or not polygons:
+            polygons.append([ring])
+        else:
+            polygons[-1].append(ring)
+    return polygons
+
+
+def _member(archive: zipfile.ZipFile, suffix: str) -> bytes:
+    names = [n for n in archive.namelist() if "ProvCM" in n and n.endswith(suffix)]
+    if len(names) != 1:
+        raise ValueError(f"Expected one ProvCM*{suffix} in the archive, found {names}")
+    return archive.read(names[0])
+
+
+def build(archive: zipfile.ZipFile, code: int, tolerance_m: float, source: str) -> dict:
+    """GeoJSON FeatureCollection of province ``code``."""
+    prj = _member(archive, ".prj").decode("latin-1")
+    if "Zone_32N" not in prj.replace(" ", "_"):
+        raise ValueError(f"Expected a UTM zone 32N layer, got: {prj[:80]}")
+
+    records = read_dbf(_member(archive, ".dbf"))
+    shapes = list(read_shp_polygons(_member(archive, ".shp")))
+    matches = [i for i, rec in enumerate(records) if int(rec["COD_PROV"]) == code]
+    if len(matches) != 1:
+        raise ValueError(f"Expected one province with COD_PROV={code}, found {len(matches)}")
+    record, rings = records[matches[0]], shapes[matches[0]]
+
+    polygons = []
+    n_vertices = 0
+    for polygon in to_multipolygon(rings):
+        lonlat_rings = []
+        for ring in polygon:
+            ring = simplify(ring, tolerance_m)
+            if len(ring) < 4:
+                continue
+            # RFC 7946 winding: exterior counter-clockwise, holes clockwise
+            lonlat = [
+                [round(v, 5) for v in utm32n_to_lonlat(x, y)] for x, y in reversed(ring)
+            ]
+            lonlat_rings.append(lonlat)
+            n_vertices += len(lonlat)
+        if lonlat_rings:
+            polygons.append(lonlat_rings)
+
+    name = record.get("DEN_UTS") or record.get("DEN_PROV") or str(code)
+    return {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "properties": {
+                "name": name,
+                "cod_prov": code,
+                "source": ISTAT_ATTRIBUTION,
+                "source_url": source,
+                "licence": ISTAT_LICENCE,
+                "simplification": (
+                    f"Douglas-Peucker, {tolerance_m:g} m tolerance in EPSG:32632, "
+                    f"{n_vertices} vertices; coordinates rounded to 1e-5 deg"
+                ),
+                "generated_by": "tools/build_province_boundary.py",
+            },
+            "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+        }],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Province boundary GeoJSON from ISTAT")
+    parser.add_argument("--zip", type=Path, help="Local ISTAT archive (default: download)")
+    parser.add_argument("--url", default=ISTAT_URL, help="ISTAT archive URL")
+    parser.add_argument("--code", type=int, default=22, help="COD_PROV (22 = Trento)")
+    parser.add_argument("--tolerance-m", type=float, default=250.0,
+                        help="Simplification tolerance in metres")
+    parser.add_argument("--output", type=Path,
+                        default=APP_DIR / "flows" / "geo" / "trentino_province.geojson")
+    args = parser.parse_args()
+
+    if args.zip is not None:
+        archive = zipfile.ZipFile(args.zip)
+    else:
+        response = requests.get(args.url, timeout=300)
+        response.raise_for_status()
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+
+    collection = build(archive, args.code, args.tolerance_m, args.url)
+    args.output.write_text(json.dumps(collection) + "\n")
+    props = collection["features"][0]["properties"]
+    print(f"Wrote {props['name']} ({props['simplification']}) to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+Offline stand-in for the Open-Meteo /v1/forecast endpoint.
+
+Answers GET and form-POST requests the way the live API does for the
+parameters the OM pipelines use:
+
+  latitude, longitude          comma-separated point lists (one result each)
+  hourly, daily, minutely_15   comma-separated variables per section
+  models                       one model, or several: variables get a
+                               ``_<model>`` suffix as on the live API
+  forecast_days, past_days, forecast_hours, past_hours,
+  forecast_minutely_15, past_minutely_15, timezone
+
+Values are synthetic and deterministic per point and variable, or replayed
+from a recorded response body (``--replay``): requested points reuse the
+recorded locations in turn, with the requested coordinates.
+
+Faults can be injected to exercise retries and the circuit breaker:
+every Nth request answered 429 with ``Retry-After``, a random share of
+5xx, a daily-limit 429 after N requests, and a fixed response latency.
+Responses are gzip-compressed when the client accepts it.
+
+Usage:
+    # Serve synthetic responses on :8765
+    python tools/om_standin.py --port 8765
+
+    # Replay a recorded body, with 10% 503s and a 429 every 20 requests
+    python tools/om_standin.py --replay wind_600.json --error-rate 0.1 --rate-limit-every 20
+
+    # Point a pipeline config at it:
+    #   api.base_url: "http://127.0.0.1:8765/v1/forecast"
+
+In tests and benchmarks, ``running_standin(...)`` serves from a background
+thread and yields the endpoint URL.
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import random
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlsplit
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORECAST_PATH = "/v1/forecast"
+
+_SECTION_STEP: Dict[str, timedelta] = {
+    "hourly": timedelta(hours=1),
+    "minutely_15": timedelta(minutes=15),
+    "daily": timedelta(days=1),
+}
+_SECTION_TIME_FORMAT: Dict[str, str] = {
+    "hourly": "%Y-%m-%dT%H:%M",
+    "minutely_15": "%Y-%m-%dT%H:%M",
+    "daily": "%Y-%m-%d",
+}
+# Per-section step-count parameters (forecast, past); days apply otherwise
+_SECTION_STEPS: Dict[str, tuple] = {
+    "hourly": ("forecast_hours", "past_hours"),
+    "minutely_15": ("forecast_minutely_15", "past_minutely_15"),
+}
+_DEFAULT_FORECAST_DAYS = 7
+
+
+class RequestError(ValueError):
+    """Invalid request; answered 400 with the API's error body."""
+
+
+@dataclass
+class StandinConfig:
+    """Behaviour of one stand-in server."""
+
+    seed: int = 0
+    replay: Optional[List[Dict[str, Any]]] = None
+    latency_seconds: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_every: int = 0
+    retry_after: int = 1
+    daily_limit_after: int = 0
+    compress: bool = True
+    now: Optional[datetime] = None
+
+
+@dataclass
+class StandinCounters:
+    """Requests and injected faults served so far."""
+
+    requests: int = 0
+    points: int = 0
+    rate_limited: int = 0
+    server_errors: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+# ---------------------------------------------------------------------------
+# Response generation
+# ---------------------------------------------------------------------------
+
+def _int_param(params: Dict[str, str], name: str, default: Optional[int] = None) -> Optional[int]:
+    if name not in params:
+        return default
+    try:
+        return int(params[name])
+    except ValueError:
+        raise RequestError(f"Parameter '{name}' must be an integer") from None
+
+
+def _time_axis(section: str, params: Dict[str, str], now: datetime) -> List[str]:
+    """Timestamps of one section, in the request's timezone."""
+    step = _SECTION_STEP[section]
+    steps_per_day = timedelta(days=1) // step
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    past_days = _int_param(params, "past_days", 0)
+    forecast_days = _int_param(params, "forecast_days", _DEFAULT_FORECAST_DAYS)
+
+    forecast_key, past_key = _SECTION_STEPS.get(section, (None, None))
+    if forecast_key and (forecast_key in params or past_key in params):
+        # Step counts start at the current step, not at midnight
+        past_steps = _int_param(params, past_key, 0)
+        forecast_steps = _int_param(params, forecast_key, forecast_days * steps_per_day)
+        start = now - (now - midnight) % step - past_steps * step
+        count = past_steps + forecast_steps
+    else:
+        start = midnight - timedelta(days=past_days)
+        count = (past_days + forecast_days) * steps_per_day
+
+    fmt = _SECTION_TIME_FORMAT[section]
+    return [(start + i * step).strftime(fmt) for i in range(count)]
+
+
+def _point_seed(seed: int, lat: float, lon: float, variable: str) -> int:
+    return zlib.crc32(f"{seed}:{lat:.4f}:{lon:.4f}:{variable}".encode())
+
+
+def _synthetic_values(variable: str, n: int, rng: np.random.Generator, lat: float) -> List[Any]:
+    """Plausible values for an Open-Meteo variable name."""
+    phase = np.arange(n) * 2 * np.pi / max(n, 1)
+    if "temperature" in variable:
+        values = 25 - 8 * (lat - 45.5) + 6 * np.sin(phase) + rng.normal(0, 1.0, n)
+    elif "direction" in variable:
+        values = rng.uniform(0, 360, n)
+    elif "gusts" in variable:
+        values = rng.gamma(2.0, 3.0, n) * 1.6
+    elif "wind_speed" in variable:
+        values = rng.gamma(2.0, 3.0, n)
+    elif "precipitation" in variable or "rain" in variable:
+        values = np.where(rng.uniform(size=n) < 0.15, rng.gamma(1.0, 1.5, n), 0.0)
+    elif "cloud" in variable or "humidity" in variable:
+        values = rng.uniform(0, 100, n)
+    elif "radiation" in variable or "irradiance" in variable:
+        values = np.clip(700 * np.sin(phase), 0, None)
+    else:
+        values = rng.normal(0, 1.0, n)
+    return values.round(1).tolist()
+
+
+def _parse_points(params: Dict[str, str]) -> List[tuple]:
+    try:
+        lats = [float(v) for v in params["latitude"].split(",")]
+        lons = [float(v) for v in params["longitude"].split(",")]
+    except KeyError as exc:
+        raise RequestError(f"Parameter '{exc.args[0]}' is required") from None
+    except ValueError:
+        raise RequestError("Latitude and longitude must be numbers") from None
+    if len(lats) != len(lons):
+        raise RequestError("Parameter 'latitude' and 'longitude' must have the same number of elements")
+    return list(zip(lats, lons))
+
+
+def build_response(params: Dict[str, str], config: StandinConfig) -> Any:
+    """Response body (before JSON encoding) for one request."""
+    points = _parse_points(params)
+    timezone = params.get("timezone", "GMT")
+    tz = ZoneInfo("UTC" if timezone in ("GMT", "auto") else timezone)
+    now = (config.now or datetime.now(tz)).astimezone(tz).replace(tzinfo=None)
+    models = [m for m in params.get("models", "").split(",") if m] or [None]
+
+    sections = {
+        section: [v for v in params[section].split(",") if v]
+        for section in _SECTION_STEP if params.get(section)
+    }
+    axes = {section: _time_axis(section, params, now) for section in sections}
+
+    body = []
+    for i, (lat, lon) in enumerate(points):
+        recorded = config.replay[i % len(config.replay)] if config.replay else None
+        location: Dict[str, Any] = {
+            "latitude": lat,
+            "longitude": lon,
+            "generationtime_ms": 0.1,
+            "utc_offset_seconds": int(tz.utcoffset(now).total_seconds()),
+            "timezone": tz.key,
+            "elevation": (
+                recorded.get("elevation") if recorded
+                else float(round(200 + 2800 * abs(np.sin(3 * lat) * np.cos(2 * lon))))
+            ),
+        }
+        for section, variables in sections.items():
+            block: Dict[str, Any] = {"time": axes[section]}
+            for variable in variables:
+                for model in models:
+                    key = f"{variable}_{model}" if len(models) > 1 else variable
+                    if recorded is not None:
+                        try:
+                            block[key] = recorded[section][key]
+                        except KeyError:
+                            raise RequestError(
+                                f"Recorded response has no {section}.{key}"
+                            ) from None
+                        continue
+                    rng = np.random.default_rng(_point_seed(config.seed, lat, lon, key))
+                    block[key] = _synthetic_values(variable, len(axes[section]), rng, lat)
+            if recorded is not None:
+                block["time"] = recorded[section]["time"]
+            location[section] = block
+        body.append(location)
+
+    return body[0] if len(body) == 1 else body
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+class StandinServer(ThreadingHTTPServer):
+    """Threaded HTTP server carrying the stand-in config and counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address, config: StandinConfig):
+        super().__init__(address, _ForecastHandler)
+        self.config = config
+        self.counters = StandinCounters()
+        self.random = random.Random(config.seed)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{FORECAST_PATH}"
+
+
+class _ForecastHandler(BaseHTTPRequestHandler):
+    server: StandinServer
+    protocol_version = "HTTP/1.1"  # keep-alive, as the live API
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s " + format, self.address_string(), *args)
+
+    def do_GET(self) -> None:
+        self._handle(urlsplit(self.path).query)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        self._handle(self.rfile.read(length).decode())
+
+    def _handle(self, query: str) -> None:
+        if urlsplit(self.path).path != FORECAST_PATH:
+            self._send(404, {"error": True, "reason": "Not Found"})
+            return
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        config = self.server.config
+        counters = self.server.counters
+
+        with counters._lock:
+            counters.requests += 1
+            number = counters.requests
+            fault = None
+            if config.daily_limit_after and number > config.daily_limit_after:
+                fault = "daily"
+            elif config.rate_limit_every and number % config.rate_limit_every == 0:
+                fault = "minutely"
+            elif config.error_rate and self.server.random.random() < config.error_rate:
+                fault = "server"
+            if fault in ("daily", "minutely"):
+                counters.rate_limited += 1
+            elif fault == "server":
+                counters.server_errors += 1
+
+        if config.latency_seconds:
+            threading.Event().wait(config.latency_seconds)
+
+        if fault == "daily":
+            self._send(429, {"error": True, "reason": "Daily API request limit exceeded. Please try again tomorrow."})
+            return
+        if fault == "minutely":
+            self._send(
+                429,
+                {"error": True, "reason": "Minutely API request limit exceeded. Please try again in one minute."},
+                headers={"Retry-After": str(config.retry_after)},
+            )
+            return
+        if fault == "server":
+            status = self.server.random.choice([500, 502, 503, 504])
+            headers = {"Retry-After": str(config.retry_after)} if status == 503 else {}
+            self._send(status, {"error": True, "reason": "Injected server error"}, headers=headers)
+            return
+
+        try:
+            body = build_response(params, config)
+        except RequestError as exc:
+            self._send(400, {"error": True, "reason": str(exc)})
+            return
+        with counters._lock:
+            counters.points += len(body) if isinstance(body, list) else 1
+        self._send(200, body)
+
+    def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body).encode()
+        compress = (
+            self.server.config.compress
+            and "gzip" in self.headers.get("Accept-Encoding", "")
+        )
+        if compress:
+            payload = gzip.compress(payload, compresslevel=5)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def load_replay(path: Path) -> List[Dict[str, Any]]:
+    """Per-location objects of a recorded /v1/forecast response body."""
+    recorded = json.loads(path.read_bytes())
+    return recorded if isinstance(recorded, list) else [recorded]
+
+
+@contextmanager
+def running_standin(
+    config: Optional[StandinConfig] = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> Iterator[StandinServer]:
+    """Serve from a background thread; ``server.url`` is the endpoint."""
+    server = StandinServer((host, port), config or StandinConfig())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Open-Meteo /v1/forecast stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic value seed")
+    parser.add_argument("--replay", type=Path, help="Recorded response body to replay")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added per-response latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 5xx responses")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="429 every Nth request")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429/503")
+    parser.add_argument("--daily-limit-after", type=int, default=0, help="Daily-limit 429 after N requests")
+    parser.add_argument("--no-compress", action="store_true", help="Never gzip responses")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    config = StandinConfig(
+        seed=args.seed,
+        replay=load_replay(args.replay) if args.replay else None,
+        latency_seconds=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        rate_limit_every=args.rate_limit_every,
+        retry_after=args.retry_after,
+        daily_limit_after=args.daily_limit_after,
+        compress=not args.no_compress,
+    )
+    server = StandinServer((args.host, args.port), config)
+    logger.info("Open-Meteo stand-in serving %s", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        counters = server.counters
+        logger.info(
+            "Served %d requests (%d points), %d rate-limited, %d server errors",
+            counters.requests, counters.points, counters.rate_limited, counters.server_errors,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ from typing import Any
 import pandas as pd
 import sqlalchemy as sa
 
+from pg_bulk import copy_dataframe
+from pg_engines import get_engine as get_pooled_engine
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,7 +17,8 @@ def get_engine(
     password: str = "securepassword123",
     dbname: str = "datasets",
 ) -> sa.Engine:
-    return sa.create_engine(
+    """Shared pooled engine for the given connection parameters."""
+    return get_pooled_engine(
         f"postgresql://{user}:{password}@{host}:{port}/{dbname}"
     )
 
@@ -43,10 +47,8 @@ def load_predictions(
     df = df.copy()
     df["_sdc_extracted_at"] = pd.Timestamp.now()
 
-    ensure_schema(engine, schema)
     with engine.begin() as conn:
-        df.to_sql(table, conn, schema=schema, if_exists="append", index=False)
-    return len(df)
+        return copy_dataframe(conn, df, schema, table)
 
 
 def already_processed(
@@ -12,15 +12,23 @@ from __future__ import annotations
 
 import logging
 import os
+import sys
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from typing import Any
 
 import pandas as pd
 from prefect import task
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
 from celine.utils.pipelines.pipeline import PipelineConfig
 
+_APP_DIR = Path(__file__).resolve().parent.parent
+if str(_APP_DIR) not in sys.path:
+    sys.path.insert(0, str(_APP_DIR))
+
+from lib.pg_engines import get_engine  # noqa: E402
+
 logger = logging.getLogger(__name__)
 
 AUTO_COMMIT_ENV = "AUTO_COMMIT_ENABLED"
@@ -47,7 +55,7 @@ def auto_commit_task(cfg: PipelineConfig) -> int:
         logger.info("Auto-commit disabled (%s not set). Skipping.", AUTO_COMMIT_ENV)
         return 0
 
-    engine = create_engine(_build_db_url(cfg.model_dump()))
+    engine = get_engine(_build_db_url(cfg.model_dump()))
     now = datetime.now(timezone.utc)
     today = now.date()
     tomorrow = today + timedelta(days=1)
@@ -5,13 +5,15 @@ from __future__ import annotations
 import logging
 import os
 import sys
+import time
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 import numpy as np
 import pandas as pd
 from prefect import task
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
 from celine.utils.pipelines.pipeline import PipelineConfig
 
@@ -20,8 +22,13 @@ if str(_APP_DIR) not in sys.path:
     sys.path.insert(0, str(_APP_DIR))
 
 from lib import baselines as bl  # noqa: E402
+from lib import fleet_baselines as fb  # noqa: E402
+from lib import meter_daily as md  # noqa: E402
 from lib import meters as mt  # noqa: E402
+from lib import sharding  # noqa: E402
 from lib.config import get_active_devices, load_config  # noqa: E402
+from lib.pg_bulk import copy_dataframe  # noqa: E402
+from lib.pg_engines import get_engine  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
@@ -38,27 +45,27 @@ def _build_db_url(cfg: dict[str, Any]) -> str:
 
 
 def _prepare_history(
-    engine, lookback_days: int, devices: list[str] | None = None
+    engine, lookback_days: int, devices: list[str] | None = None, float32: bool = False
 ) -> pd.DataFrame:
-    """rec_meters_15m (over gold meters_data_15m) -> time features -> renamed bases.
+    """_rec_meter_device_day (per-day, per-slot aggregate of rec_meters_15m) -> bases.
 
-    Returns a per-(device, ts) frame carrying every basis the v2 settlement needs.
-    All columns already arrive as kWh per 15-min bucket — no unit conversion:
+    Returns one row per (device, date, slot) carrying every basis the v2 settlement
+    needs, sorted by bucket start ``ts`` so shorter windows can be cut with
+    ``mt.lookback_slice``. Values are kWh per 15-min bucket — no unit conversion:
 
     - ``grid_import_kwh``       = consumption_kwh (energy drawn from grid)
     - ``grid_export_kwh``       = production_kwh (energy fed to grid)
     - ``total_consumption_kwh`` = behind-meter total (grid import + self-consumed PV)
-    - ``pv_production_kwh``     = gross PV (used only for M1-only detection)
+    - ``pv_production_kwh``     = gross PV (max; used only for M1-only detection)
+    - ``grid_export_total_kwh`` = summed export (clear-day ranking)
+    - ``readings``              = view rows behind the bucket
+
+    The (widest-window) frame is read in compact dtypes: categorical ``device_id``,
+    int8 ``slot``, int32 ``date`` day numbers and, with ``float32``, float32 kWh.
     """
-    merged = mt.load_meters(engine, lookback_days=lookback_days, devices=devices)
-    merged = mt.add_time_features(merged)
-    merged = merged.rename(
-        columns={
-            "consumption_kwh": "grid_import_kwh",
-            "production_kwh": "grid_export_kwh",
-        }
+    return md.load_daily(
+        engine, GOLD_SCHEMA, lookback_days=lookback_days, devices=devices, float32=float32
     )
-    return merged
 
 
 def _identify_m1_only(history: pd.DataFrame) -> set[str]:
@@ -67,7 +74,7 @@ def _identify_m1_only(history: pd.DataFrame) -> set[str]:
     SQL parity: ``rec_device_class.is_m1_only`` / gamification v2
     ``identify_m1_only_devices``. These devices use the consumption proxy.
     """
-    by_dev = history.groupby("device_id")["pv_production_kwh"].max()
+    by_dev = history.groupby("device_id", observed=True)["pv_production_kwh"].max()
     return set(by_dev[by_dev == 0.0].index)
 
 
@@ -80,23 +87,11 @@ def _grid_export_median_frame(
     (longer) reference window for stability and persisted so dbt can rebuild the
     per-interval proxy at settlement time.
     """
-    rows: list[dict[str, Any]] = []
     if not m1_only:
         return pd.DataFrame(columns=["device_id", "slot", "is_weekday", "ge_median_kwh"])
     scoped = history_reference[history_reference["device_id"].isin(m1_only)]
-    for device_id, df_dev in scoped.groupby("device_id"):
-        med = bl.compute_median_baseline(df_dev, value_col="grid_export_kwh")
-        for (slot, is_wkday), val in med.items():
-            rows.append(
-                {
-                    "device_id": device_id,
-                    "slot": slot,
-                    "is_weekday": is_wkday,
-                    "ge_median_kwh": val,
-                }
-            )
-    return pd.DataFrame(
-        rows, columns=["device_id", "slot", "is_weekday", "ge_median_kwh"]
+    return fb.fleet_median(scoped, value_col="grid_export_kwh").rename(
+        columns={"baseline_kwh": "ge_median_kwh"}
     )
 
 
@@ -134,76 +129,78 @@ def _apply_consumption_basis(
         sub["grid_export_kwh"].to_numpy(dtype=float),
         ge_base,
     )
-    history.loc[mask, "consumption_kwh"] = proxy
+    history.loc[mask, "consumption_kwh"] = proxy.astype(history["consumption_kwh"].dtype)
     return history
 
 
-@task(name="Compute Baselines", retries=2, retry_delay_seconds=60)
-def compute_baselines_task(cfg: PipelineConfig) -> int:
-    """Compute settlement (rolling) and reference (winsorized) baselines.
-
-    Writes to ``{CELINE_GOLD_SCHEMA}._rec_device_baselines_raw``.
-    """
-    yaml_cfg = load_config()
+def _widest_days(yaml_cfg: dict[str, Any]) -> int:
+    """Longest lookback of the settlement, reference and window-promise baselines."""
     bl_cfg = yaml_cfg["baseline"]
-    ref_cfg = bl_cfg["bonus_reference"]
-    active_devices = get_active_devices(yaml_cfg) or None
+    return max(
+        bl_cfg["candidate_days"],
+        bl_cfg["bonus_reference"]["lookback_days"],
+        yaml_cfg["window_promise"]["lookback_days"],
+    )
 
-    engine = create_engine(_build_db_url(cfg.model_dump()))
 
-    today_utc = pd.Timestamp.now(tz="UTC").normalize()
+def _compute_baselines(
+    history: pd.DataFrame, yaml_cfg: dict[str, Any], now: pd.Timestamp
+) -> tuple[list[pd.DataFrame], set[str], list[str]]:
+    """All baseline types of the devices in ``history`` (widest window, ts-sorted).
 
-    history_settlement = _prepare_history(
-        engine, lookback_days=bl_cfg["candidate_days"], devices=active_devices
-    )
-    history_reference = _prepare_history(
-        engine, lookback_days=ref_cfg["lookback_days"], devices=active_devices
-    )
+    Returns:
+        Non-empty tagged baseline frames, the M1-only devices and the cold-start
+        devices (no shift_potential rows).
+    """
+    bl_cfg = yaml_cfg["baseline"]
+    ref_cfg = bl_cfg["bonus_reference"]
+    wp_cfg = yaml_cfg["window_promise"]
+    today_utc = now.normalize()
 
     # v2: M1-only devices use the consumption proxy; everyone else uses behind-meter
     # total. M1-only detection runs over the long reference window (a device must
     # *never* report PV to qualify).
+    history_reference = mt.lookback_slice(history, ref_cfg["lookback_days"], now)
     m1_only = _identify_m1_only(history_reference)
     ge_med = _grid_export_median_frame(history_reference, m1_only)
-    history_settlement = _apply_consumption_basis(history_settlement, m1_only, ge_med)
-    history_reference = _apply_consumption_basis(history_reference, m1_only, ge_med)
-    logger.info(
-        "Fleet=%s devices, M1-only=%s: %s",
-        len(active_devices) if active_devices else "all",
-        len(m1_only),
-        sorted(m1_only),
-    )
-
-    frames = []
-    for device_id, df_dev in history_settlement.groupby("device_id"):
-        settlement = bl.compute_settlement_baseline(
-            df_dev,
-            select=bl_cfg["select_days"],
-            candidates=bl_cfg["candidate_days"],
-            min_readings=bl_cfg["min_readings_per_day"],
-        )
-        frames.append(bl.baselines_to_dataframe(settlement, device_id, "settlement", today_utc))
-
-    for device_id, df_dev in history_reference.groupby("device_id"):
-        reference = bl.compute_winsorized_reference_baseline(
-            df_dev,
-            select=bl_cfg["select_days"],
-            candidates=bl_cfg["candidate_days"],
-            min_readings=bl_cfg["min_readings_per_day"],
-            winsorize_pct=ref_cfg["winsorize_pct"],
-        )
-        frames.append(bl.baselines_to_dataframe(reference, device_id, "reference", today_utc))
-
-    # v2: persist the median grid-export reference for M1-only devices so the dbt
-    # settlement model can rebuild the per-interval consumption proxy.
-    for device_id, df_dev in ge_med.groupby("device_id"):
-        ge_dict = {
-            (int(r.slot), bool(r.is_weekday)): float(r.ge_median_kwh)
-            for r in df_dev.itertuples()
-        }
-        frames.append(
-            bl.baselines_to_dataframe(ge_dict, device_id, "grid_export_median", today_utc)
-        )
+    history = _apply_consumption_basis(history, m1_only, ge_med)
+    history_settlement = mt.lookback_slice(history, bl_cfg["candidate_days"], now)
+    history_reference = mt.lookback_slice(history, ref_cfg["lookback_days"], now)
+
+    # One fleet-wide pass per baseline type (lib/fleet_baselines.py), identical to
+    # the per-device functions in lib/baselines.py.
+    frames = [
+        fb.tag_baselines(
+            fb.fleet_high_x_of_y(
+                history_settlement,
+                select=bl_cfg["select_days"],
+                candidates=bl_cfg["candidate_days"],
+                min_readings=bl_cfg["min_readings_per_day"],
+                readings_col="readings",
+            ),
+            "settlement",
+            today_utc,
+        ),
+        fb.tag_baselines(
+            fb.fleet_high_x_of_y(
+                history_reference,
+                select=bl_cfg["select_days"],
+                candidates=bl_cfg["candidate_days"],
+                min_readings=bl_cfg["min_readings_per_day"],
+                winsorize_pct=ref_cfg["winsorize_pct"],
+                readings_col="readings",
+            ),
+            "reference",
+            today_utc,
+        ),
+        # v2: persist the median grid-export reference for M1-only devices so the dbt
+        # settlement model can rebuild the per-interval consumption proxy.
+        fb.tag_baselines(
+            ge_med.rename(columns={"ge_median_kwh": "baseline_kwh"}),
+            "grid_export_median",
+            today_utc,
+        ),
+    ]
 
     # v3 window promise: upward spread of the settlement consumption basis
     # (shift_potential) and, for M1-only devices, of grid import (import_spread).
@@ -211,44 +208,176 @@ def compute_baselines_task(cfg: PipelineConfig) -> int:
     # rows — that absence is the cold-start marker rec_flexibility_windows keys its
     # forecast fallback on. Settlement/reference writes above are NOT gated (they
     # drive payments and must not change).
-    wp_cfg = yaml_cfg["window_promise"]
-    history_promise = _prepare_history(
-        engine, lookback_days=wp_cfg["lookback_days"], devices=active_devices
-    )
-    history_promise = _apply_consumption_basis(history_promise, m1_only, ge_med)
-    day_counts = history_promise.groupby("device_id")["date"].nunique()
-    total_exports = history_promise.groupby("device_id")["grid_export_kwh"].sum()
-
-    for device_id, df_dev in history_promise.groupby("device_id"):
-        if int(day_counts.get(device_id, 0)) < wp_cfg["min_history_days"]:
-            logger.info(
-                "Cold start: skipping shift_potential for %s (<%s days).",
-                device_id,
-                wp_cfg["min_history_days"],
-            )
-            continue
-        is_pv = float(total_exports.get(device_id, 0.0)) > wp_cfg["pv_export_threshold_kwh"]
-        spread = bl.compute_upward_spread(
-            df_dev,
-            value_col="consumption_kwh",
-            q_hi=wp_cfg["shift_q_hi"],
-            q_lo=wp_cfg["shift_q_lo"],
-            clear_top=wp_cfg["clear_top_days"] if is_pv else None,
-        )
-        frames.append(
-            bl.baselines_to_dataframe(spread, device_id, "shift_potential", today_utc)
+    history_promise = mt.lookback_slice(history, wp_cfg["lookback_days"], now)
+    by_device = history_promise.groupby("device_id", observed=True)
+    day_counts = by_device["date"].nunique()
+    total_exports = by_device["grid_export_total_kwh"].sum()
+
+    cold_start = sorted(day_counts[day_counts < wp_cfg["min_history_days"]].index)
+    history_promise = history_promise[~history_promise["device_id"].isin(cold_start)]
+    pv_devices = set(total_exports[total_exports > wp_cfg["pv_export_threshold_kwh"]].index)
+    frames.append(
+        fb.tag_baselines(
+            fb.fleet_upward_spread(
+                history_promise,
+                value_col="consumption_kwh",
+                q_hi=wp_cfg["shift_q_hi"],
+                q_lo=wp_cfg["shift_q_lo"],
+                clear_top=wp_cfg["clear_top_days"],
+                clear_top_devices=pv_devices,
+                export_col="grid_export_total_kwh",
+            ),
+            "shift_potential",
+            today_utc,
         )
-        if device_id in m1_only:
-            imp_spread = bl.compute_upward_spread(
-                df_dev,
+    )
+    frames.append(
+        fb.tag_baselines(
+            fb.fleet_upward_spread(
+                history_promise[history_promise["device_id"].isin(m1_only)],
                 value_col="grid_import_kwh",
                 q_hi=wp_cfg["shift_q_hi"],
                 q_lo=wp_cfg["shift_q_lo"],
-                clear_top=None,
-            )
-            frames.append(
-                bl.baselines_to_dataframe(imp_spread, device_id, "import_spread", today_utc)
-            )
+            ),
+            "import_spread",
+            today_utc,
+        )
+    )
+    return [frame for frame in frames if not frame.empty], m1_only, cold_start
+
+
+@dataclass
+class _ShardResult:
+    """Baselines of one device shard plus what the parent logs about it."""
+
+    index: int
+    devices: int
+    frames: list[pd.DataFrame]
+    m1_only: set[str]
+    cold_start: list[str]
+    rows_read: int
+    read_seconds: float
+    compute_seconds: float
+
+
+def _compute_shard(
+    args: tuple[int, str, list[str], dict[str, Any], pd.Timestamp],
+) -> _ShardResult:
+    """Worker for ``sharding.run_shards``. Must be top-level and picklable.
+
+    Reads only the shard's devices (``device_id = any(:devices)``) and computes
+    their baselines; nothing is written here.
+    """
+    index, db_url, devices, yaml_cfg, now = args
+    engine = get_engine(db_url)
+
+    start = time.perf_counter()
+    history = _prepare_history(
+        engine,
+        lookback_days=_widest_days(yaml_cfg),
+        devices=devices,
+        float32=yaml_cfg["baseline"]["daily_aggregate"]["float32_kwh"],
+    )
+    read_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames, m1_only, cold_start = _compute_baselines(history, yaml_cfg, now)
+    return _ShardResult(
+        index=index,
+        devices=len(devices),
+        frames=frames,
+        m1_only=m1_only,
+        cold_start=cold_start,
+        rows_read=len(history),
+        read_seconds=read_seconds,
+        compute_seconds=time.perf_counter() - start,
+    )
+
+
+@task(name="Compute Baselines", retries=2, retry_delay_seconds=60)
+def compute_baselines_task(cfg: PipelineConfig) -> int:
+    """Compute settlement (rolling) and reference (winsorized) baselines.
+
+    The fleet is split into device shards (``baseline.sharding``), each read and
+    computed by a worker process; the results are merged into one write to
+    ``{CELINE_GOLD_SCHEMA}._rec_device_baselines_raw``.
+    """
+    yaml_cfg = load_config()
+    bl_cfg = yaml_cfg["baseline"]
+    shard_cfg = bl_cfg["sharding"]
+    wp_cfg = yaml_cfg["window_promise"]
+    active_devices = get_active_devices(yaml_cfg) or None
+
+    db_url = _build_db_url(cfg.model_dump())
+    engine = get_engine(db_url)
+    now = pd.Timestamp.now(tz="UTC")
+
+    # Fold the readings that arrived since the last run into the daily aggregate;
+    # each shard then reads the widest window of it once and cuts the settlement,
+    # reference and window-promise histories as ts-slices (no re-query).
+    md.refresh_daily_aggregate(
+        engine,
+        GOLD_SCHEMA,
+        backfill_days=_widest_days(yaml_cfg),
+        refresh_days=bl_cfg["daily_aggregate"]["refresh_days"],
+        devices=active_devices,
+        now=now,
+    )
+
+    shards = sharding.shard_devices(
+        active_devices or md.list_devices(engine, GOLD_SCHEMA), shard_cfg["shard_size"]
+    )
+    workers = sharding.resolve_workers(shard_cfg["workers"], len(shards))
+    logger.info(
+        "Computing baselines for %d devices in %d shards on %d workers.",
+        sum(len(shard) for shard in shards),
+        len(shards),
+        workers,
+    )
+
+    start = time.perf_counter()
+    frames: list[pd.DataFrame] = []
+    m1_only: set[str] = set()
+    cold_start: list[str] = []
+    busy_seconds = 0.0
+    for result in sharding.run_shards(
+        _compute_shard,
+        [(i, db_url, shard, yaml_cfg, now) for i, shard in enumerate(shards)],
+        workers=workers,
+    ):
+        logger.info(
+            "Shard %d/%d: %d devices, read %d rows in %.2fs, computed in %.2fs.",
+            result.index + 1,
+            len(shards),
+            result.devices,
+            result.rows_read,
+            result.read_seconds,
+            result.compute_seconds,
+        )
+        frames.extend(result.frames)
+        m1_only |= result.m1_only
+        cold_start.extend(result.cold_start)
+        busy_seconds += result.read_seconds + result.compute_seconds
+    # busy / wall close to the worker count means the shards keep every worker busy
+    logger.info(
+        "Computed %d shards in %.2fs wall, %.2fs summed over shards.",
+        len(shards),
+        time.perf_counter() - start,
+        busy_seconds,
+    )
+
+    logger.info(
+        "Fleet=%s devices, M1-only=%s: %s",
+        len(active_devices) if active_devices else "all",
+        len(m1_only),
+        sorted(m1_only),
+    )
+    for device_id in cold_start:
+        logger.info(
+            "Cold start: skipping shift_potential for %s (<%s days).",
+            device_id,
+            wp_cfg["min_history_days"],
+        )
 
     if not frames:
         logger.warning("No baseline rows computed.")
@@ -274,7 +403,7 @@ def compute_baselines_task(cfg: PipelineConfig) -> int:
             )
         )
         conn.execute(text(f"DELETE FROM {GOLD_SCHEMA}.{RAW_TABLE}"))
-        out_df.to_sql(RAW_TABLE, conn, schema=GOLD_SCHEMA, if_exists="append", index=False)
+        copy_dataframe(conn, out_df, GOLD_SCHEMA, RAW_TABLE, create=False)
 
     logger.info("Wrote %d baseline rows.", len(out_df))
     return len(out_df)
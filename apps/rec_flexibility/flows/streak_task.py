@@ -10,7 +10,7 @@ from typing import Any
 
 import pandas as pd
 from prefect import task
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 
 from celine.utils.pipelines.pipeline import PipelineConfig
 
@@ -20,6 +20,8 @@ if str(_APP_DIR) not in sys.path:
 
 from lib import streaks as st  # noqa: E402
 from lib.config import get_active_devices, load_config  # noqa: E402
+from lib.pg_bulk import copy_dataframe  # noqa: E402
+from lib.pg_engines import get_engine  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
@@ -79,7 +81,7 @@ def update_streaks_task(cfg: PipelineConfig) -> int:
     streak_cfg = yaml_cfg["flexibility_bonus"]["streak"]
     active_devices = get_active_devices(yaml_cfg) or None
 
-    engine = create_engine(_build_db_url(cfg.model_dump()))
+    engine = get_engine(_build_db_url(cfg.model_dump()))
 
     now = pd.Timestamp.now(tz="UTC").normalize()
     week_start = now - pd.Timedelta(days=7)
@@ -121,7 +123,7 @@ def update_streaks_task(cfg: PipelineConfig) -> int:
         )
         conn.execute(text(f"DELETE FROM {GOLD_SCHEMA}.{RAW_TABLE}"))
         if not out_df.empty:
-            out_df.to_sql(RAW_TABLE, conn, schema=GOLD_SCHEMA, if_exists="append", index=False)
+            copy_dataframe(conn, out_df, GOLD_SCHEMA, RAW_TABLE, create=False)
 
     logger.info("Wrote %d streak rows.", len(out_df))
     return len(out_df)
@@ -0,0 +1,290 @@
+"""Fleet-wide baseline engine: every device in one pass of grouped numpy ops.
+
+``lib/baselines.py`` computes one device at a time and, inside each device,
+loops over its 192 ``(slot, is_weekday)`` buckets. That is ~400 Python
+iterations (each with its own sort and quantiles) per device and baseline
+type. This module computes the same baselines for the whole fleet at once:
+
+- one pandas groupby builds the daily per-slot values of every device,
+  sorted by ``(device_id, slot, is_weekday, date)``, so every bucket is a
+  contiguous segment of one array;
+- quantiles, winsorizing, the last-``candidates`` window and the top-k mean
+  are segment operations on that array (``np.lexsort`` within segments,
+  offsets from ``np.bincount``).
+
+Results are identical, bit for bit, to the per-device functions: the
+segment quantile reproduces ``np.quantile``'s linear interpolation, and the
+top-k mean sums the same sorted values in the same order.
+
+Every function returns a long frame with columns ``device_id``, ``slot``,
+``is_weekday``, ``baseline_kwh``. ``tag_baselines`` adds the
+``baseline_type`` and ``computed_at`` columns of
+``baselines.baselines_to_dataframe``.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Collection
+
+import numpy as np
+import pandas as pd
+
+_BUCKET = ["device_id", "slot", "is_weekday"]
+_COLUMNS = [*_BUCKET, "baseline_kwh"]
+
+
+def segment_quantile(
+    sorted_values: np.ndarray,
+    starts: np.ndarray,
+    counts: np.ndarray,
+    q: float,
+) -> np.ndarray:
+    """``np.quantile(segment, q)`` (linear method) of every segment.
+
+    Args:
+        sorted_values: Values sorted ascending within each segment, NaN last.
+        starts: Offset of each segment in ``sorted_values``.
+        counts: Length of each segment (>= 1).
+        q: Quantile in [0, 1].
+
+    Returns:
+        One quantile per segment; NaN for segments containing NaN.
+    """
+    # Same arithmetic as numpy's _quantile / _lerp, vectorized over segments
+    virtual = (counts - 1) * q
+    previous = np.floor(virtual)
+    above = virtual >= counts - 1
+    previous[above] = -1
+    gamma = virtual - previous
+    lower = np.where(above, counts - 1, previous).astype(np.intp)
+    upper = np.where(above, counts - 1, previous + 1).astype(np.intp)
+
+    a = sorted_values[starts + lower]
+    b = sorted_values[starts + upper]
+    diff = b - a
+    result = a + diff * gamma
+    high = gamma >= 0.5
+    result[high] = (b - diff * (1 - gamma))[high]
+    result[np.isnan(sorted_values[starts + counts - 1])] = np.nan
+    return result
+
+
+def _daily_values(
+    history: pd.DataFrame, value_col: str, readings_col: str | None = None
+) -> pd.DataFrame:
+    """Mean and reading count of ``value_col`` per device, bucket and date.
+
+    With ``readings_col`` the rows are already per-day aggregates
+    (``meter_daily``) and their reading counts are summed instead of counted.
+    """
+    readings = (readings_col, "sum") if readings_col else (value_col, "size")
+    return (
+        history.groupby([*_BUCKET, "date"], sort=True, observed=True)
+        .agg(kwh=(value_col, "mean"), readings=readings)
+        .reset_index()
+    )
+
+
+def _segments(daily: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """Segment id of each row and start offset of each bucket segment."""
+    change = np.zeros(len(daily), dtype=bool)
+    change[:1] = True
+    for col in _BUCKET:
+        values = daily[col].to_numpy()
+        change[1:] |= values[1:] != values[:-1]
+    return np.cumsum(change) - 1, np.flatnonzero(change)
+
+
+def _bucket_frame(daily: pd.DataFrame, starts: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    """Long result frame: the bucket of each segment and its value."""
+    firsts = daily.iloc[starts]
+    return pd.DataFrame({
+        "device_id": firsts["device_id"].to_numpy(),
+        "slot": firsts["slot"].to_numpy().astype(int),
+        "is_weekday": firsts["is_weekday"].to_numpy().astype(bool),
+        "baseline_kwh": values,
+    })
+
+
+def _top_k_mean(
+    values: np.ndarray,
+    seg: np.ndarray,
+    n_segments: int,
+    select: int,
+) -> np.ndarray:
+    """Mean of the ``select`` largest values of each segment (fewer if short).
+
+    Rows of equal ``k`` are gathered into one ``(n, k)`` matrix, so each mean
+    adds the same ascending values in the same order as
+    ``np.sort(arr)[-k:].mean()``.
+    """
+    order = np.lexsort((values, seg))
+    values, seg = values[order], seg[order]
+    counts = np.bincount(seg, minlength=n_segments)
+    ends = np.cumsum(counts)
+    k = np.minimum(counts, select)
+    means = np.full(n_segments, np.nan)
+    for width in np.unique(k[k > 0]):
+        rows = np.flatnonzero(k == width)
+        columns = ends[rows, None] - width + np.arange(width)
+        means[rows] = values[columns].mean(axis=1)
+    return means
+
+
+def fleet_high_x_of_y(
+    history: pd.DataFrame,
+    select: int = 4,
+    candidates: int = 7,
+    min_readings: int = 90,
+    winsorize_pct: float | None = None,
+    value_col: str = "consumption_kwh",
+    readings_col: str | None = None,
+) -> pd.DataFrame:
+    """High ``select`` of ``candidates`` per (device, slot, is_weekday).
+
+    Fleet equivalent of ``baselines._baseline_per_slot_weekday``: daily means
+    per slot, days with too few readings dropped, optional winsorizing of
+    buckets with at least 4 days, then the mean of the top ``select`` of the
+    last ``candidates`` days.
+
+    Args:
+        history: Fleet frame with ``device_id``, ``slot``, ``is_weekday``,
+            ``date`` and ``value_col``.
+        select: Number of top days to average.
+        candidates: Number of most recent days to consider.
+        min_readings: Minimum readings per day (divided by 96 per slot).
+        winsorize_pct: Trim daily values outside these quantiles first.
+        value_col: Column to aggregate.
+        readings_col: Readings behind each row, for pre-aggregated daily
+            input; ``None`` counts rows.
+
+    Returns:
+        Long frame of baselines; buckets left empty by trimming are absent.
+    """
+    daily = _daily_values(history, value_col, readings_col)
+    daily = daily[daily["readings"].to_numpy() >= max(1, min_readings // 96)]
+    if daily.empty:
+        return pd.DataFrame(columns=_COLUMNS)
+
+    seg, starts = _segments(daily)
+    n_segments = len(starts)
+    values = daily["kwh"].to_numpy(dtype=float)
+
+    keep = np.ones(len(values), dtype=bool)
+    if winsorize_pct and 0.0 < winsorize_pct < 0.5:
+        counts = np.diff(np.append(starts, len(values)))
+        sorted_values = values[np.lexsort((values, seg))]
+        lo = segment_quantile(sorted_values, starts, counts, winsorize_pct)
+        hi = segment_quantile(sorted_values, starts, counts, 1.0 - winsorize_pct)
+        trimmed = (counts >= 4)[seg]
+        keep = ~trimmed | ((values >= lo[seg]) & (values <= hi[seg]))
+
+    # Last `candidates` kept days of each segment (rows are date-sorted)
+    kept = np.flatnonzero(keep)
+    kept_counts = np.bincount(seg[kept], minlength=n_segments)
+    from_end = np.cumsum(kept_counts)[seg[kept]] - np.arange(len(kept)) - 1
+    recent = kept[from_end < candidates]
+
+    means = _top_k_mean(values[recent], seg[recent], n_segments, select)
+    present = kept_counts > 0
+    return _bucket_frame(daily, starts[present], means[present])
+
+
+def fleet_median(history: pd.DataFrame, value_col: str = "grid_export_kwh") -> pd.DataFrame:
+    """Per (device, slot, is_weekday) median of ``value_col``.
+
+    Fleet equivalent of ``baselines.compute_median_baseline``.
+    """
+    if history.empty:
+        return pd.DataFrame(columns=_COLUMNS)
+    medians = history.groupby(_BUCKET, sort=True, observed=True)[value_col].median()
+    out = medians.rename("baseline_kwh").reset_index()
+    out["slot"] = out["slot"].astype(int)
+    out["is_weekday"] = out["is_weekday"].astype(bool)
+    out["device_id"] = out["device_id"].astype(object)
+    return out[_COLUMNS]
+
+
+def _clearest_days(
+    history: pd.DataFrame,
+    clear_top: int,
+    devices: Collection[str],
+    export_col: str,
+) -> pd.DataFrame:
+    """Keep only the ``clear_top`` highest-export days of ``devices``.
+
+    Ties are broken by earlier date, as ``Series.nlargest(keep="first")``.
+    Other devices keep all their rows.
+    """
+    daily_export = (
+        history[history["device_id"].isin(devices)]
+        .groupby(["device_id", "date"], sort=True, observed=True)[export_col]
+        .sum()
+    )
+    device_codes = pd.factorize(daily_export.index.get_level_values("device_id"))[0]
+    exports = daily_export.to_numpy(dtype=float)
+    order = np.lexsort((np.arange(len(exports)), -exports, device_codes))
+    starts = np.searchsorted(device_codes[order], device_codes[order], side="left")
+    clearest = daily_export.index[order[np.arange(len(order)) - starts < clear_top]]
+
+    keys = pd.MultiIndex.from_arrays([history["device_id"], history["date"]])
+    keep = ~history["device_id"].isin(devices).to_numpy() | keys.isin(clearest)
+    return history[keep]
+
+
+def fleet_upward_spread(
+    history: pd.DataFrame,
+    value_col: str = "consumption_kwh",
+    q_hi: float = 0.75,
+    q_lo: float = 0.5,
+    clear_top: int | None = None,
+    clear_top_devices: Collection[str] = (),
+    export_col: str = "grid_export_kwh",
+) -> pd.DataFrame:
+    """Per (device, slot, is_weekday) ``clip(q_hi − q_lo, 0)`` of daily values.
+
+    Fleet equivalent of ``baselines.compute_upward_spread``, with the
+    clear-day filter applied to ``clear_top_devices`` only (the PV devices).
+
+    Args:
+        history: Fleet frame with ``device_id``, ``slot``, ``is_weekday``,
+            ``date``, ``value_col`` (and ``export_col`` for the filter).
+        value_col: Column to measure.
+        q_hi: Upper quantile of daily per-slot values.
+        q_lo: Lower quantile of daily per-slot values.
+        clear_top: Days with the highest total export to keep per device.
+        clear_top_devices: Devices the clear-day filter applies to.
+        export_col: Export column summed per day to rank clear days.
+
+    Returns:
+        Long frame of spreads.
+    """
+    data = history
+    if clear_top is not None and len(clear_top_devices) and export_col in history.columns:
+        data = _clearest_days(history, clear_top, clear_top_devices, export_col)
+
+    daily = _daily_values(data, value_col)
+    if daily.empty:
+        return pd.DataFrame(columns=_COLUMNS)
+    seg, starts = _segments(daily)
+    values = daily["kwh"].to_numpy(dtype=float)
+    counts = np.diff(np.append(starts, len(values)))
+    sorted_values = values[np.lexsort((values, seg))]
+    spread = (
+        segment_quantile(sorted_values, starts, counts, q_hi)
+        - segment_quantile(sorted_values, starts, counts, q_lo)
+    )
+    # max(0.0, spread): NaN spreads become 0 as well
+    spread = np.where(spread > 0.0, spread, 0.0)
+    return _bucket_frame(daily, starts, spread)
+
+
+def tag_baselines(
+    baselines: pd.DataFrame,
+    baseline_type: str,
+    computed_at: pd.Timestamp,
+) -> pd.DataFrame:
+    """Add ``baseline_type`` and ``computed_at`` for the DB insert."""
+    return baselines.assign(baseline_type=baseline_type, computed_at=computed_at)[
+        ["device_id", "baseline_type", "slot", "is_weekday", "baseline_kwh", "computed_at"]
+    ]
@@ -0,0 +1,379 @@
+"""Incremental per-device, per-day aggregate of ``rec_meters_15m`` for the baselines.
+
+Every baseline is a function of daily per-slot values: High 4 of 7 and the
+winsorized reference average daily slot means, the median and the upward
+spread take quantiles of them, and the clear-day filter ranks days by total
+export. ``aggregate_daily`` computes those values per
+``(date, device_id, slot, is_weekday)``:
+
+- ``readings``                               rows of the view in the bucket
+- ``grid_import_kwh``, ``grid_export_kwh``,
+  ``total_consumption_kwh``                  bucket means
+- ``grid_export_total_kwh``                  bucket sum (clear-day ranking)
+- ``pv_production_kwh``                      bucket max (M1-only detection)
+
+``slot`` is a 15-min bucket, so that grain has one row per reading.
+``_rec_meter_device_day`` stores it one row per ``(date, device_id)``
+instead, each column an array over the day's 96 slots (``readings`` 0 and
+NULL kWh where a slot has no reading): 96x fewer rows to merge, index and
+read. ``load_daily`` expands the rows back to per-slot rows as they are
+fetched, so baselines computed from the table equal those computed from the
+raw view.
+
+Each run reads only the view rows since the watermark (the last ``ts``
+aggregated), starting ``refresh_days`` whole days earlier so late readings
+are picked up, and replaces those days in the table. ``refresh_days`` must
+cover the upstream delivery lag: readings landing further behind the
+watermark are not aggregated until the next rebuild.
+
+The first run rebuilds the table over ``backfill_days``, and so does any run
+whose device set differs from the stored one: the scope fingerprints the
+devices in the table plus those with view rows in the refreshed window, so a
+device joining with imported history is picked up in full (and one dropped
+from ``devices`` is removed) without scanning the whole view. Deleting the
+watermark row forces a rebuild, e.g. after a backfill upstream. Days older
+than ``backfill_days`` are deleted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Connection, Engine, text
+
+from lib import meters as mt
+from lib.pg_bulk import merge_dataframe
+
+logger = logging.getLogger(__name__)
+
+DAILY_TABLE = "_rec_meter_device_day"
+WATERMARK_TABLE = "_rec_meter_device_day_watermark"
+# Per-slot layout of the table before it stored one row per device-day
+_LEGACY_TABLES = ("_rec_meter_slot_daily", "_rec_meter_slot_daily_watermark")
+SLOTS_PER_DAY = 96
+# ``date`` first: merge_dataframe replaces a window of the first key column
+KEY_COLS = ["date", "device_id"]
+SLOT_KEY_COLS = ["date", "device_id", "slot", "is_weekday"]
+KWH_COLUMNS = [
+    "grid_import_kwh",
+    "grid_export_kwh",
+    "grid_export_total_kwh",
+    "total_consumption_kwh",
+    "pv_production_kwh",
+]
+# Per-slot rows (aggregate_daily, load_daily) and stored device-day rows
+DAILY_COLUMNS = [*SLOT_KEY_COLS, "readings", *KWH_COLUMNS]
+STORED_COLUMNS = [*KEY_COLS, "is_weekday", "readings", *KWH_COLUMNS]
+
+
+def aggregate_daily(meters: pd.DataFrame) -> pd.DataFrame:
+    """Per (date, device, slot, is_weekday) aggregate of ``load_meters`` rows."""
+    if meters.empty:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+    df = mt.add_time_features(meters)
+    daily = (
+        df.groupby(SLOT_KEY_COLS, sort=True, observed=True)
+        .agg(
+            readings=("ts", "size"),
+            grid_import_kwh=("consumption_kwh", "mean"),
+            grid_export_kwh=("production_kwh", "mean"),
+            grid_export_total_kwh=("production_kwh", "sum"),
+            total_consumption_kwh=("total_consumption_kwh", "mean"),
+            pv_production_kwh=("pv_production_kwh", "max"),
+        )
+        .reset_index()
+    )
+    daily["date"] = pd.DatetimeIndex(mt.days_to_dates(daily["date"])).date
+    daily["device_id"] = daily["device_id"].astype(object)
+    daily["slot"] = daily["slot"].astype(np.int16)
+    return daily[DAILY_COLUMNS]
+
+
+def _array_literals(values: np.ndarray) -> list[str]:
+    """Postgres array literal of every row of a 2-D array; NaN becomes NULL."""
+    text_values = values.astype(str)
+    if values.dtype.kind == "f":
+        text_values = np.where(np.isnan(values), "NULL", text_values)
+    return ["{" + ",".join(row) + "}" for row in text_values]
+
+
+def pack_days(daily: pd.DataFrame) -> pd.DataFrame:
+    """``aggregate_daily`` rows as stored: one row per (date, device_id).
+
+    ``readings`` and the kWh columns become array literals over the day's
+    slots, ready for COPY into the array columns of ``DAILY_TABLE``.
+    """
+    if daily.empty:
+        return pd.DataFrame(columns=STORED_COLUMNS)
+    day, days = pd.MultiIndex.from_frame(daily[KEY_COLS]).factorize()
+    slot = daily["slot"].to_numpy(dtype=np.intp)
+    packed = pd.DataFrame({
+        "date": days.get_level_values(0),
+        "device_id": days.get_level_values(1),
+    })
+    is_weekday = np.zeros(len(days), dtype=bool)
+    is_weekday[day] = daily["is_weekday"].to_numpy(dtype=bool)
+    packed["is_weekday"] = is_weekday
+    readings = np.zeros((len(days), SLOTS_PER_DAY), dtype=np.int64)
+    readings[day, slot] = daily["readings"].to_numpy(dtype=np.int64)
+    packed["readings"] = _array_literals(readings)
+    for col in KWH_COLUMNS:
+        values = np.full((len(days), SLOTS_PER_DAY), np.nan)
+        values[day, slot] = daily[col].to_numpy(dtype=float)
+        packed[col] = _array_literals(values)
+    return packed[STORED_COLUMNS]
+
+
+def scope_key(devices: list[str] | None) -> str:
+    """Fingerprint of the device set the table was built for."""
+    if not devices:
+        return "*"
+    return hashlib.md5(",".join(sorted(devices)).encode()).hexdigest()
+
+
+def _ensure_tables(conn: Connection, schema: str) -> None:
+    """Create the aggregate and watermark tables if missing, dropping the legacy ones.
+
+    The unique key on ``KEY_COLS`` is added by ``merge_dataframe``.
+    """
+    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    for table in _LEGACY_TABLES:
+        conn.execute(text(f"DROP TABLE IF EXISTS {schema}.{table}"))
+    conn.execute(
+        text(
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.{DAILY_TABLE} (
+                date date not null,
+                device_id text not null,
+                is_weekday bool not null,
+                readings smallint[] not null,
+                grid_import_kwh float[],
+                grid_export_kwh float[],
+                grid_export_total_kwh float[],
+                total_consumption_kwh float[],
+                pv_production_kwh float[]
+            )
+            """
+        )
+    )
+    conn.execute(
+        text(
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.{WATERMARK_TABLE} (
+                table_name text primary key,
+                through_ts timestamptz not null,
+                scope text not null,
+                updated_at timestamptz not null default now()
+            )
+            """
+        )
+    )
+
+
+def refresh_start(
+    watermark: pd.Timestamp | None,
+    now: pd.Timestamp,
+    backfill_days: int,
+    refresh_days: int,
+) -> pd.Timestamp:
+    """First ``ts`` to re-read: whole days, from the watermark or the backfill."""
+    backfill = (now - pd.Timedelta(days=backfill_days)).floor("D")
+    if watermark is None:
+        return backfill
+    return max(backfill, watermark.floor("D") - pd.Timedelta(days=refresh_days))
+
+
+def refresh_daily_aggregate(
+    engine: Engine,
+    schema: str,
+    backfill_days: int,
+    refresh_days: int = 1,
+    devices: list[str] | None = None,
+    now: pd.Timestamp | None = None,
+) -> int:
+    """Bring ``schema._rec_meter_device_day`` up to date with the view.
+
+    Args:
+        engine: SQLAlchemy engine.
+        schema: Schema of the aggregate and watermark tables.
+        backfill_days: Days the table covers (the longest baseline lookback).
+        refresh_days: Whole days before the watermark's day re-aggregated on
+            every run, for readings that arrive late; set it to the upstream
+            delivery lag.
+        devices: Device scope passed to ``load_meters``. A device in this
+            scope appearing in the refreshed window without rows in the
+            table, or a stored device leaving the scope, rebuilds.
+        now: Current time; defaults to now (UTC).
+
+    Returns:
+        Number of device-day rows written.
+    """
+    now = now if now is not None else pd.Timestamp.now(tz="UTC")
+    with engine.begin() as conn:
+        _ensure_tables(conn, schema)
+        conn.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+            {"key": f"{schema}.{DAILY_TABLE}"},
+        )
+        row = conn.execute(
+            text(
+                f"SELECT through_ts, scope FROM {schema}.{WATERMARK_TABLE}"
+                " WHERE table_name = :table"
+            ),
+            {"table": DAILY_TABLE},
+        ).first()
+        watermark = None
+        if row is not None:
+            watermark = pd.Timestamp(row.through_ts).tz_convert("UTC")
+            since = refresh_start(watermark, now, backfill_days, refresh_days)
+            scope = scope_key(
+                sorted(
+                    set(_stored_devices(conn, schema, devices))
+                    | set(mt.view_devices(conn, devices, since=since))
+                )
+            )
+            if scope != row.scope:
+                logger.info("Device set changed; rebuilding %s.%s.", schema, DAILY_TABLE)
+                watermark = None
+        if watermark is None:
+            conn.execute(text(f"DELETE FROM {schema}.{DAILY_TABLE}"))
+
+        since = refresh_start(watermark, now, backfill_days, refresh_days)
+        meters = mt.load_meters(engine, devices=devices, since=since)
+        days = pack_days(aggregate_daily(meters))
+        stats = merge_dataframe(
+            conn,
+            days,
+            schema,
+            DAILY_TABLE,
+            key_cols=KEY_COLS,
+            replace_window=(since.date(), now.date()),
+        )
+        conn.execute(
+            text(f"DELETE FROM {schema}.{DAILY_TABLE} WHERE date < :cutoff"),
+            {"cutoff": (now - pd.Timedelta(days=backfill_days)).date()},
+        )
+        # The devices the next run's scope starts from
+        scope = scope_key(_stored_devices(conn, schema, devices))
+        if not meters.empty:
+            through = meters["ts"].max()
+        else:
+            through = watermark if watermark is not None else since
+        conn.execute(
+            text(
+                f"""
+                INSERT INTO {schema}.{WATERMARK_TABLE} (table_name, through_ts, scope, updated_at)
+                VALUES (:table, :through, :scope, now())
+                ON CONFLICT (table_name) DO UPDATE
+                SET through_ts = EXCLUDED.through_ts, scope = EXCLUDED.scope,
+                    updated_at = EXCLUDED.updated_at
+                """
+            ),
+            {"table": DAILY_TABLE, "through": through, "scope": scope},
+        )
+    logger.info(
+        "Refreshed %s.%s from %s: %d view rows -> %d device-day rows.",
+        schema, DAILY_TABLE, since, len(meters), stats.rows_copied,
+    )
+    return stats.rows_copied
+
+
+def load_daily(
+    engine: Engine,
+    schema: str,
+    lookback_days: int,
+    devices: list[str] | None = None,
+    chunk_rows: int = mt.DEFAULT_CHUNK_ROWS,
+    float32: bool = False,
+) -> pd.DataFrame:
+    """Per-slot aggregate rows whose day lies in the last ``lookback_days``.
+
+    Device-day rows are read in chunks through a server-side cursor and
+    expanded by ``unpack_day_chunk`` into ``aggregate_daily``'s per-slot
+    rows, in the compact dtypes of ``meters.add_time_features``: categorical
+    ``device_id``, int8 ``slot``, int32 ``date`` day numbers, int32
+    ``readings`` and, with ``float32``, float32 kWh. Adds ``ts`` (the bucket
+    start, UTC) so ``meters.lookback_slice`` cuts the same windows as on the
+    raw view; rows are sorted by it.
+    """
+    where_device = ""
+    params: dict[str, object] = {"lookback": lookback_days}
+    if devices:
+        where_device = "and device_id = any(:devices)"
+        params["devices"] = list(devices)
+    sql = text(
+        f"""
+        select {", ".join(STORED_COLUMNS)}
+        from {schema}.{DAILY_TABLE}
+        where date >= ((now() - make_interval(days => :lookback)) at time zone 'UTC')::date
+        {where_device}
+        """
+    )
+    df = mt.read_chunked(
+        engine,
+        sql,
+        params,
+        lambda chunk: unpack_day_chunk(chunk, float32),
+        # Device-day rows per chunk, ~chunk_rows per-slot rows once expanded
+        max(1, chunk_rows // SLOTS_PER_DAY),
+    )
+    return with_bucket_ts(df)
+
+
+def unpack_day_chunk(chunk: pd.DataFrame, float32: bool = False) -> pd.DataFrame:
+    """Per-slot rows in ``load_daily`` dtypes of one fetched chunk of device-day rows.
+
+    Array columns arrive as lists (NULL elements as None); slots without
+    readings are dropped, as ``aggregate_daily`` has no row for them.
+    """
+    n_days = len(chunk)
+    readings = np.array(chunk["readings"].tolist(), dtype=np.int32).reshape(n_days, SLOTS_PER_DAY)
+    present = readings > 0
+    day, slot = np.nonzero(present)
+    rows = pd.DataFrame({
+        "date": mt.dates_to_days(chunk["date"])[day],
+        "device_id": pd.Categorical(chunk["device_id"].to_numpy()[day]),
+        "slot": slot.astype(np.int8),
+        "is_weekday": chunk["is_weekday"].to_numpy(dtype=bool)[day],
+        "readings": readings[present],
+    })
+    for col in KWH_COLUMNS:
+        values = np.array(chunk[col].tolist(), dtype=float).reshape(n_days, SLOTS_PER_DAY)
+        rows[col] = values[present]
+    return mt.compact_floats(rows, KWH_COLUMNS, float32)
+
+
+def with_bucket_ts(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the bucket start ``ts`` (UTC) of every row and sort by it."""
+    seconds = df["date"].to_numpy(dtype=np.int64) * 86_400 + df["slot"].to_numpy(dtype=np.int64) * 900
+    # Microseconds like the view's ts, so lookback_slice compares any timestamp
+    df["ts"] = pd.to_datetime(seconds, unit="s", utc=True).as_unit("us")
+    return df.sort_values("ts", kind="stable", ignore_index=True)
+
+
+def _stored_devices(
+    conn: Connection, schema: str, devices: list[str] | None = None
+) -> list[str]:
+    """Devices with rows in the aggregate (within ``devices`` when given), sorted."""
+    where_device = ""
+    params: dict[str, object] = {}
+    if devices:
+        where_device = "where device_id = any(:devices)"
+        params["devices"] = list(devices)
+    rows = conn.execute(
+        text(
+            f"select distinct device_id from {schema}.{DAILY_TABLE} {where_device}"
+            " order by device_id"
+        ),
+        params,
+    ).scalars()
+    return list(rows)
+
+
+def list_devices(engine: Engine, schema: str) -> list[str]:
+    """Devices with rows in the aggregate, sorted (the fleet when unscoped)."""
+    with engine.connect() as conn:
+        return _stored_devices(conn, schema)
@@ -5,23 +5,103 @@ sanctioned rec_metering interface) that reconstructs ``pv_production_kwh``,
 clips ``self_consumed_kwh`` at zero and scopes to the active fleet. All energy
 columns are kWh per 15-min bucket and are read as-is — no kW/kWh conversion
 happens anywhere in this app.
+
+Frames are kept compact, since 90 days of a large fleet runs to tens of
+millions of rows: reads go through a server-side cursor in chunks, each chunk
+converted as it arrives (categorical ``device_id``, optionally float32 kWh),
+and the time features are int8/bool/int32 columns rather than Python
+``date`` objects.
 """
 
 from __future__ import annotations
 
 import os
+from collections.abc import Callable, Sequence
 
+import numpy as np
 import pandas as pd
-from sqlalchemy import Engine, text
+from pandas.api.types import union_categoricals
+from sqlalchemy import Connection, Engine, TextClause, text
 
 _SILVER_SCHEMA = os.environ.get("CELINE_SILVER_SCHEMA", "ds_dev_silver")
 METERS_VIEW = "rec_meters_15m"
+ENERGY_COLUMNS = (
+    "consumption_kwh",
+    "production_kwh",
+    "pv_production_kwh",
+    "self_consumed_kwh",
+    "total_consumption_kwh",
+)
+# Rows per server-side cursor fetch; bounds the driver's and pandas' buffers
+DEFAULT_CHUNK_ROWS: int = 100_000
+
+
+def read_chunked(
+    engine: Engine,
+    sql: TextClause,
+    params: dict[str, object],
+    prepare: Callable[[pd.DataFrame], pd.DataFrame],
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """Read ``sql`` through a server-side cursor, ``prepare``-ing each chunk.
+
+    ``prepare`` shrinks the chunk (dtypes, dropped columns) before the next one
+    is fetched, so the full result never exists in pandas' default dtypes. A
+    categorical ``device_id`` is unioned across chunks, categories sorted.
+    """
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows)
+        chunks = [
+            prepare(chunk)
+            for chunk in pd.read_sql(sql, conn, params=params, chunksize=chunk_rows)
+        ]
+    return concat_chunks(chunks)
+
+
+def concat_chunks(chunks: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate prepared chunks, keeping a categorical ``device_id`` categorical."""
+    if len(chunks) == 1:
+        return chunks[0]
+    if not isinstance(chunks[0]["device_id"].dtype, pd.CategoricalDtype):
+        return pd.concat(chunks, ignore_index=True)
+    # concat would fall back to object strings for differing categories
+    device_id = union_categoricals([chunk["device_id"] for chunk in chunks], sort_categories=True)
+    position = chunks[0].columns.get_loc("device_id")
+    df = pd.concat([chunk.drop(columns="device_id") for chunk in chunks], ignore_index=True)
+    df.insert(position, "device_id", device_id)
+    return df
+
+
+def compact_floats(
+    df: pd.DataFrame, columns: Sequence[str], float32: bool = False
+) -> pd.DataFrame:
+    """Cast ``columns`` to float32 (or float64), in place; returns ``df``."""
+    dtype = np.float32 if float32 else np.float64
+    for col in columns:
+        df[col] = df[col].astype(dtype)
+    return df
+
+
+def days_to_dates(days: np.ndarray | pd.Series) -> np.ndarray:
+    """Calendar dates (``datetime64[D]``) of int day numbers (days since 1970-01-01)."""
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]")
+
+
+def dates_to_days(dates: pd.Series) -> np.ndarray:
+    """int32 day numbers of a date or datetime column (days since 1970-01-01)."""
+    values = pd.to_datetime(dates)
+    if values.dt.tz is not None:
+        values = values.dt.tz_convert("UTC").dt.tz_localize(None)
+    return values.to_numpy().astype("datetime64[D]").astype(np.int32)
 
 
 def load_meters(
     engine: Engine,
-    lookback_days: int,
+    lookback_days: int | None = None,
     devices: list[str] | None = None,
+    since: pd.Timestamp | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    float32: bool = False,
 ) -> pd.DataFrame:
     """Read the last ``lookback_days`` of 15-min meter rows (kWh per bucket).
 
@@ -30,14 +110,27 @@ def load_meters(
         lookback_days: How many days back to read.
         devices: Optional extra fleet scope. The view is already restricted to the
             active fleet; pass a subset to narrow further. ``None`` reads all.
+        since: Read rows with ``ts >= since`` instead of a lookback (incremental
+            readers such as ``meter_daily``).
+        chunk_rows: Rows per server-side cursor fetch.
+        float32: Store the kWh columns as float32 (half the memory, ~7
+            significant digits) instead of float64.
 
     Returns:
         One row per ``(device_id, ts)`` with columns ``consumption_kwh``
         (grid import), ``production_kwh`` (grid export), ``pv_production_kwh``,
-        ``self_consumed_kwh``, ``total_consumption_kwh``.
+        ``self_consumed_kwh``, ``total_consumption_kwh``; ``device_id`` is
+        categorical and ``ts`` is UTC.
     """
+    if since is not None:
+        where_ts = "ts >= :since"
+        params: dict[str, object] = {"since": since}
+    elif lookback_days is not None:
+        where_ts = "ts >= now() - make_interval(days => :lookback)"
+        params = {"lookback": lookback_days}
+    else:
+        raise ValueError("load_meters needs lookback_days or since")
     where_device = ""
-    params: dict[str, object] = {"lookback": lookback_days}
     if devices:
         where_device = "and device_id = any(:devices)"
         params["devices"] = list(devices)
@@ -46,21 +139,73 @@ def load_meters(
         select device_id, ts, consumption_kwh, production_kwh,
                pv_production_kwh, self_consumed_kwh, total_consumption_kwh
         from {_SILVER_SCHEMA}.{METERS_VIEW}
-        where ts >= now() - make_interval(days => :lookback)
+        where {where_ts}
         {where_device}
         """
     )
-    with engine.connect() as conn:
-        df = pd.read_sql(sql, conn, params=params)
-    df["ts"] = pd.to_datetime(df["ts"], utc=True)
-    return df
+    return read_chunked(
+        engine, sql, params, lambda chunk: compact_meter_chunk(chunk, float32), chunk_rows
+    )
+
+
+def view_devices(
+    conn: Connection,
+    devices: list[str] | None = None,
+    since: pd.Timestamp | None = None,
+) -> list[str]:
+    """Devices with rows in the view (within ``devices`` when given), sorted.
+
+    ``since`` bounds the scan to rows with ``ts >= since``.
+    """
+    conditions = []
+    params: dict[str, object] = {}
+    if devices:
+        conditions.append("device_id = any(:devices)")
+        params["devices"] = list(devices)
+    if since is not None:
+        conditions.append("ts >= :since")
+        params["since"] = since
+    where = f"where {' and '.join(conditions)}" if conditions else ""
+    rows = conn.execute(
+        text(
+            f"select distinct device_id from {_SILVER_SCHEMA}.{METERS_VIEW} {where}"
+            " order by device_id"
+        ),
+        params,
+    ).scalars()
+    return list(rows)
+
+
+def compact_meter_chunk(chunk: pd.DataFrame, float32: bool = False) -> pd.DataFrame:
+    """``load_meters`` dtypes for one fetched chunk, in place; returns ``chunk``."""
+    chunk["device_id"] = chunk["device_id"].astype("category")
+    chunk["ts"] = pd.to_datetime(chunk["ts"], utc=True)
+    return compact_floats(chunk, ENERGY_COLUMNS, float32)
+
+
+def lookback_slice(history: pd.DataFrame, lookback_days: int, now: pd.Timestamp) -> pd.DataFrame:
+    """Rows of a ``ts``-sorted frame with ``ts >= now - lookback_days``.
+
+    Same window as ``load_meters(lookback_days=...)``, cut from a frame read
+    once over a wider window. The result is a positional slice (no copy until
+    written), so callers must treat it as read-only.
+    """
+    start = history["ts"].searchsorted(now - pd.Timedelta(days=lookback_days), side="left")
+    return history.iloc[start:]
 
 
 def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Add ``slot`` (0..95), ``is_weekday`` (bool), ``date``, ``hour`` derived from ``ts``."""
-    df = df.copy()
-    df["slot"] = df["ts"].dt.hour * 4 + df["ts"].dt.minute // 15
+    """Add ``slot`` (0..95), ``is_weekday`` (bool), ``date``, ``hour`` derived from ``ts``.
+
+    ``slot`` and ``hour`` are int8. ``date`` is the int32 day number (days since
+    1970-01-01, see ``days_to_dates``): it sorts, groups and counts like the
+    calendar date without a Python object per row. The input frame's columns
+    are shared, not copied.
+    """
+    df = df.copy(deep=False)
+    hour = df["ts"].dt.hour
+    df["slot"] = (hour * 4 + df["ts"].dt.minute // 15).astype(np.int8)
     df["is_weekday"] = df["ts"].dt.dayofweek < 5
-    df["date"] = df["ts"].dt.date
-    df["hour"] = df["ts"].dt.hour
+    df["date"] = dates_to_days(df["ts"])
+    df["hour"] = hour.astype(np.int8)
     return df
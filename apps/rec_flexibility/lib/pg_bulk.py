@@ -0,0 +1,392 @@
+"""Bulk COPY loader and merge writer for Postgres tables.
+
+``copy_dataframe`` streams a DataFrame (or Arrow table) into a table with
+``COPY ... FROM STDIN`` in CSV form, in chunks, instead of the row-by-row
+INSERTs of ``DataFrame.to_sql``. ``merge_dataframe`` COPYs into a temporary
+staging table and merges into the target with a single
+``INSERT ... ON CONFLICT DO UPDATE``, optionally replacing a key window in
+the same transaction. ``prepare_merge_target`` (built on ``dedupe_table``)
+is the migration for targets that already hold duplicate keys from earlier
+appends.
+
+Works with both psycopg2 and psycopg 3 connections. Each app image ships
+only its own directory, so this module is kept identical in every app that
+writes DataFrames to Postgres (om, pv_detection, pv_estimation,
+rec_flexibility); om/tests/test_shared_modules.py fails when a copy drifts.
+"""
+
+import io
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional, Sequence
+
+import pandas as pd
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+# Rows serialized per COPY chunk; bounds the CSV buffer (~10-50 MB for raw tables)
+DEFAULT_CHUNK_ROWS: int = 100_000
+
+
+class DuplicateKeyError(Exception):
+    """The merge target holds duplicate keys, so its unique index cannot be built."""
+
+
+@dataclass
+class MergeStats:
+    """Row counts and timings of one ``merge_dataframe`` call."""
+
+    table: str
+    rows_copied: int = 0
+    rows_deleted: int = 0
+    rows_merged: int = 0
+    copy_seconds: float = 0.0
+    merge_seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.table}: copied {self.rows_copied} rows in {self.copy_seconds:.2f}s, "
+            f"merged {self.rows_merged} and deleted {self.rows_deleted} "
+            f"in {self.merge_seconds:.2f}s"
+        )
+
+
+def _quote(name: str) -> str:
+    """Quote an SQL identifier."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _to_pandas(data: Any) -> pd.DataFrame:
+    """Accept a DataFrame or anything with ``to_pandas()`` (pyarrow Table)."""
+    if isinstance(data, pd.DataFrame):
+        return data
+    if hasattr(data, "to_pandas"):
+        return data.to_pandas()
+    raise TypeError(f"Expected a DataFrame or Arrow table, got {type(data).__name__}")
+
+
+def _copy_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """Map dtypes whose CSV text Postgres would not parse as intended.
+
+    Booleans become ``t``/``f`` (nullable ones keep NULL), and dict/list
+    cells become JSON text (for json/jsonb columns). Other dtypes are
+    written as-is: floats at round-trip precision, timestamps in ISO format
+    (with offset when tz-aware), nullable integers without a ``.0``.
+    """
+    converted = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series.dtype):
+            converted[col] = series.map({True: "t", False: "f"})
+        elif series.dtype == object:
+            sample = series.dropna()
+            if not sample.empty and isinstance(sample.iloc[0], (dict, list)):
+                converted[col] = series.map(
+                    lambda v: json.dumps(v) if isinstance(v, (dict, list)) else v
+                )
+    return df.assign(**converted) if converted else df
+
+
+def dataframe_to_csv(df: pd.DataFrame) -> io.StringIO:
+    """Serialize ``df`` for ``COPY ... FROM STDIN WITH (FORMAT csv)``.
+
+    NaN/None become unquoted empty fields (NULL); see ``_copy_ready`` for
+    the dtype mapping.
+    """
+    buffer = io.StringIO()
+    _copy_ready(df).to_csv(buffer, index=False, header=False, na_rep="")
+    buffer.seek(0)
+    return buffer
+
+
+def _iter_chunks(df: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _copy_chunks(
+    conn: sa.Connection,
+    df: pd.DataFrame,
+    target: str,
+    chunk_rows: int,
+) -> None:
+    """Run ``COPY target (columns) FROM STDIN`` over ``df`` on ``conn``'s DBAPI connection."""
+    columns = ", ".join(_quote(col) for col in df.columns)
+    sql = f"COPY {target} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    cursor = conn.connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            # psycopg2: one COPY per chunk
+            for chunk in _iter_chunks(df, chunk_rows):
+                cursor.copy_expert(sql, dataframe_to_csv(chunk))
+        else:
+            # psycopg 3: one COPY, chunks streamed into it
+            with cursor.copy(sql) as copy:
+                for chunk in _iter_chunks(df, chunk_rows):
+                    copy.write(dataframe_to_csv(chunk).getvalue())
+    finally:
+        cursor.close()
+
+
+def _ensure_table(conn: sa.Connection, df: pd.DataFrame, schema: str, table: str) -> None:
+    """Create the schema, and the table with ``to_sql``'s dtype mapping, if missing."""
+    conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {_quote(schema)}"))
+    if not sa.inspect(conn).has_table(table, schema=schema):
+        df.head(0).to_sql(table, conn, schema=schema, if_exists="append", index=False)
+
+
+def copy_dataframe(
+    conn: sa.Connection,
+    data: Any,
+    schema: str,
+    table: str,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    create: bool = True,
+) -> int:
+    """Append rows to ``schema.table`` with ``COPY FROM STDIN`` (drop-in for ``to_sql``).
+
+    Runs inside the caller's transaction (``conn`` from ``engine.begin()``).
+
+    Args:
+        conn: Open connection inside a transaction.
+        data: DataFrame or Arrow table; its columns must exist in the table.
+        schema: Target schema.
+        table: Target table name.
+        chunk_rows: Rows serialized per chunk.
+        create: Create the schema, and the table from ``data``'s dtypes (as
+            ``to_sql`` would), when missing.
+
+    Returns:
+        Number of rows written.
+    """
+    df = _to_pandas(data)
+    if create:
+        _ensure_table(conn, df, schema, table)
+    if df.empty:
+        return 0
+
+    start = time.perf_counter()
+    _copy_chunks(conn, df, f"{_quote(schema)}.{_quote(table)}", chunk_rows)
+    logger.debug(
+        "COPY %d rows into %s.%s in %.2fs", len(df), schema, table, time.perf_counter() - start,
+    )
+    return len(df)
+
+
+def _key_index_name(table: str, key_cols: Sequence[str]) -> str:
+    return f"{table}_{'_'.join(key_cols)}_key"
+
+
+def _duplicate_keys_sql(target: str, key_cols: Sequence[str], limit: int = 5) -> str:
+    """Keys of ``target`` held by more than one row, most repeated first."""
+    keys = ", ".join(_quote(col) for col in key_cols)
+    return (
+        f"SELECT {keys}, count(*) AS n FROM {target}"
+        f" GROUP BY {keys} HAVING count(*) > 1"
+        f" ORDER BY n DESC LIMIT {int(limit)}"
+    )
+
+
+def _dedupe_sql(target: str, key_cols: Sequence[str]) -> str:
+    """Delete every row of ``target`` that shares its key with a higher ctid."""
+    key_match = " AND ".join(f"t.{_quote(col)} = d.{_quote(col)}" for col in key_cols)
+    return f"DELETE FROM {target} t USING {target} d WHERE {key_match} AND t.ctid < d.ctid"
+
+
+def _ensure_unique_key(
+    conn: sa.Connection,
+    schema: str,
+    table: str,
+    key_cols: Sequence[str],
+) -> None:
+    """Add the unique index on ``key_cols`` (required by ON CONFLICT) if missing.
+
+    A table written before the index existed (e.g. by ``to_sql`` appends) may
+    hold duplicate keys, on which CREATE UNIQUE INDEX fails with an opaque
+    error. They are checked first and reported with the offending keys.
+
+    Raises:
+        DuplicateKeyError: If the table holds duplicate keys; run
+            ``prepare_merge_target`` (or ``dedupe_table``) once to remove them.
+    """
+    index_name = _key_index_name(table, key_cols)
+    target = f"{_quote(schema)}.{_quote(table)}"
+    exists = conn.execute(
+        sa.text("SELECT to_regclass(:index)"),
+        {"index": f"{_quote(schema)}.{_quote(index_name)}"},
+    ).scalar()
+    if exists is not None:
+        return
+
+    duplicates = conn.execute(sa.text(_duplicate_keys_sql(target, key_cols))).fetchall()
+    if duplicates:
+        examples = ", ".join(f"{tuple(row[:-1])} x{row[-1]}" for row in duplicates)
+        raise DuplicateKeyError(
+            f"{schema}.{table} has duplicate ({', '.join(key_cols)}) keys, e.g. {examples}; "
+            f"run pg_bulk.prepare_merge_target() once to keep one row per key before merging"
+        )
+    conn.execute(sa.text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote(index_name)}"
+        f" ON {target} ({', '.join(_quote(col) for col in key_cols)})"
+    ))
+
+
+def _ensure_target(
+    conn: sa.Connection,
+    df: pd.DataFrame,
+    schema: str,
+    table: str,
+    key_cols: Sequence[str],
+) -> None:
+    """Create the target table (from ``df``'s columns) and its unique key if missing."""
+    _ensure_table(conn, df, schema, table)
+    _ensure_unique_key(conn, schema, table, key_cols)
+
+
+def dedupe_table(
+    conn: sa.Connection,
+    schema: str,
+    table: str,
+    key_cols: Sequence[str] = ("datetime",),
+) -> int:
+    """Delete duplicate-key rows of ``schema.table``, keeping one row per key.
+
+    One-off migration for a table that ``merge_dataframe`` rejects with
+    DuplicateKeyError. The row kept is the one with the highest ``ctid``,
+    normally the last one appended. Runs inside the caller's transaction.
+
+    Args:
+        conn: Open connection inside a transaction.
+        schema: Target schema.
+        table: Target table name.
+        key_cols: Key columns that must be unique.
+
+    Returns:
+        Number of rows deleted.
+    """
+    target = f"{_quote(schema)}.{_quote(table)}"
+    deleted = conn.execute(sa.text(_dedupe_sql(target, key_cols))).rowcount
+    logger.info("Deleted %d duplicate-key rows from %s.%s", deleted, schema, table)
+    return deleted
+
+
+def prepare_merge_target(
+    conn: sa.Connection,
+    schema: str,
+    table: str,
+    key_cols: Sequence[str] = ("datetime",),
+) -> int:
+    """Migrate an existing table for ``merge_dataframe``: dedupe it, add its unique key.
+
+    Meant as a pipeline step before the first merge into a table that older
+    code filled with appends. A no-op when the table does not exist yet
+    (``merge_dataframe`` creates it) or already has the unique index; runs
+    inside the caller's transaction.
+
+    Args:
+        conn: Open connection inside a transaction.
+        schema: Target schema.
+        table: Target table name.
+        key_cols: Key columns that must be unique.
+
+    Returns:
+        Number of duplicate-key rows deleted.
+    """
+    if not sa.inspect(conn).has_table(table, schema=schema):
+        return 0
+    index = f"{_quote(schema)}.{_quote(_key_index_name(table, key_cols))}"
+    if conn.execute(sa.text("SELECT to_regclass(:index)"), {"index": index}).scalar() is not None:
+        return 0
+    deleted = dedupe_table(conn, schema, table, key_cols)
+    _ensure_unique_key(conn, schema, table, key_cols)
+    return deleted
+
+
+def merge_dataframe(
+    conn: sa.Connection,
+    df: pd.DataFrame,
+    schema: str,
+    table: str,
+    key_cols: Sequence[str] = ("datetime",),
+    replace_window: Optional[tuple[Any, Any]] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> MergeStats:
+    """Upsert ``df`` into ``schema.table`` via COPY + ``INSERT ... ON CONFLICT``.
+
+    Runs inside the caller's transaction (``conn`` from ``engine.begin()``).
+    The target table is created from ``df`` on first use, and a unique index
+    on ``key_cols`` is added if missing (required by ON CONFLICT).
+
+    Args:
+        conn: Open connection inside a transaction.
+        df: Rows to write; columns must exist in the target table.
+        schema: Target schema.
+        table: Target table name.
+        key_cols: Conflict key columns.
+        replace_window: Optional inclusive (start, end) range of the first
+            key column. Target rows in it that are not in ``df`` are deleted,
+            so the window ends up holding exactly ``df``'s rows.
+        chunk_rows: Rows serialized per COPY chunk.
+
+    Returns:
+        MergeStats with row counts and timings.
+
+    Raises:
+        DuplicateKeyError: If an existing target without the unique index
+            holds duplicate keys (see ``dedupe_table``).
+    """
+    stats = MergeStats(table=f"{schema}.{table}")
+    target = f"{_quote(schema)}.{_quote(table)}"
+    # One staging table per target, dropped at commit: a transaction may merge
+    # into several targets with different layouts
+    stage = _quote(f"_stage_{schema}_{table}")
+    columns = ", ".join(_quote(col) for col in df.columns)
+
+    _ensure_target(conn, df, schema, table, key_cols)
+
+    start = time.perf_counter()
+    conn.execute(sa.text(
+        f"CREATE TEMPORARY TABLE IF NOT EXISTS {stage}"
+        f" (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP"
+    ))
+    conn.execute(sa.text(f"TRUNCATE {stage}"))
+    if not df.empty:
+        _copy_chunks(conn, df, stage, chunk_rows)
+    stats.rows_copied = len(df)
+    stats.copy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if replace_window is not None:
+        window_col = _quote(key_cols[0])
+        key_match = " AND ".join(
+            f"s.{_quote(col)} = t.{_quote(col)}" for col in key_cols
+        )
+        result = conn.execute(
+            sa.text(
+                f"DELETE FROM {target} t"
+                f" WHERE t.{window_col} >= :start AND t.{window_col} <= :end"
+                f" AND NOT EXISTS (SELECT 1 FROM {stage} s WHERE {key_match})"
+            ),
+            {"start": replace_window[0], "end": replace_window[1]},
+        )
+        stats.rows_deleted = result.rowcount
+
+    if not df.empty:
+        updates = ", ".join(
+            f"{_quote(col)} = EXCLUDED.{_quote(col)}"
+            for col in df.columns if col not in key_cols
+        )
+        on_conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        result = conn.execute(sa.text(
+            f"INSERT INTO {target} ({columns})"
+            f" SELECT {columns} FROM {stage}"
+            f" ON CONFLICT ({', '.join(_quote(col) for col in key_cols)}) {on_conflict}"
+        ))
+        stats.rows_merged = result.rowcount
+    stats.merge_seconds = time.perf_counter() - start
+
+    logger.info("Bulk merge %s", stats)
+    return stats
@@ -0,0 +1,59 @@
+"""Split the fleet into device shards and run a worker over them in processes.
+
+Baselines are independent per device, so ``compute_baselines_task`` hands
+each shard of devices to a worker that reads and computes only that shard.
+``run_shards`` uses a ``ProcessPoolExecutor`` when more than one worker and
+shard are configured, and runs the shards inline otherwise (no pickling,
+same results).
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import TypeVar
+
+from lib.pg_engines import dispose_engines
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def shard_devices(devices: Sequence[str], shard_size: int) -> list[list[str]]:
+    """Sorted ``devices`` cut into consecutive shards of at most ``shard_size``."""
+    if shard_size < 1:
+        raise ValueError(f"shard_size must be >= 1, got {shard_size}")
+    ordered = sorted(set(devices))
+    return [ordered[i : i + shard_size] for i in range(0, len(ordered), shard_size)]
+
+
+def resolve_workers(workers: int | None, n_shards: int) -> int:
+    """Worker processes to start: ``workers`` (0/None = CPU count), capped by shards."""
+    wanted = workers or os.cpu_count() or 1
+    return max(1, min(wanted, n_shards))
+
+
+def _init_worker() -> None:
+    """Forget the parent's pooled engines: their connections belong to it."""
+    dispose_engines(close=False)
+
+
+def run_shards(
+    worker: Callable[[T], R],
+    shards: Sequence[T],
+    workers: int | None = 1,
+) -> Iterator[R]:
+    """Yield ``worker(shard)`` for every shard, in shard order.
+
+    Args:
+        worker: Top-level (picklable) function of one shard.
+        shards: Work items, one per shard.
+        workers: Processes to use; 1 runs inline, 0/None uses every CPU.
+    """
+    n_workers = resolve_workers(workers, len(shards))
+    if n_workers == 1:
+        yield from map(worker, shards)
+        return
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker) as pool:
+        yield from pool.map(worker, shards)
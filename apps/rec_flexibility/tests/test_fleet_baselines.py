@@ -0,0 +1,144 @@
+"""Equivalence tests: lib/fleet_baselines.py vs the per-device lib/baselines.py."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib import baselines as bl
+from lib import fleet_baselines as fb
+from lib import meters as mt
+
+_KEYS = ["device_id", "slot", "is_weekday"]
+
+
+def _fleet(n_devices: int = 8, max_days: int = 40, seed: int = 0) -> pd.DataFrame:
+    """Ragged synthetic fleet: varying history lengths, gaps, NaN, rounded ties."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for device in range(n_devices):
+        ts = pd.date_range(
+            "2026-01-01", periods=int(rng.integers(1, max_days + 1)) * 96, freq="15min", tz="UTC"
+        )
+        ts = ts[rng.uniform(size=len(ts)) > rng.choice([0.0, 0.3])]
+        consumption = rng.gamma(0.5, 0.3, len(ts)).round(int(rng.choice([1, 3])))
+        consumption[rng.uniform(size=len(ts)) < 0.01] = np.nan
+        export = np.where(rng.uniform(size=len(ts)) < 0.5, 0.0, rng.gamma(0.5, 0.3, len(ts)).round(2))
+        frames.append(
+            pd.DataFrame(
+                {
+                    "device_id": f"dev-{device}",
+                    "ts": ts,
+                    "consumption_kwh": consumption,
+                    "grid_import_kwh": rng.gamma(0.5, 0.3, len(ts)),
+                    "grid_export_kwh": export,
+                }
+            )
+        )
+    return mt.add_time_features(pd.concat(frames, ignore_index=True))
+
+
+def _per_device(history: pd.DataFrame, compute) -> pd.DataFrame:
+    rows = [
+        (device_id, slot, is_weekday, value)
+        for device_id, df_dev in history.groupby("device_id")
+        for (slot, is_weekday), value in compute(df_dev, device_id).items()
+    ]
+    return pd.DataFrame(rows, columns=[*_KEYS, "baseline_kwh"])
+
+
+def _assert_identical(expected: pd.DataFrame, actual: pd.DataFrame) -> None:
+    expected = expected.sort_values(_KEYS).reset_index(drop=True)
+    actual = actual.sort_values(_KEYS).reset_index(drop=True)
+    assert expected[_KEYS].values.tolist() == actual[_KEYS].values.tolist()
+    # Bit-for-bit, NaN where the per-device result is NaN
+    np.testing.assert_array_equal(
+        expected["baseline_kwh"].to_numpy(dtype=float), actual["baseline_kwh"].to_numpy(dtype=float)
+    )
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5, 19, 20, 21, 90])
+@pytest.mark.parametrize("q", [0.0, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0])
+def test_segment_quantile_matches_numpy(n, q):
+    rng = np.random.default_rng(n)
+    segments = [np.sort(rng.gamma(0.5, 0.3, n).round(2)) for _ in range(3)]
+    segments[2][-1] = np.nan
+
+    result = fb.segment_quantile(
+        np.concatenate(segments), np.arange(3) * n, np.full(3, n), q
+    )
+
+    np.testing.assert_array_equal(result, [np.quantile(segment, q) for segment in segments])
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize(
+    "min_readings, winsorize_pct", [(90, None), (1, None), (90, 0.05), (1, 0.2), (300, 0.1)]
+)
+def test_high_x_of_y_matches_per_device(seed, min_readings, winsorize_pct):
+    history = _fleet(seed=seed)
+
+    expected = _per_device(
+        history,
+        lambda df, _: bl._baseline_per_slot_weekday(df, 4, 7, min_readings, winsorize_pct),
+    )
+
+    _assert_identical(
+        expected,
+        fb.fleet_high_x_of_y(
+            history, select=4, candidates=7, min_readings=min_readings, winsorize_pct=winsorize_pct
+        ),
+    )
+
+
+def test_median_matches_per_device():
+    history = _fleet(seed=4)
+
+    expected = _per_device(history, lambda df, _: bl.compute_median_baseline(df))
+
+    _assert_identical(expected, fb.fleet_median(history))
+
+
+@pytest.mark.parametrize("value_col", ["consumption_kwh", "grid_import_kwh"])
+def test_upward_spread_with_clear_day_filter_matches_per_device(value_col):
+    history = _fleet(seed=5)
+    pv_devices = {"dev-0", "dev-2", "dev-3"}
+
+    expected = _per_device(
+        history,
+        lambda df, device_id: bl.compute_upward_spread(
+            df, value_col, q_hi=0.75, q_lo=0.5, clear_top=5 if device_id in pv_devices else None
+        ),
+    )
+
+    _assert_identical(
+        expected,
+        fb.fleet_upward_spread(
+            history, value_col, q_hi=0.75, q_lo=0.5, clear_top=5, clear_top_devices=pv_devices
+        ),
+    )
+
+
+def test_empty_history_gives_empty_frames():
+    empty = _fleet(n_devices=1).iloc[:0]
+
+    assert fb.fleet_high_x_of_y(empty).empty
+    assert fb.fleet_median(empty).empty
+    assert fb.fleet_upward_spread(empty).empty
+
+
+def test_tagged_frame_has_the_db_columns():
+    history = _fleet(n_devices=2, seed=6)
+    computed_at = pd.Timestamp("2026-04-10", tz="UTC")
+
+    tagged = fb.tag_baselines(fb.fleet_high_x_of_y(history), "settlement", computed_at)
+    expected = bl.baselines_to_dataframe(
+        bl.compute_settlement_baseline(history[history["device_id"] == "dev-0"]),
+        "dev-0",
+        "settlement",
+        computed_at,
+    )
+
+    assert list(tagged.columns) == list(expected.columns)
+    assert (tagged["baseline_type"] == "settlement").all()
@@ -0,0 +1,152 @@
+"""Tests for the incremental per-device, per-day aggregate (lib/meter_daily.py)."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib import fleet_baselines as fb
+from lib import meter_daily as md
+from lib import meters as mt
+
+
+def _view_rows(days: int = 20, seed: int = 0) -> pd.DataFrame:
+    """rec_meters_15m-shaped rows for three devices, one reading per bucket."""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range("2026-03-01", periods=days * 96, freq="15min", tz="UTC")
+    frames = []
+    for device, pv in (("dev-A", 0.0), ("dev-B", 1.0), ("dev-C", 1.0)):
+        n = len(ts)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "device_id": device,
+                    "ts": ts,
+                    "consumption_kwh": rng.gamma(0.5, 0.3, n).round(3),
+                    "production_kwh": np.where(
+                        rng.uniform(size=n) < 0.5, 0.0, rng.gamma(0.5, 0.3, n).round(3)
+                    ),
+                    "pv_production_kwh": rng.gamma(0.5, 0.3, n) * pv,
+                    "self_consumed_kwh": 0.0,
+                    "total_consumption_kwh": rng.gamma(0.5, 0.3, n).round(3),
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def _raw_history(view: pd.DataFrame) -> pd.DataFrame:
+    return mt.add_time_features(view).rename(
+        columns={"consumption_kwh": "grid_import_kwh", "production_kwh": "grid_export_kwh"}
+    )
+
+
+def test_aggregate_daily_keys_and_values():
+    view = _view_rows(days=2)
+    view = pd.concat([view, view.iloc[:1].assign(consumption_kwh=3.0)], ignore_index=True)
+
+    daily = md.aggregate_daily(view)
+
+    assert list(daily.columns) == md.DAILY_COLUMNS
+    assert not daily.duplicated(md.SLOT_KEY_COLS).any()
+    assert len(daily) == 3 * 2 * 96
+    first = daily.iloc[0]
+    assert first["readings"] == 2
+    assert first["grid_import_kwh"] == pytest.approx((view.loc[0, "consumption_kwh"] + 3.0) / 2)
+    assert daily["readings"].sum() == len(view)
+    assert md.aggregate_daily(view.iloc[:0]).empty
+
+
+def test_baselines_from_the_aggregate_equal_the_raw_view():
+    view = _view_rows()
+    raw = _raw_history(view)
+    daily = md.aggregate_daily(view)
+
+    def exact(a: pd.DataFrame, b: pd.DataFrame) -> None:
+        np.testing.assert_array_equal(
+            a["baseline_kwh"].to_numpy(dtype=float), b["baseline_kwh"].to_numpy(dtype=float)
+        )
+
+    exact(
+        fb.fleet_high_x_of_y(raw, value_col="total_consumption_kwh", winsorize_pct=0.05),
+        fb.fleet_high_x_of_y(
+            daily, value_col="total_consumption_kwh", winsorize_pct=0.05, readings_col="readings"
+        ),
+    )
+    exact(fb.fleet_median(raw), fb.fleet_median(daily))
+    exact(
+        fb.fleet_upward_spread(raw, "grid_import_kwh", clear_top=5, clear_top_devices={"dev-B"}),
+        fb.fleet_upward_spread(
+            daily,
+            "grid_import_kwh",
+            clear_top=5,
+            clear_top_devices={"dev-B"},
+            export_col="grid_export_total_kwh",
+        ),
+    )
+
+
+def _fetched(packed: pd.DataFrame) -> pd.DataFrame:
+    """Stored rows as the cursor returns them: arrays as lists, NULL as None."""
+    fetched = packed.copy()
+    for col in ["readings", *md.KWH_COLUMNS]:
+        fetched[col] = [
+            [None if v == "NULL" else float(v) for v in literal.strip("{}").split(",")]
+            for literal in packed[col]
+        ]
+    return fetched
+
+
+def test_packed_days_round_trip_to_the_same_buckets_and_baselines():
+    view = _view_rows(days=10)
+    # A device-day with missing slots and a slot whose kWh is NULL
+    view = view.drop(index=range(5, 20)).reset_index(drop=True)
+    view.loc[0, "pv_production_kwh"] = np.nan
+    daily = md.aggregate_daily(view)
+
+    packed = md.pack_days(daily)
+    assert list(packed.columns) == md.STORED_COLUMNS
+    assert len(packed) == 3 * 10
+    fetched = _fetched(packed)
+    chunks = [fetched.iloc[:7].copy(), fetched.iloc[7:].copy()]
+    history = md.with_bucket_ts(mt.concat_chunks([md.unpack_day_chunk(c) for c in chunks]))
+
+    assert history["slot"].dtype == np.int8
+    assert history["date"].dtype == np.int32
+    assert isinstance(history["device_id"].dtype, pd.CategoricalDtype)
+    assert history["ts"].is_monotonic_increasing
+    assert len(history) == len(daily)
+    assert np.isnan(history["pv_production_kwh"]).sum() == 1
+    np.testing.assert_array_equal(
+        np.sort(history["ts"].unique()), np.sort(_raw_history(view)["ts"].unique())
+    )
+    np.testing.assert_array_equal(
+        fb.fleet_high_x_of_y(daily, value_col="grid_import_kwh", readings_col="readings")[
+            "baseline_kwh"
+        ].to_numpy(dtype=float),
+        fb.fleet_high_x_of_y(history, value_col="grid_import_kwh", readings_col="readings")[
+            "baseline_kwh"
+        ].to_numpy(dtype=float),
+    )
+    assert md.pack_days(daily.iloc[:0]).empty
+    assert md.unpack_day_chunk(fetched.iloc[:0]).empty
+
+
+def test_refresh_start_rereads_whole_days_before_the_watermark():
+    now = pd.Timestamp("2026-04-10 08:20", tz="UTC")
+
+    assert md.refresh_start(None, now, 90, 1) == pd.Timestamp("2026-01-10", tz="UTC")
+    assert md.refresh_start(
+        pd.Timestamp("2026-04-10 08:00", tz="UTC"), now, 90, 1
+    ) == pd.Timestamp("2026-04-09", tz="UTC")
+    # A watermark older than the backfill window restarts from the backfill
+    assert md.refresh_start(
+        pd.Timestamp("2025-12-01", tz="UTC"), now, 90, 1
+    ) == pd.Timestamp("2026-01-10", tz="UTC")
+
+
+def test_scope_key_is_order_insensitive():
+    assert md.scope_key(None) == md.scope_key([]) == "*"
+    assert md.scope_key(["b", "a"]) == md.scope_key(["a", "b"])
+    assert md.scope_key(["a"]) != md.scope_key(["a", "b"])
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -22,6 +23,10 @@ class _Conn:
     def __enter__(self):
         return self
 
+    def execution_options(self, **options):
+        self.options = options
+        return self
+
     def __exit__(self, *exc):
         return False
 
@@ -46,10 +51,10 @@ def test_load_meters_returns_kwh_columns_unconverted(monkeypatch):
     """load_meters must pass values through untouched — no x0.25, no renaming."""
     captured: dict[str, object] = {}
 
-    def fake_read_sql(sql, conn, params=None):
+    def fake_read_sql(sql, conn, params=None, chunksize=None):
         captured["sql"] = str(sql)
         captured["params"] = params
-        return _view_frame()
+        return iter([_view_frame()])
 
     monkeypatch.setattr(pd, "read_sql", fake_read_sql)
 
@@ -68,10 +73,10 @@ def test_load_meters_returns_kwh_columns_unconverted(monkeypatch):
 def test_load_meters_omits_device_filter_when_none(monkeypatch):
     captured: dict[str, object] = {}
 
-    def fake_read_sql(sql, conn, params=None):
+    def fake_read_sql(sql, conn, params=None, chunksize=None):
         captured["sql"] = str(sql)
         captured["params"] = params
-        return _view_frame()
+        return iter([_view_frame()])
 
     monkeypatch.setattr(pd, "read_sql", fake_read_sql)
 
@@ -80,13 +85,35 @@ def test_load_meters_omits_device_filter_when_none(monkeypatch):
     assert captured["params"] == {"lookback": 30}
 
 
+def test_view_devices_bounds_the_scan_to_the_window():
+    captured: dict[str, object] = {}
+
+    class _Result:
+        def scalars(self):
+            return iter(["dev-A"])
+
+    class _ExecConn:
+        def execute(self, sql, params):
+            captured["sql"] = str(sql)
+            captured["params"] = params
+            return _Result()
+
+    since = pd.Timestamp("2026-04-01", tz="UTC")
+    assert m.view_devices(_ExecConn(), ["dev-A"], since=since) == ["dev-A"]
+    assert "device_id = any(:devices) and ts >= :since" in captured["sql"]
+    assert captured["params"] == {"devices": ["dev-A"], "since": since}
+
+    m.view_devices(_ExecConn())
+    assert "where" not in captured["sql"]
+
+
 def test_add_time_features():
     df = _view_frame().iloc[:1].copy()
     df["ts"] = pd.Timestamp("2026-04-01 12:30", tz="UTC")
     df = m.add_time_features(df)
     assert df.loc[0, "slot"] == 50  # 12*4 + 30//15 = 50
     assert df.loc[0, "is_weekday"]  # 2026-04-01 is Wednesday
-    assert df.loc[0, "date"] == pd.Timestamp("2026-04-01").date()
+    assert m.days_to_dates([df.loc[0, "date"]])[0] == np.datetime64("2026-04-01")
     assert df.loc[0, "hour"] == 12
 
 
@@ -96,3 +123,66 @@ def test_view_frame_invariants():
     assert (df["self_consumed_kwh"] >= 0).all()
     expected_total = df["consumption_kwh"] + df["self_consumed_kwh"]
     assert df["total_consumption_kwh"].tolist() == pytest.approx(expected_total.tolist())
+
+
+def test_lookback_slice_matches_the_query_window():
+    ts = pd.date_range("2026-04-01", periods=10 * 96, freq="15min", tz="UTC")
+    history = pd.DataFrame({"ts": ts, "consumption_kwh": range(len(ts))})
+    now = pd.Timestamp("2026-04-11 00:05", tz="UTC")
+
+    week = m.lookback_slice(history, 7, now)
+
+    assert week["ts"].min() == pd.Timestamp("2026-04-04 00:15", tz="UTC")
+    assert week["ts"].max() == ts[-1]
+    assert week.equals(history[history["ts"] >= now - pd.Timedelta(days=7)])
+    assert len(m.lookback_slice(history, 30, now)) == len(history)
+
+
+def test_load_meters_since_replaces_the_lookback(monkeypatch):
+    captured: dict[str, object] = {}
+
+    def fake_read_sql(sql, conn, params=None, chunksize=None):
+        captured["sql"] = str(sql)
+        captured["params"] = params
+        return iter([_view_frame()])
+
+    monkeypatch.setattr(pd, "read_sql", fake_read_sql)
+
+    since = pd.Timestamp("2026-04-01", tz="UTC")
+    m.load_meters(_Engine(), since=since)
+    assert "ts >= :since" in captured["sql"]
+    assert captured["params"] == {"since": since}
+    with pytest.raises(ValueError):
+        m.load_meters(_Engine())
+
+
+def test_chunks_are_compacted_and_unioned(monkeypatch):
+    frame = _view_frame()
+    chunks = [frame.iloc[:1].copy(), frame.iloc[1:].assign(device_id="dev-0").copy()]
+    captured: dict[str, object] = {}
+
+    def fake_read_sql(sql, conn, params=None, chunksize=None):
+        captured["chunksize"] = chunksize
+        captured["options"] = conn.options
+        return iter(chunks)
+
+    monkeypatch.setattr(pd, "read_sql", fake_read_sql)
+
+    df = m.load_meters(_Engine(), lookback_days=7, chunk_rows=1, float32=True)
+
+    assert captured["chunksize"] == 1
+    assert captured["options"]["stream_results"] is True
+    assert list(df.columns) == _METER_COLUMNS
+    assert df["device_id"].tolist() == ["dev-A", "dev-0"]
+    assert list(df["device_id"].cat.categories) == ["dev-0", "dev-A"]
+    assert all(df[col].dtype == np.float32 for col in m.ENERGY_COLUMNS)
+
+
+def test_time_features_are_compact():
+    df = m.add_time_features(_view_frame())
+
+    assert df["slot"].dtype == np.int8
+    assert df["hour"].dtype == np.int8
+    assert df["is_weekday"].dtype == bool
+    assert df["date"].dtype == np.int32
+    assert m.dates_to_days(pd.Series([pd.Timestamp("2026-04-01").date()]))[0] == df.loc[0, "date"]
@@ -0,0 +1,40 @@
+"""Tests for device sharding and the shard executor (lib/sharding.py)."""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from lib import sharding
+
+
+def _describe(shard: list[str]) -> tuple[int, list[str]]:
+    return os.getpid(), shard
+
+
+def test_shard_devices_sorts_dedupes_and_cuts():
+    shards = sharding.shard_devices(["d3", "d1", "d2", "d1", "d5", "d4"], 2)
+
+    assert shards == [["d1", "d2"], ["d3", "d4"], ["d5"]]
+    assert sharding.shard_devices([], 2) == []
+    with pytest.raises(ValueError):
+        sharding.shard_devices(["d1"], 0)
+
+
+def test_resolve_workers_is_capped_by_shards():
+    assert sharding.resolve_workers(8, 3) == 3
+    assert sharding.resolve_workers(1, 10) == 1
+    assert sharding.resolve_workers(0, 1) == 1
+    assert sharding.resolve_workers(None, 0) == 1
+
+
+def test_run_shards_inline_and_in_processes_agree():
+    shards = sharding.shard_devices([f"d{i:02d}" for i in range(7)], 3)
+
+    inline = list(sharding.run_shards(_describe, shards, workers=1))
+    pooled = list(sharding.run_shards(_describe, shards, workers=2))
+
+    assert [shard for _, shard in inline] == [shard for _, shard in pooled] == shards
+    assert {pid for pid, _ in inline} == {os.getpid()}
+    assert os.getpid() not in {pid for pid, _ in pooled}
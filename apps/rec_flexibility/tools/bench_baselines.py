@@ -0,0 +1,148 @@
+"""
+Benchmark the per-device baselines (lib/baselines.py) against the fleet-wide
+engine (lib/fleet_baselines.py) on a synthetic fleet.
+
+Each run computes settlement, winsorized reference, grid-export median and
+upward spread (clear-day filter on half the devices) over ``--days`` of
+15-minute readings, and checks that both engines agree bit for bit.
+
+The per-device loop takes minutes on large fleets, so above
+``--loop-sample`` devices it is timed on a sample and scaled linearly (it is
+linear in devices by construction); those rows are marked ``~``.
+
+Usage:
+    python tools/bench_baselines.py
+    python tools/bench_baselines.py --devices 10 1000 10000 --days 35 --loop-sample 500
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+from lib import baselines as bl  # noqa: E402
+from lib import fleet_baselines as fb  # noqa: E402
+from lib import meters as mt  # noqa: E402
+
+logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+
+_KEYS = ["device_id", "slot", "is_weekday"]
+
+
+def synthetic_fleet(n_devices: int, days: int, seed: int = 0) -> pd.DataFrame:
+    """``days`` of 15-minute readings for ``n_devices`` meters, with time features."""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range("2026-01-01", periods=days * 96, freq="15min", tz="UTC")
+    n = n_devices * len(ts)
+    df = pd.DataFrame({
+        "device_id": np.repeat([f"dev-{i:05d}" for i in range(n_devices)], len(ts)),
+        "ts": np.tile(ts, n_devices),
+        "consumption_kwh": rng.gamma(0.5, 0.3, n).round(3),
+        "grid_import_kwh": rng.gamma(0.5, 0.3, n).round(3),
+        "grid_export_kwh": np.where(rng.uniform(size=n) < 0.5, 0.0, rng.gamma(0.5, 0.3, n).round(3)),
+    })
+    return mt.add_time_features(df)
+
+
+def _per_device(history: pd.DataFrame, pv_devices: set) -> Dict[str, pd.DataFrame]:
+    """The four baseline types the way compute_baselines_task used to loop."""
+    computations: Dict[str, Callable[[pd.DataFrame, str], dict]] = {
+        "settlement": lambda df, _: bl.compute_settlement_baseline(df),
+        "reference": lambda df, _: bl.compute_winsorized_reference_baseline(df),
+        "median": lambda df, _: bl.compute_median_baseline(df, value_col="grid_export_kwh"),
+        "spread": lambda df, dev: bl.compute_upward_spread(
+            df, clear_top=5 if dev in pv_devices else None
+        ),
+    }
+    groups = list(history.groupby("device_id"))
+    out = {}
+    for name, compute in computations.items():
+        rows = [
+            (device_id, slot, is_weekday, value)
+            for device_id, df_dev in groups
+            for (slot, is_weekday), value in compute(df_dev, device_id).items()
+        ]
+        out[name] = pd.DataFrame(rows, columns=[*_KEYS, "baseline_kwh"])
+    return out
+
+
+def _fleet(history: pd.DataFrame, pv_devices: set) -> Dict[str, pd.DataFrame]:
+    return {
+        "settlement": fb.fleet_high_x_of_y(history),
+        "reference": fb.fleet_high_x_of_y(history, winsorize_pct=0.05),
+        "median": fb.fleet_median(history, value_col="grid_export_kwh"),
+        "spread": fb.fleet_upward_spread(history, clear_top=5, clear_top_devices=pv_devices),
+    }
+
+
+def _same(expected: Dict[str, pd.DataFrame], actual: Dict[str, pd.DataFrame]) -> bool:
+    for name, frame in expected.items():
+        a = frame.sort_values(_KEYS).reset_index(drop=True)
+        b = actual[name].sort_values(_KEYS).reset_index(drop=True)
+        if a[_KEYS].values.tolist() != b[_KEYS].values.tolist():
+            return False
+        if not np.array_equal(
+            a["baseline_kwh"].to_numpy(dtype=float), b["baseline_kwh"].to_numpy(dtype=float), equal_nan=True
+        ):
+            return False
+    return True
+
+
+def _timed(fn: Callable, *args) -> Tuple[float, Dict[str, pd.DataFrame]]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def run(n_devices: int, days: int, loop_sample: int) -> Dict[str, object]:
+    history = synthetic_fleet(n_devices, days)
+    devices = history["device_id"].unique()
+    pv_devices = set(devices[::2])
+
+    fleet_s, fleet_out = _timed(_fleet, history, pv_devices)
+
+    sampled = n_devices > loop_sample
+    if sampled:
+        history = history[history["device_id"].isin(devices[:loop_sample])]
+        fleet_out = _fleet(history, pv_devices)
+    loop_s, loop_out = _timed(_per_device, history, pv_devices)
+    if sampled:
+        loop_s *= n_devices / loop_sample
+
+    return {
+        "loop": loop_s,
+        "fleet": fleet_s,
+        "sampled": sampled,
+        "identical": _same(loop_out, fleet_out),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-device vs fleet-wide baselines")
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--days", type=int, default=35, help="History length per device")
+    parser.add_argument(
+        "--loop-sample", type=int, default=200,
+        help="Time the per-device loop on this many devices and scale up",
+    )
+    args = parser.parse_args()
+
+    for n in args.devices:
+        r = run(n, args.days, args.loop_sample)
+        mark = "~" if r["sampled"] else " "
+        print(
+            f"devices={n:<6} per-device={mark}{r['loop']:8.2f} s  fleet={r['fleet']:7.2f} s  "
+            f"speedup={mark}{r['loop'] / r['fleet']:6.1f}x  identical={r['identical']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Measure the memory of the meter frames before and after the compact dtypes.
+
+Two frames are measured on a synthetic fleet, fed as the cursor chunks
+``pd.read_sql`` would return (string ``device_id``, ``datetime.date``
+objects, float64 kWh):
+
+- ``meters``: ``load_meters`` + ``add_time_features`` (what
+  ``refresh_daily_aggregate`` aggregates);
+- ``daily``: ``load_daily`` (the baseline history, one row per device, slot
+  and day).
+
+``before`` reads the whole result at once and converts it the way the code
+did before chunking (default dtypes, deep copy, ``date`` objects; for
+``daily``, one fetched row per device, slot and day); ``after`` runs each
+chunk through ``compact_meter_chunk`` / ``unpack_day_chunk`` (device-day
+rows with per-slot arrays) and ``concat_chunks``, like ``read_chunked``. ``frame`` is the resulting
+frame's ``memory_usage(deep=True)``, ``peak`` the tracemalloc peak while
+building it (raw chunks included).
+
+Usage:
+    python tools/bench_meter_memory.py
+    python tools/bench_meter_memory.py --devices 500 --days 90 --float32
+"""
+
+import argparse
+import datetime as dt
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+from lib import meter_daily as md  # noqa: E402
+from lib import meters as mt  # noqa: E402
+
+_MB = 1024 * 1024
+
+
+def _raw_meter_chunks(n_devices: int, days: int, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """``rec_meters_15m`` rows in cursor chunks, ordered by device then ts."""
+    rng = np.random.default_rng(0)
+    ts = pd.date_range("2026-01-01", periods=days * 96, freq="15min", tz="UTC")
+    devices = np.repeat([f"dev-{i:05d}" for i in range(n_devices)], len(ts))
+    all_ts = np.tile(ts, n_devices)
+    for start in range(0, len(devices), chunk_rows):
+        n = min(chunk_rows, len(devices) - start)
+        chunk = {"device_id": devices[start : start + n].tolist(), "ts": all_ts[start : start + n]}
+        for col in mt.ENERGY_COLUMNS:
+            chunk[col] = rng.gamma(0.5, 0.3, n).round(3)
+        yield pd.DataFrame(chunk)
+
+
+def _raw_slot_chunks(n_devices: int, days: int, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Per-slot aggregate rows (the layout before device-day rows) in cursor chunks."""
+    rng = np.random.default_rng(0)
+    first = dt.date(2026, 1, 1)
+    dates = [first + dt.timedelta(days=d) for d in range(days)]
+    per_device = days * 96
+    n_rows = n_devices * per_device
+    for start in range(0, n_rows, chunk_rows):
+        rows = np.arange(start, min(start + chunk_rows, n_rows))
+        day = (rows % per_device) // 96
+        chunk = {
+            "date": [dates[d] for d in day],
+            "device_id": [f"dev-{i:05d}" for i in rows // per_device],
+            "slot": rows % 96,
+            "is_weekday": np.array([dates[d].weekday() < 5 for d in day]),
+            "readings": np.ones(len(rows), dtype=np.int64),
+        }
+        for col in md.KWH_COLUMNS:
+            chunk[col] = rng.gamma(0.5, 0.3, len(rows)).round(3)
+        yield pd.DataFrame(chunk)
+
+
+def _raw_day_chunks(n_devices: int, days: int, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """``_rec_meter_device_day`` rows (arrays as lists) in cursor chunks."""
+    rng = np.random.default_rng(0)
+    first = dt.date(2026, 1, 1)
+    dates = [first + dt.timedelta(days=d) for d in range(days)]
+    n_rows = n_devices * days
+    step = max(1, chunk_rows // md.SLOTS_PER_DAY)
+    for start in range(0, n_rows, step):
+        rows = np.arange(start, min(start + step, n_rows))
+        chunk = {
+            "date": [dates[r % days] for r in rows],
+            "device_id": [f"dev-{i:05d}" for i in rows // days],
+            "is_weekday": np.array([dates[r % days].weekday() < 5 for r in rows]),
+            "readings": [[1] * md.SLOTS_PER_DAY for _ in rows],
+        }
+        for col in md.KWH_COLUMNS:
+            values = rng.gamma(0.5, 0.3, (len(rows), md.SLOTS_PER_DAY)).round(3)
+            chunk[col] = values.tolist()
+        yield pd.DataFrame(chunk)
+
+
+def _meters_before(chunks: Iterator[pd.DataFrame]) -> pd.DataFrame:
+    df = pd.concat(list(chunks), ignore_index=True)
+    df["ts"] = pd.to_datetime(df["ts"], utc=True)
+    df = df.copy()
+    df["slot"] = df["ts"].dt.hour * 4 + df["ts"].dt.minute // 15
+    df["is_weekday"] = df["ts"].dt.dayofweek < 5
+    df["date"] = df["ts"].dt.date
+    df["hour"] = df["ts"].dt.hour
+    return df
+
+
+def _meters_after(chunks: Iterator[pd.DataFrame], float32: bool) -> pd.DataFrame:
+    df = mt.concat_chunks([mt.compact_meter_chunk(chunk, float32) for chunk in chunks])
+    return mt.add_time_features(df)
+
+
+def _daily_before(chunks: Iterator[pd.DataFrame]) -> pd.DataFrame:
+    df = pd.concat(list(chunks), ignore_index=True)
+    df["date"] = pd.to_datetime(df["date"])
+    df["ts"] = (
+        df["date"] + pd.to_timedelta(df["slot"].astype(np.int64) * 15, unit="min")
+    ).dt.tz_localize("UTC")
+    df["date"] = df["date"].dt.date
+    return df.sort_values("ts", kind="stable", ignore_index=True)
+
+
+def _daily_after(chunks: Iterator[pd.DataFrame], float32: bool) -> pd.DataFrame:
+    df = mt.concat_chunks([md.unpack_day_chunk(chunk, float32) for chunk in chunks])
+    return md.with_bucket_ts(df)
+
+
+def _measure(build: Callable[[], pd.DataFrame]) -> Tuple[float, float, int]:
+    """Frame size (MB), tracemalloc peak (MB) and rows of ``build()``."""
+    tracemalloc.start()
+    df = build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df.memory_usage(deep=True).sum() / _MB, peak / _MB, len(df)
+
+
+def run(n_devices: int, days: int, chunk_rows: int, float32: bool) -> List[Tuple[str, ...]]:
+    def meters() -> Iterator[pd.DataFrame]:
+        return _raw_meter_chunks(n_devices, days, chunk_rows)
+
+    def slots() -> Iterator[pd.DataFrame]:
+        return _raw_slot_chunks(n_devices, days, chunk_rows)
+
+    def device_days() -> Iterator[pd.DataFrame]:
+        return _raw_day_chunks(n_devices, days, chunk_rows)
+
+    cases = [
+        ("meters", lambda: _meters_before(meters()), lambda: _meters_after(meters(), float32)),
+        ("daily", lambda: _daily_before(slots()), lambda: _daily_after(device_days(), float32)),
+    ]
+    rows = []
+    for name, before, after in cases:
+        b_frame, b_peak, n_rows = _measure(before)
+        a_frame, a_peak, _ = _measure(after)
+        rows.append((name, n_rows, b_frame, a_frame, b_peak, a_peak))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of the meter frames before/after compact dtypes")
+    parser.add_argument("--devices", type=int, nargs="+", default=[100])
+    parser.add_argument("--days", type=int, default=90, help="History length per device")
+    parser.add_argument("--chunk-rows", type=int, default=mt.DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--float32", action="store_true", help="float32 kWh columns")
+    args = parser.parse_args()
+
+    for n in args.devices:
+        for name, n_rows, b_frame, a_frame, b_peak, a_peak in run(
+            n, args.days, args.chunk_rows, args.float32
+        ):
+            print(
+                f"devices={n:<5} {name:<6} rows={n_rows:<9} "
+                f"frame {b_frame:8.1f} -> {a_frame:7.1f} MB ({b_frame / a_frame:4.1f}x)  "
+                f"peak {b_peak:8.1f} -> {a_peak:7.1f} MB ({b_peak / a_peak:4.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
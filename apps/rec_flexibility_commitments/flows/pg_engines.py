@@ -0,0 +1,197 @@
+"""Process-wide registry of pooled SQLAlchemy engines, keyed by DSN.
+
+Tasks used to build a fresh engine (or raw psycopg2 connection) per call and
+drop its pool right after, so every task paid for a new TCP + auth
+handshake. ``get_engine`` returns one engine per DSN and pool settings for
+the whole process; ``dbapi_connection`` checks a raw DBAPI connection out of
+the same pool for code written against the driver directly.
+
+Pool settings default to the ``PG_POOL_SIZE``, ``PG_MAX_OVERFLOW``,
+``PG_POOL_RECYCLE`` and ``PG_POOL_PRE_PING`` environment variables.
+Connection-acquire counts and wait times are kept per engine and reported
+by ``pool_stats``, to spot pool pressure when several flows share a worker.
+
+Each app image ships only its own directory, so this module is kept
+identical in every app that talks to Postgres (om, pv_detection,
+pv_estimation, rec_flexibility, rec_registry, rec_flexibility_commitments);
+om/tests/test_shared_modules.py fails when a copy drifts.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE: int = int(os.environ.get("PG_POOL_SIZE", "5"))
+DEFAULT_MAX_OVERFLOW: int = int(os.environ.get("PG_MAX_OVERFLOW", "10"))
+# Seconds after which a pooled connection is replaced, below typical
+# server/proxy idle timeouts
+DEFAULT_POOL_RECYCLE: int = int(os.environ.get("PG_POOL_RECYCLE", "1800"))
+DEFAULT_PRE_PING: bool = os.environ.get("PG_POOL_PRE_PING", "true").lower() in ("true", "1")
+
+
+@dataclass
+class PoolStats:
+    """Connection-acquire counters of one pooled engine."""
+
+    dsn: str
+    acquires: int = 0
+    connects: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    checked_out: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_acquire(self, seconds: float) -> None:
+        with self._lock:
+            self.acquires += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def record_connect(self) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def __str__(self) -> str:
+        mean_ms = 1000 * self.wait_seconds / self.acquires if self.acquires else 0.0
+        return (
+            f"{self.dsn}: {self.acquires} acquires ({self.connects} new connections), "
+            f"wait mean {mean_ms:.1f} ms / max {1000 * self.max_wait_seconds:.1f} ms, "
+            f"{self.checked_out} checked out"
+        )
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool that times every checkout, including pre-ping and connect."""
+
+    _acquire_stats: Optional[PoolStats] = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            if self._acquire_stats is not None:
+                self._acquire_stats.record_acquire(time.perf_counter() - start)
+
+    def recreate(self) -> QueuePool:
+        # engine.dispose() swaps in a new pool; keep counting into the same stats
+        pool = super().recreate()
+        pool._acquire_stats = self._acquire_stats
+        return pool
+
+
+_ENGINES: dict[tuple, sa.Engine] = {}
+_STATS: dict[tuple, PoolStats] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_engine(
+    url: str | sa.URL,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    pool_pre_ping: Optional[bool] = None,
+    pool_recycle: Optional[int] = None,
+) -> sa.Engine:
+    """Return the process-wide pooled engine for ``url``, creating it on first use.
+
+    Args:
+        url: SQLAlchemy database URL.
+        pool_size: Connections kept open (default ``PG_POOL_SIZE``).
+        max_overflow: Extra connections allowed under load (default ``PG_MAX_OVERFLOW``).
+        pool_pre_ping: Test connections on checkout (default ``PG_POOL_PRE_PING``).
+        pool_recycle: Max connection age in seconds (default ``PG_POOL_RECYCLE``).
+
+    Returns:
+        Engine shared by every caller with the same URL and pool settings.
+    """
+    url = sa.make_url(url)
+    options = {
+        "pool_size": DEFAULT_POOL_SIZE if pool_size is None else pool_size,
+        "max_overflow": DEFAULT_MAX_OVERFLOW if max_overflow is None else max_overflow,
+        "pool_pre_ping": DEFAULT_PRE_PING if pool_pre_ping is None else pool_pre_ping,
+        "pool_recycle": DEFAULT_POOL_RECYCLE if pool_recycle is None else pool_recycle,
+    }
+    key = (url.render_as_string(hide_password=False), *sorted(options.items()))
+
+    with _REGISTRY_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is not None:
+            return engine
+
+        stats = PoolStats(dsn=url.render_as_string(hide_password=True))
+        engine = sa.create_engine(url, poolclass=_TimedQueuePool, **options)
+        engine.pool._acquire_stats = stats
+        sa.event.listen(engine, "connect", lambda *_: stats.record_connect())
+
+        _ENGINES[key] = engine
+        _STATS[key] = stats
+        logger.debug("Created pooled engine for %s (%s)", stats.dsn, options)
+        return engine
+
+
+@contextmanager
+def dbapi_connection(url: str | sa.URL, **pool_options: Any) -> Iterator[Any]:
+    """Check a raw DBAPI connection out of the pooled engine for ``url``.
+
+    Commits when the block exits normally and rolls back on error (like a
+    psycopg2 ``with conn:`` block), then returns the connection to the pool.
+
+    Args:
+        url: SQLAlchemy database URL.
+        **pool_options: Passed to ``get_engine``.
+    """
+    conn = get_engine(url, **pool_options).raw_connection()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def pool_stats() -> list[PoolStats]:
+    """Snapshot of the acquire counters of every registered engine."""
+    with _REGISTRY_LOCK:
+        snapshot = []
+        for key, stats in _STATS.items():
+            with stats._lock:
+                snapshot.append(PoolStats(
+                    dsn=stats.dsn,
+                    acquires=stats.acquires,
+                    connects=stats.connects,
+                    wait_seconds=stats.wait_seconds,
+                    max_wait_seconds=stats.max_wait_seconds,
+                    checked_out=_ENGINES[key].pool.checkedout(),
+                ))
+        return snapshot
+
+
+def log_pool_stats(level: int = logging.INFO) -> None:
+    """Log one line of ``pool_stats`` per registered engine."""
+    for stats in pool_stats():
+        logger.log(level, "Engine pool %s", stats)
+
+
+def dispose_engines(close: bool = True) -> None:
+    """Drop every pooled engine and empty the registry.
+
+    Args:
+        close: Close the pooled connections. Pass False in a forked child,
+            whose inherited connections still belong to the parent.
+    """
+    with _REGISTRY_LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose(close=close)
+        _ENGINES.clear()
+        _STATS.clear()
@@ -20,8 +20,8 @@ from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any
 
-import psycopg2
 import psycopg2.extras
+import sqlalchemy as sa
 import yaml
 from prefect import flow, task
 
@@ -34,6 +34,8 @@ from celine.utils.pipelines.pipeline import (
     PipelineStatus,
 )
 
+from pg_engines import dbapi_connection, log_pool_stats
+
 logger = logging.getLogger(__name__)
 
 os.environ.setdefault("APP_NAME", "rec_flexibility_commitments")
@@ -90,13 +92,15 @@ CREATE INDEX IF NOT EXISTS ix_flex_mirror_period_start
 
 
 def _db_conn(cfg: PipelineConfig):
-    return psycopg2.connect(
-        host=cfg.postgres_host,
-        port=cfg.postgres_port,
-        dbname=cfg.postgres_db,
-        user=cfg.postgres_user,
+    """Pooled psycopg2 connection; commits on exit, rolls back on error."""
+    return dbapi_connection(sa.URL.create(
+        "postgresql",
+        username=cfg.postgres_user,
         password=cfg.postgres_password,
-    )
+        host=cfg.postgres_host,
+        port=int(cfg.postgres_port),
+        database=cfg.postgres_db,
+    ))
 
 
 def _flexibility_url() -> str:
@@ -249,6 +253,7 @@ def rec_flexibility_commitments_flow(config: dict[str, Any] | None = None) -> di
     result["ensure_table"] = ensure_table(cfg)
     result["mirror"] = mirror_to_db(cfg)
 
+    log_pool_stats()
     return result
 
 
@@ -19,8 +19,8 @@ import os
 from pathlib import Path
 from typing import Any
 
-import psycopg2
 import psycopg2.extras
+import sqlalchemy as sa
 import yaml
 from prefect import flow, task
 
@@ -33,6 +33,8 @@ from celine.utils.pipelines.pipeline import (
     PipelineStatus,
 )
 
+from pg_engines import dbapi_connection, log_pool_stats
+
 logger = logging.getLogger(__name__)
 
 os.environ.setdefault("APP_NAME", "rec_registry")
@@ -78,13 +80,15 @@ CREATE INDEX IF NOT EXISTS ix_rec_registry_mirror_delivery_point_ids
 
 
 def _db_conn(cfg: PipelineConfig):
-    return psycopg2.connect(
-        host=cfg.postgres_host,
-        port=cfg.postgres_port,
-        dbname=cfg.postgres_db,
-        user=cfg.postgres_user,
+    """Pooled psycopg2 connection; commits on exit, rolls back on error."""
+    return dbapi_connection(sa.URL.create(
+        "postgresql",
+        username=cfg.postgres_user,
         password=cfg.postgres_password,
-    )
+        host=cfg.postgres_host,
+        port=int(cfg.postgres_port),
+        database=cfg.postgres_db,
+    ))
 
 
 def _registry_url() -> str:
@@ -296,6 +300,7 @@ def rec_registry_flow(config: dict[str, Any] | None = None) -> dict:
     rows = fetch_registry(cfg)
     result["mirror"] = mirror_to_db(rows, cfg)
 
+    log_pool_stats()
     return result
 
 